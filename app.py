@@ -1,950 +1,2075 @@
-# Importações necessárias
-import customtkinter as ctk                 # Interface moderna baseada em Tkinter
-import tkinter as tk                        # Biblioteca padrão para GUI em Python
-from tkinter import messagebox              # Janela de mensagens (erro, alerta, info)
-from PIL import Image                       # Manipulação de imagens
-import mysql.connector                      # Conexão com banco de dados MySQL
-import bcrypt                               # Criptografia de senhas
-
-"""
-Sistema de Gestão de Saúde - VidaPlus
-Desenvolvido por: Marcos Luís de Oliveira Silva
-RU: 4330689
-
-Descrição:
-Este sistema foi desenvolvido utilizando Python com a biblioteca CustomTkinter para a interface gráfica
-e MySQL para o banco de dados. Ele tem como objetivo gerenciar o acesso e as funções de três tipos de usuários:
-Administrador, Médico e Paciente.
-
-Funcionalidades principais:
-- Login com autenticação criptografada (bcrypt) e validação de hierarquia (Administrador, Médico ou Paciente).
-- Cadastro de novos usuários com controle de permissões.
-- Interface personalizada para cada tipo de usuário:
-  • Administrador: pode atualizar dados de médicos e pacientes.
-  • Médico: pode atualizar seu cadastro e visualizar agendamentos de pacientes.
-  • Paciente: pode atualizar seus dados e agendar consultas.
-- Agendamento de consultas vinculando paciente a médico, com data, hora e observações.
-- Consulta de agendamentos para o paciente logado.
-
-O sistema busca ser simples, funcional e com foco em segurança básica de dados e experiência do usuário.
-
-Requisitos:
-- Python 3.x
-- Biblioteca CustomTkinter
-- Biblioteca bcrypt
-- Banco de dados MySQL com as tabelas `usuarios` e `agendamentos` corretamente estruturadas.
-"""
-
-# ---------- Validação de login ----------
-def validar_login(usuario_digitado, senha_digitada, janela_login, hierarquia_esperada):
-    try:
-        # Conectando ao banco de dados
-        conexao = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='890866', 
-            database='vidaplus'
-        )
-
-        cursor = conexao.cursor()
-        # Consulta para buscar senha e hierarquia do usuário
-        query = "SELECT senha, hierarquia FROM usuarios WHERE usuario = %s"
-        cursor.execute(query, (usuario_digitado,))
-        resultado = cursor.fetchone()
-
-        if resultado:
-            senha_banco, hierarquia_banco = resultado
-            # Verifica se a senha informada corresponde à senha criptografada do banco
-            if bcrypt.checkpw(senha_digitada.encode('utf-8'), senha_banco.encode('utf-8')):
-                # Define permissões por hierarquia
-                permissoesValidas = {
-                    'Administrador': ['Administrador'],
-                    'Medico': ['Administrador', 'Medico'],
-                    'Paciente': ['Paciente']
-                }
-                # Verifica se o usuário tem permissão para acessar com a hierarquia informada
-                if hierarquia_banco in permissoesValidas[hierarquia_esperada]:
-                    global usuario_logado
-                    usuario_logado = usuario_digitado  # Armazena o nome do usuário logado
-                    messagebox.showinfo("Login", f"Login bem-sucedido como {hierarquia_banco}!")
-                    janela_login.destroy()
-                    # Abre a tela conforme o tipo de usuário
-                    if hierarquia_banco == 'Administrador':
-                        tela_principal_adm()
-                    elif hierarquia_banco == 'Medico':
-                        tela_principal_medico()
-                    else:
-                        tela_principal_paciente()
-                else:
-                    # Usuário autenticado mas sem permissão para a hierarquia selecionada
-                    messagebox.showwarning('Permissao Negada!', f'Voce nao tem autorizaçao para acessar como {hierarquia_esperada}.')
-            else:
-                # Senha inválida
-                messagebox.showerror("Erro", "Senha incorreta.")
-        else:
-            # Usuário não encontrado
-            messagebox.showerror("Erro", "Usuário não encontrado.")
-
-        cursor.close()
-        conexao.close()
-
-    except mysql.connector.Error as err:
-        # Erro de conexão com o banco
-        messagebox.showerror("Erro", f"Erro ao conectar ao banco:\n{err}")
-        
-# ---------- Tela de Início ---------
-def tela_inicio():
-    ctk.set_appearance_mode('dark')               # Define modo escuro no app
-    inicio = ctk.CTk()                             # Janela inicial
-    inicio.title('Bem-Vindo a VidaPlus')
-    inicio.geometry('300x400')                     # Tamanho da janela
-    inicio.resizable(False, False)                 # Não permite redimensionamento
-    
-    # Carrega a imagem do logo
-    try:
-        inicio.logo = ctk.CTkImage(dark_image=Image.open("vidaplusimagem.png"), size=(175, 175))
-        label_imagem = ctk.CTkLabel(inicio, image=inicio.logo, text='')
-        label_imagem.pack(pady=15)
-    except Exception as e:
-        print(f"Erro ao carregar imagem: {e}")     # Mostra erro no terminal se a imagem não carregar
-
-    # Ações ao clicar nos botões
-    def abrir_login_adm():
-        inicio.destroy()
-        tela_login(exibir_cadastro=True, hierarquia_esperada='Administrador')
-    
-    def abrir_login_medico():
-        inicio.destroy()
-        tela_login(exibir_cadastro=True, hierarquia_esperada='Medico')
-
-    def abrir_login_paciente():
-        inicio.destroy()
-        tela_login(exibir_cadastro=False, hierarquia_esperada='Paciente')
-
-    # Botões de acesso conforme o tipo de usuário
-    ctk.CTkButton(inicio, text='Administrador(a)', command=abrir_login_adm).pack(pady=15)
-    ctk.CTkButton(inicio, text='Medico(a)', command=abrir_login_medico).pack(pady=15)
-    ctk.CTkButton(inicio, text='Paciente', command=abrir_login_paciente).pack(pady=15)
-
-    inicio.mainloop()                              # Executa o loop principal da interface
-
-# ---------- Tela de login ----------
-def tela_login(exibir_cadastro=True, hierarquia_esperada='Paciente'):
-    ctk.set_appearance_mode("dark")                # Modo escuro
-    app = ctk.CTk()                                 # Janela de login
-    app.title("VidaPlus - Login")
-    app.geometry("300x350")                        # Tamanho da janela
-
-    ctk.CTkLabel(app, text="Login VidaPlus", font=ctk.CTkFont(size=20)).pack(pady=20)
-
-    entry_usuario = ctk.CTkEntry(app, placeholder_text="Usuário")  # Campo de usuário
-    entry_usuario.pack(pady=10)
-
-    entry_senha = ctk.CTkEntry(app, placeholder_text="Senha", show="*")  # Campo de senha
-    entry_senha.pack(pady=10)
-    
-    # Função que chama a validação de login
-    def realizar_login():
-        usuario = entry_usuario.get().strip()
-        senha = entry_senha.get().strip()
-        if usuario and senha:
-            validar_login(usuario, senha, app, hierarquia_esperada)
-        else:
-            messagebox.showwarning("Atenção", "Preencha todos os campos.")
-
-    ctk.CTkButton(app, text="Login", command=realizar_login).pack(pady=10)
-
-    # Credenciais fixas para permitir acesso ao cadastro
-    USUARIO_MESTRE = "admincadastro2025"
-    SENHA_MESTRE = "cadastro2025"
-
-    # Função que abre a tela de autenticação para cadastro
-    def abrir_cadastro():
-        popup = ctk.CTkToplevel(app)               # Janela sobreposta
-        popup.attributes('-topmost', True)
-        popup.lift()
-        popup.focus_force()
-        popup.title("Autenticação Requerida")
-        popup.geometry("300x200")
-        popup.resizable(False, False)
-
-        # Campos de autenticação
-        ctk.CTkLabel(popup, text="Usuário Mestre").pack(pady=(20, 5))
-        entry_user = ctk.CTkEntry(popup)
-        entry_user.pack()
-
-        ctk.CTkLabel(popup, text="Senha Mestre").pack(pady=(10, 5))
-        entry_pass = ctk.CTkEntry(popup, show="*")
-        entry_pass.pack()
-
-        # Validação de usuário mestre
-        def autenticar():
-            if entry_user.get() == USUARIO_MESTRE and entry_pass.get() == SENHA_MESTRE:
-                popup.destroy()
-                app.withdraw()  # Esconde a tela de login
-                janela_cadastro = construir_tela_cadastro(app, hierarquia_esperada=hierarquia_esperada)
-                janela_cadastro.protocol("WM_DELETE_WINDOW", lambda: [janela_cadastro.destroy(), app.deiconify()])
-            else:
-                messagebox.showerror("Erro", "Usuário ou senha mestre inválidos.")
-
-        ctk.CTkButton(popup, text="Confirmar", command=autenticar).pack(pady=15)
-        ctk.CTkButton(popup, text="Cancelar", command=popup.destroy).pack()
-
-    # Botão para abrir cadastro, se permitido
-    if exibir_cadastro:
-        ctk.CTkButton(app, text="Cadastrar novo usuário", command=abrir_cadastro).pack(pady=5)
-    
-    # Botão para voltar à tela inicial
-    ctk.CTkButton(app, text="Voltar", command=lambda: [app.destroy(), tela_inicio()]).pack(pady=10)
-
-    app.mainloop()
-
-# ---------- Tela de Cadastro ----------
-def construir_tela_cadastro(janela_principal, hierarquia_esperada):
-    cadastro = ctk.CTkToplevel(janela_principal)           # Nova janela sobreposta
-    cadastro.title('Cadastro de Usuário')
-    cadastro.geometry('500x550')
-    cadastro.resizable(False, False)
-
-    ctk.CTkLabel(cadastro, text="Cadastro de Usuário", font=ctk.CTkFont("Arial", 20)).pack(pady=10)
-
-    frame_formulario = ctk.CTkFrame(cadastro)
-    frame_formulario.pack(pady=10)
-
-    # Campos do formulário de cadastro
-    campos = [
-        "Nome completo",
-        "CPF",
-        "Telefone",
-        "Endereço",
-        "Usuário",
-        "Senha"
-    ]
-
-    entradas = []  # Lista que armazena os campos de entrada
-
-    # Criação dos campos no formulário, 2 por linha
-    for i in range(0, len(campos), 2):
-        campo1 = ctk.CTkEntry(frame_formulario, placeholder_text=campos[i])
-        campo1.grid(row=i//2, column=0, padx=10, pady=5, sticky="ew")
-        entradas.append(campo1)
-
-        if i + 1 < len(campos):
-            campo2 = ctk.CTkEntry(frame_formulario, placeholder_text=campos[i+1], show="*" if campos[i+1] == "Senha" else "")
-            campo2.grid(row=i//2, column=1, padx=10, pady=5, sticky="ew")
-            entradas.append(campo2)
-
-    # Configuração das colunas para redimensionamento
-    frame_formulario.columnconfigure(0, weight=1)
-    frame_formulario.columnconfigure(1, weight=1)
-
-    # Título para seleção de hierarquia
-    ctk.CTkLabel(cadastro, text="Selecione a hierarquia:", font=ctk.CTkFont(size=14)).pack(pady=(10, 0))
-    hierarquia_var = ctk.StringVar(value="Paciente")
-    frame_hierarquia = ctk.CTkFrame(cadastro)
-    frame_hierarquia.pack(pady=5)
-    
-    # Botões para selecionar a hierarquia do novo usuário
-    if hierarquia_esperada == 'Administrador':
-        ctk.CTkRadioButton(frame_hierarquia, text="Administrador", variable=hierarquia_var, value="Administrador").pack(side="left", padx=20)
-        ctk.CTkRadioButton(frame_hierarquia, text="Medico", variable=hierarquia_var, value="Medico").pack(side="left", padx=20)
-        ctk.CTkRadioButton(frame_hierarquia, text="Paciente", variable=hierarquia_var, value="Paciente").pack(side="left", padx=20)
-    else:
-        ctk.CTkRadioButton(frame_hierarquia, text="Paciente", variable=hierarquia_var, value="Paciente").pack(side="left", padx=20)
-    
-    # Função para finalizar o cadastro de um novo usuário
-    def finalizar_cadastro():
-        # Obtém todos os valores digitados nos campos de entrada
-        dados = [entrada.get().strip() for entrada in entradas]
-        # Obtém a hierarquia selecionada (Administrador, Médico ou Paciente)
-        hierarquia = hierarquia_var.get()
-            
-        # Verifica se todos os campos foram preenchidos
-        if all(dados):
-            # Criptografa a senha antes de armazenar no banco
-            senha_cripto = bcrypt.hashpw(dados[5].encode('utf-8'), bcrypt.gensalt())
-            # Substitui a senha original pela senha criptografada
-            dados[5] = senha_cripto.decode('utf-8')
-            # Insere os dados do usuário no banco de dados
-            inserir_usuario_mysql(dados, hierarquia)
-            # Fecha a janela de cadastro
-            cadastro.destroy()
-            # Restaura a janela principal (janela anterior)
-            janela_principal.deiconify()
-        else:
-            # Exibe aviso caso haja campos vazios
-            messagebox.showwarning("Campos vazios", "Preencha todos os campos.")
-
-    # Botão para finalizar e salvar o cadastro
-    ctk.CTkButton(cadastro, text="Finalizar Cadastro", command=finalizar_cadastro).pack(pady=20)
-
-    # Botão para voltar à tela de login, destruindo a tela de cadastro atual
-    ctk.CTkButton(cadastro, text="Voltar", command=lambda: [cadastro.destroy(), tela_login(exibir_cadastro=True, hierarquia_esperada=hierarquia_esperada)]).pack(pady=10)
-
-    # Retorna a referência da tela de cadastro
-    return cadastro
-
-
-# ---------- Tela principal do Administrador ----------
-def tela_principal_adm():
-    # Cria a janela principal da interface do administrador
-    telaAdm = ctk.CTk()
-    telaAdm.title('SGHSS - Vida Plus - Administrador')
-    telaAdm.geometry('800x500')
-    telaAdm.resizable(True, True)
-
-    # Cria o menu lateral (esquerdo)
-    frame_menu = ctk.CTkFrame(telaAdm, width=200)
-    frame_menu.pack(side='left', fill='y', padx=10, pady=10)
-
-    # Cria o espaço onde os formulários e conteúdo principal serão exibidos
-    frame_conteudo = ctk.CTkFrame(telaAdm)
-    frame_conteudo.pack(side='right', expand=True, fill='both', padx=10, pady=10)
-
-    # Função para limpar o conteúdo atual do frame principal
-    def limpar_conteudo():
-        for widget in frame_conteudo.winfo_children():
-            widget.destroy()
-
-    # ---------- Formulário de atualização de médicos ----------
-    def mostrar_formulario_medico():
-        limpar_conteudo()
-
-        # Título do formulário
-        ctk.CTkLabel(frame_conteudo, text="Atualizar Cadastro Médico", font=ctk.CTkFont(size=18)).pack(pady=10)
-
-        # Tenta buscar os médicos cadastrados no banco
-        try:
-            conexao = mysql.connector.connect(
-                host='localhost',
-                user='root',
-                password='890866',
-                database='vidaplus'
-            )
-            cursor = conexao.cursor()
-            cursor.execute("SELECT usuario FROM usuarios WHERE hierarquia = 'Medico'")
-            medicos = [row[0] for row in cursor.fetchall()]
-            cursor.close()
-            conexao.close()
-        except mysql.connector.Error as err:
-            # Mostra erro se não conseguir conectar ao banco
-            messagebox.showerror("Erro", f"Erro ao buscar médicos:\n{err}")
-            return
-
-        # Se nenhum médico for encontrado, avisa o usuário
-        if not medicos:
-            messagebox.showinfo("Aviso", "Nenhum médico encontrado.")
-            return
-
-        # Variável que armazena o médico atualmente selecionado
-        medico_selecionado = ctk.StringVar(value=medicos[0])
-
-        # Função que carrega os dados do médico selecionado no menu
-        def carregar_dados_medico(*_):
-            usuario = medico_selecionado.get()
-            try:
-                conexao = mysql.connector.connect(
-                    host='localhost',
-                    user='root',
-                    password='890866',
-                    database='vidaplus'
-                )
-                cursor = conexao.cursor()
-                cursor.execute("""
-                    SELECT nome_completo, cpf, telefone, endereco, usuario 
-                    FROM usuarios WHERE usuario = %s
-                """, (usuario,))
-                resultado = cursor.fetchone()
-                cursor.close()
-                conexao.close()
-
-                if resultado:
-                    # Preenche os campos com os dados recuperados do banco
-                    for entrada, valor in zip(entradas, resultado):
-                        entrada.delete(0, tk.END)
-                        entrada.insert(0, valor)
-                else:
-                    messagebox.showwarning("Atenção", "Médico não encontrado.")
-            except mysql.connector.Error as err:
-                messagebox.showerror("Erro", f"Erro ao carregar dados:\n{err}")
-
-        # Frame para seleção de médicos
-        menu_frame = ctk.CTkFrame(frame_conteudo)
-        menu_frame.pack(pady=5)
-        ctk.CTkLabel(menu_frame, text="Selecionar Médico:").pack(side='left', padx=(0, 10))
-        ctk.CTkOptionMenu(menu_frame, variable=medico_selecionado, values=medicos, command=carregar_dados_medico).pack(side='left')
-
-        # Lista de campos que serão exibidos no formulário
-        campos = ["Nome completo", "CPF", "Telefone", "Endereço", "Usuário", "Senha"]
-        entradas = []
-
-        # Frame que contém os campos de entrada
-        frame_form = ctk.CTkFrame(frame_conteudo)
-        frame_form.pack(pady=10)
-
-        # Cria os campos de entrada de dois em dois (duas colunas)
-        for i in range(0, len(campos), 2):
-            campo1 = ctk.CTkEntry(frame_form, placeholder_text=campos[i])
-            campo1.grid(row=i//2, column=0, padx=10, pady=5, sticky="ew")
-            entradas.append(campo1)
-
-            if i + 1 < len(campos):
-                campo2 = ctk.CTkEntry(frame_form, placeholder_text=campos[i+1], show="*" if campos[i+1] == "Senha" else "")
-                campo2.grid(row=i//2, column=1, padx=10, pady=5, sticky="ew")
-                entradas.append(campo2)
-
-        # Permite que as colunas se expandam proporcionalmente
-        frame_form.columnconfigure(0, weight=1)
-        frame_form.columnconfigure(1, weight=1)
-
-        # Carrega os dados do primeiro médico automaticamente
-        carregar_dados_medico()
-
-        # Função para salvar os dados editados no banco de dados
-        def salvar_medico():
-            dados = [entrada.get().strip() for entrada in entradas]
-            if all(dados):
-                senha_cripto = bcrypt.hashpw(dados[5].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                dados[5] = senha_cripto.decode('utf-8')
-                try:
-                    conexao = mysql.connector.connect(
-                        host='localhost',
-                        user='root',
-                        password='890866',
-                        database='vidaplus'
-                    )
-                    cursor = conexao.cursor()
-                    query = """
-                        UPDATE usuarios SET 
-                            nome_completo=%s, cpf=%s, telefone=%s, endereco=%s, usuario=%s, senha=%s
-                        WHERE usuario = %s AND hierarquia = 'Medico'
-                    """
-                    # Executa o update com os dados fornecidos
-                    cursor.execute(query, (*dados, medico_selecionado.get()))
-                    conexao.commit()
-                    cursor.close()
-                    conexao.close()
-                    messagebox.showinfo("Sucesso", "Cadastro do médico atualizado com sucesso.")
-                    limpar_conteudo()
-                except mysql.connector.Error as err:
-                    messagebox.showerror("Erro", f"Erro ao atualizar:\n{err}")
-            else:
-                messagebox.showwarning("Atenção", "Preencha todos os campos.")
-
-        # Botão para salvar as alterações no cadastro
-        ctk.CTkButton(frame_conteudo, text="Salvar", command=salvar_medico).pack(pady=10)
-
-
-    # ---------- Formulário de atualização de pacientes ----------
-    def mostrar_formulario_paciente():
-        limpar_conteudo()
-
-        # Título do formulário
-        ctk.CTkLabel(frame_conteudo, text="Atualizar Cadastro Paciente", font=ctk.CTkFont(size=18)).pack(pady=10)
-
-        try:
-            # Busca usuários com hierarquia de paciente
-            conexao = mysql.connector.connect(
-                host='localhost',
-                user='root',
-                password='890866',
-                database='vidaplus'
-            )
-            cursor = conexao.cursor()
-            cursor.execute("SELECT usuario FROM usuarios WHERE hierarquia = 'Paciente'")
-            pacientes = [row[0] for row in cursor.fetchall()]
-            cursor.close()
-            conexao.close()
-        except mysql.connector.Error as err:
-            messagebox.showerror("Erro", f"Erro ao buscar pacientes:\n{err}")
-            return
-
-        # Exibe aviso se não houver pacientes
-        if not pacientes:
-            messagebox.showinfo("Aviso", "Nenhum paciente encontrado.")
-            return
-
-        # Armazena o paciente selecionado
-        paciente_selecionado = ctk.StringVar(value=pacientes[0])
-
-        # Função que carrega os dados de um paciente selecionado no menu
-        def carregar_dados_paciente(*_):
-            usuario = paciente_selecionado.get()  # Obtém o usuário selecionado
-            try:
-                # Conecta ao banco de dados
-                conexao = mysql.connector.connect(
-                    host='localhost',
-                    user='root',
-                    password='890866',
-                    database='vidaplus'
-                )
-                cursor = conexao.cursor()
-                # Executa a consulta para buscar os dados do paciente
-                cursor.execute("""
-                    SELECT nome_completo, cpf, telefone, endereco, usuario 
-                    FROM usuarios WHERE usuario = %s
-                """, (usuario,))
-                resultado = cursor.fetchone()
-                cursor.close()
-                conexao.close()
-
-                if resultado:
-                    # Preenche os campos com os dados do paciente
-                    for entrada, valor in zip(entradas, resultado):
-                        entrada.delete(0, tk.END)
-                        entrada.insert(0, valor)
-                else:
-                    # Exibe alerta se o paciente não for encontrado
-                    messagebox.showwarning("Atenção", "Paciente não encontrado.")
-            except mysql.connector.Error as err:
-                # Exibe erro caso a consulta falhe
-                messagebox.showerror("Erro", f"Erro ao carregar dados:\n{err}")
-
-            # Frame do menu com o dropdown de pacientes
-            menu_frame = ctk.CTkFrame(frame_conteudo)
-            menu_frame.pack(pady=5)
-            ctk.CTkLabel(menu_frame, text="Selecionar Paciente:").pack(side='left', padx=(0, 10))
-            # Menu suspenso para selecionar o paciente
-            ctk.CTkOptionMenu(menu_frame, variable=paciente_selecionado, values=pacientes, command=carregar_dados_paciente).pack(side='left')
-
-        # Lista de campos que serão preenchidos
-        campos = ["Nome completo", "CPF", "Telefone", "Endereço", "Usuário", "Senha"]
-        entradas = []
-
-        # Frame do formulário
-        frame_form = ctk.CTkFrame(frame_conteudo)
-        frame_form.pack(pady=10)
-
-        # Cria os campos de entrada de dois em dois (colunas)
-        for i in range(0, len(campos), 2):
-            campo1 = ctk.CTkEntry(frame_form, placeholder_text=campos[i])
-            campo1.grid(row=i//2, column=0, padx=10, pady=5, sticky="ew")
-            entradas.append(campo1)
-
-            if i + 1 < len(campos):
-                campo2 = ctk.CTkEntry(frame_form, placeholder_text=campos[i+1], show="*" if campos[i+1] == "Senha" else "")
-                campo2.grid(row=i//2, column=1, padx=10, pady=5, sticky="ew")
-                entradas.append(campo2)
-
-        # Permite que as colunas se expandam
-        frame_form.columnconfigure(0, weight=1)
-        frame_form.columnconfigure(1, weight=1)
-
-        # Carrega automaticamente os dados do primeiro paciente listado
-        carregar_dados_paciente()
-
-        # Função para salvar as alterações nos dados do paciente
-        def salvar_paciente():
-            dados = [entrada.get().strip() for entrada in entradas]
-            if all(dados):
-                # Criptografa a senha antes de salvar no banco
-                senha_cripto = bcrypt.hashpw(dados[5].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                dados[5] = senha_cripto.decode('utf-8')
-                try:
-                    conexao = mysql.connector.connect(
-                        host='localhost',
-                        user='root',
-                        password='890866',
-                        database='vidaplus'
-                    )
-                    cursor = conexao.cursor()
-                    # Query para atualizar os dados do paciente
-                    query = """
-                        UPDATE usuarios SET 
-                            nome_completo=%s, cpf=%s, telefone=%s, endereco=%s, usuario=%s, senha=%s
-                        WHERE usuario = %s AND hierarquia = 'Paciente'
-                    """
-                    cursor.execute(query, (*dados, paciente_selecionado.get()))
-                    conexao.commit()
-                    cursor.close()
-                    conexao.close()
-                    # Exibe mensagem de sucesso
-                    messagebox.showinfo("Sucesso", "Cadastro do paciente atualizado com sucesso.")
-                    limpar_conteudo()
-                except mysql.connector.Error as err:
-                    # Exibe mensagem de erro
-                    messagebox.showerror("Erro", f"Erro ao atualizar:\n{err}")
-            else:
-                # Alerta se houver campos vazios
-                messagebox.showwarning("Atenção", "Preencha todos os campos.")
-
-        # Botão para salvar alterações do paciente
-        ctk.CTkButton(frame_conteudo, text="Salvar", command=salvar_paciente).pack(pady=10)
-
-
-# ---------------- Botões do Menu Lateral ----------------
-    botoes = {
-        'Atualizar Cadastro Médico': mostrar_formulario_medico,
-        'Atualizar Cadastro Paciente': mostrar_formulario_paciente,
-        'Visualizar Histórico Clínico': lambda: print("Em construção"),
-        'Verificar Consultas Pacientes': lambda: print("Em construção"),
-        'Gerenciar Cadastro Administrador': lambda: print("Em construção"),
-        'Logout': lambda: [telaAdm.destroy(), tela_login()]
-    }
-
-    # Cria cada botão do menu com sua respectiva ação
-    for texto, comando in botoes.items():
-        ctk.CTkButton(frame_menu, text=texto, command=comando).pack(pady=10, fill='x')
-
-    # Inicia a interface principal do administrador
-    telaAdm.mainloop()
-
-
-# ---------- Tela principal para Médicos ----------
-def tela_principal_medico():
-    # Cria a janela do médico
-    telaMed = ctk.CTk()
-    telaMed.title('SGHSS - Vida Plus - Médico')
-    telaMed.geometry('800x500')
-    telaMed.resizable(True, True)
-
-    # Frame lateral do menu
-    frame_menu = ctk.CTkFrame(telaMed, width=200)
-    frame_menu.pack(side='left', fill='y', padx=10, pady=10)
-
-    # Frame do conteúdo principal
-    frame_conteudo = ctk.CTkFrame(telaMed)
-    frame_conteudo.pack(side='right', expand=True, fill='both', padx=10, pady=10)
-
-    # Função para limpar os elementos do frame de conteúdo
-    def limpar_conteudo():
-        for widget in frame_conteudo.winfo_children():
-            widget.destroy()
-
-    # Função para exibir formulário de atualização do próprio cadastro
-    def mostrar_formulario_medico():
-        limpar_conteudo()
-
-        # Título do formulário
-        ctk.CTkLabel(frame_conteudo, text="Atualizar Cadastro", font=ctk.CTkFont(size=18)).pack(pady=10)
-
-        campos = [
-            "Nome completo",
-            "CPF",
-            "Telefone",
-            "Endereço",
-            "Usuário",
-            "Senha"
-        ]
-        entradas = []
-
-        # Frame do formulário
-        frame_form = ctk.CTkFrame(frame_conteudo)
-        frame_form.pack(pady=10)
-
-        # Cria os campos de entrada (2 por linha)
-        for i in range(0, len(campos), 2):
-            campo1 = ctk.CTkEntry(frame_form, placeholder_text=campos[i])
-            campo1.grid(row=i//2, column=0, padx=10, pady=5, sticky="ew")
-            entradas.append(campo1)
-
-            if i + 1 < len(campos):
-                campo2 = ctk.CTkEntry(frame_form, placeholder_text=campos[i+1], show="*" if campos[i+1] == "Senha" else "")
-                campo2.grid(row=i//2, column=1, padx=10, pady=5, sticky="ew")
-                entradas.append(campo2)
-
-        frame_form.columnconfigure(0, weight=1)
-        frame_form.columnconfigure(1, weight=1)
-
-        # Função para salvar os dados do médico no banco
-        def salvar():
-            dados = [entrada.get().strip() for entrada in entradas]
-            if all(dados):
-                senha_cripto = bcrypt.hashpw(dados[5].encode('utf-8'), bcrypt.gensalt())
-                dados[5] = senha_cripto.decode('utf-8')
-                inserir_usuario_mysql(dados, 'Medico')
-                messagebox.showinfo("Sucesso", "Cadastro atualizado com sucesso.")
-                limpar_conteudo()
-            else:
-                messagebox.showwarning("Atenção", "Preencha todos os campos.")
-
-        # Botão de salvar alterações
-        ctk.CTkButton(frame_conteudo, text="Salvar", command=salvar).pack(pady=10)
-    # Dicionário com os botões do menu lateral da interface do médico
-    botoes = {
-        'Verificar Agendamentos': lambda: print("Verificar..."),
-        'Emitir Receita': lambda: print("Emitir..."),
-        'Gerenciar Pacientes': lambda: print("Gerenciar..."),
-        'Telemedicina - Atender': lambda: print("Atender..."),
-        'Atualização Cadastral': mostrar_formulario_medico  # Exibe o formulário para editar dados
-    }
-
-    # Criação dos botões no menu lateral com os textos e comandos definidos acima
-    for texto, comando in botoes.items():
-        ctk.CTkButton(frame_menu, text=texto, command=comando).pack(pady=10, fill='x')
-
-    # Botão para logout (fecha a tela atual e retorna para o login)
-    ctk.CTkButton(frame_menu, text="Logout", command=lambda: [telaMed.destroy(), tela_login()]).pack(pady=10, fill='x')
-
-    # Inicia o loop principal da interface do médico
-    telaMed.mainloop()
-
-
-# ---------- Tela principal do paciente ----------
-def tela_principal_paciente():
-    # Cria a janela principal para o paciente
-    telaPac = ctk.CTk()
-    telaPac.title('SGHSS - Vida Plus - Paciente')
-    telaPac.geometry('800x500')
-    telaPac.resizable(True, True)
-
-    # Frame lateral do menu
-    frame_menu = ctk.CTkFrame(telaPac, width=200)
-    frame_menu.pack(side='left', fill='y', padx=10, pady=10)
-
-    # Frame do conteúdo principal
-    frame_conteudo = ctk.CTkFrame(telaPac)
-    frame_conteudo.pack(side='right', expand=True, fill='both', padx=10, pady=10)
-
-    # Função que limpa os widgets do frame de conteúdo
-    def limpar_conteudo():
-        for widget in frame_conteudo.winfo_children():
-            widget.destroy()
-
-    # Função para exibir formulário de atualização de dados cadastrais
-    def mostrar_formulario_paciente():
-        limpar_conteudo()
-
-        ctk.CTkLabel(frame_conteudo, text="Atualizar Cadastro", font=ctk.CTkFont(size=18)).pack(pady=10)
-
-        campos = [
-            "Nome completo",
-            "CPF",
-            "Telefone",
-            "Endereço",
-            "Usuário",
-            "Senha"
-        ]
-        entradas = []
-
-        # Frame do formulário
-        frame_form = ctk.CTkFrame(frame_conteudo)
-        frame_form.pack(pady=10)
-
-        # Cria os campos de entrada (em pares lado a lado)
-        for i in range(0, len(campos), 2):
-            campo1 = ctk.CTkEntry(frame_form, placeholder_text=campos[i])
-            campo1.grid(row=i//2, column=0, padx=10, pady=5, sticky="ew")
-            entradas.append(campo1)
-
-            if i + 1 < len(campos):
-                campo2 = ctk.CTkEntry(frame_form, placeholder_text=campos[i+1], show="*" if campos[i+1] == "Senha" else "")
-                campo2.grid(row=i//2, column=1, padx=10, pady=5, sticky="ew")
-                entradas.append(campo2)
-
-        frame_form.columnconfigure(0, weight=1)
-        frame_form.columnconfigure(1, weight=1)
-
-        # Função que salva os dados atualizados no banco
-        def salvar():
-            dados = [entrada.get().strip() for entrada in entradas]
-            if all(dados):
-                # Criptografa a senha antes de salvar
-                senha_cripto = bcrypt.hashpw(dados[5].encode('utf-8'), bcrypt.gensalt())
-                dados[5] = senha_cripto.decode('utf-8')
-                inserir_usuario_mysql(dados, 'Paciente')
-                messagebox.showinfo("Sucesso", "Cadastro atualizado com sucesso.")
-                limpar_conteudo()
-            else:
-                messagebox.showwarning("Atenção", "Preencha todos os campos.")
-
-        # Botão para salvar os dados
-        ctk.CTkButton(frame_conteudo, text="Salvar", command=salvar).pack(pady=10)
-
-    def agendar_consulta_paciente():
-        # Limpa o conteúdo atual da interface para exibir o novo formulário
-        limpar_conteudo()
-
-        # Título da seção de agendamento
-        ctk.CTkLabel(frame_conteudo, text="Agendar Consulta", font=ctk.CTkFont(size=18)).pack(pady=10)
-
-        # Tenta conectar ao banco de dados e buscar médicos disponíveis
-        try:
-            conexao = mysql.connector.connect(
-                host='localhost',
-                user='root',
-                password='890866',
-                database='vidaplus'
-            )
-            cursor = conexao.cursor()
-            # Consulta todos os usuários com hierarquia 'Medico'
-            cursor.execute("SELECT usuario FROM usuarios WHERE hierarquia = 'Medico'")
-            medicos = [row[0] for row in cursor.fetchall()]  # Extrai apenas os nomes de usuário
-            cursor.close()
-            conexao.close()
-        except mysql.connector.Error as err:
-            # Em caso de erro na conexão ou consulta, exibe mensagem de erro
-            messagebox.showerror("Erro", f"Erro ao carregar médicos:\n{err}")
-            return
-
-        # Se não houver médicos cadastrados, informa ao usuário
-        if not medicos:
-            messagebox.showinfo("Aviso", "Nenhum médico disponível.")
-            return
-
-        # Variáveis para armazenar os dados do formulário
-        medico_var = ctk.StringVar(value=medicos[0])
-        data_var = ctk.StringVar()
-        hora_var = ctk.StringVar()
-        observacoes_var = ctk.StringVar()
-
-        # Campo: Seleção do médico
-        ctk.CTkLabel(frame_conteudo, text="Selecionar Médico:").pack()
-        ctk.CTkOptionMenu(frame_conteudo, values=medicos, variable=medico_var).pack(pady=5)
-
-        # Campo: Data da consulta
-        ctk.CTkLabel(frame_conteudo, text="Data (YYYY-MM-DD):").pack()
-        ctk.CTkEntry(frame_conteudo, textvariable=data_var).pack(pady=5)
-
-        # Campo: Hora da consulta
-        ctk.CTkLabel(frame_conteudo, text="Hora (HH:MM):").pack()
-        ctk.CTkEntry(frame_conteudo, textvariable=hora_var).pack(pady=5)
-
-        # Campo: Observações adicionais
-        ctk.CTkLabel(frame_conteudo, text="Observações:").pack()
-        ctk.CTkEntry(frame_conteudo, textvariable=observacoes_var).pack(pady=5)
-
-        # Função interna para salvar o agendamento no banco de dados
-        def salvar_agendamento():
-            try:
-                # Conecta ao banco novamente para inserir o novo agendamento
-                conexao = mysql.connector.connect(
-                    host='localhost',
-                    user='root',
-                    password='890866',
-                    database='vidaplus'
-                )
-                cursor = conexao.cursor()
-
-                # Comando SQL de inserção
-                query = """
-                INSERT INTO agendamentos (paciente_usuario, medico_usuario, data_consulta, hora_consulta, observacoes)
-                VALUES (%s, %s, %s, %s, %s)
-                """
-                #Criaçao de uma variável para o usuario logado
-                usuario_logado = None
-                
-                cursor.execute(query, (
-                    usuario_logado,  # <- IMPORTANTE: esta variável deve conter o login do paciente logado
-                    medico_var.get(),         # Médico selecionado
-                    data_var.get(),           # Data inserida
-                    hora_var.get(),           # Hora inserida
-                    observacoes_var.get()     # Observações da consulta
-                ))
-                conexao.commit()  # Confirma a inserção no banco
-                cursor.close()
-                conexao.close()
-                
-                # Mensagem de sucesso
-                messagebox.showinfo("Sucesso", "Consulta agendada com sucesso.")
-                limpar_conteudo()  # Limpa a tela após agendar
-            except mysql.connector.Error as err:
-                # Exibe erro se houver falha ao salvar
-                messagebox.showerror("Erro", f"Erro ao agendar consulta:\n{err}")
-
-        # Botão para confirmar agendamento
-        ctk.CTkButton(frame_conteudo, text="Agendar", command=salvar_agendamento).pack(pady=10)
-
-    def consultar_agendamentos_paciente():
-        limpar_conteudo()  # Limpa o conteúdo anterior da tela
-
-        ctk.CTkLabel(frame_conteudo, text="Consultas Agendadas", font=ctk.CTkFont(size=18)).pack(pady=10)
-
-        try:
-            # Conectar ao banco de dados
-            conexao = mysql.connector.connect(
-                host='localhost',
-                user='root',
-                password='890866',
-                database='vidaplus'
-            )
-            cursor = conexao.cursor()
-
-            # Buscar consultas do paciente logado
-            query = """
-                SELECT medico_usuario, data_consulta, hora_consulta, observacoes
-                FROM agendamentos
-                WHERE paciente_usuario = %s
-                ORDER BY data_consulta, hora_consulta
-            """
-            cursor.execute(query, (usuario_logado,))
-            resultados = cursor.fetchall()
-
-            cursor.close()
-            conexao.close()
-
-            if not resultados:
-                messagebox.showinfo("Aviso", "Nenhuma consulta agendada encontrada.")
-                return
-
-            # Criar uma textbox para exibir os agendamentos
-            texto_resultado = ctk.CTkTextbox(frame_conteudo, height=300, width=600)
-            texto_resultado.pack(pady=10)
-
-            for medico, data, hora, obs in resultados:
-                texto_resultado.insert(tk.END, f"Médico: {medico}\nData: {data}\nHora: {hora}\nObservações: {obs}\n\n")
-
-            texto_resultado.configure(state="disabled")  # Desativa edição
-
-        except mysql.connector.Error as err:
-            messagebox.showerror("Erro", f"Erro ao consultar agendamentos:\n{err}")
-
-    # Dicionário com os botões da interface do paciente
-    botoes = {
-        'Agendar Consulta': agendar_consulta_paciente,
-        'Consultar Agendamento': consultar_agendamentos_paciente,
-        'Visualizar Histórico Clínico': lambda: print("Histórico..."),
-        'Telemedicina - Consulta Online': lambda: print("Telemedicina..."),
-        'Atualização Cadastral': mostrar_formulario_paciente  # Exibe o formulário de atualização
-    }
-
-    # Cria os botões de menu com suas respectivas ações
-    for texto, comando in botoes.items():
-        ctk.CTkButton(frame_menu, text=texto, command=comando).pack(pady=10, fill='x')
-
-    # Botão de logout
-    def logout():
-        global usuario_logado
-        usuario_logado = None
-        tela_login()
-
-    ctk.CTkButton(frame_menu, text="Logout", command=lambda: [telaPac.destroy(), logout()]).pack(pady=10, fill='x')
-
-    # Inicia o loop principal da interface do paciente
-    telaPac.mainloop()
-
-# ---------- Função para inserir um novo usuário no banco de dados ----------
-def inserir_usuario_mysql(dados, hierarquia):
-    try:
-        conexao = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='890866',  # Substituir por senha segura em produção
-            database='vidaplus'
-        )
-        cursor = conexao.cursor()
-
-        # Query para inserir novo usuário
-        query = """
-        INSERT INTO usuarios (
-            nome_completo, cpf, telefone, endereco, usuario, senha, hierarquia
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        cursor.execute(query, (*dados, hierarquia))
-        conexao.commit()
-
-        # Mensagem de sucesso
-        messagebox.showinfo("Sucesso", "Usuário cadastrado com sucesso!")
-
-        cursor.close()
-        conexao.close()
-
-    except mysql.connector.Error as err:
-        # Mensagem de erro, caso ocorra alguma falha
-        messagebox.showerror("Erro", f"Erro ao cadastrar usuário:\n{err}")
-
-
-# ---------- Início do sistema ----------
-tela_inicio()  # Chamada inicial para exibir a primeira tela do sistema
-
+# Importações necessárias
+import bisect                               # Inserção ordenada das linhas da agenda do médico
+import customtkinter as ctk                 # Interface moderna baseada em Tkinter
+import tkinter as tk                        # Biblioteca padrão para GUI em Python
+from tkinter import messagebox              # Janela de mensagens (erro, alerta, info)
+from datetime import date, datetime, timedelta  # Datas das consultas e períodos da agenda
+import banco                                # Backends de banco (MySQL com pool ou SQLite)
+import busca                                # Busca de médicos/pacientes por prefixo
+import repositorio                          # Consultas SQL de usuários e agendamentos
+import migracoes                            # Migrações versionadas do esquema
+import importacao                           # Importação de usuários em lote (CSV/JSONL)
+import exportacao                           # Exportação dos agendamentos (CSV/iCalendar)
+import relatorios                           # Relatórios das consultas (agregação no banco + NumPy)
+import historico                            # Histórico clínico (só inclusões, páginas e anexos sob demanda)
+import receitas                             # Receitas em PDF/HTML geradas em segundo plano
+import limitador                            # Limite de tentativas de login
+import registros                            # Cadastros de médicos/pacientes em memória
+import componentes                          # Componentes de interface (lista virtualizada)
+import disponibilidade                      # Horários livres dos médicos (índice em memória)
+import fila_escrita                         # Fila local de cadastros e agendamentos (banco fora do ar)
+import navegacao                            # Janela raiz única e troca de telas em cache
+import servicos                             # Login, cadastro e agendamentos (sem interface)
+import sessoes                              # Sessões assinadas (bcrypt só no login de verdade)
+import rastreamento                         # Tempos de SQL, bcrypt e ações da interface
+import recursos                             # Logo decodificado e reduzido uma vez por processo
+import tarefas                              # Execução em segundo plano (threads e processos)
+
+"""
+Sistema de Gestão de Saúde - VidaPlus
+Desenvolvido por: Marcos Luís de Oliveira Silva
+RU: 4330689
+
+Descrição:
+Este sistema foi desenvolvido utilizando Python com a biblioteca CustomTkinter para a interface gráfica
+e MySQL para o banco de dados. Ele tem como objetivo gerenciar o acesso e as funções de três tipos de usuários:
+Administrador, Médico e Paciente.
+
+Funcionalidades principais:
+- Login com autenticação criptografada (bcrypt) e validação de hierarquia (Administrador, Médico ou Paciente).
+- Cadastro de novos usuários com controle de permissões.
+- Interface personalizada para cada tipo de usuário:
+  • Administrador: pode atualizar dados de médicos e pacientes.
+  • Médico: pode atualizar seu cadastro e visualizar agendamentos de pacientes.
+  • Paciente: pode atualizar seus dados e agendar consultas.
+- Agendamento de consultas vinculando paciente a médico, com data, hora e observações.
+- Consulta de agendamentos para o paciente logado.
+- Histórico clínico do paciente (registros só de inclusão, com anexos), consultado pelo administrador e pelo paciente.
+- Emissão de receitas em PDF ou HTML pelo médico, geradas em segundo plano a partir de modelos.
+
+O sistema busca ser simples, funcional e com foco em segurança básica de dados e experiência do usuário.
+
+Requisitos:
+- Python 3.x
+- Biblioteca CustomTkinter
+- Biblioteca bcrypt
+- Biblioteca NumPy (somente para os relatórios de consultas da administração)
+- Banco de dados MySQL com as tabelas `usuarios` e `agendamentos` corretamente estruturadas
+  (ou VIDAPLUS_BANCO=sqlite para rodar localmente com o banco embutido, sem servidor).
+
+Desenvolvimento (fora do sistema em uso):
+- pyflakes para a checagem estática do código (pip install pyflakes; python -m pyflakes *.py benchmarks)
+"""
+
+# Quantidade de consultas buscadas por vez na lista do paciente
+TAMANHO_PAGINA_CONSULTAS = 50
+
+# Agenda do médico: intervalo entre as leituras incrementais e a folga (em segundos) relida
+# antes da última alteração vista, para não perder gravações confirmadas fora de ordem
+INTERVALO_AGENDA_MS = 10000
+FOLGA_ALTERACOES_AGENDA = 2
+# Intervalo de atualização do aviso da fila de escrita (gravações ainda não enviadas ao banco)
+INTERVALO_FILA_MS = 1000
+# Receitas: intervalo da consulta às emissões em andamento, dias de consultas oferecidos e emissões listadas
+INTERVALO_RECEITAS_MS = 500
+DIAS_RECEITA = 7
+LIMITE_RECEITAS_EXIBIDAS = 20
+DIAS_SEMANA = ('Segunda-feira', 'Terça-feira', 'Quarta-feira', 'Quinta-feira', 'Sexta-feira', 'Sábado', 'Domingo')
+
+# ---------- Tratamento de erros das tarefas em segundo plano ----------
+def erro_banco(mensagem):
+    # Gera um callback que exibe erros do banco; outros erros seguem para o Tk
+    def mostrar(err):
+        if not isinstance(err, banco.ERROS_BANCO):
+            raise err
+        messagebox.showerror("Erro", f"{mensagem}:\n{err}")
+    return mostrar
+
+def erro_atualizacao(mensagem, ao_conflito):
+    # Como erro_banco, mas avisa quando outra estação alterou o cadastro antes
+    # (controle de versão) e chama `ao_conflito()` para recarregar os dados
+    mostrar_erro_banco = erro_banco(mensagem)
+    def mostrar(err):
+        if isinstance(err, repositorio.ConflitoVersao):
+            messagebox.showwarning("Cadastro alterado",
+                                   "Este cadastro foi alterado por outro usuário depois de aberto.\n"
+                                   "Os dados foram recarregados; revise e salve novamente.")
+            ao_conflito()
+            return
+        mostrar_erro_banco(err)
+    return mostrar
+
+def erro_login(mensagem):
+    # Como erro_banco, mas avisa quando o limite de tentativas de login foi atingido
+    mostrar_erro_banco = erro_banco(mensagem)
+    def mostrar(err):
+        if isinstance(err, limitador.TentativasExcedidas):
+            messagebox.showwarning("Login bloqueado", str(err))
+            return
+        mostrar_erro_banco(err)
+    return mostrar
+
+def erro_escrita(mensagem):
+    # Como erro_banco, mas avisa quando o banco recusou uma gravação da fila (ex.: usuário ou CPF já cadastrado)
+    mostrar_erro_banco = erro_banco(mensagem)
+    def mostrar(err):
+        if isinstance(err, fila_escrita.EscritaRecusada):
+            messagebox.showwarning("Gravação recusada", f"{mensagem}:\n{err}")
+            return
+        mostrar_erro_banco(err)
+    return mostrar
+
+# ---------- Armazém de cadastros (telas do administrador) ----------
+def carregar_armazem(tarefas_tela, hierarquia, montar_formulario, mensagem_erro):
+    # `montar_formulario(armazem)` pode devolver uma função chamada quando uma
+    # recarga em segundo plano terminar, para atualizar a tela já montada
+    armazem = registros.armazem(hierarquia)
+    if not armazem.carregado:
+        tarefas_tela.executar(armazem.recarregar, ao_concluir=montar_formulario, ao_falhar=erro_banco(mensagem_erro))
+        return
+
+    # Troca de tela instantânea com os dados em memória; se estiverem velhos, recarrega em segundo plano
+    ao_atualizar = montar_formulario(armazem)
+    if armazem.velho:
+        tarefas_tela.executar(armazem.recarregar, ao_concluir=ao_atualizar, ao_falhar=erro_banco(mensagem_erro))
+
+# ---------- Busca de usuários (caixas de busca das telas) ----------
+def pesquisar_usuarios(tarefas_tela, hierarquia, campo, mensagem_erro):
+    # Gera a função `buscar(termo)` de um componentes.CampoBusca: com o armazém da hierarquia
+    # carregado, a busca é no índice de prefixos em memória; antes disso, uma consulta LIMITada
+    # no banco em segundo plano
+    def buscar(termo):
+        armazem = registros.armazem(hierarquia)
+        if armazem.carregado:
+            return armazem.indice.buscar(termo, busca.LIMITE_RESULTADOS)
+        tarefas_tela.executar(repositorio.usuarios().buscar_prefixo, hierarquia, termo, busca.LIMITE_RESULTADOS,
+                              ao_concluir=lambda resultados: campo.mostrar(termo, resultados),
+                              ao_falhar=erro_banco(mensagem_erro))
+        return None
+    return buscar
+
+# Linha da lista de resultados: (usuario, nome_completo, cpf)
+def formatar_usuario(resultado):
+    usuario, nome, cpf = resultado
+    return f"{nome} ({usuario}) - CPF {cpf}"
+
+def formatar_medico(resultado):
+    usuario, nome, _ = resultado
+    return f"{nome} ({usuario})"
+
+# ---------- Arquivos gerados (anexos do histórico e receitas) ----------
+def abrir_arquivo(caminho):
+    import pathlib, webbrowser  # Só anexos e receitas abrem o visualizador do sistema
+    webbrowser.open(pathlib.Path(caminho).as_uri())
+
+# ---------- Histórico clínico (telas do administrador e do paciente) ----------
+def construir_historico(view, tarefas_tela, escolher_paciente):
+    # Com `escolher_paciente` (administrador) a tela tem a busca de pacientes e o formulário de
+    # novos registros; sem ela (paciente) mostra só o histórico do usuário logado
+    frame = view.frame
+
+    ctk.CTkLabel(frame, text="Histórico Clínico", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+    # Paciente exibido, última linha recebida (continuação da linha do tempo) e arquivos a anexar
+    estado = {'paciente': None, 'ultima': None, 'arquivos': []}
+
+    if escolher_paciente:
+        frame_busca = ctk.CTkFrame(frame, fg_color='transparent')
+        frame_busca.pack(pady=5)
+        ctk.CTkLabel(frame_busca, text="Paciente:").pack(side='left', anchor='n', padx=(0, 10), pady=4)
+        busca_pacientes = componentes.CampoBusca(frame_busca, ao_selecionar=lambda resultado: mostrar_paciente(resultado[0]),
+                                                 formatar=formatar_usuario, placeholder="Nome, usuário ou CPF")
+        busca_pacientes.buscar = pesquisar_usuarios(tarefas_tela, 'Paciente', busca_pacientes, "Erro ao buscar pacientes")
+        busca_pacientes.pack(side='left')
+
+    # Resumo do paciente (uma linha no banco), exibido antes de qualquer página da linha do tempo
+    rotulo_resumo = ctk.CTkLabel(frame, text="", justify='left')
+    rotulo_resumo.pack(pady=5)
+
+    frame_corpo = ctk.CTkFrame(frame, fg_color='transparent')
+    frame_corpo.pack(fill='both', expand=True)
+
+    # ----- Linha do tempo: páginas buscadas conforme a rolagem -----
+    def receber_pagina(paciente, linhas):
+        if paciente != estado['paciente']:
+            return  # Resposta de um paciente que já saiu da tela
+        estado['ultima'] = linhas[-1] if linhas else estado['ultima']
+        lista.adicionar(linhas, fim=len(linhas) < historico.TAMANHO_PAGINA)
+
+    def receber_abertura(paciente, resultado):
+        if paciente != estado['paciente']:
+            return
+        resumo, linhas = resultado
+        rotulo_resumo.configure(text=historico.formatar_resumo(resumo))
+        receber_pagina(paciente, linhas)
+
+    def carregar_mais():
+        paciente = estado['paciente']
+        if paciente is None:
+            lista.adicionar([], fim=True)
+            return
+        if estado['ultima'] is None:
+            # Primeira tela: resumo e primeira página juntos
+            tarefas_tela.executar(historico.abrir, paciente, ao_concluir=lambda resultado: receber_abertura(paciente, resultado),
+                                  ao_falhar=erro_banco("Erro ao carregar o histórico clínico"))
+        else:
+            tarefas_tela.executar(historico.pagina, paciente, estado['ultima'],
+                                  ao_concluir=lambda linhas: receber_pagina(paciente, linhas),
+                                  ao_falhar=erro_banco("Erro ao carregar o histórico clínico"))
+
+    def formatar(item):
+        _, criado_em, tipo, titulo, autor, previa, anexos = item
+        linha = f"{str(criado_em)[:16]}  {tipo.capitalize()}: {titulo} ({autor})"
+        if anexos:
+            linha += f"  [{anexos} anexo(s)]"
+        previa = ' '.join((previa or '').split())
+        return f"{linha}\n{previa[:90] + '...' if len(previa) > 90 else previa}"
+
+    lista = componentes.ListaVirtual(frame_corpo, formatar, carregar_mais=carregar_mais, ao_clicar=lambda item: abrir_registro(item),
+                                     height=300, width=420)
+    lista.pack(side='left', pady=10, fill='both', expand=True)
+
+    # ----- Registro aberto: texto completo e anexos, lidos só agora -----
+    frame_lateral = ctk.CTkFrame(frame_corpo, fg_color='transparent', width=300)
+    frame_lateral.pack(side='right', fill='y', padx=(10, 0), pady=10)
+    texto_registro = ctk.CTkTextbox(frame_lateral, width=300, height=180, wrap='word')
+    texto_registro.pack(fill='x')
+    frame_anexos = ctk.CTkFrame(frame_lateral, fg_color='transparent')
+    frame_anexos.pack(fill='x', pady=5)
+
+    def exibir_texto(texto):
+        texto_registro.configure(state='normal')
+        texto_registro.delete('1.0', tk.END)
+        texto_registro.insert('1.0', texto)
+        texto_registro.configure(state='disabled')
+
+    def falhar_anexo(err):
+        if isinstance(err, LookupError):
+            messagebox.showwarning("Atenção", str(err))
+        elif isinstance(err, OSError):
+            messagebox.showerror("Erro", f"Erro ao gravar o anexo:\n{err}")
+        else:
+            erro_banco("Erro ao abrir o anexo")(err)
+
+    def abrir_anexo(paciente, anexo):
+        id_anexo, nome, _, _ = anexo
+        # Lido do banco só na primeira abertura; depois vem da cópia em disco
+        tarefas_tela.executar(historico.abrir_anexo, id_anexo, nome, paciente, ao_concluir=abrir_arquivo, ao_falhar=falhar_anexo)
+
+    def mostrar_registro(paciente, item, resultado):
+        if paciente != estado['paciente']:
+            return
+        if resultado is None:
+            messagebox.showwarning("Atenção", "Registro não encontrado.")
+            return
+        texto, anexos = resultado
+        _, criado_em, tipo, titulo, autor, _, _ = item
+        exibir_texto(f"{tipo.capitalize()}: {titulo}\n{str(criado_em)[:16]} - {autor}\n\n{texto}")
+        for botao in frame_anexos.winfo_children():
+            botao.destroy()
+        for anexo in anexos:
+            _, nome, _, tamanho = anexo
+            ctk.CTkButton(frame_anexos, text=f"{nome} ({historico.formatar_tamanho(tamanho)})", anchor='w',
+                          command=lambda anexo=anexo: abrir_anexo(paciente, anexo)).pack(fill='x', pady=2)
+
+    def abrir_registro(item):
+        paciente = estado['paciente']
+        tarefas_tela.executar(historico.detalhar, item[0], paciente,
+                              ao_concluir=lambda resultado: mostrar_registro(paciente, item, resultado),
+                              ao_falhar=erro_banco("Erro ao abrir o registro"))
+
+    def fechar_registro():
+        exibir_texto("Clique em um registro para ver o texto completo e os anexos.")
+        for botao in frame_anexos.winfo_children():
+            botao.destroy()
+
+    # Recomeça a linha do tempo do paciente (resumo e primeira página)
+    def mostrar_paciente(paciente):
+        estado.update(paciente=paciente, ultima=None)
+        rotulo_resumo.configure(text="Carregando..." if paciente else "Selecione um paciente.")
+        lista.texto_vazio = "Nenhum registro no histórico clínico." if paciente else "Selecione um paciente."
+        fechar_registro()
+        lista.limpar()
+
+    # ----- Novo registro (administrador): só inclusão, uma correção é um registro novo -----
+    if escolher_paciente:
+        frame_novo = ctk.CTkFrame(frame_lateral)
+        tipo_var = ctk.StringVar(value=historico.TIPOS[0])
+        ctk.CTkOptionMenu(frame_novo, variable=tipo_var, values=list(historico.TIPOS)).pack(fill='x', padx=5, pady=(5, 2))
+        entrada_titulo = ctk.CTkEntry(frame_novo, placeholder_text="Título")
+        entrada_titulo.pack(fill='x', padx=5, pady=2)
+        texto_novo = ctk.CTkTextbox(frame_novo, height=80, wrap='word')
+        texto_novo.pack(fill='x', padx=5, pady=2)
+        rotulo_arquivos = ctk.CTkLabel(frame_novo, text="", justify='left', wraplength=280)
+
+        def limpar_novo():
+            entrada_titulo.delete(0, 'end')
+            texto_novo.delete('1.0', tk.END)
+            estado['arquivos'] = []
+            rotulo_arquivos.configure(text="")
+
+        def escolher_arquivos():
+            from tkinter import filedialog  # Só as telas de arquivo usam o seletor
+            caminhos = filedialog.askopenfilenames(title="Anexar arquivos")
+            if caminhos:
+                estado['arquivos'] = list(caminhos)
+                rotulo_arquivos.configure(text="\n".join(caminho.rsplit('/', 1)[-1] for caminho in caminhos))
+
+        def falhar_registro(err):
+            if isinstance(err, (ValueError, OSError)):
+                messagebox.showwarning("Atenção", str(err))  # Título vazio, anexo grande demais ou ilegível
+                return
+            erro_banco("Erro ao registrar no histórico")(err)
+
+        def registrado(paciente):
+            messagebox.showinfo("Sucesso", "Registro incluído no histórico clínico.")
+            limpar_novo()
+            if paciente == estado['paciente']:
+                mostrar_paciente(paciente)
+
+        def registrar():
+            paciente = estado['paciente']
+            if paciente is None:
+                messagebox.showwarning("Atenção", "Selecione um paciente.")
+                return
+            if tarefas_tela.ocupado:
+                return
+            # Os anexos são lidos e gravados em segundo plano, na mesma transação do registro
+            tarefas_tela.executar(historico.registrar, paciente, usuario_logado(), tipo_var.get(), entrada_titulo.get(),
+                                  texto_novo.get('1.0', tk.END), list(estado['arquivos']),
+                                  ao_concluir=lambda _: registrado(paciente), ao_falhar=falhar_registro)
+
+        frame_botoes_novo = ctk.CTkFrame(frame_novo, fg_color='transparent')
+        frame_botoes_novo.pack(fill='x', padx=5, pady=2)
+        ctk.CTkButton(frame_botoes_novo, text="Anexar...", width=90, command=escolher_arquivos).pack(side='left')
+        ctk.CTkButton(frame_botoes_novo, text="Registrar", width=90,
+                      command=rastreamento.acao_ui("Registrar no histórico", registrar)).pack(side='right')
+        rotulo_arquivos.pack(fill='x', padx=5, pady=(0, 5))
+
+        def alternar_novo():
+            if frame_novo.winfo_ismapped():
+                frame_novo.pack_forget()
+            else:
+                frame_novo.pack(fill='x', pady=5)
+
+        ctk.CTkButton(frame_lateral, text="Novo Registro", command=alternar_novo).pack(fill='x', pady=5, before=frame_anexos)
+
+    def ao_exibir():
+        if escolher_paciente:
+            # Mantém o paciente escolhido antes e relê o histórico dele
+            mostrar_paciente(estado['paciente'])
+        else:
+            mostrar_paciente(usuario_logado())
+
+    view.ao_exibir = ao_exibir
+
+# ---------- Validação de login ----------
+def validar_login(usuario_digitado, senha_digitada, hierarquia_esperada, tarefas_login):
+    # Trata o resultado da autenticação de volta na thread da interface
+    def concluir(hierarquia_banco):
+        if hierarquia_banco is None:
+            # Usuário não encontrado
+            messagebox.showerror("Erro", "Usuário não encontrado.")
+            return
+        if hierarquia_banco is False:
+            # Senha inválida
+            messagebox.showerror("Erro", "Senha incorreta.")
+            return
+
+        # Verifica se o usuário tem permissão para acessar com a hierarquia informada
+        if servicos.pode_acessar(hierarquia_banco, hierarquia_esperada):
+            # Login completo: abre a sessão que evita o bcrypt nas próximas entradas
+            entrar(sessoes.tabela().abrir(usuario_digitado, hierarquia_banco, senha_digitada), hierarquia_esperada)
+        else:
+            # Usuário autenticado mas sem permissão para a hierarquia selecionada
+            messagebox.showwarning('Permissao Negada!', f'Voce nao tem autorizaçao para acessar como {hierarquia_esperada}.')
+
+    # Ignora cliques repetidos enquanto a autenticação anterior não termina
+    if tarefas_login.ocupado:
+        return
+    # O mesmo usuário voltando a uma sessão bloqueada: senha conferida em memória, sem bcrypt nem banco
+    sessao = sessoes.tabela().retomar(usuario_digitado, senha_digitada)
+    if sessao is not None:
+        entrar(sessao, hierarquia_esperada)
+        return
+    # A autenticação roda fora da thread da interface (consulta ao banco e bcrypt)
+    tarefas_login.executar(
+        servicos.autenticar_usuario, usuario_digitado, senha_digitada,
+        ao_concluir=concluir,
+        ao_falhar=erro_login("Erro ao conectar ao banco")  # Erro de conexão ou tentativas demais
+    )
+
+# Torna `sessao` a sessão atual e abre a tela da hierarquia que ela carrega
+def entrar(sessao, hierarquia_esperada):
+    global sessao_atual
+    if not servicos.pode_acessar(sessao.hierarquia, hierarquia_esperada):
+        sessoes.tabela().bloquear(sessao.token)
+        messagebox.showwarning('Permissao Negada!', f'Voce nao tem autorizaçao para acessar como {hierarquia_esperada}.')
+        return
+    sessao_atual = sessao.token  # Guarda o token da sessão do usuário logado
+    messagebox.showinfo("Login", f"Login bem-sucedido como {sessao.hierarquia}!")
+    # Abre a tela conforme o tipo de usuário (a tela de login fica em cache, oculta)
+    if sessao.hierarquia == 'Administrador':
+        tela_principal_adm()
+    elif sessao.hierarquia == 'Medico':
+        tela_principal_medico()
+    else:
+        tela_principal_paciente()
+
+# ---------- Sessão ----------
+# Intervalo da verificação de inatividade da sessão atual
+INTERVALO_SESSAO_MS = 15000
+
+# Usuário da sessão atual (usuário e hierarquia vêm da sessão, sem consulta ao banco)
+def usuario_logado():
+    return sessoes.tabela().validar(sessao_atual, tocar=False).usuario
+
+# Teclas e cliques contam como uso da sessão
+def tocar_sessao(_=None):
+    if sessao_atual:
+        sessoes.tabela().tocar(sessao_atual)
+
+# Logout: a sessão fica bloqueada (o mesmo usuário volta sem bcrypt) até expirar por inatividade
+def logout():
+    global sessao_atual
+    token, sessao_atual = sessao_atual, None
+    if not token:
+        tela_login()
+        return
+    try:
+        sessao = sessoes.tabela().validar(token, tocar=False)
+    except sessoes.SessaoInvalida:
+        tela_login()
+        return
+    sessoes.tabela().bloquear(token)
+    # Volta ao login da mesma hierarquia com o usuário já preenchido
+    tela = tela_login(exibir_cadastro=sessao.hierarquia != 'Paciente', hierarquia_esperada=sessao.hierarquia)
+    tela.preencher_usuario(sessao.usuario)
+
+# Bloqueia a sessão após TEMPO_BLOQUEIO sem uso e descarta as sessões ociosas demais
+def vigiar_sessao():
+    tabela = sessoes.tabela()
+    tabela.expirar()
+    if sessao_atual:
+        try:
+            ociosa = tabela.validar(sessao_atual, tocar=False).ociosa_ha() >= sessoes.TEMPO_BLOQUEIO
+            mensagem = "Sessão bloqueada por inatividade. Digite sua senha para continuar."
+        except sessoes.SessaoInvalida:
+            ociosa, mensagem = True, "Sessão expirada. Faça login novamente."
+        if ociosa:
+            logout()
+            messagebox.showinfo("Sessão", mensagem)
+    raiz.after(INTERVALO_SESSAO_MS, vigiar_sessao)
+
+# ---------- Fila de escrita ----------
+# Aviso no rodapé com as gravações que ainda não chegaram ao banco, e das que ele recusou depois
+# da confirmação local (ex.: horário reservado por outra estação enquanto a conexão estava fora)
+def vigiar_fila():
+    fila = fila_escrita.fila()
+    estado = fila.estado()
+    if estado['pendentes']:
+        texto = f"{estado['pendentes']} gravação(ões) aguardando o banco (há {int(estado['atraso_s'])} s)"
+        if estado['ultimo_erro']:
+            texto += " - sem conexão, tentando novamente"
+        rotulo_fila.configure(text=texto)
+        rotulo_fila.place(relx=0, rely=1, relwidth=1, anchor='sw')
+    else:
+        rotulo_fila.place_forget()
+    if estado['recusadas_nao_vistas']:
+        recusas = fila.recusas_nao_vistas()
+        linhas = "\n".join(f"- {servicos.descrever_escrita(recusa.tipo, recusa.dados)}: {recusa}" for recusa in recusas)
+        messagebox.showwarning("Gravações recusadas",
+                               f"O banco recusou gravações salvas anteriormente neste terminal:\n\n{linhas}")
+    raiz.after(INTERVALO_FILA_MS, vigiar_fila)
+
+# ---------- Janela raiz e navegação ----------
+# Uma única janela CTk para o sistema inteiro: as telas são frames construídos
+# uma vez e trocados pelo roteador, com um só mainloop
+raiz = None
+roteador = None
+rotulo_fila = None
+sessao_atual = None  # Token da sessão do usuário autenticado (sessoes.py)
+
+def iniciar():
+    global raiz, roteador, rotulo_fila
+    ctk.set_appearance_mode('dark')               # Define modo escuro no app
+    raiz = ctk.CTk()
+    roteador = navegacao.Roteador(raiz)
+    rotulo_fila = ctk.CTkLabel(raiz, text="", text_color="orange")
+    # Ctrl+Shift+D grava as medições de tempo (JSON e formato do Prometheus)
+    raiz.bind('<Control-D>', lambda _: salvar_rastreamento())
+    raiz.bind_all('<KeyPress>', tocar_sessao, add='+')
+    raiz.bind_all('<ButtonPress>', tocar_sessao, add='+')
+    raiz.after(INTERVALO_SESSAO_MS, vigiar_sessao)
+    tela_inicio()
+    return raiz
+
+def salvar_rastreamento():
+    try:
+        caminhos = rastreamento.salvar()
+    except OSError as err:
+        messagebox.showerror("Erro", f"Erro ao gravar as medições:\n{err}")
+        return
+    messagebox.showinfo("Medições", "Medições de tempo gravadas em:\n" + "\n".join(caminhos))
+
+# ---------- Tela de Início ---------
+def tela_inicio():
+    roteador.mostrar('inicio', construir_tela_inicio,
+                     titulo='Bem-Vindo a VidaPlus', geometria='300x400', redimensionavel=(False, False))
+
+def construir_tela_inicio(tela):
+    inicio = tela.frame
+
+    # Carrega a imagem do logo (já reduzida; a cópia em 2x mantém a nitidez em telas HiDPI)
+    try:
+        inicio.logo = recursos.imagem("vidaplusimagem.png", (175, 175), escala=2)
+        label_imagem = ctk.CTkLabel(inicio, image=inicio.logo, text='')
+        label_imagem.pack(pady=15)
+    except Exception as e:
+        print(f"Erro ao carregar imagem: {e}")     # Mostra erro no terminal se a imagem não carregar
+
+    # Botões de acesso conforme o tipo de usuário
+    ctk.CTkButton(inicio, text='Administrador(a)', command=lambda: tela_login(exibir_cadastro=True, hierarquia_esperada='Administrador')).pack(pady=15)
+    ctk.CTkButton(inicio, text='Medico(a)', command=lambda: tela_login(exibir_cadastro=True, hierarquia_esperada='Medico')).pack(pady=15)
+    ctk.CTkButton(inicio, text='Paciente', command=lambda: tela_login(exibir_cadastro=False, hierarquia_esperada='Paciente')).pack(pady=15)
+
+# ---------- Tela de login ----------
+def tela_login(exibir_cadastro=True, hierarquia_esperada='Paciente'):
+    # Uma tela de login em cache para cada combinação de hierarquia e cadastro
+    return roteador.mostrar(f'login:{hierarquia_esperada}:{exibir_cadastro}',
+                     lambda tela: construir_tela_login(tela, exibir_cadastro, hierarquia_esperada),
+                     titulo="VidaPlus - Login", geometria="300x350", redimensionavel=(True, True))
+
+def construir_tela_login(tela, exibir_cadastro, hierarquia_esperada):
+    app = tela.frame
+
+    ctk.CTkLabel(app, text="Login VidaPlus", font=ctk.CTkFont(size=20)).pack(pady=20)
+
+    entry_usuario = ctk.CTkEntry(app, placeholder_text="Usuário")  # Campo de usuário
+    entry_usuario.pack(pady=10)
+
+    entry_senha = ctk.CTkEntry(app, placeholder_text="Senha", show="*")  # Campo de senha
+    entry_senha.pack(pady=10)
+
+    # Indicador exibido enquanto a autenticação roda em segundo plano
+    rotulo_status = ctk.CTkLabel(app, text="")
+    tarefas_login = tarefas.GrupoTarefas(app, tarefas.IndicadorOcupado(app.winfo_toplevel(), rotulo_status, "Autenticando..."))
+
+    # Função que chama a validação de login
+    def realizar_login():
+        usuario = entry_usuario.get().strip()
+        senha = entry_senha.get().strip()
+        if usuario and senha:
+            validar_login(usuario, senha, hierarquia_esperada, tarefas_login)
+        else:
+            messagebox.showwarning("Atenção", "Preencha todos os campos.")
+
+    ctk.CTkButton(app, text="Login", command=rastreamento.acao_ui("Login", realizar_login)).pack(pady=10)
+
+    # Credenciais fixas para permitir acesso ao cadastro
+    USUARIO_MESTRE = "admincadastro2025"
+    SENHA_MESTRE = "cadastro2025"
+
+    # Função que abre a tela de autenticação para cadastro
+    def abrir_cadastro():
+        popup = ctk.CTkToplevel(app)               # Janela sobreposta
+        popup.attributes('-topmost', True)
+        popup.lift()
+        popup.focus_force()
+        popup.title("Autenticação Requerida")
+        popup.geometry("300x200")
+        popup.resizable(False, False)
+
+        # Campos de autenticação
+        ctk.CTkLabel(popup, text="Usuário Mestre").pack(pady=(20, 5))
+        entry_user = ctk.CTkEntry(popup)
+        entry_user.pack()
+
+        ctk.CTkLabel(popup, text="Senha Mestre").pack(pady=(10, 5))
+        entry_pass = ctk.CTkEntry(popup, show="*")
+        entry_pass.pack()
+
+        # Validação de usuário mestre
+        def autenticar():
+            if entry_user.get() == USUARIO_MESTRE and entry_pass.get() == SENHA_MESTRE:
+                popup.destroy()
+                tela_cadastro(hierarquia_esperada)  # Troca a tela de login pela de cadastro
+            else:
+                messagebox.showerror("Erro", "Usuário ou senha mestre inválidos.")
+
+        ctk.CTkButton(popup, text="Confirmar", command=rastreamento.acao_ui("Confirmar administrador", autenticar)).pack(pady=15)
+        ctk.CTkButton(popup, text="Cancelar", command=popup.destroy).pack()
+
+    # Botão para abrir cadastro, se permitido
+    if exibir_cadastro:
+        ctk.CTkButton(app, text="Cadastrar novo usuário", command=abrir_cadastro).pack(pady=5)
+
+    # Botão para voltar à tela inicial
+    ctk.CTkButton(app, text="Voltar", command=tela_inicio).pack(pady=10)
+    rotulo_status.pack()
+
+    # A tela é reaproveitada: a cada exibição os campos (principalmente a senha) voltam vazios
+    def ao_exibir():
+        entry_usuario.delete(0, tk.END)
+        entry_senha.delete(0, tk.END)
+
+    # Sessão bloqueada: o usuário já vem preenchido e o foco vai para a senha
+    def preencher_usuario(usuario):
+        entry_usuario.insert(0, usuario)
+        entry_senha.focus_set()
+
+    tela.ao_exibir = ao_exibir
+    tela.preencher_usuario = preencher_usuario
+    tela.ao_ocultar = tarefas_login.cancelar
+
+# ---------- Tela de Cadastro ----------
+def tela_cadastro(hierarquia_esperada):
+    roteador.mostrar(f'cadastro:{hierarquia_esperada}',
+                     lambda tela: construir_tela_cadastro(tela, hierarquia_esperada),
+                     titulo='Cadastro de Usuário', geometria='500x550', redimensionavel=(False, False))
+
+def construir_tela_cadastro(tela, hierarquia_esperada):
+    cadastro = tela.frame
+
+    ctk.CTkLabel(cadastro, text="Cadastro de Usuário", font=ctk.CTkFont("Arial", 20)).pack(pady=10)
+
+    frame_formulario = ctk.CTkFrame(cadastro)
+    frame_formulario.pack(pady=10)
+
+    # Campos do formulário de cadastro
+    campos = [
+        "Nome completo",
+        "CPF",
+        "Telefone",
+        "Endereço",
+        "Usuário",
+        "Senha"
+    ]
+
+    entradas = []  # Lista que armazena os campos de entrada
+
+    # Criação dos campos no formulário, 2 por linha
+    for i in range(0, len(campos), 2):
+        campo1 = ctk.CTkEntry(frame_formulario, placeholder_text=campos[i])
+        campo1.grid(row=i//2, column=0, padx=10, pady=5, sticky="ew")
+        entradas.append(campo1)
+
+        if i + 1 < len(campos):
+            campo2 = ctk.CTkEntry(frame_formulario, placeholder_text=campos[i+1], show="*" if campos[i+1] == "Senha" else "")
+            campo2.grid(row=i//2, column=1, padx=10, pady=5, sticky="ew")
+            entradas.append(campo2)
+
+    # Configuração das colunas para redimensionamento
+    frame_formulario.columnconfigure(0, weight=1)
+    frame_formulario.columnconfigure(1, weight=1)
+
+    # Título para seleção de hierarquia
+    ctk.CTkLabel(cadastro, text="Selecione a hierarquia:", font=ctk.CTkFont(size=14)).pack(pady=(10, 0))
+    hierarquia_var = ctk.StringVar(value="Paciente")
+    frame_hierarquia = ctk.CTkFrame(cadastro)
+    frame_hierarquia.pack(pady=5)
+    
+    # Botões para selecionar a hierarquia do novo usuário
+    if hierarquia_esperada == 'Administrador':
+        ctk.CTkRadioButton(frame_hierarquia, text="Administrador", variable=hierarquia_var, value="Administrador").pack(side="left", padx=20)
+        ctk.CTkRadioButton(frame_hierarquia, text="Medico", variable=hierarquia_var, value="Medico").pack(side="left", padx=20)
+        ctk.CTkRadioButton(frame_hierarquia, text="Paciente", variable=hierarquia_var, value="Paciente").pack(side="left", padx=20)
+    else:
+        ctk.CTkRadioButton(frame_hierarquia, text="Paciente", variable=hierarquia_var, value="Paciente").pack(side="left", padx=20)
+    
+    # Tarefas em segundo plano desta tela e indicador de progresso
+    rotulo_status = ctk.CTkLabel(cadastro, text="")
+    tarefas_cadastro = tarefas.GrupoTarefas(cadastro, tarefas.IndicadorOcupado(cadastro.winfo_toplevel(), rotulo_status, "Salvando..."))
+
+    # Função para finalizar o cadastro de um novo usuário
+    def finalizar_cadastro():
+        # Obtém todos os valores digitados nos campos de entrada
+        dados = [entrada.get().strip() for entrada in entradas]
+        # Obtém a hierarquia selecionada (Administrador, Médico ou Paciente)
+        hierarquia = hierarquia_var.get()
+            
+        # Verifica se todos os campos foram preenchidos
+        if all(dados):
+            if tarefas_cadastro.ocupado:
+                return
+
+            def concluir(situacao):
+                if situacao == 'pendente':
+                    messagebox.showinfo("Cadastro salvo", "Cadastro salvo neste terminal.\n"
+                                        "Ele será gravado no banco assim que a conexão voltar.")
+                else:
+                    messagebox.showinfo("Sucesso", "Usuário cadastrado com sucesso!")
+                # Volta para a tela de login de onde o cadastro foi aberto
+                tela_login(exibir_cadastro=True, hierarquia_esperada=hierarquia_esperada)
+
+            # Executado em segundo plano: criptografa a senha e insere o usuário no banco
+            tarefas_cadastro.executar(servicos.cadastrar_usuario, dados, hierarquia,
+                                      ao_concluir=concluir, ao_falhar=erro_escrita("Erro ao cadastrar usuário"))
+        else:
+            # Exibe aviso caso haja campos vazios
+            messagebox.showwarning("Campos vazios", "Preencha todos os campos.")
+
+    # Botão para finalizar e salvar o cadastro
+    ctk.CTkButton(cadastro, text="Finalizar Cadastro", command=rastreamento.acao_ui("Finalizar Cadastro", finalizar_cadastro)).pack(pady=20)
+
+    # Botão para voltar à tela de login
+    ctk.CTkButton(cadastro, text="Voltar", command=lambda: tela_login(exibir_cadastro=True, hierarquia_esperada=hierarquia_esperada)).pack(pady=10)
+    rotulo_status.pack()
+
+    # Cada cadastro começa com o formulário em branco
+    def ao_exibir():
+        for entrada in entradas:
+            entrada.delete(0, tk.END)
+        hierarquia_var.set("Paciente")
+
+    tela.ao_exibir = ao_exibir
+    tela.ao_ocultar = tarefas_cadastro.cancelar
+
+
+# ---------- Tela principal do Administrador ----------
+def tela_principal_adm():
+    roteador.mostrar('adm', construir_tela_principal_adm,
+                     titulo='SGHSS - Vida Plus - Administrador', geometria='800x500', redimensionavel=(True, True))
+
+def construir_tela_principal_adm(tela):
+    telaAdm = tela.frame
+
+    # Cria o menu lateral (esquerdo)
+    frame_menu = ctk.CTkFrame(telaAdm, width=200)
+    frame_menu.pack(side='left', fill='y', padx=10, pady=10)
+
+    # Cria o espaço onde os formulários e conteúdo principal serão exibidos
+    frame_conteudo = ctk.CTkFrame(telaAdm)
+    frame_conteudo.pack(side='right', expand=True, fill='both', padx=10, pady=10)
+    # Formulários do conteúdo, construídos na primeira vez em que são abertos
+    conteudo = navegacao.Roteador(frame_conteudo)
+
+    # Indicador de carregamento e tarefas em segundo plano da tela atual
+    rotulo_status = ctk.CTkLabel(frame_menu, text="")
+    rotulo_status.pack(side='bottom', pady=5)
+    tarefas_tela = tarefas.GrupoTarefas(telaAdm, tarefas.IndicadorOcupado(telaAdm.winfo_toplevel(), rotulo_status))
+
+    # Função para limpar o conteúdo atual do frame principal
+    def limpar_conteudo():
+        # Descarta consultas pendentes da tela anterior e esconde o formulário aberto
+        tarefas_tela.cancelar()
+        conteudo.ocultar()
+
+    # Troca o formulário exibido, reaproveitando os widgets já construídos
+    def exibir(nome, construir):
+        tarefas_tela.cancelar()
+        conteudo.mostrar(nome, construir)
+
+    # ---------- Formulário de atualização de médicos ----------
+    def construir_formulario_medico(view):
+        frame = view.frame
+
+        # Título do formulário
+        ctk.CTkLabel(frame, text="Atualizar Cadastro Médico", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        # Armazém com os cadastros dos médicos, o registro exibido no formulário (com sua versão)
+        # e o usuário escolhido na busca
+        estado = {'armazem': None, 'registro': None, 'selecionado': None}
+
+        # Função que carrega os dados do médico escolhido na busca (busca no armazém, sem ir ao banco)
+        def carregar_dados_medico(*_):
+            if estado['armazem'] is None or estado['selecionado'] is None:
+                return  # O armazém ainda está carregando: montar_formulario preenche depois
+            registro = estado['armazem'].obter(estado['selecionado'])
+            if registro:
+                # Preenche os campos com os dados do cadastro; a senha só muda se for digitada
+                campos_medico.carregar(registro.campos_formulario())
+                estado['registro'] = registro
+            else:
+                messagebox.showwarning("Atenção", "Médico não encontrado.")
+
+        # Frame para seleção de médicos (busca por nome, usuário ou CPF)
+        menu_frame = ctk.CTkFrame(frame)
+        menu_frame.pack(pady=5)
+        ctk.CTkLabel(menu_frame, text="Selecionar Médico:").pack(side='left', anchor='n', padx=(0, 10), pady=4)
+
+        def escolher_medico(resultado):
+            estado['selecionado'] = resultado[0]
+            carregar_dados_medico()
+
+        busca_medicos = componentes.CampoBusca(menu_frame, ao_selecionar=escolher_medico, formatar=formatar_usuario,
+                                               placeholder="Nome, usuário ou CPF")
+        busca_medicos.buscar = pesquisar_usuarios(tarefas_tela, 'Medico', busca_medicos, "Erro ao buscar médicos")
+        busca_medicos.pack(side='left')
+
+        # Lista de campos que serão exibidos no formulário
+        campos = ["Nome completo", "CPF", "Telefone", "Endereço", "Usuário", "Senha"]
+        entradas = []
+
+        # Frame que contém os campos de entrada
+        frame_form = ctk.CTkFrame(frame)
+        frame_form.pack(pady=10)
+
+        # Cria os campos de entrada de dois em dois (duas colunas)
+        for i in range(0, len(campos), 2):
+            campo1 = ctk.CTkEntry(frame_form, placeholder_text=campos[i])
+            campo1.grid(row=i//2, column=0, padx=10, pady=5, sticky="ew")
+            entradas.append(campo1)
+
+            if i + 1 < len(campos):
+                campo2 = ctk.CTkEntry(frame_form, placeholder_text=campos[i+1], show="*" if campos[i+1] == "Senha" else "")
+                campo2.grid(row=i//2, column=1, padx=10, pady=5, sticky="ew")
+                entradas.append(campo2)
+
+        # Permite que as colunas se expandam proporcionalmente
+        frame_form.columnconfigure(0, weight=1)
+        frame_form.columnconfigure(1, weight=1)
+
+        # Guarda os valores carregados para gravar apenas as colunas alteradas
+        campos_medico = componentes.CamposRastreados(entradas, repositorio.COLUNAS_EDITAVEIS)
+
+        # Função para salvar os dados editados no banco de dados
+        def salvar_medico():
+            armazem, registro = estado['armazem'], estado['registro']
+            if registro is None or tarefas_tela.ocupado:
+                return  # Os cadastros ainda estão carregando ou a gravação anterior não terminou
+            if not campos_medico.completos():
+                messagebox.showwarning("Atenção", "Preencha todos os campos.")
+                return
+            # Apenas as colunas alteradas vão para o UPDATE (a senha, só se uma nova foi digitada)
+            alteracoes = campos_medico.alteracoes()
+            if not alteracoes:
+                messagebox.showinfo("Aviso", "Nenhuma alteração para salvar.")
+                return
+            usuario_original = registro.usuario
+
+            def concluir(versao):
+                # Mantém o armazém coerente com o que acabou de ser gravado
+                armazem.substituir(usuario_original, registro.com_alteracoes(alteracoes, versao))
+                # Usuário ou senha trocados: a sessão guardada dele neste terminal deixa de valer
+                if 'usuario' in alteracoes or 'senha' in alteracoes:
+                    sessoes.tabela().encerrar_usuario(usuario_original)
+                messagebox.showinfo("Sucesso", "Cadastro do médico atualizado com sucesso.")
+                limpar_conteudo()
+
+            # Outra estação gravou antes: recarrega os cadastros e preenche o formulário de novo
+            def recarregar():
+                tarefas_tela.executar(armazem.recarregar, ao_concluir=montar_formulario, ao_falhar=erro_banco("Erro ao buscar médicos"))
+
+            # Executado em segundo plano: criptografa a senha nova (se houver) e grava as alterações
+            tarefas_tela.executar(servicos.atualizar_usuario, usuario_original, 'Medico', alteracoes, registro.versao,
+                                  ao_concluir=concluir, ao_falhar=erro_atualizacao("Erro ao atualizar", recarregar))
+
+        # Botão para salvar as alterações no cadastro
+        ctk.CTkButton(frame, text="Salvar", command=rastreamento.acao_ui("Salvar médico", salvar_medico)).pack(pady=10)
+
+        # Preenche o formulário quando os cadastros dos médicos estão em memória
+        def montar_formulario(armazem):
+            # Se nenhum médico for encontrado, avisa o usuário
+            if len(armazem) == 0:
+                messagebox.showinfo("Aviso", "Nenhum médico encontrado.")
+                limpar_conteudo()
+                return
+
+            estado['armazem'] = armazem
+            # Mantém a seleção anterior se ela ainda existir (ou a escolhida enquanto o armazém carregava)
+            if estado['selecionado'] is not None and armazem.obter(estado['selecionado']) is None:
+                estado['selecionado'] = None
+                busca_medicos.limpar()
+            carregar_dados_medico()
+
+        # A cada exibição o formulário é esvaziado e preenchido com os cadastros atuais
+        def ao_exibir():
+            estado['armazem'] = estado['registro'] = None
+            campos_medico.limpar()
+            if estado['selecionado'] is None:
+                busca_medicos.limpar()
+            # Carrega todos os cadastros de médicos de uma vez (ou reaproveita os já carregados)
+            carregar_armazem(tarefas_tela, 'Medico', montar_formulario, "Erro ao buscar médicos")
+
+        view.ao_exibir = ao_exibir
+
+    # ---------- Formulário de atualização de pacientes ----------
+    def construir_formulario_paciente(view):
+        frame = view.frame
+
+        # Título do formulário
+        ctk.CTkLabel(frame, text="Atualizar Cadastro Paciente", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        # Armazém com os cadastros dos pacientes, o registro exibido no formulário (com sua versão)
+        # e o usuário escolhido na busca
+        estado = {'armazem': None, 'registro': None, 'selecionado': None}
+
+        # Função que carrega os dados do paciente escolhido na busca (busca no armazém)
+        def carregar_dados_paciente(*_):
+            if estado['armazem'] is None or estado['selecionado'] is None:
+                return  # O armazém ainda está carregando: montar_formulario preenche depois
+            registro = estado['armazem'].obter(estado['selecionado'])
+            if registro:
+                # Preenche os campos com os dados do paciente; a senha só muda se for digitada
+                campos_paciente.carregar(registro.campos_formulario())
+                estado['registro'] = registro
+            else:
+                # Exibe alerta se o paciente não for encontrado
+                messagebox.showwarning("Atenção", "Paciente não encontrado.")
+
+        # Frame com a busca de pacientes (nome, usuário ou CPF)
+        menu_frame = ctk.CTkFrame(frame)
+        menu_frame.pack(pady=5)
+        ctk.CTkLabel(menu_frame, text="Selecionar Paciente:").pack(side='left', anchor='n', padx=(0, 10), pady=4)
+
+        def escolher_paciente(resultado):
+            estado['selecionado'] = resultado[0]
+            carregar_dados_paciente()
+
+        # Caixa de busca em vez de um menu com todos os pacientes
+        busca_pacientes = componentes.CampoBusca(menu_frame, ao_selecionar=escolher_paciente, formatar=formatar_usuario,
+                                                 placeholder="Nome, usuário ou CPF")
+        busca_pacientes.buscar = pesquisar_usuarios(tarefas_tela, 'Paciente', busca_pacientes, "Erro ao buscar pacientes")
+        busca_pacientes.pack(side='left')
+
+        # Lista de campos que serão preenchidos
+        campos = ["Nome completo", "CPF", "Telefone", "Endereço", "Usuário", "Senha"]
+        entradas = []
+
+        # Frame do formulário
+        frame_form = ctk.CTkFrame(frame)
+        frame_form.pack(pady=10)
+
+        # Cria os campos de entrada de dois em dois (colunas)
+        for i in range(0, len(campos), 2):
+            campo1 = ctk.CTkEntry(frame_form, placeholder_text=campos[i])
+            campo1.grid(row=i//2, column=0, padx=10, pady=5, sticky="ew")
+            entradas.append(campo1)
+
+            if i + 1 < len(campos):
+                campo2 = ctk.CTkEntry(frame_form, placeholder_text=campos[i+1], show="*" if campos[i+1] == "Senha" else "")
+                campo2.grid(row=i//2, column=1, padx=10, pady=5, sticky="ew")
+                entradas.append(campo2)
+
+        # Permite que as colunas se expandam
+        frame_form.columnconfigure(0, weight=1)
+        frame_form.columnconfigure(1, weight=1)
+
+        # Guarda os valores carregados para gravar apenas as colunas alteradas
+        campos_paciente = componentes.CamposRastreados(entradas, repositorio.COLUNAS_EDITAVEIS)
+
+        # Função para salvar as alterações nos dados do paciente
+        def salvar_paciente():
+            armazem, registro = estado['armazem'], estado['registro']
+            if registro is None or tarefas_tela.ocupado:
+                return  # Os cadastros ainda estão carregando ou a gravação anterior não terminou
+            if not campos_paciente.completos():
+                messagebox.showwarning("Atenção", "Preencha todos os campos.")
+                return
+            # Apenas as colunas alteradas vão para o UPDATE (a senha, só se uma nova foi digitada)
+            alteracoes = campos_paciente.alteracoes()
+            if not alteracoes:
+                messagebox.showinfo("Aviso", "Nenhuma alteração para salvar.")
+                return
+            usuario_original = registro.usuario
+
+            def concluir(versao):
+                # Mantém o armazém coerente com o que acabou de ser gravado
+                armazem.substituir(usuario_original, registro.com_alteracoes(alteracoes, versao))
+                # Usuário ou senha trocados: a sessão guardada dele neste terminal deixa de valer
+                if 'usuario' in alteracoes or 'senha' in alteracoes:
+                    sessoes.tabela().encerrar_usuario(usuario_original)
+                messagebox.showinfo("Sucesso", "Cadastro do paciente atualizado com sucesso.")
+                limpar_conteudo()
+
+            # Outra estação gravou antes: recarrega os cadastros e preenche o formulário de novo
+            def recarregar():
+                tarefas_tela.executar(armazem.recarregar, ao_concluir=montar_formulario, ao_falhar=erro_banco("Erro ao buscar pacientes"))
+
+            # Executado em segundo plano: criptografa a senha nova (se houver) e grava as alterações
+            tarefas_tela.executar(servicos.atualizar_usuario, usuario_original, 'Paciente', alteracoes, registro.versao,
+                                  ao_concluir=concluir, ao_falhar=erro_atualizacao("Erro ao atualizar", recarregar))
+
+        # Botão para salvar alterações do paciente
+        ctk.CTkButton(frame, text="Salvar", command=rastreamento.acao_ui("Salvar paciente", salvar_paciente)).pack(pady=10)
+
+        # Preenche o formulário quando os cadastros dos pacientes estão em memória
+        def montar_formulario(armazem):
+            # Exibe aviso se não houver pacientes
+            if len(armazem) == 0:
+                messagebox.showinfo("Aviso", "Nenhum paciente encontrado.")
+                limpar_conteudo()
+                return
+
+            estado['armazem'] = armazem
+            # Mantém a seleção anterior se ela ainda existir (ou a escolhida enquanto o armazém carregava)
+            if estado['selecionado'] is not None and armazem.obter(estado['selecionado']) is None:
+                estado['selecionado'] = None
+                busca_pacientes.limpar()
+            carregar_dados_paciente()
+
+        # A cada exibição o formulário é esvaziado e preenchido com os cadastros atuais
+        def ao_exibir():
+            estado['armazem'] = estado['registro'] = None
+            campos_paciente.limpar()
+            if estado['selecionado'] is None:
+                busca_pacientes.limpar()
+            # Carrega todos os cadastros de pacientes de uma vez (ou reaproveita os já carregados)
+            carregar_armazem(tarefas_tela, 'Paciente', montar_formulario, "Erro ao buscar pacientes")
+
+        view.ao_exibir = ao_exibir
+
+    # ---------- Importação de usuários em lote ----------
+    def construir_importacao(view):
+        frame = view.frame
+
+        ctk.CTkLabel(frame, text="Importar Usuários (CSV ou JSONL)", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        # Arquivo a importar
+        arquivo_var = ctk.StringVar()
+        frame_arquivo = ctk.CTkFrame(frame)
+        frame_arquivo.pack(pady=5)
+        ctk.CTkEntry(frame_arquivo, textvariable=arquivo_var, width=320, placeholder_text="Arquivo").pack(side='left', padx=(0, 10))
+
+        def procurar_arquivo():
+            from tkinter import filedialog  # Só esta tela usa o seletor de arquivos
+            caminho = filedialog.askopenfilename(
+                title="Selecionar arquivo de usuários",
+                filetypes=[("CSV ou JSONL", "*.csv *.jsonl *.ndjson"), ("Todos os arquivos", "*.*")])
+            if caminho:
+                arquivo_var.set(caminho)
+
+        ctk.CTkButton(frame_arquivo, text="Procurar...", width=100, command=procurar_arquivo).pack(side='left')
+
+        # Hierarquia usada nas linhas sem a coluna 'hierarquia'
+        ctk.CTkLabel(frame, text="Hierarquia padrão:").pack(pady=(10, 0))
+        hierarquia_var = ctk.StringVar(value='Paciente')
+        ctk.CTkOptionMenu(frame, values=list(importacao.HIERARQUIAS), variable=hierarquia_var).pack(pady=5)
+
+        # Progresso: a importação atualiza o dicionário e a interface o lê periodicamente
+        rotulo_progresso = ctk.CTkLabel(frame, text="")
+        progresso = {}
+
+        def acompanhar():
+            if progresso:
+                rotulo_progresso.configure(text=importacao.formatar_progresso(progresso))
+            if tarefas_tela.ocupado:
+                frame.after(200, acompanhar)
+
+        def iniciar_importacao():
+            if tarefas_tela.ocupado:
+                return
+            caminho, hierarquia = arquivo_var.get().strip(), hierarquia_var.get()
+            if not caminho:
+                messagebox.showwarning("Atenção", "Selecione o arquivo a importar.")
+                return
+            progresso.clear()
+            rotulo_progresso.configure(text="Importando...")
+
+            def concluir(resultado):
+                rotulo_progresso.configure(text=importacao.formatar_progresso(resultado))
+                mensagem = f"{resultado['importadas']} usuário(s) importado(s) em {resultado['segundos']:.1f} s."
+                if resultado['rejeitadas']:
+                    mensagem += f"\n{resultado['rejeitadas']} linha(s) recusada(s), listadas em:\n{resultado['arquivo_rejeitados']}"
+                messagebox.showinfo("Importação concluída", mensagem)
+
+            def falhar(err):
+                rotulo_progresso.configure(text="")
+                if isinstance(err, OSError):
+                    messagebox.showerror("Erro", f"Erro ao ler o arquivo:\n{err}")
+                    return
+                erro_banco("Erro ao importar usuários")(err)
+
+            # Roda em segundo plano; as senhas são criptografadas no pool de processos
+            tarefas_tela.executar(lambda: importacao.importar(caminho, hierarquia, ao_progredir=progresso.update),
+                                  ao_concluir=concluir, ao_falhar=falhar)
+            acompanhar()
+
+        ctk.CTkButton(frame, text="Importar", command=rastreamento.acao_ui("Importar", iniciar_importacao)).pack(pady=10)
+        rotulo_progresso.pack(pady=5)
+
+        view.ao_exibir = lambda: rotulo_progresso.configure(text="")
+
+    # ---------- Exportação dos agendamentos ----------
+    def construir_exportacao(view):
+        frame = view.frame
+
+        ctk.CTkLabel(frame, text="Exportar Agendamentos (CSV ou iCalendar)", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        # Filtros: médico e período são opcionais (em branco = todos)
+        medico_var, inicio_var, fim_var = ctk.StringVar(), ctk.StringVar(), ctk.StringVar()
+        ctk.CTkLabel(frame, text="Médico (usuário, em branco para todos):").pack()
+        ctk.CTkEntry(frame, textvariable=medico_var, width=250).pack(pady=5)
+        ctk.CTkLabel(frame, text="Período (AAAA-MM-DD, em branco para sem limite):").pack()
+        frame_periodo = ctk.CTkFrame(frame)
+        frame_periodo.pack(pady=5)
+        ctk.CTkEntry(frame_periodo, textvariable=inicio_var, width=120, placeholder_text="Início").pack(side='left', padx=5)
+        ctk.CTkEntry(frame_periodo, textvariable=fim_var, width=120, placeholder_text="Fim").pack(side='left', padx=5)
+
+        formato_var = ctk.StringVar(value='csv')
+        ctk.CTkOptionMenu(frame, values=list(exportacao.FORMATOS), variable=formato_var).pack(pady=5)
+        gzip_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(frame, text="Comprimir (gzip)", variable=gzip_var).pack(pady=5)
+
+        # Progresso: a exportação atualiza o dicionário e a interface o lê periodicamente
+        rotulo_progresso = ctk.CTkLabel(frame, text="")
+        progresso = {}
+
+        def acompanhar():
+            if progresso:
+                rotulo_progresso.configure(text=exportacao.formatar_progresso(progresso))
+            if tarefas_tela.ocupado:
+                frame.after(200, acompanhar)
+
+        def iniciar_exportacao():
+            if tarefas_tela.ocupado:
+                return
+            filtros = (medico_var.get().strip() or None, inicio_var.get().strip() or None, fim_var.get().strip() or None)
+            for data in filtros[1:]:
+                if data:
+                    try:
+                        date.fromisoformat(data)
+                    except ValueError:
+                        messagebox.showwarning("Atenção", f"Data inválida: {data} (use AAAA-MM-DD).")
+                        return
+            formato, comprimir = formato_var.get(), gzip_var.get()
+
+            from tkinter import filedialog  # Só as telas de arquivo usam o seletor
+            extensao = f".{formato}{'.gz' if comprimir else ''}"
+            caminho = filedialog.asksaveasfilename(title="Salvar exportação", defaultextension=extensao,
+                                                   initialfile=f"agendamentos{extensao}")
+            if not caminho:
+                return
+            progresso.clear()
+            rotulo_progresso.configure(text="Exportando...")
+
+            def concluir(resultado):
+                rotulo_progresso.configure(text=exportacao.formatar_progresso(resultado))
+                messagebox.showinfo("Exportação concluída",
+                                    f"{resultado['linhas']} consulta(s) exportada(s) em {resultado['segundos']:.1f} s "
+                                    f"({resultado['linhas_por_segundo']:.0f} linhas/s) para:\n{resultado['arquivo']}")
+
+            def falhar(err):
+                rotulo_progresso.configure(text="")
+                if isinstance(err, OSError):
+                    messagebox.showerror("Erro", f"Erro ao gravar o arquivo:\n{err}")
+                    return
+                erro_banco("Erro ao exportar agendamentos")(err)
+
+            # Roda em segundo plano; as linhas vão do cursor do banco direto para o arquivo
+            tarefas_tela.executar(lambda: exportacao.exportar(caminho, *filtros, formato=formato, comprimir=comprimir,
+                                                              ao_progredir=progresso.update),
+                                  ao_concluir=concluir, ao_falhar=falhar)
+            acompanhar()
+
+        ctk.CTkButton(frame, text="Exportar", command=rastreamento.acao_ui("Exportar", iniciar_exportacao)).pack(pady=10)
+        rotulo_progresso.pack(pady=5)
+
+        view.ao_exibir = lambda: rotulo_progresso.configure(text="")
+
+    # ---------- Relatório das consultas ----------
+    def construir_relatorio_consultas(view):
+        frame = view.frame
+
+        ctk.CTkLabel(frame, text="Relatório de Consultas", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        # Período do relatório (padrão: últimos 12 meses)
+        inicio_var, fim_var = ctk.StringVar(), ctk.StringVar()
+        frame_periodo = ctk.CTkFrame(frame, fg_color='transparent')
+        frame_periodo.pack(pady=5)
+        ctk.CTkLabel(frame_periodo, text="De").pack(side='left', padx=5)
+        ctk.CTkEntry(frame_periodo, textvariable=inicio_var, width=110).pack(side='left', padx=5)
+        ctk.CTkLabel(frame_periodo, text="até").pack(side='left', padx=5)
+        ctk.CTkEntry(frame_periodo, textvariable=fim_var, width=110).pack(side='left', padx=5)
+
+        texto = ctk.CTkTextbox(frame, width=640, height=360, font=ctk.CTkFont(family='Courier', size=12), wrap='none')
+
+        def mostrar(relatorio):
+            texto.configure(state='normal')
+            texto.delete('1.0', tk.END)
+            texto.insert('1.0', relatorios.formatar_relatorio(relatorio))
+            texto.configure(state='disabled')
+
+        def falhar(err):
+            if isinstance(err, RuntimeError):
+                messagebox.showerror("Erro", str(err))  # NumPy não instalado
+                return
+            erro_banco("Erro ao gerar o relatório")(err)
+
+        def gerar():
+            if tarefas_tela.ocupado:
+                return
+            try:
+                inicio, fim = date.fromisoformat(inicio_var.get().strip()), date.fromisoformat(fim_var.get().strip())
+            except ValueError:
+                messagebox.showwarning("Atenção", "Informe as datas no formato AAAA-MM-DD.")
+                return
+            if inicio > fim:
+                messagebox.showwarning("Atenção", "A data inicial é posterior à final.")
+                return
+            # Em segundo plano: só os dias alterados desde o último relatório voltam ao banco
+            tarefas_tela.executar(relatorios.gerar_relatorio, inicio.isoformat(), fim.isoformat(),
+                                  ao_concluir=mostrar, ao_falhar=falhar)
+
+        ctk.CTkButton(frame, text="Gerar", command=rastreamento.acao_ui("Gerar relatório", gerar)).pack(pady=5)
+        texto.pack(pady=10, fill='both', expand=True)
+
+        def ao_exibir():
+            hoje = date.today()
+            inicio_var.set((hoje - timedelta(days=365)).isoformat())
+            fim_var.set(hoje.isoformat())
+            gerar()
+
+        view.ao_exibir = ao_exibir
+
+    # ---------- Histórico clínico dos pacientes (consulta e novos registros) ----------
+    def construir_historico_adm(view):
+        construir_historico(view, tarefas_tela, escolher_paciente=True)
+
+
+# ---------------- Botões do Menu Lateral ----------------
+    botoes = {
+        'Atualizar Cadastro Médico': lambda: exibir('formulario_medico', construir_formulario_medico),
+        'Atualizar Cadastro Paciente': lambda: exibir('formulario_paciente', construir_formulario_paciente),
+        'Visualizar Histórico Clínico': lambda: exibir('historico', construir_historico_adm),
+        'Verificar Consultas Pacientes': lambda: exibir('relatorio_consultas', construir_relatorio_consultas),
+        'Gerenciar Cadastro Administrador': lambda: print("Em construção"),
+        'Importar Usuários': lambda: exibir('importacao', construir_importacao),
+        'Exportar Agendamentos': lambda: exibir('exportacao', construir_exportacao),
+        'Logout': logout
+    }
+
+    # Cria cada botão do menu com sua respectiva ação
+    for texto, comando in botoes.items():
+        ctk.CTkButton(frame_menu, text=texto, command=rastreamento.acao_ui(texto, comando)).pack(pady=10, fill='x')
+
+    # Cada login começa com o conteúdo vazio; ao sair, as tarefas pendentes são descartadas
+    tela.ao_exibir = limpar_conteudo
+    tela.ao_ocultar = limpar_conteudo
+
+
+# ---------- Tela principal para Médicos ----------
+def tela_principal_medico():
+    roteador.mostrar('medico', construir_tela_principal_medico,
+                     titulo='SGHSS - Vida Plus - Médico', geometria='800x500', redimensionavel=(True, True))
+
+def construir_tela_principal_medico(tela):
+    telaMed = tela.frame
+
+    # Frame lateral do menu
+    frame_menu = ctk.CTkFrame(telaMed, width=200)
+    frame_menu.pack(side='left', fill='y', padx=10, pady=10)
+
+    # Frame do conteúdo principal
+    frame_conteudo = ctk.CTkFrame(telaMed)
+    frame_conteudo.pack(side='right', expand=True, fill='both', padx=10, pady=10)
+    # Formulários do conteúdo, construídos na primeira vez em que são abertos
+    conteudo = navegacao.Roteador(frame_conteudo)
+
+    # Indicador de carregamento e tarefas em segundo plano da tela atual
+    rotulo_status = ctk.CTkLabel(frame_menu, text="")
+    rotulo_status.pack(side='bottom', pady=5)
+    tarefas_tela = tarefas.GrupoTarefas(telaMed, tarefas.IndicadorOcupado(telaMed.winfo_toplevel(), rotulo_status))
+
+    # Função para esconder o conteúdo atual
+    def limpar_conteudo():
+        # Descarta tarefas pendentes da tela anterior
+        tarefas_tela.cancelar()
+        conteudo.ocultar()
+
+    # Troca o formulário exibido, reaproveitando os widgets já construídos
+    def exibir(nome, construir):
+        tarefas_tela.cancelar()
+        conteudo.mostrar(nome, construir)
+
+    # Formulário de atualização do próprio cadastro
+    def construir_formulario_medico(view):
+        frame = view.frame
+
+        # Título do formulário
+        ctk.CTkLabel(frame, text="Atualizar Cadastro", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        campos = [
+            "Nome completo",
+            "CPF",
+            "Telefone",
+            "Endereço",
+            "Usuário",
+            "Senha"
+        ]
+        entradas = []
+
+        # Frame do formulário
+        frame_form = ctk.CTkFrame(frame)
+        frame_form.pack(pady=10)
+
+        # Cria os campos de entrada (2 por linha)
+        for i in range(0, len(campos), 2):
+            campo1 = ctk.CTkEntry(frame_form, placeholder_text=campos[i])
+            campo1.grid(row=i//2, column=0, padx=10, pady=5, sticky="ew")
+            entradas.append(campo1)
+
+            if i + 1 < len(campos):
+                campo2 = ctk.CTkEntry(frame_form, placeholder_text=campos[i+1], show="*" if campos[i+1] == "Senha" else "")
+                campo2.grid(row=i//2, column=1, padx=10, pady=5, sticky="ew")
+                entradas.append(campo2)
+
+        frame_form.columnconfigure(0, weight=1)
+        frame_form.columnconfigure(1, weight=1)
+
+        # Guarda os valores carregados para gravar apenas as colunas alteradas
+        campos_medico = componentes.CamposRastreados(entradas, repositorio.COLUNAS_EDITAVEIS)
+        # Hierarquia e versão do cadastro carregado (controle de concorrência)
+        estado = {'hierarquia': None, 'versao': None}
+
+        # Preenche o formulário com o cadastro do usuário logado
+        def preencher(dados):
+            if dados is None:
+                messagebox.showwarning("Atenção", "Cadastro não encontrado.")
+                limpar_conteudo()
+                return
+            campos_medico.carregar(dict(zip(repositorio.COLUNAS_EDITAVEIS, dados[:5])))
+            estado['hierarquia'], estado['versao'] = dados[5], dados[6]
+
+        # Função para salvar as alterações do cadastro no banco
+        def salvar():
+            if estado['versao'] is None or tarefas_tela.ocupado:
+                return  # O cadastro ainda está carregando ou a gravação anterior não terminou
+            if not campos_medico.completos():
+                messagebox.showwarning("Atenção", "Preencha todos os campos.")
+                return
+            # Apenas as colunas alteradas vão para o UPDATE (a senha, só se uma nova foi digitada)
+            alteracoes = campos_medico.alteracoes()
+            if not alteracoes:
+                messagebox.showinfo("Aviso", "Nenhuma alteração para salvar.")
+                return
+            usuario_original, hierarquia = usuario_logado(), estado['hierarquia']
+
+            # Executado em segundo plano: grava as alterações e marca o armazém do administrador como velho
+            def gravar():
+                versao = servicos.atualizar_usuario(usuario_original, hierarquia, alteracoes, estado['versao'])
+                registros.armazem(hierarquia).marcar_velho()
+                return versao
+
+            def concluir(_):
+                global sessao_atual
+                # O nome de usuário e a senha podem ter mudado junto com o cadastro
+                sessao_atual = sessoes.tabela().atualizar(sessao_atual, usuario=alteracoes.get('usuario'),
+                                                          senha=alteracoes.get('senha')).token
+                messagebox.showinfo("Sucesso", "Cadastro atualizado com sucesso.")
+                limpar_conteudo()
+
+            tarefas_tela.executar(gravar, ao_concluir=concluir,
+                                  ao_falhar=erro_atualizacao("Erro ao atualizar cadastro", carregar))
+
+        # Botão para salvar alterações
+        ctk.CTkButton(frame, text="Salvar", command=rastreamento.acao_ui("Salvar cadastro", salvar)).pack(pady=10)
+
+        # Busca o cadastro atual (em segundo plano) a cada exibição do formulário
+        def carregar():
+            estado['versao'] = None
+            campos_medico.limpar()
+            tarefas_tela.executar(repositorio.usuarios().buscar_dados, usuario_logado(),
+                                  ao_concluir=preencher, ao_falhar=erro_banco("Erro ao carregar cadastro"))
+
+        view.ao_exibir = carregar
+
+    # Agenda do médico logado (dia ou semana). A primeira leitura traz o período inteiro;
+    # depois, a cada INTERVALO_AGENDA_MS, só as consultas criadas ou alteradas desde a última
+    # leitura, e apenas as linhas afetadas são criadas, atualizadas ou removidas na tela.
+    def construir_agenda(view):
+        frame = view.frame
+
+        ctk.CTkLabel(frame, text="Agenda", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        # Barra de navegação: visão, período anterior/seguinte e volta para hoje
+        frame_nav = ctk.CTkFrame(frame, fg_color='transparent')
+        frame_nav.pack(pady=5)
+        seletor_visao = ctk.CTkSegmentedButton(frame_nav, values=["Dia", "Semana"], command=lambda _: carregar())
+        seletor_visao.set("Semana")
+        seletor_visao.grid(row=0, column=0, padx=10)
+        ctk.CTkButton(frame_nav, text="<", width=30, command=lambda: navegar(-1)).grid(row=0, column=1, padx=2)
+        ctk.CTkButton(frame_nav, text="Hoje", width=60, command=lambda: navegar(0)).grid(row=0, column=2, padx=2)
+        ctk.CTkButton(frame_nav, text=">", width=30, command=lambda: navegar(1)).grid(row=0, column=3, padx=2)
+        rotulo_periodo = ctk.CTkLabel(frame_nav, text="")
+        rotulo_periodo.grid(row=0, column=4, padx=10)
+
+        area = ctk.CTkScrollableFrame(frame, width=600, height=320)
+        area.pack(pady=10, fill='both', expand=True)
+        rotulo_atualizacao = ctk.CTkLabel(frame, text="")
+        rotulo_atualizacao.pack(pady=(0, 5))
+
+        # As leituras periódicas têm um grupo próprio, sem o indicador de carregamento da tela
+        tarefas_agenda = tarefas.GrupoTarefas(frame)
+
+        # dias: 'AAAA-MM-DD' -> {'cabecalho', 'frame', 'chaves' (ordenadas), 'widgets'};
+        # linhas: id -> (data, chave de ordenação, atualizado_em, widget); `desde`: marco da próxima leitura.
+        # `geracao` descarta respostas de leituras anteriores a uma troca de período.
+        estado = {'medico': None, 'dia': None, 'inicio': None, 'fim': None, 'desde': None,
+                  'dias': {}, 'linhas': {}, 'geracao': 0, 'temporizador': None}
+
+        def periodo():
+            dia = estado['dia']
+            if seletor_visao.get() == "Dia":
+                return dia, dia
+            inicio = dia - timedelta(days=dia.weekday())
+            return inicio, inicio + timedelta(days=6)
+
+        def navegar(direcao):
+            passo = 1 if seletor_visao.get() == "Dia" else 7
+            estado['dia'] = date.today() if direcao == 0 else estado['dia'] + timedelta(days=passo * direcao)
+            carregar()
+
+        def atualizar_cabecalho(data):
+            dia = estado['dias'][data]
+            quantidade = len(dia['chaves'])
+            texto = f"{DIAS_SEMANA[dia['data'].weekday()]}, {dia['data']:%d/%m}"
+            dia['cabecalho'].configure(text=f"{texto} — {quantidade} consulta{'s' if quantidade != 1 else ''}")
+
+        def texto_linha(paciente, nome, hora, obs, status):
+            texto = f"{repositorio.formatar_hora(hora)}   {nome or paciente} ({paciente})"
+            if status != 'agendada':
+                texto += f"   [{status}]"
+            return f"{texto}\n    {obs}" if obs else texto
+
+        # Clique com o botão direito em uma consulta: marca o comparecimento do paciente
+        menu_status = tk.Menu(frame, tearoff=0)
+
+        def abrir_menu_status(evento, id_):
+            menu_status.delete(0, tk.END)
+            for status, texto in (('realizada', "Marcar como realizada"), ('faltou', "Marcar falta"),
+                                  ('agendada', "Desmarcar")):
+                menu_status.add_command(label=texto, command=lambda status=status: marcar_status(id_, status))
+            menu_status.tk_popup(evento.x_root, evento.y_root)
+
+        def marcar_status(id_, status):
+            # A leitura incremental logo em seguida traz a linha com a nova situação
+            def concluir(_):
+                cancelar_atualizacao()
+                atualizar()
+            tarefas_tela.executar(repositorio.agendamentos().marcar_status, id_, estado['medico'], status,
+                                  ao_concluir=concluir, ao_falhar=erro_banco("Erro ao marcar a consulta"))
+
+        # Insere o widget da consulta na posição certa do dia, sem reempacotar os demais
+        def inserir_linha(id_, paciente, nome, data, hora, obs, atualizado_em, status):
+            dia = estado['dias'][data]
+            chave = (repositorio.normalizar_hora(hora), id_)
+            posicao = bisect.bisect_left(dia['chaves'], chave)
+            rotulo = ctk.CTkLabel(dia['frame'], text=texto_linha(paciente, nome, hora, obs, status), anchor='w', justify='left')
+            rotulo.bind('<Button-3>', lambda evento: abrir_menu_status(evento, id_))
+            if posicao < len(dia['widgets']):
+                rotulo.pack(fill='x', padx=20, before=dia['widgets'][posicao])
+            else:
+                rotulo.pack(fill='x', padx=20)
+            dia['chaves'].insert(posicao, chave)
+            dia['widgets'].insert(posicao, rotulo)
+            estado['linhas'][id_] = (data, chave, atualizado_em, rotulo)
+            atualizar_cabecalho(data)
+
+        def remover_linha(id_):
+            data, chave, _, rotulo = estado['linhas'].pop(id_)
+            dia = estado['dias'][data]
+            posicao = dia['chaves'].index(chave)
+            del dia['chaves'][posicao]
+            del dia['widgets'][posicao]
+            rotulo.destroy()
+            atualizar_cabecalho(data)
+
+        def aplicar(linhas):
+            for id_, paciente, nome, data, hora, obs, atualizado_em, status in linhas:
+                data = disponibilidade.como_data(data).isoformat()
+                atualizado_em = repositorio.texto_instante(atualizado_em)
+                atual = estado['linhas'].get(id_)
+                if atual is not None and atual[2] == atualizado_em:
+                    continue  # Relida por causa da folga, sem mudança
+                chave = (repositorio.normalizar_hora(hora), id_)
+                if atual is not None and atual[:2] == (data, chave):
+                    # Mesmo dia e horário: só o texto muda
+                    atual[3].configure(text=texto_linha(paciente, nome, hora, obs, status))
+                    estado['linhas'][id_] = (data, chave, atualizado_em, atual[3])
+                    continue
+                if atual is not None:
+                    remover_linha(id_)
+                if data in estado['dias']:
+                    inserir_linha(id_, paciente, nome, data, hora, obs, atualizado_em, status)
+
+        def avancar_marco(linhas):
+            instantes = [repositorio.texto_instante(linha[6]) for linha in linhas if linha[6] is not None]
+            if instantes and (estado['desde'] is None or max(instantes) > estado['desde']):
+                estado['desde'] = max(instantes)
+
+        # Carga completa do período exibido: recria os dias e todas as linhas
+        def carregar():
+            estado['geracao'] += 1
+            cancelar_atualizacao()
+            inicio, fim = periodo()
+            estado.update(inicio=inicio, fim=fim, desde=None, linhas={})
+            for dia in estado['dias'].values():
+                dia['frame'].destroy()
+            estado['dias'] = {}
+            for deslocamento in range((fim - inicio).days + 1):
+                data = inicio + timedelta(days=deslocamento)
+                frame_dia = ctk.CTkFrame(area, fg_color='transparent')
+                frame_dia.pack(fill='x', pady=(0, 8))
+                cabecalho = ctk.CTkLabel(frame_dia, text="", anchor='w', font=ctk.CTkFont(weight='bold'))
+                cabecalho.pack(fill='x')
+                estado['dias'][data.isoformat()] = {'data': data, 'cabecalho': cabecalho, 'frame': frame_dia,
+                                                    'chaves': [], 'widgets': []}
+                atualizar_cabecalho(data.isoformat())
+            rotulo_periodo.configure(text=f"{inicio:%d/%m/%Y}" if inicio == fim else f"{inicio:%d/%m} a {fim:%d/%m/%Y}")
+
+            # O marco é lido antes do período: o que mudar entre as duas leituras vem na próxima
+            def ler(medico, inicio, fim):
+                agendamentos = repositorio.agendamentos()
+                desde = agendamentos.ultima_alteracao_medico(medico)
+                return desde, agendamentos.listar_agenda_medico(medico, inicio, fim)
+
+            def receber(resultado, geracao=estado['geracao']):
+                if geracao != estado['geracao']:
+                    return
+                estado['desde'], linhas = resultado
+                aplicar(linhas)
+                avancar_marco(linhas)
+                agendar_atualizacao()
+
+            tarefas_tela.executar(ler, estado['medico'], inicio.isoformat(), fim.isoformat(),
+                                  ao_concluir=receber, ao_falhar=erro_banco("Erro ao carregar agenda"))
+
+        # ---------- Atualização incremental ----------
+        def agendar_atualizacao():
+            estado['temporizador'] = frame.after(INTERVALO_AGENDA_MS, atualizar)
+
+        def cancelar_atualizacao():
+            tarefas_agenda.cancelar()
+            if estado['temporizador'] is not None:
+                frame.after_cancel(estado['temporizador'])
+                estado['temporizador'] = None
+
+        def atualizar():
+            estado['temporizador'] = None
+            geracao = estado['geracao']
+            # Sem marco (médico ainda sem consultas), qualquer consulta gravada é novidade
+            desde = (repositorio.recuar_instante(estado['desde'], FOLGA_ALTERACOES_AGENDA)
+                     if estado['desde'] else '1970-01-01 00:00:00.000')
+
+            def receber(linhas):
+                if geracao != estado['geracao']:
+                    return
+                aplicar(linhas)
+                avancar_marco(linhas)
+                rotulo_atualizacao.configure(text=f"Atualizado às {datetime.now():%H:%M:%S}")
+                agendar_atualizacao()
+
+            def falhar(err):
+                if geracao != estado['geracao']:
+                    return
+                if not isinstance(err, banco.ERROS_BANCO):
+                    raise err
+                # Falha momentânea de conexão: avisa discretamente e tenta de novo no próximo ciclo
+                rotulo_atualizacao.configure(text=f"Falha ao atualizar: {err}")
+                agendar_atualizacao()
+
+            tarefas_agenda.executar(repositorio.agendamentos().listar_agenda_medico_alterados, estado['medico'], desde,
+                                    ao_concluir=receber, ao_falhar=falhar)
+
+        # Cada exibição recomeça na semana atual do médico logado; ao sair, as leituras param
+        def ao_exibir():
+            estado.update(medico=usuario_logado(), dia=date.today())
+            rotulo_atualizacao.configure(text="")
+            carregar()
+
+        def ao_ocultar():
+            estado['geracao'] += 1
+            cancelar_atualizacao()
+
+        view.ao_exibir = ao_exibir
+        view.ao_ocultar = ao_ocultar
+
+    # ---------- Emissão de receitas ----------
+    def construir_receita(view):
+        frame = view.frame
+
+        ctk.CTkLabel(frame, text="Emitir Receita", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        # Consultas dos últimos DIAS_RECEITA dias (rótulo do menu -> id do agendamento), médico logado
+        # e o after() da próxima consulta às emissões em andamento
+        estado = {'consultas': {}, 'medico': None, 'temporizador': None}
+
+        consulta_var = ctk.StringVar(value="")
+        menu_consultas = ctk.CTkOptionMenu(frame, variable=consulta_var, values=[""], width=420, dynamic_resizing=False)
+        menu_consultas.pack(pady=5)
+
+        ctk.CTkLabel(frame, text="Medicamentos (um por linha: medicamento - posologia):").pack()
+        texto_itens = ctk.CTkTextbox(frame, width=500, height=110)
+        texto_itens.pack(pady=5)
+        entrada_observacoes = ctk.CTkEntry(frame, placeholder_text="Observações", width=500)
+        entrada_observacoes.pack(pady=5)
+
+        def preencher_consultas(linhas):
+            # Da consulta mais recente para a mais antiga
+            estado['consultas'] = {}
+            for id_, paciente, nome, data, hora, *_ in sorted(linhas, key=lambda linha: (str(linha[3]), str(linha[4])),
+                                                              reverse=True):
+                dia = date.fromisoformat(str(data)[:10])
+                rotulo = f"{dia:%d/%m} {repositorio.formatar_hora(hora)} - {nome or paciente} (consulta {id_})"
+                estado['consultas'][rotulo] = id_
+            rotulos = list(estado['consultas']) or ["Nenhuma consulta nos últimos dias"]
+            menu_consultas.configure(values=rotulos)
+            consulta_var.set(rotulos[0])
+
+        # ----- Emissões: a tela só consulta a situação de cada uma, a geração segue em segundo plano -----
+        frame_emissoes = ctk.CTkScrollableFrame(frame, width=500, height=120)
+        linhas_emissoes = []  # (rótulo, botão) reaproveitados a cada atualização
+
+        def falhar_abertura(err):
+            if isinstance(err, LookupError):
+                messagebox.showwarning("Atenção", str(err))
+            elif isinstance(err, OSError):
+                messagebox.showerror("Erro", f"Erro ao gravar a receita:\n{err}")
+            else:
+                erro_banco("Erro ao abrir a receita")(err)
+
+        def abrir_receita(emissao):
+            tarefas_tela.executar(receitas.abrir, emissao.id_agendamento, emissao.medico, emissao.formato,
+                                  ao_concluir=abrir_arquivo, ao_falhar=falhar_abertura)
+
+        def acompanhar():
+            estado['temporizador'] = None
+            emissoes = receitas.emissoes(estado['medico'])[:LIMITE_RECEITAS_EXIBIDAS]
+            while len(linhas_emissoes) < len(emissoes):
+                linha = ctk.CTkFrame(frame_emissoes, fg_color='transparent')
+                rotulo = ctk.CTkLabel(linha, text="", anchor='w', justify='left', wraplength=380)
+                rotulo.pack(side='left', fill='x', expand=True)
+                botao = ctk.CTkButton(linha, text="Abrir", width=70)
+                botao.pack(side='right')
+                linhas_emissoes.append((linha, rotulo, botao))
+            for posicao, (linha, rotulo, botao) in enumerate(linhas_emissoes):
+                if posicao >= len(emissoes):
+                    linha.pack_forget()
+                    continue
+                emissao = emissoes[posicao]
+                rotulo.configure(text=receitas.formatar_emissao(emissao))
+                botao.configure(state='normal' if emissao.situacao() == 'pronta' else 'disabled',
+                                command=lambda emissao=emissao: abrir_receita(emissao))
+                linha.pack(fill='x', pady=2)
+            if any(not emissao.concluida for emissao in emissoes):
+                estado['temporizador'] = frame.after(INTERVALO_RECEITAS_MS, acompanhar)
+
+        def emitir():
+            id_agendamento = estado['consultas'].get(consulta_var.get())
+            if id_agendamento is None:
+                messagebox.showwarning("Atenção", "Selecione a consulta.")
+                return
+            try:
+                itens = receitas.interpretar_itens(texto_itens.get('1.0', tk.END))
+            except ValueError as err:
+                messagebox.showwarning("Atenção", str(err))
+                return
+            # Retorna na hora: leitura da consulta, geração e gravação seguem em segundo plano
+            receitas.emitir(id_agendamento, estado['medico'], itens, entrada_observacoes.get(), formato_var.get())
+            texto_itens.delete('1.0', tk.END)
+            entrada_observacoes.delete(0, 'end')
+            if estado['temporizador'] is not None:
+                frame.after_cancel(estado['temporizador'])
+            acompanhar()
+
+        frame_acoes = ctk.CTkFrame(frame, fg_color='transparent')
+        frame_acoes.pack(pady=5)
+        formato_var = ctk.StringVar(value='pdf')
+        ctk.CTkOptionMenu(frame_acoes, values=list(receitas.FORMATOS), variable=formato_var, width=90).pack(side='left', padx=5)
+        ctk.CTkButton(frame_acoes, text="Emitir", command=rastreamento.acao_ui("Emitir receita", emitir)).pack(side='left', padx=5)
+        ctk.CTkLabel(frame, text="Receitas emitidas nesta estação:").pack(pady=(10, 0))
+        frame_emissoes.pack(pady=5, fill='both', expand=True)
+
+        def ao_exibir():
+            estado['medico'] = usuario_logado()
+            hoje = date.today()
+            tarefas_tela.executar(repositorio.agendamentos().listar_agenda_medico, estado['medico'],
+                                  (hoje - timedelta(days=DIAS_RECEITA)).isoformat(), hoje.isoformat(),
+                                  ao_concluir=preencher_consultas, ao_falhar=erro_banco("Erro ao carregar as consultas"))
+            acompanhar()
+
+        # As emissões continuam fora da tela; só a consulta à situação delas para
+        def ao_ocultar():
+            if estado['temporizador'] is not None:
+                frame.after_cancel(estado['temporizador'])
+                estado['temporizador'] = None
+
+        view.ao_exibir = ao_exibir
+        view.ao_ocultar = ao_ocultar
+
+    # Dicionário com os botões do menu lateral da interface do médico
+    botoes = {
+        'Verificar Agendamentos': lambda: exibir('agenda', construir_agenda),
+        'Emitir Receita': lambda: exibir('receita', construir_receita),
+        'Gerenciar Pacientes': lambda: print("Gerenciar..."),
+        'Telemedicina - Atender': lambda: print("Atender..."),
+        'Atualização Cadastral': lambda: exibir('formulario_medico', construir_formulario_medico)  # Exibe o formulário para editar dados
+    }
+
+    # Criação dos botões no menu lateral com os textos e comandos definidos acima
+    for texto, comando in botoes.items():
+        ctk.CTkButton(frame_menu, text=texto, command=rastreamento.acao_ui(texto, comando)).pack(pady=10, fill='x')
+
+    # Botão para logout (bloqueia a sessão e retorna para o login)
+    ctk.CTkButton(frame_menu, text="Logout", command=logout).pack(pady=10, fill='x')
+
+    # Cada login começa com o conteúdo vazio; ao sair, as tarefas pendentes são descartadas
+    tela.ao_exibir = limpar_conteudo
+    tela.ao_ocultar = limpar_conteudo
+
+
+# ---------- Tela principal do paciente ----------
+def tela_principal_paciente():
+    roteador.mostrar('paciente', construir_tela_principal_paciente,
+                     titulo='SGHSS - Vida Plus - Paciente', geometria='800x500', redimensionavel=(True, True))
+
+def construir_tela_principal_paciente(tela):
+    telaPac = tela.frame
+
+    # Frame lateral do menu
+    frame_menu = ctk.CTkFrame(telaPac, width=200)
+    frame_menu.pack(side='left', fill='y', padx=10, pady=10)
+
+    # Frame do conteúdo principal
+    frame_conteudo = ctk.CTkFrame(telaPac)
+    frame_conteudo.pack(side='right', expand=True, fill='both', padx=10, pady=10)
+    # Formulários do conteúdo, construídos na primeira vez em que são abertos
+    conteudo = navegacao.Roteador(frame_conteudo)
+
+    # Indicador de carregamento e tarefas em segundo plano da tela atual
+    rotulo_status = ctk.CTkLabel(frame_menu, text="")
+    rotulo_status.pack(side='bottom', pady=5)
+    tarefas_tela = tarefas.GrupoTarefas(telaPac, tarefas.IndicadorOcupado(telaPac.winfo_toplevel(), rotulo_status))
+
+    # Função que esconde o conteúdo atual
+    def limpar_conteudo():
+        # Descarta tarefas pendentes da tela anterior
+        tarefas_tela.cancelar()
+        conteudo.ocultar()
+
+    # Troca o formulário exibido, reaproveitando os widgets já construídos
+    def exibir(nome, construir):
+        tarefas_tela.cancelar()
+        conteudo.mostrar(nome, construir)
+
+    # Formulário de atualização de dados cadastrais
+    def construir_formulario_paciente(view):
+        frame = view.frame
+
+        ctk.CTkLabel(frame, text="Atualizar Cadastro", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        campos = [
+            "Nome completo",
+            "CPF",
+            "Telefone",
+            "Endereço",
+            "Usuário",
+            "Senha"
+        ]
+        entradas = []
+
+        # Frame do formulário
+        frame_form = ctk.CTkFrame(frame)
+        frame_form.pack(pady=10)
+
+        # Cria os campos de entrada (em pares lado a lado)
+        for i in range(0, len(campos), 2):
+            campo1 = ctk.CTkEntry(frame_form, placeholder_text=campos[i])
+            campo1.grid(row=i//2, column=0, padx=10, pady=5, sticky="ew")
+            entradas.append(campo1)
+
+            if i + 1 < len(campos):
+                campo2 = ctk.CTkEntry(frame_form, placeholder_text=campos[i+1], show="*" if campos[i+1] == "Senha" else "")
+                campo2.grid(row=i//2, column=1, padx=10, pady=5, sticky="ew")
+                entradas.append(campo2)
+
+        frame_form.columnconfigure(0, weight=1)
+        frame_form.columnconfigure(1, weight=1)
+
+        # Guarda os valores carregados para gravar apenas as colunas alteradas
+        campos_paciente = componentes.CamposRastreados(entradas, repositorio.COLUNAS_EDITAVEIS)
+        # Hierarquia e versão do cadastro carregado (controle de concorrência)
+        estado = {'hierarquia': None, 'versao': None}
+
+        # Preenche o formulário com o cadastro do usuário logado
+        def preencher(dados):
+            if dados is None:
+                messagebox.showwarning("Atenção", "Cadastro não encontrado.")
+                limpar_conteudo()
+                return
+            campos_paciente.carregar(dict(zip(repositorio.COLUNAS_EDITAVEIS, dados[:5])))
+            estado['hierarquia'], estado['versao'] = dados[5], dados[6]
+
+        # Função para salvar as alterações do cadastro no banco
+        def salvar():
+            if estado['versao'] is None or tarefas_tela.ocupado:
+                return  # O cadastro ainda está carregando ou a gravação anterior não terminou
+            if not campos_paciente.completos():
+                messagebox.showwarning("Atenção", "Preencha todos os campos.")
+                return
+            # Apenas as colunas alteradas vão para o UPDATE (a senha, só se uma nova foi digitada)
+            alteracoes = campos_paciente.alteracoes()
+            if not alteracoes:
+                messagebox.showinfo("Aviso", "Nenhuma alteração para salvar.")
+                return
+            usuario_original, hierarquia = usuario_logado(), estado['hierarquia']
+
+            # Executado em segundo plano: grava as alterações e marca o armazém do administrador como velho
+            def gravar():
+                versao = servicos.atualizar_usuario(usuario_original, hierarquia, alteracoes, estado['versao'])
+                registros.armazem(hierarquia).marcar_velho()
+                return versao
+
+            def concluir(_):
+                global sessao_atual
+                # O nome de usuário e a senha podem ter mudado junto com o cadastro
+                sessao_atual = sessoes.tabela().atualizar(sessao_atual, usuario=alteracoes.get('usuario'),
+                                                          senha=alteracoes.get('senha')).token
+                messagebox.showinfo("Sucesso", "Cadastro atualizado com sucesso.")
+                limpar_conteudo()
+
+            tarefas_tela.executar(gravar, ao_concluir=concluir,
+                                  ao_falhar=erro_atualizacao("Erro ao atualizar cadastro", carregar))
+
+        # Botão para salvar alterações
+        ctk.CTkButton(frame, text="Salvar", command=rastreamento.acao_ui("Salvar cadastro", salvar)).pack(pady=10)
+
+        # Busca o cadastro atual (em segundo plano) a cada exibição do formulário
+        def carregar():
+            estado['versao'] = None
+            campos_paciente.limpar()
+            tarefas_tela.executar(repositorio.usuarios().buscar_dados, usuario_logado(),
+                                  ao_concluir=preencher, ao_falhar=erro_banco("Erro ao carregar cadastro"))
+
+        view.ao_exibir = carregar
+
+    def construir_agendamento(view):
+        frame = view.frame
+
+        # Título da seção de agendamento
+        ctk.CTkLabel(frame, text="Agendar Consulta", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        # Variáveis para armazenar os dados do formulário
+        medico_var = ctk.StringVar(value='')
+        data_var = ctk.StringVar()
+        hora_var = ctk.StringVar()
+        observacoes_var = ctk.StringVar()
+
+        # Datas livres do médico selecionado: {data: [horas livres]}
+        estado = {'dias': {}}
+
+        # Exibe os horários livres da data escolhida (já em memória, sem ir ao banco)
+        def mostrar_horarios(*_):
+            horas = [hora[:5] for hora in estado['dias'].get(data_var.get(), [])]
+            menu_horas.configure(values=horas or [''])
+            hora_var.set(horas[0] if horas else '')
+
+        def receber_horarios(resultado):
+            medico, dias = resultado
+            if medico != medico_var.get():
+                return  # O paciente já trocou de médico
+            estado['dias'] = dias
+            datas = list(dias)
+            menu_datas.configure(values=datas or [''])
+            data_var.set(datas[0] if datas else '')
+            rotulo_disponibilidade.configure(text="" if datas else "Sem horários livres nos próximos 30 dias.")
+            mostrar_horarios()
+
+        # Busca as datas e horários livres do médico (índice de disponibilidade em memória)
+        def carregar_horarios(*_):
+            medico = medico_var.get()
+            estado['dias'] = {}
+            data_var.set('')
+            hora_var.set('')
+            if medico:
+                tarefas_tela.executar(lambda: (medico, disponibilidade.agenda().dias_livres(medico)),
+                                      ao_concluir=receber_horarios, ao_falhar=erro_banco("Erro ao carregar horários"))
+
+        # Campo: Busca do médico por nome ou usuário
+        ctk.CTkLabel(frame, text="Selecionar Médico:").pack()
+
+        def escolher_medico(resultado):
+            medico_var.set(resultado[0])
+            carregar_horarios()
+
+        busca_medicos = componentes.CampoBusca(frame, ao_selecionar=escolher_medico, formatar=formatar_medico,
+                                               placeholder="Nome ou usuário do médico")
+        busca_medicos.buscar = pesquisar_usuarios(tarefas_tela, 'Medico', busca_medicos, "Erro ao buscar médicos")
+        busca_medicos.pack(pady=5)
+
+        # Campo: Data da consulta (somente datas com horário livre)
+        ctk.CTkLabel(frame, text="Data:").pack()
+        menu_datas = ctk.CTkOptionMenu(frame, values=[''], variable=data_var, command=mostrar_horarios)
+        menu_datas.pack(pady=5)
+
+        # Campo: Hora da consulta (somente horários livres da data)
+        ctk.CTkLabel(frame, text="Hora:").pack()
+        menu_horas = ctk.CTkOptionMenu(frame, values=[''], variable=hora_var)
+        menu_horas.pack(pady=5)
+        rotulo_disponibilidade = ctk.CTkLabel(frame, text="")
+        rotulo_disponibilidade.pack()
+
+        # Campo: Observações adicionais
+        ctk.CTkLabel(frame, text="Observações:").pack()
+        ctk.CTkEntry(frame, textvariable=observacoes_var).pack(pady=5)
+
+        # Função interna para salvar o agendamento no banco de dados
+        def salvar_agendamento():
+            # Ignora cliques enquanto salva ou enquanto os horários não chegaram
+            if tarefas_tela.ocupado or not (medico_var.get() and data_var.get() and hora_var.get()):
+                return
+
+            # Valores lidos na thread da interface antes de irem para o segundo plano
+            valores = (
+                usuario_logado(),         # Paciente logado
+                medico_var.get(),         # Médico selecionado
+                data_var.get(),           # Data escolhida
+                hora_var.get(),           # Hora escolhida
+                observacoes_var.get()     # Observações da consulta
+            )
+
+            def inserir():
+                # Confere o horário no índice de disponibilidade e grava o agendamento (pela fila de escrita)
+                return servicos.agendar_consulta(*valores)
+
+            def concluir(situacao):
+                # Mensagem de sucesso
+                if situacao == 'pendente':
+                    messagebox.showinfo("Consulta salva", "Consulta salva neste terminal.\n"
+                                        "Ela será gravada no banco assim que a conexão voltar.")
+                else:
+                    messagebox.showinfo("Sucesso", "Consulta agendada com sucesso.")
+                limpar_conteudo()  # Limpa a tela após agendar
+
+            def falhar(err):
+                if isinstance(err, disponibilidade.HorarioIndisponivel):
+                    # Outro paciente reservou o horário: mostra as alternativas e atualiza a lista
+                    alternativas = "\n".join(f"{data} às {hora[:5]}" for data, hora in err.alternativas)
+                    messagebox.showwarning("Horário indisponível",
+                                           f"Este horário acabou de ser reservado.\n\nPróximos horários livres:\n{alternativas}")
+                    carregar_horarios()
+                    return
+                # Exibe erro se houver falha ao salvar
+                erro_escrita("Erro ao agendar consulta")(err)
+
+            tarefas_tela.executar(inserir, ao_concluir=concluir, ao_falhar=falhar)
+
+        # Botão para confirmar agendamento
+        ctk.CTkButton(frame, text="Agendar", command=rastreamento.acao_ui("Agendar", salvar_agendamento)).pack(pady=10)
+
+        # Confere se há médicos quando os cadastros chegam (a busca passa a usar o índice em memória)
+        def montar_formulario(armazem):
+            # Se não houver médicos cadastrados, informa ao usuário
+            if len(armazem) == 0:
+                messagebox.showinfo("Aviso", "Nenhum médico disponível.")
+                limpar_conteudo()
+
+        # A cada exibição os campos são esvaziados e a lista de médicos é atualizada
+        def ao_exibir():
+            for variavel in (medico_var, data_var, hora_var, observacoes_var):
+                variavel.set('')
+            rotulo_disponibilidade.configure(text="")
+            busca_medicos.limpar()
+            # Carrega os cadastros dos médicos para a busca (ou reaproveita os já carregados)
+            carregar_armazem(tarefas_tela, 'Medico', montar_formulario, "Erro ao carregar médicos")
+
+        view.ao_exibir = ao_exibir
+
+    def construir_consultas(view):
+        frame = view.frame
+
+        ctk.CTkLabel(frame, text="Consultas Agendadas", font=ctk.CTkFont(size=18)).pack(pady=10)
+
+        # Primeiro as próximas consultas; o histórico só é buscado quando a rolagem chega ao fim.
+        # O estado é reiniciado a cada exibição (ao_exibir), pois a view é reaproveitada entre logins.
+        estado = {'fase': 'proximas', 'ultima': None, 'paciente': None, 'hoje': None}
+
+        # Busca a próxima página de consultas do paciente logado (em segundo plano)
+        def buscar_pagina(paciente, hoje, fase, ultima):
+            return fase, servicos.pagina_consultas_paciente(paciente, hoje, fase, ultima, TAMANHO_PAGINA_CONSULTAS)
+
+        def receber_pagina(resultado):
+            fase, linhas = resultado
+            itens = list(linhas)
+            ultima_pagina = len(linhas) < TAMANHO_PAGINA_CONSULTAS
+            if fase == 'historico' and linhas and estado['ultima'] is None:
+                itens.insert(0, "Consultas anteriores")  # Separador entre próximas e histórico
+            estado['ultima'] = linhas[-1] if linhas else estado['ultima']
+
+            if fase == 'proximas' and ultima_pagina:
+                # Acabaram as próximas consultas: a próxima carga passa a ser o histórico
+                estado['fase'], estado['ultima'] = 'historico', None
+                lista.adicionar(itens, fim=False)
+                return
+            fim = fase == 'historico' and ultima_pagina
+            lista.adicionar(itens, fim=fim)
+            if fim and len(lista) == 0:
+                messagebox.showinfo("Aviso", "Nenhuma consulta agendada encontrada.")
+
+        def carregar_mais():
+            tarefas_tela.executar(buscar_pagina, estado['paciente'], estado['hoje'], estado['fase'], estado['ultima'],
+                                  ao_concluir=receber_pagina, ao_falhar=erro_banco("Erro ao consultar agendamentos"))
+
+        def formatar(item):
+            if isinstance(item, str):
+                return f"— {item} —"
+            _, medico, data, hora, obs = item
+            return f"Médico: {medico}    Data: {data}    Hora: {repositorio.formatar_hora(hora)}\nObservações: {obs or ''}"
+
+        # Lista virtualizada: só as linhas visíveis viram widgets
+        lista = componentes.ListaVirtual(frame, formatar, carregar_mais=carregar_mais, height=300, width=600)
+        lista.texto_vazio = "Nenhuma consulta agendada encontrada."
+        lista.pack(pady=10, fill='both', expand=True)
+
+        # Recomeça a listagem do início para o paciente logado
+        def ao_exibir():
+            estado.update(fase='proximas', ultima=None, paciente=usuario_logado(), hoje=date.today().isoformat())
+            lista.limpar()
+
+        view.ao_exibir = ao_exibir
+
+    # Histórico clínico do próprio paciente (somente leitura)
+    def construir_historico_paciente(view):
+        construir_historico(view, tarefas_tela, escolher_paciente=False)
+
+    # Dicionário com os botões da interface do paciente
+    botoes = {
+        'Agendar Consulta': lambda: exibir('agendamento', construir_agendamento),
+        'Consultar Agendamento': lambda: exibir('consultas', construir_consultas),
+        'Visualizar Histórico Clínico': lambda: exibir('historico', construir_historico_paciente),
+        'Telemedicina - Consulta Online': lambda: print("Telemedicina..."),
+        'Atualização Cadastral': lambda: exibir('formulario_paciente', construir_formulario_paciente)  # Exibe o formulário de atualização
+    }
+
+    # Cria os botões de menu com suas respectivas ações
+    for texto, comando in botoes.items():
+        ctk.CTkButton(frame_menu, text=texto, command=rastreamento.acao_ui(texto, comando)).pack(pady=10, fill='x')
+
+    # Botão de logout
+    ctk.CTkButton(frame_menu, text="Logout", command=logout).pack(pady=10, fill='x')
+
+    # Cada login começa com o conteúdo vazio; ao sair, as tarefas pendentes são descartadas
+    tela.ao_exibir = limpar_conteudo
+    tela.ao_ocultar = limpar_conteudo
+
+# ---------- Início do sistema ----------
+# A proteção é necessária porque o pool de processos do bcrypt reimporta este módulo
+if __name__ == '__main__':
+    try:
+        iniciar()  # Cria a janela raiz e exibe a primeira tela do sistema
+        raiz.update()  # Desenha a tela inicial antes de conectar ao banco
+
+        # Aplica as migrações pendentes do esquema (índices, novas colunas e tabelas)
+        try:
+            # A migração 4 retira da agenda as reservas duplicadas antigas antes de criar a chave única
+            if 4 in migracoes.aplicar_migracoes():
+                movidas = migracoes.conflitos_movidos()
+                if movidas:
+                    messagebox.showwarning("Atenção", f"{movidas} reserva(s) duplicada(s) de um mesmo horário de médico "
+                                           "foram retiradas da agenda e guardadas na tabela agendamentos_conflitos "
+                                           "para remarcação.")
+        except banco.ERROS_BANCO as err:
+            messagebox.showerror("Erro", f"Erro ao atualizar o esquema do banco:\n{err}")
+
+        # Reenvia ao banco o que ficou no diário local de uma execução anterior
+        fila_escrita.fila().iniciar()
+        vigiar_fila()
+
+        raiz.mainloop()  # Único loop de eventos do sistema
+    finally:
+        fila_escrita.encerrar()
+        tarefas.encerrar()
+        if rastreamento.ARQUIVO_SAIDA:
+            rastreamento.salvar(rastreamento.ARQUIVO_SAIDA)
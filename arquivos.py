@@ -0,0 +1,83 @@
+"""
+Pastas privadas para os arquivos clínicos que o VidaPlus grava em disco
+(anexos do histórico e receitas abertos no visualizador do sistema).
+
+Por padrão as pastas ficam dentro de ~/.cache/vidaplus, do usuário do sistema
+operacional, e não na pasta temporária compartilhada. Antes de cada uso a pasta
+é conferida: precisa ser um diretório de verdade (não um link), pertencer ao
+usuário que roda o sistema e não dar acesso a mais ninguém (modo 0o700). Uma
+pasta que não passa na conferência não é usada (PermissionError), porque quem
+tem acesso a ela poderia trocar um arquivo antes de ele ser exibido.
+
+Arquivos mais antigos que a validade são apagados na primeira vez que a pasta
+é usada em cada processo.
+
+Configuração por variáveis de ambiente:
+- VIDAPLUS_ARQUIVOS_VALIDADE_HORAS  (tempo que um arquivo aberto fica em disco, padrão: 24)
+"""
+import os
+import stat
+import tempfile
+import threading
+import time
+
+PASTA_BASE = os.path.join(os.path.expanduser('~'), '.cache', 'vidaplus')
+VALIDADE_SEGUNDOS = float(os.environ.get('VIDAPLUS_ARQUIVOS_VALIDADE_HORAS', '24')) * 3600
+
+_limpas = set()  # Pastas já limpas neste processo
+_lock = threading.Lock()
+
+
+def pasta_padrao(nome):
+    return os.path.join(PASTA_BASE, nome)
+
+
+# Cria a pasta (0o700) se preciso e confere dono e permissões; PermissionError se ela não é segura
+def pasta_privada(caminho):
+    caminho = os.path.abspath(caminho)
+    os.makedirs(caminho, mode=0o700, exist_ok=True)
+    estado = os.lstat(caminho)
+    if not stat.S_ISDIR(estado.st_mode):
+        raise PermissionError(f"{caminho} não é uma pasta (link ou arquivo); os arquivos clínicos não serão gravados nela.")
+    # No Windows não há dono/modo POSIX: a pasta do perfil já é restrita ao usuário
+    if hasattr(os, 'getuid'):
+        if estado.st_uid != os.getuid():
+            raise PermissionError(f"A pasta {caminho} pertence a outro usuário; os arquivos clínicos não serão gravados nela.")
+        if stat.S_IMODE(estado.st_mode) & 0o077:
+            raise PermissionError(f"A pasta {caminho} é acessível a outros usuários (modo "
+                                  f"{stat.S_IMODE(estado.st_mode):o}); restrinja-a com chmod 700.")
+    with _lock:
+        limpar = caminho not in _limpas
+        _limpas.add(caminho)
+    if limpar:
+        remover_antigos(caminho)
+    return caminho
+
+
+def remover_antigos(pasta, validade=None):
+    limite = time.time() - (VALIDADE_SEGUNDOS if validade is None else validade)
+    removidos = 0
+    with os.scandir(pasta) as entradas:
+        for entrada in entradas:
+            try:
+                if entrada.is_file(follow_symlinks=False) and entrada.stat(follow_symlinks=False).st_mtime < limite:
+                    os.remove(entrada.path)
+                    removidos += 1
+            except OSError:
+                pass  # Aberto no visualizador (Windows) ou já removido por outro processo
+    return removidos
+
+
+# Grava `conteudo` em `caminho` por um arquivo temporário renomeado: um arquivo pela metade nunca
+# aparece com o nome final
+def gravar(caminho, conteudo):
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), prefix='.parcial-')
+    try:
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return caminho
@@ -0,0 +1,517 @@
+"""
+Acesso ao banco de dados do sistema VidaPlus.
+
+Em vez de cada ação da interface abrir e fechar a própria conexão (pagando o
+handshake TCP e a autenticação a cada clique), as conexões MySQL ficam guardadas
+em um pool de tamanho configurável e são reaproveitadas entre as telas.
+
+Para rodar a interface, benchmarks e testes de carga sem servidor MySQL, existe
+também um backend SQLite embutido que cria o esquema a partir de "BD VidaPlus.sql".
+O SQL dos repositórios é escrito com marcadores %s e o backend SQLite o adapta.
+
+Configuração por variáveis de ambiente:
+- VIDAPLUS_BANCO                 ('mysql' ou 'sqlite', padrão: mysql)
+- VIDAPLUS_SQLITE_CAMINHO        (arquivo do banco SQLite, padrão: vidaplus.db; aceita ':memory:')
+- VIDAPLUS_DB_HOST, VIDAPLUS_DB_USUARIO, VIDAPLUS_DB_SENHA, VIDAPLUS_DB_NOME
+- VIDAPLUS_POOL_TAMANHO          (padrão: 5 conexões)
+- VIDAPLUS_POOL_ESPERA           (segundos aguardando uma conexão livre, padrão: 10)
+- VIDAPLUS_POOL_VERIFICACAO      (segundos ociosos antes de testar a conexão com ping, padrão: 30)
+"""
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import rastreamento
+
+# O driver MySQL só é importado quando um backend MySQL é criado (carregar_driver_mysql):
+# ele pesa na abertura do sistema e não é usado com o backend SQLite
+mysql = None
+errors = None
+
+# Dados de conexão (os padrões mantêm o ambiente de desenvolvimento original)
+CONFIG_BANCO = {
+    'host': os.environ.get('VIDAPLUS_DB_HOST', 'localhost'),
+    'user': os.environ.get('VIDAPLUS_DB_USUARIO', 'root'),
+    'password': os.environ.get('VIDAPLUS_DB_SENHA', '890866'),  # Substituir por senha segura em produção
+    'database': os.environ.get('VIDAPLUS_DB_NOME', 'vidaplus'),
+}
+
+TAMANHO_POOL = int(os.environ.get('VIDAPLUS_POOL_TAMANHO', '5'))
+TEMPO_ESPERA = float(os.environ.get('VIDAPLUS_POOL_ESPERA', '10'))
+INTERVALO_VERIFICACAO = float(os.environ.get('VIDAPLUS_POOL_VERIFICACAO', '30'))
+
+TIPO_BANCO = os.environ.get('VIDAPLUS_BANCO', 'mysql').lower()
+CAMINHO_SQLITE = os.environ.get('VIDAPLUS_SQLITE_CAMINHO', 'vidaplus.db')
+ARQUIVO_ESQUEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'BD VidaPlus.sql')
+
+# Exceções de banco tratadas pela interface, independentemente do driver em uso
+# (o erro do MySQL entra na tupla quando o driver é carregado)
+ERROS_BANCO = (sqlite3.Error,)
+_driver_lock = threading.Lock()
+
+
+def carregar_driver_mysql():
+    global mysql, errors, ERROS_BANCO
+    with _driver_lock:
+        if mysql is None:
+            try:
+                import mysql.connector
+                from mysql.connector import errors
+            except ImportError:
+                raise RuntimeError("Driver mysql-connector-python não instalado; use VIDAPLUS_BANCO=sqlite.") from None
+            ERROS_BANCO = (sqlite3.Error, mysql.connector.Error)
+    return mysql.connector
+
+
+# ---------- Pool de conexões ----------
+class PoolConexoes:
+    def __init__(self, config=None, tamanho=TAMANHO_POOL, tempo_espera=TEMPO_ESPERA,
+                 intervalo_verificacao=INTERVALO_VERIFICACAO):
+        carregar_driver_mysql()
+        self.config = dict(config or CONFIG_BANCO)
+        self.tamanho = tamanho
+        self.tempo_espera = tempo_espera
+        self.intervalo_verificacao = intervalo_verificacao
+
+        # Conexões livres no formato (conexao, instante_da_devolucao); LIFO mantém as mais "quentes" em uso
+        self._livres = queue.LifoQueue()
+        self._criadas = 0
+        self._lock = threading.Lock()
+        self._contadores = {
+            'acertos': 0,          # Checkouts atendidos por uma conexão já aberta
+            'falhas': 0,           # Checkouts que precisaram abrir uma conexão nova
+            'esperas': 0,          # Checkouts que aguardaram o pool esgotado
+            'tempo_espera_total': 0.0,
+            'tempo_espera_max': 0.0,
+            'reconexoes': 0,       # Conexões velhas substituídas após falhar no ping
+            'descartadas': 0,      # Conexões fechadas por erro durante o uso
+        }
+
+    def _contar(self, chave, valor=1):
+        with self._lock:
+            self._contadores[chave] += valor
+
+    def _nova_conexao(self):
+        with rastreamento.medir('conexao', 'abrir'):
+            return mysql.connector.connect(**self.config)
+
+    def _abrir_reservada(self):
+        # Abre uma conexão para uma vaga já reservada em self._criadas
+        try:
+            return self._nova_conexao()
+        except Exception:
+            with self._lock:
+                self._criadas -= 1
+            raise
+
+    def _validar(self, conexao, devolvida_em):
+        # Conexões usadas há pouco tempo são reaproveitadas sem ida ao servidor;
+        # as que ficaram ociosas passam por um ping antes de voltar ao uso
+        if time.monotonic() - devolvida_em < self.intervalo_verificacao:
+            return conexao
+        try:
+            conexao.ping(reconnect=False)
+            return conexao
+        except mysql.connector.Error:
+            self._fechar(conexao)
+            self._contar('reconexoes')
+            return self._nova_conexao()
+
+    def _fechar(self, conexao):
+        try:
+            conexao.close()
+        except Exception:
+            pass
+
+    def obter(self):
+        with rastreamento.medir('conexao', 'obter'):
+            return self._obter()
+
+    def _obter(self):
+        # Caminho rápido: existe conexão livre
+        try:
+            conexao, devolvida_em = self._livres.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            self._contar('acertos')
+            return self._validar_ou_liberar(conexao, devolvida_em)
+
+        # Ainda há vaga no pool: abre uma conexão nova
+        with self._lock:
+            pode_criar = self._criadas < self.tamanho
+            if pode_criar:
+                self._criadas += 1
+                self._contadores['falhas'] += 1
+        if pode_criar:
+            return self._abrir_reservada()
+
+        # Pool esgotado: aguarda alguma conexão ser devolvida
+        inicio = time.perf_counter()
+        try:
+            conexao, devolvida_em = self._livres.get(timeout=self.tempo_espera)
+        except queue.Empty:
+            raise errors.PoolError(
+                f"Nenhuma conexão livre após {self.tempo_espera:.0f}s (pool com {self.tamanho} conexões)."
+            )
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._lock:
+                self._contadores['esperas'] += 1
+                self._contadores['tempo_espera_total'] += espera
+                self._contadores['tempo_espera_max'] = max(self._contadores['tempo_espera_max'], espera)
+        return self._validar_ou_liberar(conexao, devolvida_em)
+
+    def _validar_ou_liberar(self, conexao, devolvida_em):
+        try:
+            return self._validar(conexao, devolvida_em)
+        except Exception:
+            # Não foi possível reconectar: libera a vaga para a próxima tentativa
+            with self._lock:
+                self._criadas -= 1
+            raise
+
+    def devolver(self, conexao):
+        try:
+            # Descarta qualquer transação deixada aberta antes de reaproveitar a conexão
+            if conexao.in_transaction:
+                conexao.rollback()
+        except Exception:
+            self.descartar(conexao)
+            return
+        self._livres.put((conexao, time.monotonic()))
+
+    def descartar(self, conexao):
+        self._fechar(conexao)
+        with self._lock:
+            self._criadas -= 1
+            self._contadores['descartadas'] += 1
+
+    @contextmanager
+    def conexao(self):
+        conexao = self.obter()
+        try:
+            yield conexao
+        except mysql.connector.Error as err:
+            # Erros de comunicação invalidam a conexão; erros de SQL não
+            if isinstance(err, (errors.InterfaceError, errors.OperationalError)):
+                self.descartar(conexao)
+            else:
+                self.devolver(conexao)
+            raise
+        except BaseException:
+            self.devolver(conexao)
+            raise
+        else:
+            self.devolver(conexao)
+
+    @contextmanager
+    def cursor(self, commit=False):
+        with self.conexao() as conexao:
+            cursor = _CursorMedido(conexao.cursor())
+            try:
+                yield cursor
+                if commit:
+                    with rastreamento.medir('sql', 'COMMIT'):
+                        conexao.commit()
+            finally:
+                cursor.close()
+
+    def estatisticas(self):
+        with self._lock:
+            dados = dict(self._contadores)
+            dados['abertas'] = self._criadas
+        checkouts = dados['acertos'] + dados['falhas'] + dados['esperas']
+        dados['livres'] = self._livres.qsize()
+        dados['em_uso'] = dados['abertas'] - dados['livres']
+        dados['tamanho'] = self.tamanho
+        dados['taxa_acerto'] = (dados['acertos'] + dados['esperas']) / checkouts if checkouts else 0.0
+        dados['tempo_espera_medio'] = dados['tempo_espera_total'] / dados['esperas'] if dados['esperas'] else 0.0
+        return dados
+
+    def fechar_todas(self):
+        while True:
+            try:
+                conexao, _ = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            self._fechar(conexao)
+            with self._lock:
+                self._criadas -= 1
+
+
+# Cursor do driver com cada comando medido (rastreamento) pelo texto normalizado do SQL
+class _CursorMedido:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, parametros=()):
+        with rastreamento.medir('sql', rastreamento.normalizar_sql(sql)):
+            return self._cursor.execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        with rastreamento.medir('sql', rastreamento.normalizar_sql(sql)):
+            return self._cursor.executemany(sql, sequencia)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+# ---------- Backend MySQL ----------
+class BackendMySQL:
+    dialeto = 'mysql'
+
+    def __init__(self, pool=None):
+        self.pool = pool or PoolConexoes()
+
+    def conexao(self):
+        return self.pool.conexao()
+
+    def cursor(self, commit=False):
+        return self.pool.cursor(commit=commit)
+
+    @contextmanager
+    def cursor_fluxo(self):
+        # Cursor sem buffer: o servidor envia as linhas conforme são lidas, com memória constante no
+        # cliente. Se a leitura parar no meio, a conexão ainda tem linhas a receber e é descartada.
+        conexao = self.pool.obter()
+        cursor = conexao.cursor(buffered=False)
+        try:
+            yield _CursorMedido(cursor)
+        except BaseException:
+            self.pool.descartar(conexao)
+            raise
+        try:
+            cursor.close()
+        except mysql.connector.Error:
+            self.pool.descartar(conexao)
+            raise
+        self.pool.devolver(conexao)
+
+    def eh_duplicado(self, err):
+        # 1062 = ER_DUP_ENTRY (violação de chave única)
+        return isinstance(err, errors.IntegrityError) and err.errno == 1062
+
+    def eh_transitorio(self, err):
+        # Falhas de conexão/servidor que passam sozinhas (vale tentar de novo mais tarde)
+        return isinstance(err, (errors.InterfaceError, errors.OperationalError, errors.PoolError))
+
+    def estatisticas(self):
+        return self.pool.estatisticas()
+
+    def fechar(self):
+        self.pool.fechar_todas()
+
+
+# ---------- Backend SQLite ----------
+@lru_cache(maxsize=256)
+def _adaptar_sql(sql):
+    # Converte os marcadores do MySQL (%s) para os do SQLite (?)
+    return sql.replace('%s', '?')
+
+
+def esquema_sqlite(caminho_script=ARQUIVO_ESQUEMA):
+    # Lê o script MySQL do projeto e traduz as instruções CREATE TABLE para SQLite
+    with open(caminho_script, encoding='utf-8') as arquivo:
+        texto = re.sub(r'--[^\n]*', '', arquivo.read())
+
+    comandos = []
+    for comando in texto.split(';'):
+        comando = comando.strip()
+        if not comando.upper().startswith('CREATE TABLE'):
+            continue  # Ignora USE, SELECT e afins
+        comando = re.sub(r'(?i)^CREATE TABLE\s+(?!IF NOT EXISTS)', 'CREATE TABLE IF NOT EXISTS ', comando)
+        comando = re.sub(r'(?i)\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT', comando)
+        comando = re.sub(r'(?i)(\w+)\s+ENUM\s*\(([^)]*)\)', r'\1 TEXT CHECK (\1 IN (\2))', comando)
+        comandos.append(comando)
+    return comandos
+
+
+class _CursorSQLite:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, parametros=()):
+        with rastreamento.medir('sql', rastreamento.normalizar_sql(sql)):
+            self._cursor.execute(_adaptar_sql(sql), parametros)
+        return self
+
+    def executemany(self, sql, sequencia):
+        with rastreamento.medir('sql', rastreamento.normalizar_sql(sql)):
+            self._cursor.executemany(_adaptar_sql(sql), sequencia)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, tamanho=None):
+        return self._cursor.fetchmany(tamanho or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class _ConexaoSQLite:
+    def __init__(self, conexao):
+        self._conexao = conexao
+
+    def cursor(self):
+        return _CursorSQLite(self._conexao.cursor())
+
+    @property
+    def in_transaction(self):
+        return self._conexao.in_transaction
+
+    def commit(self):
+        with rastreamento.medir('sql', 'COMMIT'):
+            self._conexao.commit()
+
+    def rollback(self):
+        self._conexao.rollback()
+
+
+class BackendSQLite:
+    dialeto = 'sqlite'
+
+    def __init__(self, caminho=CAMINHO_SQLITE, script_esquema=ARQUIVO_ESQUEMA):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._abertas = []
+        self._lock = threading.Lock()
+        # Bancos em memória são compartilhados entre threads via cache compartilhado;
+        # a conexão "âncora" mantém o banco vivo enquanto o backend existir
+        if caminho == ':memory:':
+            self._alvo, self._uri = f'file:vidaplus_{id(self)}?mode=memory&cache=shared', True
+        else:
+            self._alvo, self._uri = caminho, False
+        self._ancora = self._conectar()
+        for comando in esquema_sqlite(script_esquema):
+            self._ancora.execute(comando)
+        self._ancora.commit()
+
+    @rastreamento.rastrear('conexao', 'abrir')
+    def _conectar(self):
+        conexao = sqlite3.connect(self._alvo, uri=self._uri, timeout=30, check_same_thread=False)
+        conexao.execute('PRAGMA foreign_keys = ON')
+        if not self._uri:
+            conexao.execute('PRAGMA journal_mode = WAL')
+            conexao.execute('PRAGMA synchronous = NORMAL')
+        with self._lock:
+            self._abertas.append(conexao)
+        return conexao
+
+    @contextmanager
+    def conexao(self):
+        # Uma conexão por thread, reaproveitada entre as chamadas
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = self._local.conexao = self._conectar()
+        try:
+            yield _ConexaoSQLite(conexao)
+        finally:
+            if conexao.in_transaction:
+                conexao.rollback()
+
+    @contextmanager
+    def cursor(self, commit=False):
+        with self.conexao() as conexao:
+            cursor = conexao.cursor()
+            try:
+                yield cursor
+                if commit:
+                    conexao.commit()
+            finally:
+                cursor.close()
+
+    def cursor_fluxo(self):
+        # O cursor do sqlite3 já lê as linhas do arquivo sob demanda
+        return self.cursor()
+
+    def eh_duplicado(self, err):
+        return isinstance(err, sqlite3.IntegrityError) and 'UNIQUE constraint failed' in str(err)
+
+    def eh_transitorio(self, err):
+        # Banco travado por outra conexão, arquivo inacessível e afins
+        return isinstance(err, sqlite3.OperationalError)
+
+    def estatisticas(self):
+        with self._lock:
+            return {'conexoes_abertas': len(self._abertas)}
+
+    def fechar(self):
+        with self._lock:
+            abertas, self._abertas = self._abertas, []
+        for conexao in abertas:
+            conexao.close()
+        self._local = threading.local()
+
+
+# ---------- Backend global do módulo ----------
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def criar_backend(tipo=TIPO_BANCO):
+    if tipo == 'sqlite':
+        return BackendSQLite()
+    if tipo == 'mysql':
+        carregar_driver_mysql()
+        return BackendMySQL()
+    raise ValueError(f"Tipo de banco desconhecido: {tipo!r} (use 'mysql' ou 'sqlite').")
+
+
+def obter_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = criar_backend()
+    return _backend
+
+
+def definir_backend(backend):
+    # Troca o backend padrão (usado por benchmarks e testes de carga)
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+
+def conexao():
+    # Uso: with banco.conexao() as con: ...
+    return obter_backend().conexao()
+
+
+def cursor(commit=False):
+    # Uso: with banco.cursor(commit=True) as cur: cur.execute(...)
+    return obter_backend().cursor(commit=commit)
+
+
+def estatisticas_pool():
+    return obter_backend().estatisticas()
@@ -0,0 +1,6 @@
+"""
+Scripts de carga e desempenho do VidaPlus.
+
+Rodam a partir da raiz do projeto como módulos, por exemplo:
+    python -m benchmarks.concorrencia_reservas
+"""
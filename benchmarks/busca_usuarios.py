@@ -0,0 +1,80 @@
+"""
+Tempo de resposta da busca de usuários por prefixo (busca.py).
+
+Monta o índice com cadastros sintéticos e mede a busca de termos curtos (o pior
+caso: muitos candidatos) e longos, como na caixa de busca das telas. A meta é
+responder em menos de LIMITE_MS mesmo com dezenas de milhares de pacientes.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.busca_usuarios
+    python -m benchmarks.busca_usuarios --cadastros 100000 --buscas 5000
+
+Sai com código 1 se o p99 da busca passar de LIMITE_MS.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+
+import busca
+
+LIMITE_MS = 50
+PRENOMES = ('Ana', 'João', 'José', 'Maria', 'Pedro', 'Paula', 'Lucas', 'Carla', 'Fernanda', 'Antônio')
+SOBRENOMES = ('Silva', 'Souza', 'Oliveira', 'Santos', 'Pereira', 'Lima', 'Costa', 'Rodrigues', 'Almeida')
+
+
+def gerar_cadastros(quantidade, semente=None):
+    aleatorio = random.Random(semente)
+    for i in range(quantidade):
+        nome = ' '.join([aleatorio.choice(PRENOMES)] + aleatorio.sample(SOBRENOMES, 2))
+        cpf = f"{aleatorio.randrange(10 ** 11):011d}"
+        yield f"usuario{i}", nome, f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+
+
+def executar(cadastros=20000, buscas=2000, semente=None):
+    entradas = list(gerar_cadastros(cadastros, semente))
+    inicio = time.perf_counter()
+    indice = busca.IndicePrefixos(entradas)
+    montagem = time.perf_counter() - inicio
+
+    aleatorio = random.Random(semente)
+    tempos = []
+    for _ in range(buscas):
+        usuario, nome, cpf = aleatorio.choice(entradas)
+        termo = aleatorio.choice((nome, nome.split()[-1], usuario, cpf))[:aleatorio.randint(1, 8)]
+        inicio = time.perf_counter()
+        indice.buscar(termo)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+
+    percentis = statistics.quantiles(tempos, n=100)
+    return {
+        'cadastros': cadastros,
+        'buscas': buscas,
+        'montagem_s': montagem,
+        'p50_ms': percentis[49],
+        'p99_ms': percentis[98],
+        'maximo_ms': max(tempos),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo de resposta da busca de usuários por prefixo")
+    parser.add_argument('--cadastros', type=int, default=20000, help="cadastros no índice (padrão: 20000)")
+    parser.add_argument('--buscas', type=int, default=2000, help="buscas medidas (padrão: 2000)")
+    parser.add_argument('--semente', type=int, help="semente aleatória para repetir a medição")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args.cadastros, args.buscas, args.semente)
+    for chave, valor in resultado.items():
+        print(f"{chave:>12}: {valor:.3f}" if isinstance(valor, float) else f"{chave:>12}: {valor}")
+
+    if resultado['p99_ms'] > LIMITE_MS:
+        print(f"[FALHA] p99 acima de {LIMITE_MS} ms")
+        return 1
+    print(f"OK: p99 abaixo de {LIMITE_MS} ms.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Teste de concorrência das reservas de horário do VidaPlus.
+
+Simula vários balcões de recepção disputando os mesmos horários de um médico ao
+mesmo tempo, pelo mesmo caminho da tela: servicos.agendar_consulta, que confere
+o índice de disponibilidade e grava pela fila de escrita (diário local, reenvio
+em lote com SAVEPOINT por gravação e recusa da chave duplicada como
+HorarioIndisponivel).
+
+Cada balcão é um processo, como um terminal de verdade: tem a própria
+conexão com o banco, o próprio diário da fila (FilaEscrita) e o próprio índice,
+carregado antes da disputa. Todos acreditam que os horários estão livres e a
+única proteção entre balcões é a chave única do banco. Dentro de um balcão,
+várias threads agendam ao mesmo tempo. Ao final confere que nenhum horário foi
+reservado duas vezes e que cada horário disputado tem exatamente uma reserva.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.concorrencia_reservas
+    python -m benchmarks.concorrencia_reservas --tentativas 1000 --threads 64
+    python -m benchmarks.concorrencia_reservas --banco mysql   (usa VIDAPLUS_DB_*; remove os dados criados)
+
+Sai com código 1 se encontrar reserva duplicada.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import banco
+import disponibilidade
+import migracoes
+import repositorio
+
+SQL_DUPLICADAS = """
+    SELECT medico_usuario, data_consulta, hora_consulta, COUNT(*)
+    FROM agendamentos
+    WHERE medico_usuario = %s
+    GROUP BY medico_usuario, data_consulta, hora_consulta
+    HAVING COUNT(*) > 1
+"""
+
+SQL_CONTAR_RESERVAS = "SELECT COUNT(*) FROM agendamentos WHERE medico_usuario = %s"
+
+ESPERA_DRENAGEM = 60  # Segundos para cada balcão esvaziar a fila depois da disputa
+
+
+def criar_backend(tipo, diretorio):
+    if tipo == 'mysql':
+        return banco.criar_backend('mysql')
+    return banco.BackendSQLite(os.path.join(diretorio, 'concorrencia.db'))
+
+
+def proximo_dia_util(inicio):
+    dia = inicio + timedelta(days=1)
+    while dia.weekday() >= 5:
+        dia += timedelta(days=1)
+    return dia
+
+
+# ---------- Balcão (um processo por balcão) ----------
+def balcao(numero, tipo, diretorio, medico, dia, pedidos, threads, largada, saida):
+    # Importados aqui: o processo do balcão monta o próprio backend e a própria fila antes de usá-los
+    import fila_escrita
+    import servicos
+
+    backend = banco.definir_backend(criar_backend(tipo, diretorio))
+    fila = fila_escrita.definir_fila(fila_escrita.FilaEscrita(os.path.join(diretorio, f'fila-balcao{numero}.db')))
+    disponibilidade.agenda().horarios_livres(medico, dia)  # Índice carregado antes da disputa: tudo livre
+    resultados = {'reservadas': 0, 'pendentes': 0, 'conflitos': 0, 'erros': 0}
+
+    def agendar(pedido):
+        paciente, hora = pedido
+        try:
+            situacao = servicos.agendar_consulta(paciente, medico, dia, hora, 'teste de concorrência')
+            return 'reservadas' if situacao == 'aplicada' else 'pendentes'
+        except disponibilidade.HorarioIndisponivel:
+            return 'conflitos'
+        except (fila_escrita.EscritaRecusada, *banco.ERROS_BANCO) as err:
+            print(f"Balcão {numero}: erro inesperado: {err}", file=sys.stderr)
+            return 'erros'
+
+    try:
+        largada.wait()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for chave in executor.map(agendar, pedidos):
+                resultados[chave] += 1
+        # Gravações que passaram da espera de aguardar(): o resultado chega pelo reenvio da fila
+        resultados['sem_reenvio'] = fila.drenar(ESPERA_DRENAGEM)
+        for recusa in fila.recusas_nao_vistas():
+            resultados['pendentes'] -= 1
+            resultados['conflitos' if recusa.duplicada else 'erros'] += 1
+        resultados['reservadas'] += resultados.pop('pendentes')
+        # Recusadas pela chave única no banco (e não pelo índice do balcão): a disputa entre balcões
+        metricas = fila.metricas()
+        resultados['lotes'], resultados['recusadas_pelo_banco'] = metricas['lotes'], metricas['recusadas']
+    finally:
+        fila_escrita.encerrar()
+        backend.fechar()
+    saida.put(resultados)
+
+
+def executar(tipo='sqlite', tentativas=500, threads=32, balcoes=8, semente=None):
+    diretorio = tempfile.mkdtemp(prefix='vidaplus_concorrencia_')
+    backend = banco.definir_backend(criar_backend(tipo, diretorio))
+    migracoes.aplicar_migracoes(backend)
+
+    sufixo = uuid.uuid4().hex[:8]
+    medico = f'medico_{sufixo}'
+    pacientes = [f'paciente_{sufixo}_{i}' for i in range(threads)]
+    usuarios = repositorio.RepositorioUsuarios(backend)
+    usuarios.inserir_lote([(f'Médico {sufixo}', f'm{sufixo}', None, None, medico, 'x', 'Medico')] +
+                          [(f'Paciente {i}', f'p{sufixo}{i}', None, None, paciente, 'x', 'Paciente')
+                           for i, paciente in enumerate(pacientes)])
+
+    # Todos os horários de um dia útil do médico, disputados pelos balcões
+    dia = proximo_dia_util(date.today())
+    horarios = disponibilidade.AgendaDisponibilidade(repositorio.RepositorioAgendamentos(backend)).horarios_livres(
+        medico, dia)
+
+    gerador = random.Random(semente)
+    pedidos = [[] for _ in range(balcoes)]
+    for _ in range(tentativas):
+        pedidos[gerador.randrange(balcoes)].append((gerador.choice(pacientes), gerador.choice(horarios)))
+    threads_balcao = max(1, threads // balcoes)
+
+    # spawn: cada balcão começa sem nada herdado deste processo (conexões, fila, índice)
+    contexto = multiprocessing.get_context('spawn')
+    largada = contexto.Barrier(balcoes + 1)
+    saida = contexto.Queue()
+    processos = [contexto.Process(target=balcao, args=(numero, tipo, diretorio, medico, dia, lista,
+                                                       threads_balcao, largada, saida))
+                 for numero, lista in enumerate(pedidos)]
+    for processo in processos:
+        processo.start()
+    largada.wait()  # Todos os balcões prontos: a medição começa junto com a disputa
+    inicio = time.perf_counter()
+    resultados = {'reservadas': 0, 'conflitos': 0, 'erros': 0, 'sem_reenvio': 0, 'lotes': 0,
+                  'recusadas_pelo_banco': 0}
+    for _ in processos:
+        for chave, valor in saida.get().items():
+            resultados[chave] += valor
+    segundos = time.perf_counter() - inicio
+    for processo in processos:
+        processo.join()
+
+    with backend.cursor() as cursor:
+        cursor.execute(SQL_DUPLICADAS, (medico,))
+        duplicadas = cursor.fetchall()
+        cursor.execute(SQL_CONTAR_RESERVAS, (medico,))
+        gravadas = cursor.fetchone()[0]
+
+    disputados = len({hora for lista in pedidos for _, hora in lista})
+    if tipo == 'mysql':
+        limpar_mysql(backend, medico, pacientes)
+    backend.fechar()
+    shutil.rmtree(diretorio, ignore_errors=True)
+
+    return {
+        'banco': tipo,
+        'tentativas': tentativas,
+        'threads': threads_balcao * balcoes,
+        'balcoes': balcoes,
+        'horarios_disputados': disputados,
+        'reservas_gravadas': gravadas,
+        'duplicadas': len(duplicadas),
+        'segundos': segundos,
+        'reservas_por_segundo': tentativas / segundos if segundos else 0.0,
+        **resultados,
+    }
+
+
+def limpar_mysql(backend, medico, pacientes):
+    with backend.cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM agendamentos WHERE medico_usuario = %s", (medico,))
+        cursor.executemany("DELETE FROM usuarios WHERE usuario = %s", [(usuario,) for usuario in [medico] + pacientes])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de concorrência das reservas de horário")
+    parser.add_argument('--banco', choices=('sqlite', 'mysql'), default='sqlite')
+    parser.add_argument('--tentativas', type=int, default=500, help="reservas disparadas (padrão: 500)")
+    parser.add_argument('--threads', type=int, default=32,
+                        help="reservas simultâneas, divididas entre os balcões (padrão: 32)")
+    parser.add_argument('--balcoes', type=int, default=8,
+                        help="balcões (processos com fila e índice próprios, padrão: 8)")
+    parser.add_argument('--semente', type=int, help="semente aleatória para repetir a mesma disputa")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args.banco, args.tentativas, args.threads, args.balcoes, args.semente)
+    for chave, valor in resultado.items():
+        print(f"{chave:>22}: {valor:.2f}" if isinstance(valor, float) else f"{chave:>22}: {valor}")
+
+    falhas = []
+    if resultado['duplicadas']:
+        falhas.append(f"{resultado['duplicadas']} horário(s) reservado(s) mais de uma vez")
+    if resultado['reservas_gravadas'] != resultado['horarios_disputados']:
+        falhas.append("número de reservas gravadas diferente do número de horários disputados")
+    if resultado['reservas_gravadas'] != resultado['reservadas']:
+        falhas.append("reservas confirmadas aos balcões diferente das gravadas no banco")
+    if resultado['sem_reenvio']:
+        falhas.append(f"{resultado['sem_reenvio']} gravação(ões) ainda na fila ao fim da espera")
+    if resultado['reservadas'] + resultado['conflitos'] != resultado['tentativas']:
+        falhas.append(f"{resultado['erros']} tentativa(s) terminaram em erro inesperado")
+    for falha in falhas:
+        print(f"[FALHA] {falha}")
+    if not falhas:
+        print("OK: nenhuma reserva duplicada.")
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
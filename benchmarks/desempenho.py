@@ -0,0 +1,342 @@
+"""
+Benchmark dos caminhos principais do VidaPlus, sem interface gráfica.
+
+Cria um banco SQLite semeado com médicos, pacientes e N agendamentos e mede,
+pelas mesmas funções que as telas chamam (servicos.py), os cenários:
+    login               servicos.autenticar_usuario (consulta + bcrypt)
+    cadastro            servicos.cadastrar_usuario (bcrypt + fila de escrita + INSERT)
+    agendamento         servicos.agendar_consulta (índice de disponibilidade + fila de escrita + INSERT)
+    consultas_paciente  primeira página das próximas consultas e do histórico do paciente
+    agenda_medico       semana da agenda do médico
+
+Para cada cenário são gravados p50/p95/p99, média e máximo (ms) e a vazão
+(operações por segundo) em um arquivo JSON, para comparar versões entre si.
+Com --comparar, as diferenças em relação a um resultado anterior são impressas
+e o script sai com código 1 se algum p95 piorar mais que a tolerância.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.desempenho                          1k, 100k e 1M agendamentos
+    python -m benchmarks.desempenho --tamanhos 1k 100k --saida atual.json
+    python -m benchmarks.desempenho --comparar anterior.json --tolerancia 0.2
+    python -m benchmarks.desempenho --diretorio /tmp/bases   reaproveita as bases já semeadas
+
+A semeadura de 1M de agendamentos leva alguns minutos; com --diretorio ela só é feita uma vez.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import banco
+import disponibilidade
+import fila_escrita
+import migracoes
+import repositorio
+import senhas
+import servicos
+import tarefas
+
+TAMANHOS_PADRAO = ('1k', '100k', '1M')
+SENHA = 'senha-benchmark'
+OBSERVACAO = 'benchmark'           # Observação das consultas marcadas pelo cenário de agendamento
+PREFIXO_CADASTRO = 'benchmark_'    # Usuários criados pelo cenário de cadastro
+LOTE_SEMEADURA = 10000
+# Horários de um dia útil no expediente padrão (08:00-12:00 e 13:00-17:00, de 30 em 30 minutos)
+HORARIOS = [disponibilidade.hora_texto(inicio)
+            for bloco_inicio, bloco_fim, duracao in disponibilidade.EXPEDIENTE_PADRAO[0]
+            for inicio in range(bloco_inicio, bloco_fim, duracao)]
+
+
+def interpretar_tamanho(texto):
+    multiplicadores = {'k': 1000, 'm': 1000000}
+    texto = texto.strip().lower()
+    if texto[-1:] in multiplicadores:
+        return int(float(texto[:-1]) * multiplicadores[texto[-1]])
+    return int(texto)
+
+
+def rotulo_tamanho(quantidade):
+    for sufixo, valor in (('M', 1000000), ('k', 1000)):
+        if quantidade >= valor and quantidade % valor == 0:
+            return f"{quantidade // valor}{sufixo}"
+    return str(quantidade)
+
+
+# ---------- Semeadura ----------
+def dimensoes(agendamentos):
+    # Médicos e pacientes proporcionais ao volume de agendamentos
+    medicos = min(200, max(5, agendamentos // 5000))
+    pacientes = min(100000, max(50, agendamentos // 10))
+    return medicos, pacientes
+
+
+def dias_uteis(inicio, quantidade):
+    dia = inicio
+    while quantidade:
+        if dia.weekday() < 5:
+            yield dia
+            quantidade -= 1
+        dia += timedelta(days=1)
+
+
+def semear(backend, agendamentos, semente):
+    aleatorio = random.Random(semente)
+    medicos, pacientes = dimensoes(agendamentos)
+    # Um único hash para todos os cadastros: criptografar milhares de senhas só atrasaria a semeadura
+    senha_hash = senhas.gerar_hash_senha(SENHA)
+    usuarios = repositorio.RepositorioUsuarios(backend)
+    usuarios.inserir_lote([(f'Médico {i}', f'{i:011d}', None, None, f'medico{i}', senha_hash, 'Medico')
+                           for i in range(medicos)])
+    for inicio in range(0, pacientes, LOTE_SEMEADURA):
+        usuarios.inserir_lote([(f'Paciente {i}', f'{medicos + i:011d}', None, None, f'paciente{i}', senha_hash, 'Paciente')
+                               for i in range(inicio, min(pacientes, inicio + LOTE_SEMEADURA))])
+
+    # Agenda lotada em dias úteis consecutivos, com cerca de 70% dos dias no passado
+    # (histórico) e o restante no futuro (próximas consultas)
+    total_dias = math.ceil(agendamentos / (medicos * len(HORARIOS)))
+    primeiro_dia = date.today() - timedelta(days=int(total_dias * 0.7 * 7 / 5))
+
+    def linhas():
+        gerados = 0
+        for dia in dias_uteis(primeiro_dia, total_dias):
+            for medico in range(medicos):
+                for hora in HORARIOS:
+                    if gerados == agendamentos:
+                        return
+                    yield (f'paciente{aleatorio.randrange(pacientes)}', f'medico{medico}', dia.isoformat(), hora, None)
+                    gerados += 1
+
+    lote = []
+    with backend.cursor(commit=True) as cursor:
+        for linha in linhas():
+            lote.append(linha)
+            if len(lote) == LOTE_SEMEADURA:
+                cursor.executemany(repositorio.SQL_INSERIR_AGENDAMENTO, lote)
+                lote = []
+        if lote:
+            cursor.executemany(repositorio.SQL_INSERIR_AGENDAMENTO, lote)
+    return {'medicos': medicos, 'pacientes': pacientes, 'ultimo_dia': max(dias_uteis(primeiro_dia, total_dias))}
+
+
+def abrir_base(agendamentos, diretorio, semente):
+    # Reaproveita uma base semeada antes (mesmo tamanho) quando ela existe no diretório
+    caminho = os.path.join(diretorio, f'vidaplus_{rotulo_tamanho(agendamentos)}.db')
+    existia = os.path.exists(caminho)
+    backend = banco.definir_backend(banco.BackendSQLite(caminho))
+    migracoes.aplicar_migracoes(backend)
+    if existia:
+        with backend.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*), MAX(data_consulta) FROM agendamentos")
+            total, ultimo = cursor.fetchone()
+        if total == agendamentos:
+            medicos, pacientes = dimensoes(agendamentos)
+            return backend, {'medicos': medicos, 'pacientes': pacientes,
+                             'ultimo_dia': disponibilidade.como_data(ultimo), 'semeadura_s': 0.0}
+        backend.fechar()
+        os.remove(caminho)
+        return abrir_base(agendamentos, diretorio, semente)
+
+    inicio = time.perf_counter()
+    dados = semear(backend, agendamentos, semente)
+    dados['semeadura_s'] = time.perf_counter() - inicio
+    return backend, dados
+
+
+# ---------- Medição ----------
+def resumir(tempos, segundos):
+    # `tempos` em segundos, um por operação; `segundos` é a duração total do cenário
+    ordenados = sorted(tempo * 1000 for tempo in tempos)
+    percentis = statistics.quantiles(ordenados, n=100, method='inclusive') if len(ordenados) > 1 else ordenados * 99
+    return {
+        'operacoes': len(ordenados),
+        'p50_ms': percentis[49],
+        'p95_ms': percentis[94],
+        'p99_ms': percentis[98],
+        'media_ms': statistics.fmean(ordenados),
+        'maximo_ms': ordenados[-1],
+        'operacoes_por_segundo': len(ordenados) / segundos if segundos else 0.0,
+    }
+
+
+def medir(operacoes, executar):
+    # Chama executar(i) `operacoes` vezes, cronometrando cada chamada
+    tempos = []
+    inicio = time.perf_counter()
+    for i in range(operacoes):
+        antes = time.perf_counter()
+        executar(i)
+        tempos.append(time.perf_counter() - antes)
+    return resumir(tempos, time.perf_counter() - inicio)
+
+
+def executar_cenarios(dados, operacoes, operacoes_bcrypt, semente):
+    aleatorio = random.Random(semente)
+    medicos, pacientes, ultimo_dia = dados['medicos'], dados['pacientes'], dados['ultimo_dia']
+    hoje = date.today().isoformat()
+    resultados = {}
+
+    def paciente():
+        return f'paciente{aleatorio.randrange(pacientes)}'
+
+    def medico():
+        return f'medico{aleatorio.randrange(medicos)}'
+
+    def login(_):
+        if not servicos.autenticar_usuario(paciente(), SENHA):
+            raise RuntimeError("login do benchmark recusado")
+    resultados['login'] = medir(operacoes_bcrypt, login)
+
+    sufixo = datetime.now().strftime('%H%M%S%f')
+
+    def cadastro(i):
+        servicos.cadastrar_usuario([f'Novo {i}', f'9{sufixo}{i:06d}'[-14:], '', '', f'{PREFIXO_CADASTRO}{sufixo}_{i}', SENHA],
+                                   'Paciente')
+    resultados['cadastro'] = medir(operacoes_bcrypt, cadastro)
+
+    # Reservas nos dias úteis seguintes à agenda semeada; horários já tomados contam como conflito
+    dias_livres = list(dias_uteis(ultimo_dia + timedelta(days=1), 20))
+    conflitos = 0
+
+    def agendamento(_):
+        nonlocal conflitos
+        try:
+            servicos.agendar_consulta(paciente(), medico(), aleatorio.choice(dias_livres),
+                                      aleatorio.choice(HORARIOS), OBSERVACAO)
+        except disponibilidade.HorarioIndisponivel:
+            conflitos += 1
+    resultados['agendamento'] = medir(operacoes, agendamento)
+    resultados['agendamento']['conflitos'] = conflitos
+
+    def consultas_paciente(_):
+        usuario = paciente()
+        servicos.pagina_consultas_paciente(usuario, hoje, 'proximas', None, 50)
+        servicos.pagina_consultas_paciente(usuario, hoje, 'historico', None, 50)
+    resultados['consultas_paciente'] = medir(operacoes, consultas_paciente)
+
+    def agenda_medico(_):
+        inicio = date.today() - timedelta(days=date.today().weekday())
+        repositorio.agendamentos().listar_agenda_medico(medico(), inicio.isoformat(), (inicio + timedelta(days=6)).isoformat())
+    resultados['agenda_medico'] = medir(operacoes, agenda_medico)
+    return resultados
+
+
+def limpar(backend):
+    # Remove o que os cenários gravaram, para a base guardada em --diretorio continuar igual
+    with backend.cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM agendamentos WHERE observacoes = %s", (OBSERVACAO,))
+        cursor.execute("DELETE FROM usuarios WHERE usuario LIKE %s", (f'{PREFIXO_CADASTRO}%',))
+
+
+def executar(tamanhos, operacoes=200, operacoes_bcrypt=20, diretorio=None, semente=42):
+    temporario = diretorio is None
+    diretorio = diretorio or tempfile.mkdtemp(prefix='vidaplus_desempenho_')
+    os.makedirs(diretorio, exist_ok=True)
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'banco': 'sqlite',
+        'versao_esquema': max(migracao.versao for migracao in migracoes.MIGRACOES),
+        'semente': semente,
+        'conjuntos': {},
+    }
+    # O diário da fila de escrita fica junto das bases, e não na pasta atual
+    fila = fila_escrita.definir_fila(fila_escrita.FilaEscrita(os.path.join(diretorio, 'fila.db')))
+    try:
+        for agendamentos in tamanhos:
+            print(f"Preparando base com {rotulo_tamanho(agendamentos)} agendamentos...", file=sys.stderr)
+            backend, dados = abrir_base(agendamentos, diretorio, semente)
+            try:
+                disponibilidade.agenda().invalidar()
+                conjunto = {'agendamentos': agendamentos, 'medicos': dados['medicos'],
+                            'pacientes': dados['pacientes'], 'semeadura_s': dados['semeadura_s']}
+                conjunto['cenarios'] = executar_cenarios(dados, operacoes, operacoes_bcrypt, semente)
+                relatorio['conjuntos'][rotulo_tamanho(agendamentos)] = conjunto
+            finally:
+                fila.drenar()
+                limpar(backend)
+                backend.fechar()
+    finally:
+        fila_escrita.encerrar()
+        tarefas.encerrar()
+        if temporario:
+            shutil.rmtree(diretorio, ignore_errors=True)
+    return relatorio
+
+
+# ---------- Comparação entre execuções ----------
+def comparar(atual, anterior, tolerancia):
+    # Retorna as linhas do relatório e a lista de regressões (p95 acima da tolerância)
+    linhas, regressoes = [], []
+    for tamanho, conjunto in atual['conjuntos'].items():
+        base = anterior.get('conjuntos', {}).get(tamanho)
+        if base is None:
+            continue
+        for cenario, medidas in conjunto['cenarios'].items():
+            medidas_base = base['cenarios'].get(cenario)
+            if not medidas_base or not medidas_base['p95_ms']:
+                continue
+            variacao = medidas['p95_ms'] / medidas_base['p95_ms'] - 1
+            linha = (f"{tamanho:>5} {cenario:<20} p95 {medidas_base['p95_ms']:9.2f} -> {medidas['p95_ms']:9.2f} ms "
+                     f"({variacao:+.0%})")
+            linhas.append(linha)
+            if variacao > tolerancia:
+                regressoes.append(linha)
+    return linhas, regressoes
+
+
+def imprimir(relatorio):
+    for tamanho, conjunto in relatorio['conjuntos'].items():
+        print(f"\n{tamanho} agendamentos ({conjunto['medicos']} médicos, {conjunto['pacientes']} pacientes)")
+        for cenario, medidas in conjunto['cenarios'].items():
+            print(f"  {cenario:<20} p50 {medidas['p50_ms']:8.2f}  p95 {medidas['p95_ms']:8.2f}  "
+                  f"p99 {medidas['p99_ms']:8.2f} ms  {medidas['operacoes_por_segundo']:9.1f} op/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos principais do VidaPlus")
+    parser.add_argument('--tamanhos', nargs='+', default=TAMANHOS_PADRAO,
+                        help="quantidades de agendamentos (ex.: 1k 100k 1M)")
+    parser.add_argument('--operacoes', type=int, default=200, help="operações por cenário (padrão: 200)")
+    parser.add_argument('--operacoes-bcrypt', type=int, default=20,
+                        help="operações dos cenários com bcrypt: login e cadastro (padrão: 20)")
+    parser.add_argument('--diretorio', help="guarda as bases semeadas para as próximas execuções")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="arquivo JSON do resultado (padrão: desempenho-<data>.json)")
+    parser.add_argument('--comparar', help="resultado JSON anterior para comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="piora aceitável do p95 (padrão: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    tamanhos = [interpretar_tamanho(tamanho) for tamanho in args.tamanhos]
+    relatorio = executar(tamanhos, args.operacoes, args.operacoes_bcrypt, args.diretorio, args.semente)
+    imprimir(relatorio)
+
+    saida = args.saida or f"desempenho-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(f"\nResultado gravado em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        linhas, regressoes = comparar(relatorio, anterior, args.tolerancia)
+        print(f"\nComparação com {args.comparar}:")
+        for linha in linhas:
+            print(f"  {linha}")
+        for regressao in regressoes:
+            print(f"[FALHA] {regressao.strip()}")
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Benchmark da exportação dos agendamentos (exportacao.py) com teto de memória.
+
+Semeia (ou reaproveita, com --diretorio) uma base SQLite com N agendamentos,
+como benchmarks.desempenho, e exporta a base inteira em cada formato pedido em
+um processo Python novo. Para cada exportação são gravados as linhas por
+segundo, o tamanho do arquivo e o pico de memória residente do processo
+(ru_maxrss). Como as linhas vão do cursor ao arquivo sem serem acumuladas, o
+pico deve ficar praticamente igual em 100k e em 10M agendamentos: o script sai
+com código 1 se alguma exportação passar de --memoria-maxima-mb.
+
+Com --comparar, as linhas por segundo são comparadas com um resultado anterior
+e o script sai com código 1 se alguma piorar mais que a tolerância.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.exportacao                                 100k e 1M, csv, csv.gz e ics
+    python -m benchmarks.exportacao --tamanhos 10M --diretorio /tmp/bases --memoria-maxima-mb 120
+    python -m benchmarks.exportacao --comparar anterior.json --tolerancia 0.2
+
+O pico de memória só é medido em sistemas com o módulo `resource` (Linux, macOS).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks import desempenho
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TAMANHOS_PADRAO = ('100k', '1M')
+FORMATOS_PADRAO = ('csv', 'csv.gz', 'ics')
+MEMORIA_MAXIMA_MB = 150
+
+# Executado no processo filho; imprime uma linha JSON com o resultado da exportação
+PROGRAMA = """
+import json, sys
+import exportacao
+resultado = exportacao.exportar(sys.argv[1])
+try:
+    import resource
+    pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    resultado['memoria_pico_mb'] = pico_kb / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+except ImportError:
+    resultado['memoria_pico_mb'] = None
+print(json.dumps(resultado), flush=True)
+"""
+
+
+def exportar_em_processo(caminho_base, caminho_saida):
+    variaveis = dict(os.environ)
+    variaveis.update({'VIDAPLUS_BANCO': 'sqlite', 'VIDAPLUS_SQLITE_CAMINHO': caminho_base,
+                      'VIDAPLUS_RASTREAMENTO_ARQUIVO': ''})
+    processo = subprocess.run([sys.executable, '-c', PROGRAMA, caminho_saida], cwd=RAIZ, env=variaveis,
+                              capture_output=True, text=True)
+    if processo.returncode != 0:
+        raise RuntimeError(f"A exportação falhou:\n{processo.stderr.strip()}")
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def executar(tamanhos, formatos=FORMATOS_PADRAO, diretorio=None, semente=42):
+    temporario = diretorio is None
+    diretorio = diretorio or tempfile.mkdtemp(prefix='vidaplus_exportacao_')
+    os.makedirs(diretorio, exist_ok=True)
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'banco': 'sqlite',
+        'conjuntos': {},
+    }
+    try:
+        for agendamentos in tamanhos:
+            rotulo = desempenho.rotulo_tamanho(agendamentos)
+            print(f"Preparando base com {rotulo} agendamentos...", file=sys.stderr)
+            backend, _ = desempenho.abrir_base(agendamentos, diretorio, semente)
+            backend.fechar()
+            caminho_base = os.path.join(diretorio, f'vidaplus_{rotulo}.db')
+
+            exportacoes = {}
+            for formato in formatos:
+                caminho_saida = os.path.join(diretorio, f'exportacao_{rotulo}.{formato}')
+                print(f"Exportando {rotulo} agendamentos ({formato})...", file=sys.stderr)
+                try:
+                    resultado = exportar_em_processo(caminho_base, caminho_saida)
+                finally:
+                    if os.path.exists(caminho_saida):
+                        os.remove(caminho_saida)
+                exportacoes[formato] = {chave: resultado[chave]
+                                        for chave in ('linhas', 'segundos', 'linhas_por_segundo', 'bytes',
+                                                      'memoria_pico_mb')}
+            relatorio['conjuntos'][rotulo] = {'agendamentos': agendamentos, 'exportacoes': exportacoes}
+    finally:
+        if temporario:
+            shutil.rmtree(diretorio, ignore_errors=True)
+    return relatorio
+
+
+# ---------- Verificações ----------
+def acima_do_teto(relatorio, memoria_maxima_mb):
+    excessos = []
+    for rotulo, conjunto in relatorio['conjuntos'].items():
+        for formato, medidas in conjunto['exportacoes'].items():
+            pico = medidas['memoria_pico_mb']
+            if pico is not None and pico > memoria_maxima_mb:
+                excessos.append(f"{rotulo:>5} {formato:<7} pico de {pico:.0f} MB (teto: {memoria_maxima_mb:g} MB)")
+    return excessos
+
+
+def comparar(atual, anterior, tolerancia):
+    # Retorna as linhas do relatório e a lista de regressões (linhas/s abaixo da tolerância)
+    linhas, regressoes = [], []
+    for rotulo, conjunto in atual['conjuntos'].items():
+        base = anterior.get('conjuntos', {}).get(rotulo)
+        if base is None:
+            continue
+        for formato, medidas in conjunto['exportacoes'].items():
+            medidas_base = base['exportacoes'].get(formato)
+            if not medidas_base or not medidas_base['linhas_por_segundo']:
+                continue
+            variacao = medidas['linhas_por_segundo'] / medidas_base['linhas_por_segundo'] - 1
+            linha = (f"{rotulo:>5} {formato:<7} {medidas_base['linhas_por_segundo']:10.0f} -> "
+                     f"{medidas['linhas_por_segundo']:10.0f} linhas/s ({variacao:+.0%})")
+            linhas.append(linha)
+            if variacao < -tolerancia:
+                regressoes.append(linha)
+    return linhas, regressoes
+
+
+def imprimir(relatorio):
+    for rotulo, conjunto in relatorio['conjuntos'].items():
+        print(f"\n{rotulo} agendamentos")
+        for formato, medidas in conjunto['exportacoes'].items():
+            pico = medidas['memoria_pico_mb']
+            print(f"  {formato:<7} {medidas['linhas_por_segundo']:10.0f} linhas/s  {medidas['segundos']:7.1f} s  "
+                  f"{medidas['bytes'] / 1024 / 1024:8.1f} MB  pico {'-' if pico is None else f'{pico:.0f}'} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da exportação dos agendamentos do VidaPlus")
+    parser.add_argument('--tamanhos', nargs='+', default=TAMANHOS_PADRAO,
+                        help="quantidades de agendamentos (ex.: 100k 1M 10M)")
+    parser.add_argument('--formatos', nargs='+', default=FORMATOS_PADRAO, choices=FORMATOS_PADRAO + ('ics.gz',))
+    parser.add_argument('--diretorio', help="guarda as bases semeadas para as próximas execuções")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--memoria-maxima-mb', type=float, default=MEMORIA_MAXIMA_MB,
+                        help=f"teto do pico de memória de uma exportação (padrão: {MEMORIA_MAXIMA_MB})")
+    parser.add_argument('--saida', help="arquivo JSON do resultado (padrão: exportacao-<data>.json)")
+    parser.add_argument('--comparar', help="resultado JSON anterior para comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="queda aceitável das linhas/s (padrão: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    tamanhos = [desempenho.interpretar_tamanho(tamanho) for tamanho in args.tamanhos]
+    try:
+        relatorio = executar(tamanhos, args.formatos, args.diretorio, args.semente)
+    except RuntimeError as err:
+        print(err, file=sys.stderr)
+        return 2
+    imprimir(relatorio)
+
+    saida = args.saida or f"exportacao-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(f"\nResultado gravado em {saida}")
+
+    falhou = False
+    for excesso in acima_do_teto(relatorio, args.memoria_maxima_mb):
+        print(f"[FALHA] {excesso}")
+        falhou = True
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        linhas, regressoes = comparar(relatorio, anterior, args.tolerancia)
+        print(f"\nComparação com {args.comparar}:")
+        for linha in linhas:
+            print(f"  {linha}")
+        for regressao in regressoes:
+            print(f"[FALHA] {regressao.strip()}")
+        falhou = falhou or bool(regressoes)
+    return 1 if falhou else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Benchmark do tempo de abertura do VidaPlus (import e primeira tela).
+
+Cada rodada é um processo Python novo, como um clique no atalho do sistema:
+o processo importa o módulo alvo (app, por padrão), cria a janela raiz, desenha
+a tela inicial (raiz.update()) e informa os tempos medidos por dentro. O
+processo pai mede também o tempo total, incluindo a subida do interpretador.
+A primeira rodada usa uma pasta de cache de recursos vazia (logo ainda não
+reduzido) e é relatada à parte como 'sem_cache'; as demais formam as medianas.
+
+Uma rodada extra com `python -X importtime` lista os módulos de nível mais
+alto que mais pesam na importação e quais dependências pesadas (customtkinter,
+PIL, mysql.connector, bcrypt, multiprocessing) já estavam carregadas na
+primeira tela — elas devem ficar de fora até o primeiro uso.
+
+Sem servidor gráfico (DISPLAY), só a importação é medida.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.inicializacao
+    python -m benchmarks.inicializacao --rodadas 20 --saida atual.json
+    python -m benchmarks.inicializacao --comparar anterior.json --tolerancia 0.2
+    python -m benchmarks.inicializacao --modulo servicos      só a importação da camada sem interface
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEPENDENCIAS_PESADAS = ('customtkinter', 'PIL', 'mysql.connector', 'bcrypt', 'multiprocessing', 'numpy')
+MODULOS_LISTADOS = 15
+
+# Executado no processo filho; imprime uma linha JSON com os tempos
+PROGRAMA = """
+import json, sys, time
+inicio = time.perf_counter()
+modulo = __import__(sys.argv[1])
+resultado = {'importacao_ms': (time.perf_counter() - inicio) * 1000}
+if sys.argv[2] == '1':
+    raiz = modulo.iniciar()
+    raiz.update()
+    resultado['primeira_tela_ms'] = (time.perf_counter() - inicio) * 1000
+    resultado['carregadas'] = [nome for nome in sys.argv[3:] if nome in sys.modules]
+    raiz.destroy()
+else:
+    resultado['carregadas'] = [nome for nome in sys.argv[3:] if nome in sys.modules]
+print(json.dumps(resultado), flush=True)
+"""
+
+
+def tem_tela():
+    if sys.platform.startswith('win') or sys.platform == 'darwin':
+        return True
+    return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+
+def ambiente(pasta_cache):
+    variaveis = dict(os.environ)
+    variaveis.update({
+        'VIDAPLUS_CACHE_RECURSOS': pasta_cache,
+        'VIDAPLUS_BANCO': 'sqlite',            # A primeira tela não deve depender do banco
+        'VIDAPLUS_RASTREAMENTO_ARQUIVO': '',
+    })
+    return variaveis
+
+
+def rodar(modulo, desenhar, pasta_cache, opcoes=()):
+    comando = [sys.executable, *opcoes, '-c', PROGRAMA, modulo, '1' if desenhar else '0', *DEPENDENCIAS_PESADAS]
+    inicio = time.perf_counter()
+    processo = subprocess.run(comando, cwd=RAIZ, env=ambiente(pasta_cache), capture_output=True, text=True)
+    total_ms = (time.perf_counter() - inicio) * 1000
+    if processo.returncode != 0:
+        raise RuntimeError(f"O processo de medição falhou:\n{processo.stderr.strip()}")
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    resultado['processo_ms'] = total_ms
+    return resultado, processo.stderr
+
+
+def modulos_mais_pesados(saida_importtime, quantidade=MODULOS_LISTADOS):
+    # Linhas "import time: self [us] | cumulative | nome"; só os de nível mais alto (sem recuo)
+    modulos = []
+    for linha in saida_importtime.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, cumulativo, nome = linha[len('import time:'):].split('|')
+        if nome.startswith(' ') and not nome.startswith('  '):
+            modulos.append({'modulo': nome.strip(), 'cumulativo_ms': int(cumulativo) / 1000})
+    return sorted(modulos, key=lambda item: item['cumulativo_ms'], reverse=True)[:quantidade]
+
+
+def resumir(rodadas, chave):
+    valores = [rodada[chave] for rodada in rodadas if chave in rodada]
+    if not valores:
+        return None
+    return {'mediana_ms': statistics.median(valores), 'minimo_ms': min(valores), 'maximo_ms': max(valores)}
+
+
+def executar(modulo='app', rodadas=10, desenhar=None):
+    desenhar = tem_tela() if desenhar is None else desenhar
+    pasta_cache = tempfile.mkdtemp(prefix='vidaplus_recursos_')
+    try:
+        sem_cache, _ = rodar(modulo, desenhar, pasta_cache)
+        medidas = [rodar(modulo, desenhar, pasta_cache)[0] for _ in range(rodadas)]
+        detalhe, saida_importtime = rodar(modulo, desenhar, pasta_cache, ('-X', 'importtime'))
+    finally:
+        shutil.rmtree(pasta_cache, ignore_errors=True)
+
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'modulo': modulo,
+        'primeira_tela': desenhar,
+        'rodadas': rodadas,
+        'medidas': {chave: resumir(medidas, chave)
+                    for chave in ('importacao_ms', 'primeira_tela_ms', 'processo_ms') if resumir(medidas, chave)},
+        'sem_cache': {chave: valor for chave, valor in sem_cache.items() if chave.endswith('_ms')},
+        'dependencias_carregadas': detalhe['carregadas'],
+        'modulos_mais_pesados': modulos_mais_pesados(saida_importtime),
+    }
+
+
+# ---------- Comparação entre execuções ----------
+def comparar(atual, anterior, tolerancia):
+    # Retorna as linhas do relatório e a lista de regressões (mediana acima da tolerância)
+    linhas, regressoes = [], []
+    for chave, medida in atual['medidas'].items():
+        base = anterior.get('medidas', {}).get(chave)
+        if not base or not base['mediana_ms']:
+            continue
+        variacao = medida['mediana_ms'] / base['mediana_ms'] - 1
+        linha = f"{chave:<18} mediana {base['mediana_ms']:8.1f} -> {medida['mediana_ms']:8.1f} ms ({variacao:+.0%})"
+        linhas.append(linha)
+        if variacao > tolerancia:
+            regressoes.append(linha)
+    return linhas, regressoes
+
+
+def imprimir(relatorio):
+    print(f"\nAbertura de '{relatorio['modulo']}' ({relatorio['rodadas']} rodadas)")
+    for chave, medida in relatorio['medidas'].items():
+        print(f"  {chave:<18} mediana {medida['mediana_ms']:8.1f}  mín {medida['minimo_ms']:8.1f}  "
+              f"máx {medida['maximo_ms']:8.1f} ms")
+    for chave, valor in relatorio['sem_cache'].items():
+        print(f"  {chave:<18} sem cache {valor:8.1f} ms")
+    if not relatorio['primeira_tela']:
+        print("  (sem servidor gráfico: a primeira tela não foi medida)")
+    print(f"  dependências pesadas já carregadas: {', '.join(relatorio['dependencias_carregadas']) or 'nenhuma'}")
+    print("  módulos mais pesados na importação:")
+    for item in relatorio['modulos_mais_pesados']:
+        print(f"    {item['cumulativo_ms']:8.1f} ms  {item['modulo']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do tempo de abertura do VidaPlus")
+    parser.add_argument('--modulo', default='app', help="módulo importado em cada rodada (padrão: app)")
+    parser.add_argument('--rodadas', type=int, default=10, help="processos medidos (padrão: 10)")
+    parser.add_argument('--sem-tela', action='store_true', help="mede só a importação, sem criar a janela")
+    parser.add_argument('--saida', help="arquivo JSON do resultado (padrão: inicializacao-<data>.json)")
+    parser.add_argument('--comparar', help="resultado JSON anterior para comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="piora aceitável da mediana (padrão: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    desenhar = False if args.sem_tela or args.modulo != 'app' else None
+    try:
+        relatorio = executar(args.modulo, args.rodadas, desenhar)
+    except RuntimeError as err:
+        print(err, file=sys.stderr)
+        return 2
+    imprimir(relatorio)
+
+    saida = args.saida or f"inicializacao-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(f"\nResultado gravado em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        linhas, regressoes = comparar(relatorio, anterior, args.tolerancia)
+        print(f"\nComparação com {args.comparar}:")
+        for linha in linhas:
+            print(f"  {linha}")
+        for regressao in regressoes:
+            print(f"[FALHA] {regressao.strip()}")
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Benchmark da geração de receitas em lote (receitas.py).
+
+Gera N receitas com dados sintéticos em cada formato e mede a vazão
+(receitas por segundo) nos cenários:
+    sem_cache  o modelo é analisado de novo a cada receita (como seria sem o cache)
+    serial     modelos em cache, geração em um só processo
+    pool       modelos em cache, lote distribuído no pool de processos (tarefas.executor_cpu)
+    emissao    caminho da tela: receitas.emitir() em uma base SQLite semeada (leitura da
+               consulta, geração no pool e gravação), com o tempo de retorno de emitir()
+
+Com --comparar, a vazão é comparada com um resultado anterior e o script sai
+com código 1 se algum cenário piorar mais que a tolerância.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.receitas
+    python -m benchmarks.receitas --quantidade 5000 --itens 8 --saida atual.json
+    python -m benchmarks.receitas --comparar anterior.json --tolerancia 0.2
+"""
+import argparse
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import receitas
+import tarefas
+from benchmarks import desempenho
+
+QUANTIDADE_PADRAO = 1000
+ITENS_PADRAO = 5
+AGENDAMENTOS_BASE = 10000          # Tamanho da base semeada para o cenário de emissão
+MEDICAMENTOS = ('Amoxicilina 500 mg', 'Dipirona 500 mg', 'Losartana 50 mg', 'Omeprazol 20 mg',
+                'Metformina 850 mg', 'Sinvastatina 20 mg', 'Ibuprofeno 600 mg', 'Loratadina 10 mg')
+POSOLOGIAS = ('1 comprimido de 8 em 8 horas por 7 dias', '1 comprimido ao dia, em jejum',
+              '1 cápsula a cada 12 horas', '1 comprimido se dor ou febre (máximo 4 ao dia)')
+
+
+def gerar_dados(quantidade, itens, semente):
+    aleatorio = random.Random(semente)
+    hoje = date.today()
+    lote = []
+    for i in range(quantidade):
+        consulta = (i, (hoje - timedelta(days=aleatorio.randrange(30))).isoformat(),
+                    f'{aleatorio.randrange(8, 17):02d}:{aleatorio.choice((0, 30)):02d}:00',
+                    f'paciente{i}', f'Paciente {i} da Silva', f'{i:011d}', 'medico0', 'Dra. Ana Pereira')
+        texto = "\n".join(f"{aleatorio.choice(MEDICAMENTOS)} - {aleatorio.choice(POSOLOGIAS)}" for _ in range(itens))
+        lote.append(receitas.montar_dados(consulta, receitas.interpretar_itens(texto), "Retorno em 30 dias."))
+    return lote
+
+
+def vazao(quantidade, segundos, **extras):
+    return {'receitas': quantidade, 'segundos': segundos,
+            'receitas_por_segundo': quantidade / segundos if segundos else 0.0, **extras}
+
+
+# ---------- Cenários ----------
+def sem_cache(formato, lote):
+    _, texto = receitas.MODELOS_PADRAO[formato]
+    inicio = time.perf_counter()
+    for dados in lote:
+        documento = receitas.Modelo(texto, escapar=formato == 'html').renderizar(dados)
+        if formato == 'pdf':
+            receitas.escrever_pdf(documento)
+    return vazao(len(lote), time.perf_counter() - inicio)
+
+
+def serial(formato, lote):
+    receitas.modelo(formato)  # Aquecimento: a análise do modelo fica fora da medição
+    inicio = time.perf_counter()
+    total = sum(len(receitas.renderizar(formato, dados)) for dados in lote)
+    return vazao(len(lote), time.perf_counter() - inicio, bytes_por_receita=total / len(lote))
+
+
+def pool(formato, lote):
+    executor = tarefas.executor_cpu()
+    # Sobe os processos e analisa o modelo em cada um antes de medir
+    list(executor.map(receitas.renderizar, [formato] * tarefas.PROCESSOS_CPU, lote[:tarefas.PROCESSOS_CPU]))
+    inicio = time.perf_counter()
+    total = sum(len(documento) for documento in
+                executor.map(receitas.renderizar, [formato] * len(lote), lote, chunksize=max(1, len(lote) // 64)))
+    return vazao(len(lote), time.perf_counter() - inicio, bytes_por_receita=total / len(lote),
+                 processos=tarefas.PROCESSOS_CPU)
+
+
+def emissao(formato, quantidade, itens, diretorio, semente):
+    backend, _ = desempenho.abrir_base(AGENDAMENTOS_BASE, diretorio, semente)
+    try:
+        with backend.cursor() as cursor:
+            cursor.execute("SELECT id, medico_usuario FROM agendamentos ORDER BY id LIMIT %s", (quantidade,))
+            consultas = cursor.fetchall()
+        aleatorio = random.Random(semente)
+        texto = "\n".join(f"{aleatorio.choice(MEDICAMENTOS)} - {aleatorio.choice(POSOLOGIAS)}" for _ in range(itens))
+        lista = receitas.interpretar_itens(texto)
+
+        retornos = []
+        inicio = time.perf_counter()
+        emissoes = []
+        for id_agendamento, medico in consultas:
+            antes = time.perf_counter()
+            emissoes.append(receitas.emitir(id_agendamento, medico, lista, formato=formato))
+            retornos.append(time.perf_counter() - antes)
+        for emitida in emissoes:
+            emitida.aguardar()
+        segundos = time.perf_counter() - inicio
+        retornos.sort()
+        return vazao(len(emissoes), segundos, retorno_p95_ms=retornos[int(len(retornos) * 0.95)] * 1000,
+                     retorno_maximo_ms=retornos[-1] * 1000)
+    finally:
+        with backend.cursor(commit=True) as cursor:
+            cursor.execute("DELETE FROM receitas")
+        backend.fechar()
+
+
+def executar(quantidade=QUANTIDADE_PADRAO, itens=ITENS_PADRAO, formatos=receitas.FORMATOS, semente=42):
+    diretorio = tempfile.mkdtemp(prefix='vidaplus_receitas_')
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'quantidade': quantidade,
+        'itens_por_receita': itens,
+        'formatos': {},
+    }
+    try:
+        lote = gerar_dados(quantidade, itens, semente)
+        for formato in formatos:
+            print(f"Gerando {quantidade} receitas ({formato})...", file=sys.stderr)
+            relatorio['formatos'][formato] = {
+                'sem_cache': sem_cache(formato, lote),
+                'serial': serial(formato, lote),
+                'pool': pool(formato, lote),
+                'emissao': emissao(formato, min(quantidade, AGENDAMENTOS_BASE), itens, diretorio, semente),
+            }
+    finally:
+        tarefas.encerrar()
+        shutil.rmtree(diretorio, ignore_errors=True)
+    return relatorio
+
+
+# ---------- Comparação entre execuções ----------
+def comparar(atual, anterior, tolerancia):
+    # Retorna as linhas do relatório e a lista de regressões (receitas/s abaixo da tolerância)
+    linhas, regressoes = [], []
+    for formato, cenarios in atual['formatos'].items():
+        base = anterior.get('formatos', {}).get(formato)
+        if base is None:
+            continue
+        for cenario, medidas in cenarios.items():
+            medidas_base = base.get(cenario)
+            if not medidas_base or not medidas_base['receitas_por_segundo']:
+                continue
+            variacao = medidas['receitas_por_segundo'] / medidas_base['receitas_por_segundo'] - 1
+            linha = (f"{formato:<5} {cenario:<10} {medidas_base['receitas_por_segundo']:9.0f} -> "
+                     f"{medidas['receitas_por_segundo']:9.0f} receitas/s ({variacao:+.0%})")
+            linhas.append(linha)
+            if variacao < -tolerancia:
+                regressoes.append(linha)
+    return linhas, regressoes
+
+
+def imprimir(relatorio):
+    for formato, cenarios in relatorio['formatos'].items():
+        print(f"\n{formato.upper()} ({relatorio['quantidade']} receitas, {relatorio['itens_por_receita']} itens cada)")
+        for cenario, medidas in cenarios.items():
+            linha = f"  {cenario:<10} {medidas['receitas_por_segundo']:9.0f} receitas/s  {medidas['segundos']:7.2f} s"
+            if 'retorno_p95_ms' in medidas:
+                linha += f"  emitir() p95 {medidas['retorno_p95_ms']:.2f} ms"
+            print(linha)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da geração de receitas do VidaPlus")
+    parser.add_argument('--quantidade', type=int, default=QUANTIDADE_PADRAO,
+                        help=f"receitas por formato e cenário (padrão: {QUANTIDADE_PADRAO})")
+    parser.add_argument('--itens', type=int, default=ITENS_PADRAO,
+                        help=f"medicamentos por receita (padrão: {ITENS_PADRAO})")
+    parser.add_argument('--formatos', nargs='+', default=receitas.FORMATOS, choices=receitas.FORMATOS)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="arquivo JSON do resultado (padrão: receitas-<data>.json)")
+    parser.add_argument('--comparar', help="resultado JSON anterior para comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="queda aceitável das receitas/s (padrão: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    relatorio = executar(args.quantidade, args.itens, args.formatos, args.semente)
+    imprimir(relatorio)
+
+    saida = args.saida or f"receitas-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(f"\nResultado gravado em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        linhas, regressoes = comparar(relatorio, anterior, args.tolerancia)
+        print(f"\nComparação com {args.comparar}:")
+        for linha in linhas:
+            print(f"  {linha}")
+        for regressao in regressoes:
+            print(f"[FALHA] {regressao.strip()}")
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Busca incremental (type-ahead) de médicos e pacientes do VidaPlus.
+
+Em vez de um menu com todos os usuários da hierarquia, as telas mostram uma
+caixa de busca: cada termo digitado é procurado como prefixo do usuário, de
+qualquer palavra do nome completo ou dos dígitos do CPF. O índice é uma lista
+ordenada de (chave normalizada, usuario) consultada com bisect. Ele é montado junto com o
+armazém de registros (registros.py) e mantido coerente com as gravações desta
+estação. Enquanto o armazém ainda não foi carregado, a tela usa a consulta
+LIMITada do repositório (RepositorioUsuarios.buscar_prefixo) como alternativa.
+"""
+import bisect
+import re
+import unicodedata
+
+LIMITE_RESULTADOS = 50
+
+
+# ---------- Normalização ----------
+def normalizar(texto):
+    # Minúsculas, sem acentos e com espaços simples: "José  da Silva" -> "jose da silva"
+    decomposto = unicodedata.normalize('NFKD', str(texto or ''))
+    sem_acentos = ''.join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+    return ' '.join(sem_acentos.casefold().split())
+
+
+def normalizar_termo(termo):
+    # Termos só com dígitos e pontuação de CPF ("123.456") são procurados pelos dígitos
+    termo = normalizar(termo)
+    if re.fullmatch(r'[\d.\-/ ]+', termo) and any(caractere.isdigit() for caractere in termo):
+        return re.sub(r'\D', '', termo)
+    return termo
+
+
+# Chaves de busca de um cadastro: usuario, o nome a partir de cada palavra
+# ("maria da silva", "da silva", "silva") e os dígitos do CPF
+def chaves_de(usuario, nome_completo, cpf):
+    chaves = {normalizar(usuario)}
+    palavras = normalizar(nome_completo).split()
+    chaves.update(' '.join(palavras[i:]) for i in range(len(palavras)))
+    digitos = re.sub(r'\D', '', cpf or '')
+    if digitos:
+        chaves.add(digitos)
+    chaves.discard('')
+    return chaves
+
+
+# ---------- Índice de prefixos ----------
+class IndicePrefixos:
+    # `entradas` são tuplas (usuario, nome_completo, cpf); a busca devolve as mesmas tuplas
+    def __init__(self, entradas=()):
+        self._entradas = {entrada[0]: tuple(entrada) for entrada in entradas}
+        self._chaves = sorted((chave, usuario) for usuario, entrada in self._entradas.items()
+                              for chave in chaves_de(*entrada))
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def buscar(self, termo, limite=LIMITE_RESULTADOS):
+        termo = normalizar_termo(termo)
+        if not termo:
+            return []
+        resultado = []
+        vistos = set()
+        posicao = bisect.bisect_left(self._chaves, (termo,))
+        while posicao < len(self._chaves) and len(resultado) < limite:
+            chave, usuario = self._chaves[posicao]
+            if not chave.startswith(termo):
+                break
+            if usuario not in vistos:
+                vistos.add(usuario)
+                resultado.append(self._entradas[usuario])
+            posicao += 1
+        return resultado
+
+    # Atualizações pontuais (cadastro alterado por esta estação), sem reconstruir o índice
+    def adicionar(self, usuario, nome_completo, cpf):
+        self.remover(usuario)
+        self._entradas[usuario] = (usuario, nome_completo, cpf)
+        for chave in chaves_de(usuario, nome_completo, cpf):
+            bisect.insort(self._chaves, (chave, usuario))
+
+    def remover(self, usuario):
+        entrada = self._entradas.pop(usuario, None)
+        if entrada is None:
+            return
+        for chave in chaves_de(*entrada):
+            posicao = bisect.bisect_left(self._chaves, (chave, usuario))
+            if posicao < len(self._chaves) and self._chaves[posicao] == (chave, usuario):
+                del self._chaves[posicao]
+
@@ -0,0 +1,92 @@
+"""
+Cache em memória com expiração (TTL) usado pelo VidaPlus.
+
+Guarda resultados de consultas repetitivas (por exemplo, a lista de médicos de
+cada menu) para que as telas abram sem ir ao banco. Quem grava no banco chama
+invalidar() logo após a escrita, e o TTL cobre alterações feitas por outros
+terminais.
+
+Configuração por variável de ambiente:
+- VIDAPLUS_CACHE_TTL  (segundos, padrão: 60)
+"""
+import os
+import threading
+import time
+
+TTL_PADRAO = float(os.environ.get('VIDAPLUS_CACHE_TTL', '60'))
+
+
+class CacheTTL:
+    # `carregar(chave)` busca o valor na origem quando a chave não está no cache
+    def __init__(self, carregar, ttl=TTL_PADRAO):
+        self.carregar = carregar
+        self.ttl = ttl
+        self._entradas = {}      # chave -> (valor, expira_em)
+        self._geracoes = {}      # chave -> contador incrementado a cada invalidação
+        self._geracao_global = 0 # incrementado quando o cache inteiro é invalidado
+        self._travas = {}        # chave -> lock que evita cargas duplicadas simultâneas
+        self._lock = threading.Lock()
+        self._contadores = {'acertos': 0, 'falhas': 0, 'expiradas': 0, 'invalidacoes': 0}
+
+    def _trava(self, chave):
+        with self._lock:
+            return self._travas.setdefault(chave, threading.Lock())
+
+    def _consultar(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            if entrada[1] <= time.monotonic():
+                del self._entradas[chave]
+                self._contadores['expiradas'] += 1
+                return None
+            self._contadores['acertos'] += 1
+            return entrada
+
+    # Retorna o valor somente se ele já estiver em cache (sem ir à origem), ou None
+    def obter_se_presente(self, chave):
+        entrada = self._consultar(chave)
+        return None if entrada is None else entrada[0]
+
+    def obter(self, chave):
+        entrada = self._consultar(chave)
+        if entrada is not None:
+            return entrada[0]
+
+        # Apenas uma thread carrega cada chave; as demais aguardam e reaproveitam
+        with self._trava(chave):
+            entrada = self._consultar(chave)
+            if entrada is not None:
+                return entrada[0]
+            with self._lock:
+                self._contadores['falhas'] += 1
+                geracao = self._geracao(chave)
+            valor = self.carregar(chave)
+            with self._lock:
+                # Se houve invalidação durante a carga, o valor já nasce velho e não é guardado
+                if self._geracao(chave) == geracao:
+                    self._entradas[chave] = (valor, time.monotonic() + self.ttl)
+            return valor
+
+    def _geracao(self, chave):
+        return self._geracao_global, self._geracoes.get(chave, 0)
+
+    def invalidar(self, chave=None):
+        # Sem chave, descarta o cache inteiro
+        with self._lock:
+            if chave is None:
+                self._entradas.clear()
+                self._geracao_global += 1
+            else:
+                self._entradas.pop(chave, None)
+                self._geracoes[chave] = self._geracoes.get(chave, 0) + 1
+            self._contadores['invalidacoes'] += 1
+
+    def estatisticas(self):
+        with self._lock:
+            dados = dict(self._contadores)
+            dados['chaves'] = len(self._entradas)
+        consultas = dados['acertos'] + dados['falhas']
+        dados['taxa_acerto'] = dados['acertos'] / consultas if consultas else 0.0
+        return dados
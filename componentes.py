@@ -0,0 +1,299 @@
+"""
+Componentes de interface reutilizáveis do VidaPlus (CustomTkinter).
+"""
+import customtkinter as ctk
+
+
+# ---------- Lista virtualizada ----------
+class ListaVirtual(ctk.CTkFrame):
+    # Exibe listas longas criando widgets apenas para as linhas visíveis: ao rolar,
+    # os mesmos rótulos são reaproveitados com outros itens. Quando a rolagem se
+    # aproxima do fim dos itens carregados, chama `carregar_mais()`, que deve
+    # responder com adicionar(itens, fim=...). Um clique em uma linha chama
+    # `ao_clicar(item)`.
+    def __init__(self, master, formatar, carregar_mais=None, altura_linha=70, margem_carga=5, ao_clicar=None,
+                 **kwargs):
+        super().__init__(master, **kwargs)
+        self.formatar = formatar
+        self.carregar_mais = carregar_mais
+        self.ao_clicar = ao_clicar
+        self.altura_linha = altura_linha
+        self.margem_carga = margem_carga
+
+        self._itens = []
+        self._inicio = 0
+        self._rotulos = []
+        self._fim = carregar_mais is None
+        self._carregando = False
+        self.texto_vazio = "Nenhum item encontrado."
+
+        self._area = ctk.CTkFrame(self, fg_color='transparent')
+        self._area.pack(side='left', fill='both', expand=True)
+        self._barra = ctk.CTkScrollbar(self, command=self._ao_rolar)
+        self._barra.pack(side='right', fill='y')
+
+        self._area.bind('<Configure>', self._ao_redimensionar)
+        self._ligar_roda(self._area)
+
+    # ---------- API ----------
+    def adicionar(self, itens, fim=False):
+        self._itens.extend(itens)
+        self._fim = fim
+        self._carregando = False
+        self._redesenhar()
+        self._talvez_carregar()
+
+    def limpar(self):
+        self._itens = []
+        self._inicio = 0
+        self._fim = self.carregar_mais is None
+        self._carregando = False
+        self._redesenhar()
+        self._talvez_carregar()
+
+    def __len__(self):
+        return len(self._itens)
+
+    # ---------- Rolagem ----------
+    def _ligar_roda(self, widget):
+        widget.bind('<MouseWheel>', self._ao_rodar)                      # Windows/macOS
+        widget.bind('<Button-4>', lambda _: self._rolar_para(self._inicio - 3))  # Linux
+        widget.bind('<Button-5>', lambda _: self._rolar_para(self._inicio + 3))
+
+    def _ao_rodar(self, evento):
+        self._rolar_para(self._inicio - (3 if evento.delta > 0 else -3))
+
+    def _ao_rolar(self, acao, valor, unidade=None):
+        if acao == 'moveto':
+            self._rolar_para(int(float(valor) * len(self._itens)))
+        elif acao == 'scroll':
+            passo = len(self._rotulos) - 1 if unidade == 'pages' else 1
+            self._rolar_para(self._inicio + int(valor) * max(1, passo))
+
+    def _rolar_para(self, inicio):
+        maximo = max(0, len(self._itens) - len(self._rotulos) + 1)
+        inicio = max(0, min(inicio, maximo))
+        if inicio != self._inicio:
+            self._inicio = inicio
+            self._redesenhar()
+        self._talvez_carregar()
+
+    def _talvez_carregar(self):
+        if self._fim or self._carregando or self.carregar_mais is None:
+            return
+        if self._inicio + len(self._rotulos) + self.margem_carga >= len(self._itens):
+            self._carregando = True
+            self.carregar_mais()
+
+    def _clicar(self, posicao):
+        indice = self._inicio + posicao
+        if self.ao_clicar is not None and indice < len(self._itens):
+            self.ao_clicar(self._itens[indice])
+
+    # ---------- Desenho ----------
+    def _ao_redimensionar(self, evento):
+        visiveis = max(1, evento.height // self.altura_linha + 1)
+        # Cria ou descarta rótulos apenas quando a altura visível muda
+        while len(self._rotulos) < visiveis:
+            rotulo = ctk.CTkLabel(self._area, text='', anchor='w', justify='left')
+            self._ligar_roda(rotulo)
+            rotulo.bind('<Button-1>', lambda _, posicao=len(self._rotulos): self._clicar(posicao))
+            self._rotulos.append(rotulo)
+        while len(self._rotulos) > visiveis:
+            self._rotulos.pop().destroy()
+        self._redesenhar()
+        self._talvez_carregar()
+
+    def _redesenhar(self):
+        total = len(self._itens)
+        for posicao, rotulo in enumerate(self._rotulos):
+            indice = self._inicio + posicao
+            if indice < total:
+                texto = self.formatar(self._itens[indice])
+            elif indice == total and not self._fim:
+                texto = "Carregando..."
+            elif indice == 0 and self._fim:
+                texto = self.texto_vazio
+            else:
+                texto = ''
+            rotulo.configure(text=texto)
+            rotulo.place(x=0, y=posicao * self.altura_linha, relwidth=1, height=self.altura_linha)
+
+        # A barra de rolagem representa apenas os itens já carregados
+        if total:
+            self._barra.set(self._inicio / total, min(1.0, (self._inicio + len(self._rotulos)) / total))
+        else:
+            self._barra.set(0, 1)
+
+
+# ---------- Campos de formulário com rastreamento de alterações ----------
+class CamposRastreados:
+    # Liga cada entrada do formulário a uma coluna e guarda os valores carregados,
+    # para que a gravação envie apenas as colunas que o usuário realmente mudou.
+    # Colunas em `somente_digitadas` (a senha) nunca são carregadas e só contam
+    # como alteradas quando algo é digitado nelas.
+    def __init__(self, entradas, colunas, somente_digitadas=('senha',)):
+        self.entradas = dict(zip(colunas, entradas))
+        self.somente_digitadas = set(somente_digitadas)
+        self._originais = {}
+
+    # Preenche as entradas com {coluna: valor}; colunas ausentes ficam vazias
+    def carregar(self, valores):
+        self._originais = {}
+        for coluna, entrada in self.entradas.items():
+            valor = '' if coluna in self.somente_digitadas else (valores.get(coluna) or '')
+            entrada.delete(0, 'end')
+            if valor:
+                entrada.insert(0, valor)
+            self._originais[coluna] = valor
+
+    def limpar(self):
+        self.carregar({})
+
+    def valores(self):
+        return {coluna: entrada.get().strip() for coluna, entrada in self.entradas.items()}
+
+    # Colunas preenchidas obrigatoriamente (todas menos as somente digitadas) estão completas?
+    def completos(self):
+        return all(valor for coluna, valor in self.valores().items() if coluna not in self.somente_digitadas)
+
+    def alteracoes(self):
+        alteradas = {}
+        for coluna, valor in self.valores().items():
+            if coluna in self.somente_digitadas:
+                if valor:
+                    alteradas[coluna] = valor
+            elif valor != self._originais.get(coluna, ''):
+                alteradas[coluna] = valor
+        return alteradas
+
+
+# ---------- Caixa de busca incremental ----------
+class CampoBusca(ctk.CTkFrame):
+    # Caixa de texto com a lista de resultados logo abaixo. Depois de `atraso_ms` sem
+    # digitação chama `buscar(termo)`, que devolve os resultados ou None quando a
+    # resposta vem depois, por mostrar(termo, resultados) (busca em segundo plano).
+    # Os resultados são desenhados em blocos de `bloco` linhas, um bloco por volta do
+    # mainloop, reaproveitando os botões já criados.
+    def __init__(self, master, buscar=None, ao_selecionar=None, formatar=str, placeholder="Buscar...",
+                 atraso_ms=150, bloco=10, altura_lista=160, **kwargs):
+        super().__init__(master, fg_color='transparent', **kwargs)
+        self.buscar = buscar
+        self.ao_selecionar = ao_selecionar
+        self.formatar = formatar
+        self.atraso_ms = atraso_ms
+        self.bloco = bloco
+        self.selecionado = None
+
+        self._termo = ''
+        self._resultados = []
+        self._botoes = []
+        self._exibidos = 0        # Botões empacotados, sempre os primeiros de _botoes
+        self._agendado = None     # after() do debounce
+        self._desenho = None      # after() do próximo bloco de resultados
+
+        self.entrada = ctk.CTkEntry(self, placeholder_text=placeholder, width=320)
+        self.entrada.pack(fill='x')
+        self.entrada.bind('<KeyRelease>', self._ao_digitar)
+        self.entrada.bind('<Return>', self._selecionar_primeiro)
+        self._lista = ctk.CTkScrollableFrame(self, height=altura_lista)
+        self._aviso = ctk.CTkLabel(self._lista, text='')
+
+    # ---------- API ----------
+    def mostrar(self, termo, resultados):
+        if termo != self._termo:
+            return  # Resposta de um termo que já foi alterado
+        self._cancelar(desenho_apenas=True)
+        self._resultados = list(resultados)
+        self._lista.pack(fill='x', pady=(5, 0))
+        # Só o primeiro bloco continua visível; os demais voltam bloco a bloco
+        self._ocultar_botoes(min(self.bloco, len(self._resultados)))
+        if self._resultados:
+            self._aviso.pack_forget()
+            self._desenhar(0)
+        else:
+            self._mostrar_aviso("Nenhum resultado encontrado.")
+
+    def selecionar(self, resultado):
+        self.selecionado = resultado
+        self._definir_texto(resultado[0])
+        self._esconder_lista()
+        if self.ao_selecionar is not None:
+            self.ao_selecionar(resultado)
+
+    def limpar(self):
+        self.selecionado = None
+        self._definir_texto('')
+        self._esconder_lista()
+
+    # ---------- Digitação (debounce) ----------
+    def _ao_digitar(self, _evento):
+        termo = self.entrada.get().strip()
+        if termo == self._termo:
+            return  # Teclas que não mudam o texto (setas, Shift...)
+        self._termo = termo
+        self._cancelar()
+        self._agendado = self.after(self.atraso_ms, self._executar)
+
+    def _selecionar_primeiro(self, _evento):
+        if self._resultados:
+            self.selecionar(self._resultados[0])
+
+    def _executar(self):
+        self._agendado = None
+        if not self._termo:
+            self._esconder_lista()
+            return
+        resultados = self.buscar(self._termo)
+        if resultados is None:
+            self._lista.pack(fill='x', pady=(5, 0))
+            self._mostrar_aviso("Buscando...")
+        else:
+            self.mostrar(self._termo, resultados)
+
+    # ---------- Desenho incremental ----------
+    def _desenhar(self, inicio):
+        self._desenho = None
+        fim = min(inicio + self.bloco, len(self._resultados))
+        for indice in range(inicio, fim):
+            if indice == len(self._botoes):
+                self._botoes.append(ctk.CTkButton(self._lista, anchor='w', fg_color='transparent',
+                                                  text_color=('gray10', 'gray90'), hover_color=('gray75', 'gray30')))
+            resultado = self._resultados[indice]
+            self._botoes[indice].configure(text=self.formatar(resultado),
+                                           command=lambda resultado=resultado: self.selecionar(resultado))
+            if indice >= self._exibidos:
+                self._botoes[indice].pack(fill='x')
+                self._exibidos = indice + 1
+        if fim < len(self._resultados):
+            self._desenho = self.after(1, self._desenhar, fim)
+
+    def _ocultar_botoes(self, manter):
+        for botao in self._botoes[manter:self._exibidos]:
+            botao.pack_forget()
+        self._exibidos = min(self._exibidos, manter)
+
+    def _mostrar_aviso(self, texto):
+        self._ocultar_botoes(0)
+        self._aviso.configure(text=texto)
+        self._aviso.pack(fill='x')
+
+    def _esconder_lista(self):
+        self._cancelar()
+        self._resultados = []
+        self._lista.pack_forget()
+
+    def _definir_texto(self, texto):
+        self._cancelar()
+        self.entrada.delete(0, 'end')
+        if texto:
+            self.entrada.insert(0, texto)
+        self._termo = texto
+
+    def _cancelar(self, desenho_apenas=False):
+        if self._agendado is not None and not desenho_apenas:
+            self.after_cancel(self._agendado)
+            self._agendado = None
+        if self._desenho is not None:
+            self.after_cancel(self._desenho)
+            self._desenho = None
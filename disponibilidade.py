@@ -0,0 +1,255 @@
+"""
+Disponibilidade de horários dos médicos do VidaPlus.
+
+Cada médico tem um expediente (blocos de atendimento por dia da semana e a
+duração de cada consulta, tabela `expedientes`). Os horários já reservados
+ficam em um índice de intervalos em memória por (medico_usuario, data_consulta):
+listas ordenadas de início/fim consultadas com bisect, carregadas sob demanda em
+janelas de dias (uma consulta ao banco cobre JANELA_DIAS dias) e atualizadas a
+cada reserva feita por esta estação. Reservas de outras estações aparecem quando
+o dia expira (TTL).
+
+Com o índice carregado, "este horário está livre?" e "próximos N horários
+livres do médico" são respondidos sem ir ao banco. A reserva em si
+(servicos.agendar_consulta, gravada pela fila de escrita) não depende do
+índice: o INSERT é protegido pela chave única (medico_usuario, data_consulta,
+hora_consulta), e a chave duplicada vira HorarioIndisponivel.
+
+Configuração por variável de ambiente:
+- VIDAPLUS_AGENDA_TTL  (segundos até um dia carregado ser relido do banco, padrão: 30)
+"""
+import bisect
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import cache
+import repositorio
+
+TTL_AGENDA = float(os.environ.get('VIDAPLUS_AGENDA_TTL', '30'))
+JANELA_DIAS = 14      # Dias lidos do banco de uma vez
+HORIZONTE_DIAS = 60   # Até quantos dias à frente procurar horários livres
+
+# Expediente dos médicos sem linhas em `expedientes`: segunda a sexta,
+# 08:00-12:00 e 13:00-17:00, consultas de 30 minutos (em minutos desde 00:00)
+EXPEDIENTE_PADRAO = {dia: [(8 * 60, 12 * 60, 30), (13 * 60, 17 * 60, 30)] for dia in range(5)}
+DURACAO_PADRAO = 30
+
+
+class HorarioIndisponivel(Exception):
+    # O horário pedido já está reservado ou fica fora do expediente do médico
+    def __init__(self, medico, data, hora, alternativas=()):
+        super().__init__(f"O horário {hora[:5]} de {data} com {medico} não está disponível.")
+        self.medico = medico
+        self.data = data
+        self.hora = hora
+        self.alternativas = list(alternativas)  # [(data, hora), ...] livres mais próximos
+
+
+# ---------- Conversões ----------
+def minutos(valor):
+    # Minutos desde 00:00 de um horário em qualquer formato aceito por normalizar_hora
+    horas, minutos_, _ = repositorio.normalizar_hora(valor).split(':')
+    return int(horas) * 60 + int(minutos_)
+
+
+def hora_texto(total_minutos):
+    return f"{total_minutos // 60:02d}:{total_minutos % 60:02d}:00"
+
+
+def como_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor))
+
+
+# ---------- Índice de intervalos de um dia ----------
+class _DiaAgenda:
+    __slots__ = ('inicios', 'fins', 'carregado_em')
+
+    def __init__(self, intervalos, carregado_em):
+        intervalos = sorted(intervalos)
+        self.inicios = [inicio for inicio, _ in intervalos]
+        self.fins = [fim for _, fim in intervalos]
+        self.carregado_em = carregado_em
+
+    def livre(self, inicio, fim):
+        posicao = bisect.bisect_right(self.inicios, inicio)
+        if posicao and self.fins[posicao - 1] > inicio:
+            return False
+        return posicao == len(self.inicios) or self.inicios[posicao] >= fim
+
+    def ocupar(self, inicio, fim):
+        posicao = bisect.bisect_right(self.inicios, inicio)
+        self.inicios.insert(posicao, inicio)
+        self.fins.insert(posicao, fim)
+
+    def liberar(self, inicio):
+        posicao = bisect.bisect_left(self.inicios, inicio)
+        if posicao < len(self.inicios) and self.inicios[posicao] == inicio:
+            del self.inicios[posicao]
+            del self.fins[posicao]
+
+
+# ---------- Agenda de disponibilidade ----------
+class AgendaDisponibilidade:
+    def __init__(self, repositorio_agendamentos=None, ttl=TTL_AGENDA, janela_dias=JANELA_DIAS):
+        self.repositorio = repositorio_agendamentos or repositorio.agendamentos()
+        self.ttl = ttl
+        self.janela_dias = janela_dias
+        # Expedientes mudam raramente: ficam no cache com o TTL padrão
+        self.expedientes = cache.CacheTTL(self._carregar_expediente)
+        self._dias = {}      # (medico, 'AAAA-MM-DD') -> _DiaAgenda
+        self._geracoes = {}  # medico -> contador incrementado a cada reserva registrada
+        self._lock = threading.Lock()
+
+    # ---------- Expediente ----------
+    def _carregar_expediente(self, medico):
+        blocos = {}
+        for dia_semana, inicio, fim, duracao in self.repositorio.listar_expedientes(medico):
+            blocos.setdefault(int(dia_semana), []).append((minutos(inicio), minutos(fim), int(duracao)))
+        return blocos or EXPEDIENTE_PADRAO
+
+    def blocos(self, medico, dia):
+        # [(inicio, fim, duracao), ...] em minutos para a data informada
+        return self.expedientes.obter(medico).get(como_data(dia).weekday(), [])
+
+    def duracao(self, medico, dia):
+        blocos = self.blocos(medico, dia)
+        return blocos[0][2] if blocos else DURACAO_PADRAO
+
+    # ---------- Índice por dia ----------
+    def _dia(self, medico, dia):
+        chave = (medico, dia.isoformat())
+        with self._lock:
+            entrada = self._dias.get(chave)
+        if entrada is None or time.monotonic() - entrada.carregado_em > self.ttl:
+            self._carregar_periodo(medico, dia, dia + timedelta(days=self.janela_dias - 1))
+            with self._lock:
+                entrada = self._dias[chave]
+        return entrada
+
+    def _carregar_periodo(self, medico, inicio, fim):
+        dias = [inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)]
+        duracoes = {dia: self.duracao(medico, dia) for dia in dias}
+        while True:
+            with self._lock:
+                geracao = self._geracoes.get(medico, 0)
+            carregado_em = time.monotonic()
+            reservados = {}
+            for data, hora in self.repositorio.listar_horarios_medico(medico, inicio.isoformat(), fim.isoformat()):
+                reservados.setdefault(como_data(data), []).append(minutos(hora))
+            with self._lock:
+                # Uma reserva registrada durante a leitura poderia ficar de fora: lê de novo
+                if self._geracoes.get(medico, 0) != geracao:
+                    continue
+                for dia in dias:
+                    intervalos = [(inicio_, inicio_ + duracoes[dia]) for inicio_ in reservados.get(dia, ())]
+                    self._dias[(medico, dia.isoformat())] = _DiaAgenda(intervalos, carregado_em)
+                return
+
+    # ---------- Consultas ----------
+    # Horários livres (HH:MM:SS) do médico na data; `a_partir_de` em minutos ignora os anteriores
+    def horarios_livres(self, medico, dia, a_partir_de=None):
+        dia = como_data(dia)
+        blocos = self.blocos(medico, dia)
+        if not blocos:
+            return []
+        entrada = self._dia(medico, dia)
+        livres = []
+        with self._lock:
+            for inicio, fim, duracao in blocos:
+                for horario in range(inicio, fim - duracao + 1, duracao):
+                    if a_partir_de is not None and horario < a_partir_de:
+                        continue
+                    if entrada.livre(horario, horario + duracao):
+                        livres.append(hora_texto(horario))
+        return livres
+
+    # `agora` (padrão: datetime.now()) define o que já passou: horário passado nunca está livre
+    def esta_livre(self, medico, dia, hora, agora=None):
+        dia = como_data(dia)
+        inicio = minutos(hora)
+        if datetime.combine(dia, datetime.min.time()) + timedelta(minutes=inicio) <= (agora or datetime.now()):
+            return False
+        # O horário precisa estar dentro de um bloco do expediente e alinhado à sua grade
+        for bloco_inicio, bloco_fim, duracao in self.blocos(medico, dia):
+            if bloco_inicio <= inicio and inicio + duracao <= bloco_fim and (inicio - bloco_inicio) % duracao == 0:
+                entrada = self._dia(medico, dia)
+                with self._lock:
+                    return entrada.livre(inicio, inicio + duracao)
+        return False
+
+    # [(data, hora), ...] com os próximos `quantidade` horários livres a partir de agora
+    def proximos_livres(self, medico, quantidade=5, a_partir_de=None, horizonte_dias=HORIZONTE_DIAS):
+        agora = a_partir_de or datetime.now()
+        resultado = []
+        for deslocamento in range(horizonte_dias):
+            dia = agora.date() + timedelta(days=deslocamento)
+            minimo = agora.hour * 60 + agora.minute + 1 if deslocamento == 0 else None
+            for hora in self.horarios_livres(medico, dia, minimo):
+                resultado.append((dia.isoformat(), hora))
+                if len(resultado) >= quantidade:
+                    return resultado
+        return resultado
+
+    # {data: [horas livres]} dos próximos `dias` dias, só com as datas que têm horário livre
+    def dias_livres(self, medico, dias=30, a_partir_de=None):
+        agora = a_partir_de or datetime.now()
+        resultado = {}
+        for deslocamento in range(dias):
+            dia = agora.date() + timedelta(days=deslocamento)
+            minimo = agora.hour * 60 + agora.minute + 1 if deslocamento == 0 else None
+            livres = self.horarios_livres(medico, dia, minimo)
+            if livres:
+                resultado[dia.isoformat()] = livres
+        return resultado
+
+    # ---------- Escritas ----------
+    # Mantém o índice coerente após uma reserva gravada no banco por esta estação
+    def registrar(self, medico, dia, hora):
+        dia = como_data(dia)
+        inicio = minutos(hora)
+        duracao = self.duracao(medico, dia)
+        with self._lock:
+            self._geracoes[medico] = self._geracoes.get(medico, 0) + 1
+            entrada = self._dias.get((medico, dia.isoformat()))
+            if entrada is not None:
+                entrada.ocupar(inicio, inicio + duracao)
+
+    def liberar(self, medico, dia, hora):
+        with self._lock:
+            self._geracoes[medico] = self._geracoes.get(medico, 0) + 1
+            entrada = self._dias.get((medico, como_data(dia).isoformat()))
+            if entrada is not None:
+                entrada.liberar(minutos(hora))
+
+    # HorarioIndisponivel com os próximos horários livres (horário ocupado no índice ou recusado
+    # pela chave única do banco quando a fila de escrita grava o agendamento)
+    def indisponivel(self, medico, dia, hora):
+        dia = como_data(dia)
+        # Alternativas a partir do horário pedido (ou de agora, se ele já passou)
+        pedido = datetime.combine(dia, datetime.min.time()) + timedelta(minutes=minutos(hora))
+        return HorarioIndisponivel(medico, dia.isoformat(), hora,
+                                   self.proximos_livres(medico, a_partir_de=max(pedido, datetime.now())))
+
+    def invalidar(self, medico=None):
+        # Descarta os dias carregados (de um médico ou de todos) e o expediente em cache
+        with self._lock:
+            for chave in [chave for chave in self._dias if medico is None or chave[0] == medico]:
+                del self._dias[chave]
+        self.expedientes.invalidar(medico)
+
+
+# ---------- Instância padrão (ligada ao backend global de `banco`) ----------
+_agenda = None
+
+
+def agenda():
+    global _agenda
+    if _agenda is None or _agenda.repositorio is not repositorio.agendamentos():
+        _agenda = AgendaDisponibilidade()
+    return _agenda
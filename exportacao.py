@@ -0,0 +1,198 @@
+"""
+Exportação dos agendamentos do VidaPlus para CSV ou iCalendar (.ics).
+
+Usada para entregar à clínica a agenda completa de um médico, ou de todos os
+médicos em um período. As linhas são lidas do banco por um cursor em fluxo
+(sem buffer no cliente, no MySQL) e passam por geradores até o arquivo, uma a
+uma: a memória usada não cresce com o tamanho da exportação. O arquivo pode
+ser comprimido com gzip enquanto é escrito.
+
+Colunas do CSV:
+    id, data, hora, medico_usuario, medico_nome, paciente_usuario, paciente_nome, observacoes
+
+No .ics cada consulta vira um VEVENT com a duração do expediente do médico,
+em horário local (sem fuso), como a agenda é gravada.
+
+Uso pela linha de comando:
+    python exportacao.py agendamentos.csv
+    python exportacao.py agenda.ics --medico dra.ana --inicio 2025-01-01 --fim 2025-06-30
+    python exportacao.py agendamentos.csv.gz --inicio 2024-01-01     (gzip pela extensão ou com --gzip)
+"""
+import argparse
+import csv
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import disponibilidade
+import repositorio
+
+FORMATOS = ('csv', 'ics')
+COLUNAS = ('id', 'data', 'hora', 'medico_usuario', 'medico_nome', 'paciente_usuario', 'paciente_nome',
+           'observacoes')
+# Período padrão: todas as consultas
+DATA_INICIAL = '0001-01-01'
+DATA_FINAL = '9999-12-31'
+TAMANHO_BLOCO = 2000           # Linhas buscadas do cursor por vez
+INTERVALO_PROGRESSO = 10000    # Linhas entre avisos de progresso
+LIMITE_LINHA_ICS = 75          # Octetos por linha do iCalendar (RFC 5545); o resto continua na linha seguinte
+
+
+# ---------- Formatos ----------
+def comprimido(caminho):
+    return caminho.lower().endswith('.gz')
+
+
+def formato_do_arquivo(caminho):
+    caminho = caminho.lower()
+    if caminho.endswith('.gz'):
+        caminho = caminho[:-3]
+    return 'ics' if caminho.endswith('.ics') else 'csv'
+
+
+def abrir_saida(caminho, comprimir=False):
+    # newline='': o CSV e o iCalendar já escrevem \r\n no fim de cada linha
+    if comprimir:
+        return gzip.open(caminho, 'wt', encoding='utf-8', newline='')
+    return open(caminho, 'w', encoding='utf-8', newline='')
+
+
+# Linha do SQL_EXPORTAR_AGENDAMENTOS com data e hora em texto (o MySQL devolve date e timedelta)
+def normalizar(linha):
+    id_agendamento, data, hora, *resto = linha
+    return (id_agendamento, str(data)[:10], repositorio.normalizar_hora(hora), *resto)
+
+
+# ---------- CSV ----------
+def linhas_csv(linhas):
+    yield COLUNAS
+    for linha in linhas:
+        yield tuple('' if valor is None else valor for valor in linha)
+
+
+# ---------- iCalendar ----------
+def escapar_ics(texto):
+    texto = str(texto or '')
+    for original, escapado in (('\\', '\\\\'), (';', '\\;'), (',', '\\,'), ('\r\n', '\\n'), ('\n', '\\n')):
+        texto = texto.replace(original, escapado)
+    return texto
+
+
+# Quebra a linha em pedaços de até 75 octetos (sem partir caracteres UTF-8), terminando em \r\n
+def dobrar_ics(linha):
+    dados = linha.encode('utf-8')
+    if len(dados) <= LIMITE_LINHA_ICS:
+        return linha + '\r\n'
+    partes, inicio, limite = [], 0, LIMITE_LINHA_ICS
+    while inicio < len(dados):
+        fim = min(inicio + limite, len(dados))
+        while fim < len(dados) and dados[fim] & 0xC0 == 0x80:
+            fim -= 1
+        partes.append(dados[inicio:fim].decode('utf-8'))
+        # As linhas de continuação começam com um espaço, que conta no limite
+        inicio, limite = fim, LIMITE_LINHA_ICS - 1
+    return '\r\n '.join(partes) + '\r\n'
+
+
+def linhas_ics(linhas, duracao_minutos):
+    # `duracao_minutos(medico, data)`: duração da consulta no expediente do médico
+    carimbo = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//VidaPlus//Agendamentos//PT-BR\r\nCALSCALE:GREGORIAN\r\n'
+    for id_agendamento, data, hora, medico, nome_medico, paciente, nome_paciente, observacoes in linhas:
+        inicio = datetime.fromisoformat(f"{data}T{hora}")
+        fim = inicio + timedelta(minutes=duracao_minutos(medico, data))
+        yield 'BEGIN:VEVENT\r\n'
+        yield f'UID:agendamento-{id_agendamento}@vidaplus\r\n'
+        yield f'DTSTAMP:{carimbo}\r\n'
+        yield f'DTSTART:{inicio:%Y%m%dT%H%M%S}\r\n'
+        yield f'DTEND:{fim:%Y%m%dT%H%M%S}\r\n'
+        yield dobrar_ics(f'SUMMARY:{escapar_ics(f"Consulta: {nome_paciente or paciente} com {nome_medico or medico}")}')
+        if observacoes:
+            yield dobrar_ics(f'DESCRIPTION:{escapar_ics(observacoes)}')
+        yield 'END:VEVENT\r\n'
+    yield 'END:VCALENDAR\r\n'
+
+
+# ---------- Exportação ----------
+class Exportador:
+    # `ao_progredir(estatisticas)` é chamado a cada INTERVALO_PROGRESSO linhas (na thread da exportação)
+    def __init__(self, repositorio_agendamentos=None, tamanho_bloco=TAMANHO_BLOCO, ao_progredir=None):
+        self.repositorio = repositorio_agendamentos or repositorio.agendamentos()
+        self.tamanho_bloco = tamanho_bloco
+        self.ao_progredir = ao_progredir
+        self._linhas = 0
+        self._inicio = None
+
+    def estatisticas(self):
+        segundos = time.monotonic() - self._inicio if self._inicio else 0.0
+        return {'linhas': self._linhas, 'segundos': segundos,
+                'linhas_por_segundo': self._linhas / segundos if segundos else 0.0}
+
+    # Conta as linhas que passam pelo pipeline e avisa o progresso
+    def _contar(self, linhas):
+        for linha in linhas:
+            self._linhas += 1
+            if self.ao_progredir is not None and self._linhas % INTERVALO_PROGRESSO == 0:
+                self.ao_progredir(self.estatisticas())
+            yield linha
+
+    def exportar(self, caminho, medico=None, inicio=None, fim=None, formato=None, comprimir=None):
+        formato = formato or formato_do_arquivo(caminho)
+        comprimir = comprimido(caminho) if comprimir is None else comprimir
+        self._inicio, self._linhas = time.monotonic(), 0
+
+        linhas = self.repositorio.exportar(inicio or DATA_INICIAL, fim or DATA_FINAL, medico, self.tamanho_bloco)
+        linhas = self._contar(normalizar(linha) for linha in linhas)
+        try:
+            with abrir_saida(caminho, comprimir) as arquivo:
+                if formato == 'ics':
+                    arquivo.writelines(linhas_ics(linhas, disponibilidade.agenda().duracao))
+                else:
+                    csv.writer(arquivo).writerows(linhas_csv(linhas))
+        except BaseException:
+            # Não deixa para trás um arquivo pela metade, que pareceria uma exportação completa
+            if os.path.exists(caminho):
+                os.remove(caminho)
+            raise
+
+        estatisticas = self.estatisticas()
+        estatisticas.update(arquivo=caminho, formato=formato, comprimido=comprimir, bytes=os.path.getsize(caminho))
+        return estatisticas
+
+
+def exportar(caminho, medico=None, inicio=None, fim=None, formato=None, comprimir=None,
+             tamanho_bloco=TAMANHO_BLOCO, ao_progredir=None):
+    exportador = Exportador(tamanho_bloco=tamanho_bloco, ao_progredir=ao_progredir)
+    return exportador.exportar(caminho, medico, inicio, fim, formato, comprimir)
+
+
+def formatar_progresso(estatisticas):
+    return f"{estatisticas['linhas']} consultas exportadas ({estatisticas['linhas_por_segundo']:.0f} linhas/s)"
+
+
+# ---------- Linha de comando ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportação dos agendamentos do VidaPlus (CSV ou iCalendar)")
+    parser.add_argument('arquivo', help="arquivo de saída (.csv, .ics; com .gz no fim é comprimido)")
+    parser.add_argument('--medico', help="usuário do médico (padrão: todos)")
+    parser.add_argument('--inicio', help="primeira data, AAAA-MM-DD (padrão: sem limite)")
+    parser.add_argument('--fim', help="última data, AAAA-MM-DD (padrão: sem limite)")
+    parser.add_argument('--formato', choices=FORMATOS, help="padrão: pela extensão do arquivo")
+    parser.add_argument('--gzip', action='store_true', help="comprime a saída mesmo sem a extensão .gz")
+    parser.add_argument('--bloco', type=int, default=TAMANHO_BLOCO, help="linhas buscadas do banco por vez")
+    args = parser.parse_args(argv)
+
+    def mostrar_progresso(estatisticas):
+        print(f"\r{formatar_progresso(estatisticas)}", end='', flush=True)
+
+    resultado = exportar(args.arquivo, args.medico, args.inicio, args.fim, args.formato,
+                         True if args.gzip else None, args.bloco, ao_progredir=mostrar_progresso)
+    print(f"\r{formatar_progresso(resultado)} em {resultado['segundos']:.1f} s "
+          f"({resultado['bytes'] / 1024:.0f} KiB em {resultado['arquivo']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
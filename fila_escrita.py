@@ -0,0 +1,342 @@
+"""
+Fila de escrita local do VidaPlus (write-behind).
+
+Cadastros e agendamentos feitos na recepção não vão direto ao banco: cada
+gravação entra primeiro em um diário local (um arquivo SQLite só de inserções,
+com fsync a cada confirmação) e é confirmada ao usuário na hora. Uma thread de
+reenvio esvazia o diário no banco principal, na ordem em que as gravações
+entraram, em lotes de uma transação só.
+
+Cada gravação tem uma chave única (idempotência) que entra no banco na mesma
+transação da escrita (tabela escritas_aplicadas): se o sistema cair entre o
+COMMIT no banco e a baixa no diário, o reenvio reconhece a chave e não grava
+duas vezes. Falhas de conexão interrompem o lote e o reenvio tenta de novo com
+espera exponencial, sem pular a ordem. Erros definitivos (um horário reservado
+por outra estação, um CPF já cadastrado) tiram a gravação da fila e a guardam
+como recusada, para a interface avisar.
+
+Quem grava pode aguardar alguns instantes pela confirmação do banco (aguardar):
+com o banco no ar a resposta chega antes disso, inclusive as recusas; com o
+banco lento ou fora do ar, a gravação fica salva no diário e segue depois.
+
+Observação: o diário guarda os dados pessoais dos cadastros (com a senha já
+criptografada) até o reenvio; fica no próprio terminal, como o banco local.
+
+Configuração por variáveis de ambiente:
+- VIDAPLUS_FILA_CAMINHO        (arquivo do diário, padrão: vidaplus-fila.db)
+- VIDAPLUS_FILA_LOTE           (gravações por transação no reenvio, padrão: 50)
+- VIDAPLUS_FILA_ESPERA         (segundos aguardando a confirmação do banco, padrão: 1)
+- VIDAPLUS_FILA_ESPERA_MAXIMA  (maior intervalo entre tentativas com o banco fora do ar, padrão: 30)
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import banco
+import rastreamento
+import repositorio
+
+CAMINHO_FILA = os.environ.get('VIDAPLUS_FILA_CAMINHO', 'vidaplus-fila.db')
+TAMANHO_LOTE = int(os.environ.get('VIDAPLUS_FILA_LOTE', '50'))
+ESPERA_CONFIRMACAO = float(os.environ.get('VIDAPLUS_FILA_ESPERA', '1'))
+ESPERA_MAXIMA = float(os.environ.get('VIDAPLUS_FILA_ESPERA_MAXIMA', '30'))
+ESPERA_INICIAL = 0.5
+INTERVALO_LIMPEZA = 3600     # Segundos entre limpezas das chaves antigas no banco
+MAXIMO_RESULTADOS = 1000     # Resultados recentes guardados para aguardar()
+
+logger = logging.getLogger('vidaplus.fila')
+
+SQL_CRIAR_DIARIO = [
+    """CREATE TABLE IF NOT EXISTS pendentes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        chave TEXT NOT NULL UNIQUE,
+        tipo TEXT NOT NULL,
+        dados TEXT NOT NULL,
+        criado_em REAL NOT NULL,
+        tentativas INTEGER NOT NULL DEFAULT 0,
+        ultimo_erro TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS recusadas (
+        seq INTEGER PRIMARY KEY,
+        chave TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        dados TEXT NOT NULL,
+        criado_em REAL NOT NULL,
+        recusada_em REAL NOT NULL,
+        erro TEXT NOT NULL,
+        duplicada INTEGER NOT NULL,
+        vista INTEGER NOT NULL DEFAULT 0
+    )""",
+]
+
+# Funções chamadas depois que uma gravação de um tipo é aplicada ou recusada pelo banco
+_ao_aplicar = {}   # tipo -> funcao(dados)
+_ao_recusar = {}   # tipo -> funcao(dados, duplicada)
+
+
+def ao_aplicar(tipo, funcao):
+    _ao_aplicar[tipo] = funcao
+
+
+def ao_recusar(tipo, funcao):
+    _ao_recusar[tipo] = funcao
+
+
+class EscritaRecusada(Exception):
+    # `duplicada`: o banco recusou por chave única (horário já reservado, usuário ou CPF já cadastrado)
+    def __init__(self, chave, tipo, dados, mensagem, duplicada):
+        super().__init__(mensagem)
+        self.chave = chave
+        self.tipo = tipo
+        self.dados = dados
+        self.duplicada = duplicada
+
+
+# ---------- Fila ----------
+class FilaEscrita:
+    def __init__(self, caminho=CAMINHO_FILA, tamanho_lote=TAMANHO_LOTE, espera_maxima=ESPERA_MAXIMA,
+                 repositorio_escritas=None):
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self.espera_maxima = espera_maxima
+        # None = repositorio.escritas(), que acompanha o backend global de `banco`
+        self._repositorio = repositorio_escritas
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._conexao.execute('PRAGMA journal_mode = WAL')
+        self._conexao.execute('PRAGMA synchronous = FULL')  # A gravação só é confirmada depois do fsync
+        for comando in SQL_CRIAR_DIARIO:
+            self._conexao.execute(comando)
+        self._lock = threading.Lock()                 # Protege a conexão do diário
+        self._condicao = threading.Condition()        # Avisa quem aguarda uma chave
+        self._resultados = OrderedDict()              # chave -> ('aplicada' | EscritaRecusada)
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+        self._falhas_seguidas = 0
+        self._ultimo_erro = None
+        self._contadores = {'enfileiradas': 0, 'aplicadas': 0, 'repetidas': 0, 'recusadas': 0,
+                            'lotes': 0, 'falhas_transitorias': 0}
+
+    def _executar(self, sql, parametros=()):
+        with self._lock:
+            return self._conexao.execute(sql, parametros).fetchall()
+
+    # ---------- Gravação ----------
+    # Grava no diário (com fsync) e retorna a chave; o reenvio ao banco acontece em segundo plano
+    def enfileirar(self, tipo, dados):
+        if tipo not in repositorio.GRAVACOES:
+            raise ValueError(f"Tipo de gravação desconhecido: {tipo!r}")
+        chave = uuid.uuid4().hex
+        with rastreamento.medir('fila', 'enfileirar'):
+            self._executar("INSERT INTO pendentes (chave, tipo, dados, criado_em) VALUES (?, ?, ?, ?)",
+                           (chave, tipo, json.dumps(dados, ensure_ascii=False), time.time()))
+        self._contadores['enfileiradas'] += 1
+        self.iniciar()
+        self._acordar.set()
+        return chave
+
+    # Aguarda até `tempo` segundos pelo banco: retorna 'aplicada' ou 'pendente' (segue no diário);
+    # levanta EscritaRecusada se o banco recusou a gravação
+    def aguardar(self, chave, tempo=ESPERA_CONFIRMACAO):
+        limite = time.monotonic() + tempo
+        with self._condicao:
+            while chave not in self._resultados:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return 'pendente'
+                self._condicao.wait(restante)
+            resultado = self._resultados[chave]
+        if isinstance(resultado, EscritaRecusada):
+            # Quem aguardou já recebe a recusa: a interface não precisa avisar de novo
+            self._executar("UPDATE recusadas SET vista = 1 WHERE chave = ?", (chave,))
+            raise resultado
+        return resultado
+
+    # ---------- Reenvio ----------
+    def iniciar(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._reenviar, name='vidaplus-fila', daemon=True)
+                    self._thread.start()
+
+    def encerrar(self, tempo=5):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(tempo)
+        with self._lock:
+            self._conexao.close()
+
+    # Aguarda até `tempo` segundos a fila esvaziar; retorna quantas gravações continuam pendentes
+    def drenar(self, tempo=10):
+        limite = time.monotonic() + tempo
+        while True:
+            pendentes = self.estado()['pendentes']
+            if not pendentes or time.monotonic() >= limite:
+                return pendentes
+            self._acordar.set()
+            time.sleep(0.05)
+
+    def _reenviar(self):
+        ultima_limpeza = 0.0
+        while not self._parar.is_set():
+            # Limpo antes da leitura: uma gravação enfileirada durante o lote não espera o próximo aviso
+            self._acordar.clear()
+            try:
+                processadas = self.drenar_lote()
+            except Exception as err:
+                # Banco fora do ar (ou driver indisponível): espera crescente, sem perder a ordem
+                self._registrar_falha(err)
+                espera = min(self.espera_maxima, ESPERA_INICIAL * 2 ** (self._falhas_seguidas - 1))
+                self._parar.wait(espera * random.uniform(0.8, 1.2))
+                continue
+            if processadas:
+                continue
+            if time.monotonic() - ultima_limpeza > INTERVALO_LIMPEZA:
+                ultima_limpeza = time.monotonic()
+                try:
+                    self.repositorio().limpar_aplicadas()
+                except banco.ERROS_BANCO as err:
+                    logger.warning("Falha ao limpar as chaves antigas da fila: %s", err)
+            self._acordar.wait(INTERVALO_LIMPEZA)
+
+    def repositorio(self):
+        return self._repositorio or repositorio.escritas()
+
+    # Envia o próximo lote ao banco e dá baixa no diário; retorna quantas gravações saíram da fila
+    def drenar_lote(self):
+        linhas = self._executar("SELECT seq, chave, tipo, dados, criado_em FROM pendentes ORDER BY seq LIMIT ?",
+                                (self.tamanho_lote,))
+        if not linhas:
+            return 0
+        itens = [(chave, tipo, json.loads(dados)) for _, chave, tipo, dados, _ in linhas]
+        with rastreamento.medir('fila', 'lote'):
+            resultados = self.repositorio().aplicar_lote(itens)
+        self._falhas_seguidas = 0
+        self._ultimo_erro = None
+        self._contadores['lotes'] += 1
+
+        backend = self.repositorio().backend
+        agora = time.time()
+        concluidos = {}
+        with self._lock:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                for (seq, chave, tipo, dados, criado_em), (situacao, erro) in zip(linhas, resultados):
+                    if situacao == 'recusada':
+                        duplicada = isinstance(erro, banco.ERROS_BANCO) and backend.eh_duplicado(erro)
+                        self._conexao.execute(
+                            "INSERT INTO recusadas (seq, chave, tipo, dados, criado_em, recusada_em, erro, duplicada) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (seq, chave, tipo, dados, criado_em, agora, str(erro), int(duplicada)))
+                        concluidos[chave] = EscritaRecusada(chave, tipo, json.loads(dados), str(erro), duplicada)
+                    else:
+                        concluidos[chave] = 'aplicada'
+                    self._conexao.execute("DELETE FROM pendentes WHERE seq = ?", (seq,))
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+
+        for (chave, tipo, dados), (situacao, _) in zip(itens, resultados):
+            self._contadores[f'{situacao}s'] += 1
+            resultado = concluidos[chave]
+            funcao = _ao_recusar.get(tipo) if situacao == 'recusada' else _ao_aplicar.get(tipo)
+            if funcao is None:
+                continue
+            try:
+                if situacao == 'recusada':
+                    funcao(dados, resultado.duplicada)
+                else:
+                    funcao(dados)
+            except Exception:
+                logger.exception("Falha no aviso da gravação %s (%s)", chave, tipo)
+
+        with self._condicao:
+            self._resultados.update(concluidos)
+            while len(self._resultados) > MAXIMO_RESULTADOS:
+                self._resultados.popitem(last=False)
+            self._condicao.notify_all()
+        return len(linhas)
+
+    def _registrar_falha(self, err):
+        self._falhas_seguidas += 1
+        self._ultimo_erro = str(err) or type(err).__name__
+        self._contadores['falhas_transitorias'] += 1
+        if not isinstance(err, banco.ERROS_BANCO):
+            logger.exception("Falha inesperada no reenvio da fila", exc_info=err)
+        try:
+            with self._lock:
+                self._conexao.execute(
+                    "UPDATE pendentes SET tentativas = tentativas + 1, ultimo_erro = ? "
+                    "WHERE seq = (SELECT MIN(seq) FROM pendentes)", (self._ultimo_erro,))
+        except sqlite3.Error:
+            pass
+
+    # ---------- Estado ----------
+    # Tamanho da fila e atraso (segundos desde a gravação mais antiga ainda não enviada)
+    def estado(self):
+        (pendentes, mais_antiga), = self._executar("SELECT COUNT(*), MIN(criado_em) FROM pendentes")
+        (recusadas,), = self._executar("SELECT COUNT(*) FROM recusadas WHERE vista = 0")
+        return {
+            'pendentes': pendentes,
+            'atraso_s': round(time.time() - mais_antiga, 1) if mais_antiga else 0.0,
+            'recusadas_nao_vistas': recusadas,
+            'falhas_seguidas': self._falhas_seguidas,
+            'ultimo_erro': self._ultimo_erro,
+        }
+
+    # Recusas que ninguém aguardou (chegaram depois da confirmação local); marca como vistas
+    def recusas_nao_vistas(self):
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT chave, tipo, dados, erro, duplicada FROM recusadas WHERE vista = 0 ORDER BY seq").fetchall()
+            self._conexao.execute("UPDATE recusadas SET vista = 1 WHERE vista = 0")
+        return [EscritaRecusada(chave, tipo, json.loads(dados), erro, bool(duplicada))
+                for chave, tipo, dados, erro, duplicada in linhas]
+
+    def metricas(self):
+        metricas = dict(self._contadores)
+        estado = self.estado()
+        metricas.update(pendentes=estado['pendentes'], atraso_segundos=estado['atraso_s'],
+                        falhas_seguidas=estado['falhas_seguidas'])
+        return metricas
+
+
+# ---------- Instância padrão ----------
+_fila = None
+_fila_lock = threading.Lock()
+
+
+def fila():
+    global _fila
+    if _fila is None:
+        with _fila_lock:
+            if _fila is None:
+                _fila = FilaEscrita()
+                rastreamento.registrar_contadores('fila', _fila.metricas)
+    return _fila
+
+
+def definir_fila(nova):
+    # Troca a fila padrão (usado por benchmarks e testes de carga)
+    global _fila
+    with _fila_lock:
+        _fila = nova
+    rastreamento.registrar_contadores('fila', nova.metricas)
+    return nova
+
+
+def encerrar():
+    global _fila
+    with _fila_lock:
+        atual, _fila = _fila, None
+    if atual is not None:
+        atual.encerrar()
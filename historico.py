@@ -0,0 +1,151 @@
+"""
+Histórico clínico dos pacientes do VidaPlus.
+
+Os registros (anotações, consultas, diagnósticos, exames e prescrições) só são
+incluídos: o banco recusa UPDATE e DELETE com gatilhos, e uma correção entra
+como um registro novo. Cada inclusão atualiza, na mesma transação, a linha de
+resumo do paciente (historico_resumo).
+
+A primeira tela do histórico custa o mesmo para um paciente com um registro e
+para um com décadas deles: a linha de resumo vem pela chave primária e a
+primeira página da linha do tempo pelo índice (paciente_usuario, criado_em, id).
+As páginas seguintes continuam da última linha recebida, sem OFFSET, e cada
+linha traz só o começo do texto; o texto inteiro e a lista de anexos são lidos
+ao abrir o registro.
+
+Os anexos ficam em uma tabela própria, fora da linha do registro, e o conteúdo
+só é lido do banco quando o anexo é aberto. Como nunca mudam, ficam guardados
+em uma pasta privada do usuário (arquivos.pasta_privada) depois da primeira
+leitura; a cópia guardada só é entregue depois de o banco confirmar que o
+anexo é do paciente.
+
+Configuração por variáveis de ambiente:
+- VIDAPLUS_HISTORICO_PAGINA   (registros por página da linha do tempo, padrão: 30)
+- VIDAPLUS_ANEXO_MAXIMO_MB    (tamanho máximo de um anexo, padrão: 16)
+- VIDAPLUS_ANEXOS_DIRETORIO   (onde os anexos abertos ficam guardados, padrão: ~/.cache/vidaplus/anexos)
+"""
+import mimetypes
+import os
+import re
+import threading
+
+import arquivos
+import rastreamento
+import repositorio
+
+TAMANHO_PAGINA = int(os.environ.get('VIDAPLUS_HISTORICO_PAGINA', '30'))
+ANEXO_MAXIMO_BYTES = int(float(os.environ.get('VIDAPLUS_ANEXO_MAXIMO_MB', '16')) * 1024 * 1024)
+DIRETORIO_ANEXOS = os.environ.get('VIDAPLUS_ANEXOS_DIRETORIO') or arquivos.pasta_padrao('anexos')
+TIPOS = ('anotacao', 'consulta', 'diagnostico', 'exame', 'prescricao')
+TAMANHO_TITULO = 150
+
+_contadores = {'paginas': 0, 'registros_abertos': 0, 'anexos_do_banco': 0, 'anexos_do_disco': 0,
+               'bytes_anexos_lidos': 0}
+_lock = threading.Lock()
+
+
+def _contar(chave, valor=1):
+    with _lock:
+        _contadores[chave] += valor
+
+
+def metricas():
+    with _lock:
+        return dict(_contadores)
+
+
+rastreamento.registrar_contadores('historico', metricas)
+
+
+# ---------- Leitura ----------
+# Primeira tela: (resumo, primeira página da linha do tempo); resumo None = paciente sem registros
+def abrir(paciente, limite=TAMANHO_PAGINA):
+    historico = repositorio.historico()
+    resumo = historico.resumo(paciente)
+    if resumo is None:
+        return None, []
+    return resumo, pagina(paciente, None, limite)
+
+
+# Próxima página, a partir da última linha recebida (`antes`)
+def pagina(paciente, antes=None, limite=TAMANHO_PAGINA):
+    _contar('paginas')
+    return repositorio.historico().listar(paciente, antes, limite)
+
+
+# (texto, anexos) de um registro aberto na linha do tempo; None se ele não é do paciente
+def detalhar(id_entrada, paciente):
+    _contar('registros_abertos')
+    return repositorio.historico().detalhar(id_entrada, paciente)
+
+
+# Caminho local do anexo, com o conteúdo lido do banco só na primeira vez em que é aberto nesta estação.
+# A posse (anexo de um registro do paciente) é conferida no banco sempre, mesmo com a cópia em disco.
+def abrir_anexo(id_anexo, nome, paciente, diretorio=None):
+    historico = repositorio.historico()
+    tamanho = historico.tamanho_anexo(id_anexo, paciente)
+    if tamanho is None:
+        raise LookupError("Anexo não encontrado no histórico deste paciente.")
+    # Anexos são dados clínicos: só numa pasta do próprio usuário, inacessível aos demais
+    diretorio = arquivos.pasta_privada(diretorio or DIRETORIO_ANEXOS)
+    caminho = os.path.join(diretorio, f"{id_anexo}-{nome_seguro(nome)}")
+    if os.path.isfile(caminho) and os.path.getsize(caminho) == tamanho:
+        _contar('anexos_do_disco')
+        return caminho
+
+    resultado = historico.conteudo_anexo(id_anexo, paciente)
+    if resultado is None:
+        raise LookupError("Anexo não encontrado no histórico deste paciente.")
+    _, conteudo = resultado
+    _contar('anexos_do_banco')
+    _contar('bytes_anexos_lidos', len(conteudo))
+    return arquivos.gravar(caminho, conteudo)
+
+
+def nome_seguro(nome):
+    nome = re.sub(r'[^\w.\- ]', '_', os.path.basename(nome or '')).strip(' .')
+    return nome[:100] or 'anexo'
+
+
+# ---------- Inclusão ----------
+# (nome, tipo_mime, conteudo) de um arquivo a anexar; ValueError se ele passar do tamanho máximo
+def ler_anexo(caminho):
+    tamanho = os.path.getsize(caminho)
+    if tamanho > ANEXO_MAXIMO_BYTES:
+        raise ValueError(f"O arquivo {os.path.basename(caminho)} tem {tamanho / 1024 / 1024:.1f} MB; "
+                         f"o máximo é {ANEXO_MAXIMO_BYTES / 1024 / 1024:g} MB.")
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    tipo_mime = mimetypes.guess_type(caminho)[0] or 'application/octet-stream'
+    return os.path.basename(caminho), tipo_mime, conteudo
+
+
+# Inclui um registro no histórico do paciente com os arquivos de `caminhos` anexados; retorna o id.
+# ValueError para tipo, título ou anexo inválidos.
+def registrar(paciente, autor, tipo, titulo, texto='', caminhos=()):
+    titulo = ' '.join((titulo or '').split())
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de registro inválido: {tipo!r}")
+    if not titulo:
+        raise ValueError("Informe o título do registro.")
+    if len(titulo) > TAMANHO_TITULO:
+        raise ValueError(f"O título pode ter no máximo {TAMANHO_TITULO} caracteres.")
+    anexos = [ler_anexo(caminho) for caminho in caminhos]
+    return repositorio.historico().registrar(paciente, autor, tipo, titulo, (texto or '').strip(), anexos)
+
+
+# ---------- Formatação ----------
+def formatar_resumo(resumo):
+    if resumo is None:
+        return "Nenhum registro no histórico clínico."
+    total, anexos, primeira_em, ultima_em, tipo, titulo, autor = resumo
+    return (f"{total} registro(s) e {anexos} anexo(s), de {str(primeira_em)[:10]} a {str(ultima_em)[:10]}\n"
+            f"Último: {tipo} - {titulo} ({autor})")
+
+
+def formatar_tamanho(tamanho):
+    if tamanho < 1024:
+        return f"{tamanho} B"
+    if tamanho < 1024 * 1024:
+        return f"{tamanho / 1024:.0f} KB"
+    return f"{tamanho / 1024 / 1024:.1f} MB"
@@ -0,0 +1,280 @@
+"""
+Importação em lote de usuários do VidaPlus a partir de arquivos CSV ou JSONL.
+
+Usada para cadastrar os pacientes (ou médicos) de uma clínica nova de uma só
+vez, em vez de um por um na tela de cadastro. O arquivo é lido em fluxo, linha a
+linha; CPF, campos obrigatórios e unicidade de usuário/CPF são validados em
+memória contra os cadastros já existentes (carregados uma única vez). As senhas
+são criptografadas em paralelo no pool de processos e as linhas válidas são
+gravadas em lotes com executemany, um lote por transação. Enquanto um lote é
+gravado, as senhas do próximo já estão sendo criptografadas.
+
+Linhas recusadas vão para um arquivo de rejeitados (CSV, com o número da linha e
+o motivo; a senha não é copiada para ele).
+
+Colunas do CSV (cabeçalho, separado por vírgula ou ponto e vírgula) ou chaves do JSONL:
+    nome_completo, cpf, telefone, endereco, usuario, senha e, opcionalmente, hierarquia
+
+Uso pela linha de comando:
+    python importacao.py pacientes.csv
+    python importacao.py medicos.jsonl --hierarquia Medico --lote 500 --rejeitados recusados.csv
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+import banco
+import limitador
+import registros
+import repositorio
+import senhas
+import tarefas
+
+COLUNAS = ('nome_completo', 'cpf', 'telefone', 'endereco', 'usuario', 'senha')
+OBRIGATORIAS = ('nome_completo', 'cpf', 'usuario', 'senha')
+# Tamanhos máximos das colunas em "BD VidaPlus.sql"
+TAMANHOS = {'nome_completo': 100, 'cpf': 14, 'telefone': 20, 'endereco': 150, 'usuario': 50}
+HIERARQUIAS = ('Administrador', 'Medico', 'Paciente')
+TAMANHO_LOTE = 200
+
+
+# ---------- CPF ----------
+def digitos_cpf(cpf):
+    return re.sub(r'\D', '', cpf or '')
+
+
+# Confere os dois dígitos verificadores (aceita CPF com ou sem pontuação)
+def cpf_valido(cpf):
+    digitos = digitos_cpf(cpf)
+    if len(digitos) != 11 or digitos == digitos[0] * 11:
+        return False
+    for tamanho in (9, 10):
+        soma = sum(int(digito) * (tamanho + 1 - i) for i, digito in enumerate(digitos[:tamanho]))
+        if (soma * 10) % 11 % 10 != int(digitos[tamanho]):
+            return False
+    return True
+
+
+# ---------- Leitura em fluxo ----------
+def formato_do_arquivo(caminho):
+    return 'jsonl' if caminho.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+# Gera (numero_da_linha, dados, erro) sem carregar o arquivo inteiro na memória
+def ler_registros(caminho, formato=None):
+    formato = formato or formato_do_arquivo(caminho)
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        if formato == 'jsonl':
+            for numero, linha in enumerate(arquivo, 1):
+                if not linha.strip():
+                    continue
+                try:
+                    dados = json.loads(linha)
+                except json.JSONDecodeError as err:
+                    yield numero, None, f"JSON inválido: {err.msg}"
+                    continue
+                if not isinstance(dados, dict):
+                    yield numero, None, "a linha não é um objeto JSON"
+                    continue
+                yield numero, dados, None
+        else:
+            # Planilhas exportadas em português costumam usar ';' como separador
+            cabecalho = arquivo.readline()
+            arquivo.seek(0)
+            separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+            leitor = csv.DictReader(arquivo, delimiter=separador)
+            for dados in leitor:
+                yield leitor.line_num, dados, None
+
+
+# ---------- Validação em memória ----------
+class Validador:
+    # Mantém os usuários e CPFs já cadastrados (e os aceitos neste arquivo) para
+    # recusar duplicados sem uma consulta ao banco por linha
+    def __init__(self, chaves_existentes, hierarquia_padrao='Paciente'):
+        self.hierarquia_padrao = hierarquia_padrao
+        self.usuarios = set()
+        self.cpfs = set()
+        for usuario, cpf in chaves_existentes:
+            # O MySQL compara usuario sem diferenciar maiúsculas (collation padrão)
+            self.usuarios.add(usuario.casefold())
+            self.cpfs.add(digitos_cpf(cpf))
+
+    # Retorna (campos, hierarquia, None) para linhas válidas ou (None, None, motivo)
+    def validar(self, dados):
+        valores = {coluna: str(dados.get(coluna) or '').strip() for coluna in COLUNAS}
+        faltando = [coluna for coluna in OBRIGATORIAS if not valores[coluna]]
+        if faltando:
+            return None, None, f"campos obrigatórios vazios: {', '.join(faltando)}"
+        for coluna, tamanho in TAMANHOS.items():
+            if len(valores[coluna]) > tamanho:
+                return None, None, f"{coluna} excede {tamanho} caracteres"
+
+        hierarquia = str(dados.get('hierarquia') or self.hierarquia_padrao).strip()
+        if hierarquia not in HIERARQUIAS:
+            return None, None, f"hierarquia inválida: {hierarquia}"
+        if not cpf_valido(valores['cpf']):
+            return None, None, "CPF inválido"
+
+        usuario, cpf = valores['usuario'].casefold(), digitos_cpf(valores['cpf'])
+        if usuario in self.usuarios:
+            return None, None, "usuário já cadastrado"
+        if cpf in self.cpfs:
+            return None, None, "CPF já cadastrado"
+        self.usuarios.add(usuario)
+        self.cpfs.add(cpf)
+
+        campos = tuple(valores[coluna] or None for coluna in COLUNAS)
+        return campos, hierarquia, None
+
+
+# ---------- Importação ----------
+class Importador:
+    # `ao_progredir(estatisticas)` é chamado após cada lote gravado (na thread da importação)
+    def __init__(self, repositorio_usuarios=None, tamanho_lote=TAMANHO_LOTE, ao_progredir=None):
+        self.repositorio = repositorio_usuarios or repositorio.usuarios()
+        self.tamanho_lote = tamanho_lote
+        self.ao_progredir = ao_progredir
+        self._contadores = {'lidas': 0, 'importadas': 0, 'rejeitadas': 0}
+        self._inicio = None
+        self._rejeitados = None
+        self._hierarquias = set()
+
+    def estatisticas(self):
+        dados = dict(self._contadores)
+        dados['segundos'] = time.monotonic() - self._inicio if self._inicio else 0.0
+        dados['linhas_por_segundo'] = dados['lidas'] / dados['segundos'] if dados['segundos'] else 0.0
+        return dados
+
+    def importar(self, caminho, hierarquia='Paciente', formato=None, caminho_rejeitados=None):
+        self._inicio = time.monotonic()
+        caminho_rejeitados = caminho_rejeitados or caminho_rejeitados_padrao(caminho)
+        validador = Validador(self.repositorio.listar_chaves_unicas(), hierarquia)
+
+        with open(caminho_rejeitados, 'w', newline='', encoding='utf-8') as arquivo_rejeitados:
+            self._rejeitados = csv.writer(arquivo_rejeitados)
+            self._rejeitados.writerow(('linha', 'motivo') + COLUNAS[:-1])
+
+            lote = []
+            pendente = None  # Lote cujas senhas já estão sendo criptografadas
+            for numero, dados, erro in ler_registros(caminho, formato):
+                self._contadores['lidas'] += 1
+                campos = None
+                if erro is None:
+                    campos, hierarquia_linha, erro = validador.validar(dados)
+                if erro is not None:
+                    self._rejeitar(numero, erro, dados or {})
+                    continue
+
+                lote.append((numero, campos, hierarquia_linha))
+                if len(lote) >= self.tamanho_lote:
+                    pendente = self._avancar(pendente, lote)
+                    lote = []
+
+            if lote:
+                pendente = self._avancar(pendente, lote)
+            if pendente is not None:
+                self._gravar(*pendente)
+
+        # Telas do administrador com cadastros em memória precisam recarregar
+        for hierarquia_gravada in self._hierarquias:
+            registros.armazem(hierarquia_gravada).marcar_velho()
+        # Usuários recém-importados podem estar no cache de inexistentes do login
+        limitador.inexistentes().limpar()
+
+        estatisticas = self.estatisticas()
+        estatisticas['arquivo_rejeitados'] = caminho_rejeitados
+        return estatisticas
+
+    # Envia as senhas do lote novo ao pool de processos e grava o lote anterior enquanto isso
+    def _avancar(self, pendente, lote):
+        senhas_lote = [campos[5] for _, campos, _ in lote]
+        pedacos = max(1, len(senhas_lote) // (tarefas.PROCESSOS_CPU * 4))
+        hashes = tarefas.executor_cpu().map(senhas.gerar_hash_senha, senhas_lote, chunksize=pedacos)
+        if pendente is not None:
+            self._gravar(*pendente)
+        return lote, hashes
+
+    def _gravar(self, lote, hashes):
+        linhas = [(*campos[:5], senha_hash, hierarquia)
+                  for (_, campos, hierarquia), senha_hash in zip(lote, hashes)]
+        try:
+            self.repositorio.inserir_lote(linhas)
+        except banco.ERROS_BANCO as err:
+            if not self.repositorio.backend.eh_duplicado(err):
+                raise
+            # Outro terminal cadastrou alguém do lote no meio tempo: grava linha a linha
+            # para recusar só os duplicados
+            self._gravar_individualmente(lote, linhas)
+        else:
+            self._contadores['importadas'] += len(linhas)
+            self._hierarquias.update(linha[6] for linha in linhas)
+
+        if self.ao_progredir is not None:
+            self.ao_progredir(self.estatisticas())
+
+    def _gravar_individualmente(self, lote, linhas):
+        for (numero, campos, _), linha in zip(lote, linhas):
+            try:
+                self.repositorio.inserir_lote([linha])
+            except banco.ERROS_BANCO as err:
+                if not self.repositorio.backend.eh_duplicado(err):
+                    raise
+                self._rejeitar(numero, "usuário ou CPF já cadastrado", dict(zip(COLUNAS, campos)))
+            else:
+                self._contadores['importadas'] += 1
+                self._hierarquias.add(linha[6])
+
+    def _rejeitar(self, numero, motivo, dados):
+        self._contadores['rejeitadas'] += 1
+        # A senha não é copiada para o arquivo de rejeitados
+        self._rejeitados.writerow((numero, motivo) + tuple(dados.get(coluna) or '' for coluna in COLUNAS[:-1]))
+
+
+def caminho_rejeitados_padrao(caminho):
+    base, _ = os.path.splitext(caminho)
+    return f"{base}.rejeitados.csv"
+
+
+def importar(caminho, hierarquia='Paciente', formato=None, tamanho_lote=TAMANHO_LOTE,
+             caminho_rejeitados=None, ao_progredir=None):
+    importador = Importador(tamanho_lote=tamanho_lote, ao_progredir=ao_progredir)
+    return importador.importar(caminho, hierarquia, formato, caminho_rejeitados)
+
+
+def formatar_progresso(estatisticas):
+    return (f"{estatisticas['lidas']} lidas, {estatisticas['importadas']} importadas, "
+            f"{estatisticas['rejeitadas']} rejeitadas ({estatisticas['linhas_por_segundo']:.0f} linhas/s)")
+
+
+# ---------- Linha de comando ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importação em lote de usuários do VidaPlus")
+    parser.add_argument('arquivo', help="arquivo CSV ou JSONL com os cadastros")
+    parser.add_argument('--hierarquia', default='Paciente', choices=HIERARQUIAS,
+                        help="hierarquia das linhas sem a coluna 'hierarquia' (padrão: Paciente)")
+    parser.add_argument('--formato', choices=('csv', 'jsonl'), help="padrão: pela extensão do arquivo")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="linhas por transação")
+    parser.add_argument('--rejeitados', help="arquivo CSV de linhas recusadas (padrão: <arquivo>.rejeitados.csv)")
+    args = parser.parse_args(argv)
+
+    def mostrar_progresso(estatisticas):
+        print(f"\r{formatar_progresso(estatisticas)}", end='', flush=True)
+
+    try:
+        resultado = importar(args.arquivo, args.hierarquia, args.formato, args.lote,
+                             args.rejeitados, ao_progredir=mostrar_progresso)
+    finally:
+        tarefas.encerrar()
+    print(f"\r{formatar_progresso(resultado)} em {resultado['segundos']:.1f} s")
+    if resultado['rejeitadas']:
+        print(f"Linhas recusadas em: {resultado['arquivo_rejeitados']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
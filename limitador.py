@@ -0,0 +1,229 @@
+"""
+Limite de tentativas de login do VidaPlus.
+
+Cada tentativa consome uma ficha de dois baldes (token bucket): o do usuário
+digitado e o do terminal. Sem ficha, a tentativa é recusada antes de qualquer
+consulta ao banco ou bcrypt; um login bem-sucedido devolve as fichas, então só
+os erros esgotam os baldes. Assim um script martelando a tela de login, ou
+alguém testando senhas de um colega, não tira CPU dos logins legítimos.
+
+Usuários que o banco disse não existir ficam em um cache negativo limitado
+(com TTL), evitando a ida ao banco a cada erro de digitação repetido. Para
+não revelar pela demora quais usuários existem, servicos.autenticar_usuario
+confere a senha contra um hash fictício nesses casos.
+
+Os contadores dos dois mecanismos entram nas medições de `rastreamento`
+(JSON e formato do Prometheus).
+
+Configuração por variáveis de ambiente:
+- VIDAPLUS_LOGIN_TENTATIVAS_USUARIO   (fichas por usuário, padrão: 5)
+- VIDAPLUS_LOGIN_INTERVALO_USUARIO    (segundos para repor uma ficha do usuário, padrão: 30)
+- VIDAPLUS_LOGIN_TENTATIVAS_TERMINAL  (fichas do terminal, padrão: 20)
+- VIDAPLUS_LOGIN_INTERVALO_TERMINAL   (segundos para repor uma ficha do terminal, padrão: 3)
+- VIDAPLUS_INEXISTENTES_TTL           (segundos que um usuário inexistente fica no cache, padrão: 60)
+- VIDAPLUS_INEXISTENTES_MAXIMO        (usuários inexistentes guardados, padrão: 10000)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import rastreamento
+
+TENTATIVAS_USUARIO = float(os.environ.get('VIDAPLUS_LOGIN_TENTATIVAS_USUARIO', '5'))
+INTERVALO_USUARIO = float(os.environ.get('VIDAPLUS_LOGIN_INTERVALO_USUARIO', '30'))
+TENTATIVAS_TERMINAL = float(os.environ.get('VIDAPLUS_LOGIN_TENTATIVAS_TERMINAL', '20'))
+INTERVALO_TERMINAL = float(os.environ.get('VIDAPLUS_LOGIN_INTERVALO_TERMINAL', '3'))
+TTL_INEXISTENTES = float(os.environ.get('VIDAPLUS_INEXISTENTES_TTL', '60'))
+MAXIMO_INEXISTENTES = int(os.environ.get('VIDAPLUS_INEXISTENTES_MAXIMO', '10000'))
+# Baldes de usuário guardados; os mais antigos saem primeiro (um balde cheio não guarda informação)
+MAXIMO_BALDES = 10000
+
+
+class TentativasExcedidas(Exception):
+    # `escopo`: 'usuario' ou 'terminal'; `espera`: segundos até a próxima tentativa ser aceita
+    def __init__(self, escopo, espera):
+        super().__init__(f"Muitas tentativas de login. Aguarde {int(espera) + 1} segundos.")
+        self.escopo = escopo
+        self.espera = espera
+
+
+# ---------- Balde de fichas ----------
+class Balde:
+    __slots__ = ('capacidade', 'intervalo', 'fichas', 'atualizado_em')
+
+    def __init__(self, capacidade, intervalo, agora):
+        self.capacidade = capacidade
+        self.intervalo = intervalo
+        self.fichas = capacidade
+        self.atualizado_em = agora
+
+    def _repor(self, agora):
+        if self.intervalo > 0:
+            self.fichas = min(self.capacidade, self.fichas + (agora - self.atualizado_em) / self.intervalo)
+        self.atualizado_em = agora
+
+    # Segundos até haver uma ficha inteira (0 se já houver)
+    def espera(self, agora):
+        self._repor(agora)
+        return 0.0 if self.fichas >= 1 else (1 - self.fichas) * self.intervalo
+
+    def consumir(self, agora):
+        self._repor(agora)
+        self.fichas -= 1
+
+    def devolver(self, agora):
+        self._repor(agora)
+        self.fichas = min(self.capacidade, self.fichas + 1)
+
+
+# ---------- Limitador de tentativas ----------
+class LimitadorLogin:
+    def __init__(self, tentativas_usuario=TENTATIVAS_USUARIO, intervalo_usuario=INTERVALO_USUARIO,
+                 tentativas_terminal=TENTATIVAS_TERMINAL, intervalo_terminal=INTERVALO_TERMINAL,
+                 maximo_baldes=MAXIMO_BALDES, relogio=time.monotonic):
+        self.tentativas_usuario = tentativas_usuario
+        self.intervalo_usuario = intervalo_usuario
+        self.maximo_baldes = maximo_baldes
+        self.relogio = relogio
+        self._terminal = Balde(tentativas_terminal, intervalo_terminal, relogio())
+        self._usuarios = OrderedDict()  # usuario normalizado -> Balde
+        self._lock = threading.Lock()
+        self._contadores = {'permitidas': 0, 'recusadas_usuario': 0, 'recusadas_terminal': 0, 'devolvidas': 0}
+
+    @staticmethod
+    def _chave(usuario):
+        # 'Ana' e ' ana' disputam o mesmo balde (o MySQL compara usuários sem diferenciar maiúsculas)
+        return usuario.strip().lower()
+
+    def _balde_usuario(self, chave, agora):
+        balde = self._usuarios.get(chave)
+        if balde is None:
+            balde = self._usuarios[chave] = Balde(self.tentativas_usuario, self.intervalo_usuario, agora)
+            if len(self._usuarios) > self.maximo_baldes:
+                self._usuarios.popitem(last=False)
+        else:
+            self._usuarios.move_to_end(chave)
+        return balde
+
+    # Consome uma ficha do usuário e uma do terminal, ou levanta TentativasExcedidas sem consumir nada
+    def tentar(self, usuario):
+        with self._lock:
+            agora = self.relogio()
+            balde = self._balde_usuario(self._chave(usuario), agora)
+            for escopo, alvo in (('terminal', self._terminal), ('usuario', balde)):
+                espera = alvo.espera(agora)
+                if espera:
+                    self._contadores[f'recusadas_{escopo}'] += 1
+                    raise TentativasExcedidas(escopo, espera)
+            self._terminal.consumir(agora)
+            balde.consumir(agora)
+            self._contadores['permitidas'] += 1
+
+    # Login bem-sucedido: as fichas da tentativa voltam aos baldes
+    def devolver(self, usuario):
+        with self._lock:
+            agora = self.relogio()
+            self._terminal.devolver(agora)
+            balde = self._usuarios.get(self._chave(usuario))
+            if balde is not None:
+                balde.devolver(agora)
+                if balde.fichas >= balde.capacidade:
+                    del self._usuarios[self._chave(usuario)]
+            self._contadores['devolvidas'] += 1
+
+    def metricas(self):
+        with self._lock:
+            agora = self.relogio()
+            self._terminal.espera(agora)
+            metricas = dict(self._contadores)
+            metricas['baldes_usuario'] = len(self._usuarios)
+            metricas['usuarios_bloqueados'] = sum(1 for balde in self._usuarios.values() if balde.espera(agora))
+            metricas['fichas_terminal'] = round(self._terminal.fichas, 3)
+        return metricas
+
+
+# ---------- Cache negativo de usuários inexistentes ----------
+class CacheInexistentes:
+    def __init__(self, ttl=TTL_INEXISTENTES, maximo=MAXIMO_INEXISTENTES, relogio=time.monotonic):
+        self.ttl = ttl
+        self.maximo = maximo
+        self.relogio = relogio
+        self._entradas = OrderedDict()  # usuario normalizado -> expira_em (em ordem de inclusão)
+        self._lock = threading.Lock()
+        self._contadores = {'acertos': 0, 'falhas': 0, 'inclusoes': 0, 'descartes': 0}
+
+    def __len__(self):
+        return len(self._entradas)
+
+    # Mesma chave do limitador: 'ANA' recusado e depois 'ana' cadastrado não pode seguir como inexistente
+    _chave = staticmethod(LimitadorLogin._chave)
+
+    def contem(self, usuario):
+        chave = self._chave(usuario)
+        with self._lock:
+            expira_em = self._entradas.get(chave)
+            if expira_em is not None and expira_em <= self.relogio():
+                del self._entradas[chave]
+                expira_em = None
+            self._contadores['acertos' if expira_em is not None else 'falhas'] += 1
+            return expira_em is not None
+
+    def adicionar(self, usuario):
+        chave = self._chave(usuario)
+        with self._lock:
+            self._entradas.pop(chave, None)
+            self._entradas[chave] = self.relogio() + self.ttl
+            self._contadores['inclusoes'] += 1
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    # O usuário passou a existir (cadastro, importação ou troca de nome)
+    def descartar(self, usuario):
+        chave = self._chave(usuario)
+        with self._lock:
+            if self._entradas.pop(chave, None) is not None:
+                self._contadores['descartes'] += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def metricas(self):
+        with self._lock:
+            metricas = dict(self._contadores)
+            metricas['tamanho'] = len(self._entradas)
+        return metricas
+
+
+# ---------- Instâncias padrão ----------
+_tentativas = None
+_inexistentes = None
+_instancias_lock = threading.Lock()
+
+
+def tentativas():
+    global _tentativas
+    if _tentativas is None:
+        with _instancias_lock:
+            if _tentativas is None:
+                _tentativas = LimitadorLogin()
+    return _tentativas
+
+
+def inexistentes():
+    global _inexistentes
+    if _inexistentes is None:
+        with _instancias_lock:
+            if _inexistentes is None:
+                _inexistentes = CacheInexistentes()
+    return _inexistentes
+
+
+def metricas():
+    resultado = {f'tentativas_{chave}': valor for chave, valor in tentativas().metricas().items()}
+    resultado.update({f'inexistentes_{chave}': valor for chave, valor in inexistentes().metricas().items()})
+    return resultado
+
+
+rastreamento.registrar_contadores('login', metricas)
@@ -0,0 +1,417 @@
+"""
+Migrações versionadas do esquema do VidaPlus.
+
+"BD VidaPlus.sql" cria as tabelas base; cada alteração posterior (índices,
+colunas, tabelas novas) entra aqui como uma Migracao numerada. As migrações são
+aplicadas na inicialização do sistema e registradas na tabela schema_version,
+de modo que cada uma roda uma única vez por banco.
+
+Uso pela linha de comando:
+    python migracoes.py               aplica as migrações pendentes
+    python migracoes.py --verificar   roda EXPLAIN em cada consulta do sistema e
+                                      falha se alguma fizer varredura completa
+
+Observação: no MySQL o otimizador pode preferir varrer tabelas quase vazias
+mesmo com índice disponível; rode a verificação sobre uma base com volume
+representativo.
+"""
+import argparse
+import sys
+
+import banco
+import repositorio
+
+
+# ---------- Definição das migrações ----------
+class Migracao:
+    # `comandos` vale para qualquer banco; `mysql`/`sqlite` trazem os comandos
+    # específicos de cada dialeto, executados depois dos comuns
+    def __init__(self, versao, descricao, comandos=(), mysql=(), sqlite=()):
+        self.versao = versao
+        self.descricao = descricao
+        self.comandos = list(comandos)
+        self.especificos = {'mysql': list(mysql), 'sqlite': list(sqlite)}
+
+    def comandos_para(self, dialeto):
+        return self.comandos + self.especificos.get(dialeto, [])
+
+
+MIGRACOES = [
+    Migracao(1, 'Índices das consultas de agendamentos e usuários', comandos=[
+        # consultar_agendamentos_paciente: WHERE paciente_usuario ORDER BY data, hora
+        "CREATE INDEX idx_agendamentos_paciente_data ON agendamentos (paciente_usuario, data_consulta, hora_consulta)",
+        # Agenda do médico: WHERE medico_usuario AND data_consulta BETWEEN ... (substituído na migração 4)
+        "CREATE INDEX idx_agendamentos_medico_data ON agendamentos (medico_usuario, data_consulta, hora_consulta)",
+        # Listas de médicos/pacientes: WHERE hierarquia ORDER BY usuario (índice de cobertura)
+        "CREATE INDEX idx_usuarios_hierarquia_usuario ON usuarios (hierarquia, usuario)",
+    ]),
+    Migracao(2, 'Versão dos cadastros para controle de concorrência otimista', comandos=[
+        # Incrementada a cada UPDATE; a gravação só vale se a versão lida ainda for a atual
+        "ALTER TABLE usuarios ADD COLUMN versao INT NOT NULL DEFAULT 1",
+    ]),
+    Migracao(3, 'Expediente dos médicos (horários de atendimento e duração das consultas)', comandos=[
+        # Um bloco de atendimento por linha; médicos sem linhas usam disponibilidade.EXPEDIENTE_PADRAO
+        """CREATE TABLE expedientes (
+            medico_usuario VARCHAR(50) NOT NULL,
+            dia_semana INT NOT NULL,
+            hora_inicio TIME NOT NULL,
+            hora_fim TIME NOT NULL,
+            duracao_minutos INT NOT NULL DEFAULT 30,
+            PRIMARY KEY (medico_usuario, dia_semana, hora_inicio),
+            FOREIGN KEY (medico_usuario) REFERENCES usuarios(usuario)
+        )""",
+    ]),
+    Migracao(4, 'Chave única do horário do médico (impede reservas duplicadas)', comandos=[
+        # Reservas duplicadas antigas (mesmo médico, data e hora) impediriam a criação da chave:
+        # fica a de menor id e as demais vão para agendamentos_conflitos, com o id da mantida,
+        # para a administração remarcar. Os comandos podem ser repetidos se a migração parar no meio
+        # (no MySQL cada DDL confirma a transação).
+        """CREATE TABLE IF NOT EXISTS agendamentos_conflitos (
+            id INT PRIMARY KEY,
+            paciente_usuario VARCHAR(50),
+            medico_usuario VARCHAR(50),
+            data_consulta DATE,
+            hora_consulta TIME,
+            observacoes TEXT,
+            mantido_id INT NOT NULL,
+            movido_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """INSERT INTO agendamentos_conflitos
+            (id, paciente_usuario, medico_usuario, data_consulta, hora_consulta, observacoes, mantido_id)
+        SELECT a.id, a.paciente_usuario, a.medico_usuario, a.data_consulta, a.hora_consulta, a.observacoes,
+               d.mantido_id
+        FROM agendamentos a
+        JOIN (SELECT medico_usuario, data_consulta, hora_consulta, MIN(id) AS mantido_id
+              FROM agendamentos
+              GROUP BY medico_usuario, data_consulta, hora_consulta
+              HAVING COUNT(*) > 1) d
+          ON d.medico_usuario = a.medico_usuario AND d.data_consulta = a.data_consulta
+         AND d.hora_consulta = a.hora_consulta
+        WHERE a.id <> d.mantido_id
+          AND a.id NOT IN (SELECT id FROM agendamentos_conflitos)""",
+        "DELETE FROM agendamentos WHERE id IN (SELECT id FROM agendamentos_conflitos)",
+        # A reserva é um INSERT simples: se duas estações disputam o mesmo horário, o banco
+        # recusa a segunda com erro de chave duplicada, sem SELECT prévio nem lock de tabela.
+        "CREATE UNIQUE INDEX uq_agendamentos_medico_horario ON agendamentos (medico_usuario, data_consulta, hora_consulta)",
+    ], mysql=[
+        # O índice único cobre as consultas do antigo índice do médico, que passa a ser redundante
+        "DROP INDEX idx_agendamentos_medico_data ON agendamentos",
+    ], sqlite=[
+        "DROP INDEX idx_agendamentos_medico_data",
+    ]),
+    Migracao(5, 'Horário da última alteração dos agendamentos (atualização incremental da agenda)', mysql=[
+        "ALTER TABLE agendamentos ADD COLUMN atualizado_em TIMESTAMP(3) NOT NULL "
+        "DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)",
+        # Agenda do médico: WHERE medico_usuario AND atualizado_em >= última consulta
+        "CREATE INDEX idx_agendamentos_medico_atualizado ON agendamentos (medico_usuario, atualizado_em)",
+    ], sqlite=[
+        # O SQLite não aceita DEFAULT CURRENT_TIMESTAMP em ALTER TABLE nem ON UPDATE: usa gatilhos
+        "ALTER TABLE agendamentos ADD COLUMN atualizado_em TEXT",
+        "UPDATE agendamentos SET atualizado_em = strftime('%Y-%m-%d %H:%M:%f', 'now')",
+        """CREATE TRIGGER trg_agendamentos_inserido AFTER INSERT ON agendamentos
+        BEGIN
+            UPDATE agendamentos SET atualizado_em = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+        END""",
+        """CREATE TRIGGER trg_agendamentos_alterado
+        AFTER UPDATE OF paciente_usuario, medico_usuario, data_consulta, hora_consulta, observacoes ON agendamentos
+        BEGIN
+            UPDATE agendamentos SET atualizado_em = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+        END""",
+        "CREATE INDEX idx_agendamentos_medico_atualizado ON agendamentos (medico_usuario, atualizado_em)",
+    ]),
+    Migracao(6, 'Chaves das gravações aplicadas pela fila de escrita (reenvio idempotente)', comandos=[
+        # Cada gravação da fila (fila_escrita.py) insere sua chave na mesma transação da escrita:
+        # se a fila reenviar algo já aplicado (queda entre o COMMIT e a baixa local), a chave
+        # duplicada mostra que a gravação já está no banco
+        """CREATE TABLE escritas_aplicadas (
+            chave VARCHAR(64) PRIMARY KEY,
+            aplicada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )""",
+        # Limpeza periódica das chaves antigas
+        "CREATE INDEX idx_escritas_aplicadas_data ON escritas_aplicadas (aplicada_em)",
+    ]),
+    Migracao(7, 'Índice dos agendamentos por data (exportação de um período)', comandos=[
+        # exportacao.py: WHERE data_consulta BETWEEN ... ORDER BY data, hora, id lido em fluxo pelo índice
+        "CREATE INDEX idx_agendamentos_data ON agendamentos (data_consulta, hora_consulta)",
+    ]),
+    Migracao(8, 'Situação das consultas (comparecimento) e índices dos relatórios', comandos=[
+        # 'agendada', 'realizada' ou 'faltou' (marcada pelo médico na agenda)
+        "ALTER TABLE agendamentos ADD COLUMN status VARCHAR(12) NOT NULL DEFAULT 'agendada'",
+        # relatorios.py: GROUP BY data, médico, horário e situação lido só do índice (cobertura)
+        "CREATE INDEX idx_agendamentos_resumo ON agendamentos "
+        "(data_consulta, medico_usuario, hora_consulta, status)",
+        # Dias com consultas criadas ou alteradas desde a última leitura dos resumos
+        "CREATE INDEX idx_agendamentos_atualizado ON agendamentos (atualizado_em, data_consulta)",
+    ], sqlite=[
+        # O gatilho da migração 5 lista as colunas que atualizam atualizado_em: passa a incluir status
+        "DROP TRIGGER trg_agendamentos_alterado",
+        """CREATE TRIGGER trg_agendamentos_alterado
+        AFTER UPDATE OF paciente_usuario, medico_usuario, data_consulta, hora_consulta, observacoes, status
+        ON agendamentos
+        BEGIN
+            UPDATE agendamentos SET atualizado_em = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+        END""",
+    ]),
+    Migracao(9, 'Histórico clínico (registros só de inclusão, resumo por paciente e anexos à parte)', mysql=[
+        # Um registro por linha, nunca alterado nem apagado: uma correção é um registro novo
+        """CREATE TABLE historico_clinico (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            paciente_usuario VARCHAR(50) NOT NULL,
+            autor_usuario VARCHAR(50) NOT NULL,
+            criado_em TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+            tipo VARCHAR(20) NOT NULL,
+            titulo VARCHAR(150) NOT NULL,
+            texto TEXT,
+            anexos INT NOT NULL DEFAULT 0,
+            FOREIGN KEY (paciente_usuario) REFERENCES usuarios(usuario),
+            FOREIGN KEY (autor_usuario) REFERENCES usuarios(usuario)
+        )""",
+        # Conteúdo dos anexos fora da linha do registro: a linha do tempo nunca lê os bytes
+        """CREATE TABLE historico_anexos (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            entrada_id BIGINT NOT NULL,
+            nome VARCHAR(255) NOT NULL,
+            tipo_mime VARCHAR(100) NOT NULL,
+            tamanho INT NOT NULL,
+            conteudo LONGBLOB NOT NULL,
+            FOREIGN KEY (entrada_id) REFERENCES historico_clinico(id)
+        )""",
+        # Primeira tela do histórico: uma linha por paciente, mantida na mesma transação de cada registro
+        """CREATE TABLE historico_resumo (
+            paciente_usuario VARCHAR(50) PRIMARY KEY,
+            total_entradas INT NOT NULL,
+            total_anexos INT NOT NULL,
+            primeira_em TIMESTAMP(3) NOT NULL,
+            ultima_em TIMESTAMP(3) NOT NULL,
+            ultimo_tipo VARCHAR(20) NOT NULL,
+            ultimo_titulo VARCHAR(150) NOT NULL,
+            ultimo_autor VARCHAR(50) NOT NULL,
+            FOREIGN KEY (paciente_usuario) REFERENCES usuarios(usuario)
+        )""",
+        # Linha do tempo do paciente, da mais recente para a mais antiga, paginada por (criado_em, id)
+        "CREATE INDEX idx_historico_paciente_data ON historico_clinico (paciente_usuario, criado_em, id)",
+        # Anexos de um registro (só os metadados são listados; o conteúdo é lido ao abrir o anexo)
+        "CREATE INDEX idx_anexos_entrada ON historico_anexos (entrada_id)",
+        # Só inclusões: o banco recusa UPDATE e DELETE, venham de onde vierem
+        # (com o log binário ligado, criar gatilhos exige SUPER ou log_bin_trust_function_creators=1)
+        "CREATE TRIGGER trg_historico_sem_alteracao BEFORE UPDATE ON historico_clinico FOR EACH ROW "
+        "SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'O histórico clínico não pode ser alterado'",
+        "CREATE TRIGGER trg_historico_sem_exclusao BEFORE DELETE ON historico_clinico FOR EACH ROW "
+        "SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'O histórico clínico não pode ser apagado'",
+        "CREATE TRIGGER trg_anexos_sem_alteracao BEFORE UPDATE ON historico_anexos FOR EACH ROW "
+        "SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Os anexos do histórico não podem ser alterados'",
+        "CREATE TRIGGER trg_anexos_sem_exclusao BEFORE DELETE ON historico_anexos FOR EACH ROW "
+        "SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Os anexos do histórico não podem ser apagados'",
+    ], sqlite=[
+        """CREATE TABLE historico_clinico (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            paciente_usuario VARCHAR(50) NOT NULL,
+            autor_usuario VARCHAR(50) NOT NULL,
+            criado_em TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+            tipo VARCHAR(20) NOT NULL,
+            titulo VARCHAR(150) NOT NULL,
+            texto TEXT,
+            anexos INT NOT NULL DEFAULT 0,
+            FOREIGN KEY (paciente_usuario) REFERENCES usuarios(usuario),
+            FOREIGN KEY (autor_usuario) REFERENCES usuarios(usuario)
+        )""",
+        """CREATE TABLE historico_anexos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entrada_id INTEGER NOT NULL,
+            nome VARCHAR(255) NOT NULL,
+            tipo_mime VARCHAR(100) NOT NULL,
+            tamanho INT NOT NULL,
+            conteudo BLOB NOT NULL,
+            FOREIGN KEY (entrada_id) REFERENCES historico_clinico(id)
+        )""",
+        """CREATE TABLE historico_resumo (
+            paciente_usuario VARCHAR(50) PRIMARY KEY,
+            total_entradas INT NOT NULL,
+            total_anexos INT NOT NULL,
+            primeira_em TEXT NOT NULL,
+            ultima_em TEXT NOT NULL,
+            ultimo_tipo VARCHAR(20) NOT NULL,
+            ultimo_titulo VARCHAR(150) NOT NULL,
+            ultimo_autor VARCHAR(50) NOT NULL,
+            FOREIGN KEY (paciente_usuario) REFERENCES usuarios(usuario)
+        )""",
+        "CREATE INDEX idx_historico_paciente_data ON historico_clinico (paciente_usuario, criado_em, id)",
+        "CREATE INDEX idx_anexos_entrada ON historico_anexos (entrada_id)",
+        """CREATE TRIGGER trg_historico_sem_alteracao BEFORE UPDATE ON historico_clinico
+        BEGIN
+            SELECT RAISE(ABORT, 'O histórico clínico não pode ser alterado');
+        END""",
+        """CREATE TRIGGER trg_historico_sem_exclusao BEFORE DELETE ON historico_clinico
+        BEGIN
+            SELECT RAISE(ABORT, 'O histórico clínico não pode ser apagado');
+        END""",
+        """CREATE TRIGGER trg_anexos_sem_alteracao BEFORE UPDATE ON historico_anexos
+        BEGIN
+            SELECT RAISE(ABORT, 'Os anexos do histórico não podem ser alterados');
+        END""",
+        """CREATE TRIGGER trg_anexos_sem_exclusao BEFORE DELETE ON historico_anexos
+        BEGIN
+            SELECT RAISE(ABORT, 'Os anexos do histórico não podem ser apagados');
+        END""",
+    ]),
+    Migracao(10, 'Receitas emitidas (documento gerado, por consulta e formato)', mysql=[
+        # Uma receita por consulta e formato: emitir de novo substitui a anterior
+        """CREATE TABLE receitas (
+            agendamento_id INT NOT NULL,
+            formato VARCHAR(4) NOT NULL,
+            medico_usuario VARCHAR(50) NOT NULL,
+            emitida_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            conteudo LONGBLOB NOT NULL,
+            PRIMARY KEY (agendamento_id, formato),
+            FOREIGN KEY (agendamento_id) REFERENCES agendamentos(id),
+            FOREIGN KEY (medico_usuario) REFERENCES usuarios(usuario)
+        )""",
+    ], sqlite=[
+        """CREATE TABLE receitas (
+            agendamento_id INT NOT NULL,
+            formato VARCHAR(4) NOT NULL,
+            medico_usuario VARCHAR(50) NOT NULL,
+            emitida_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            conteudo BLOB NOT NULL,
+            PRIMARY KEY (agendamento_id, formato),
+            FOREIGN KEY (agendamento_id) REFERENCES agendamentos(id),
+            FOREIGN KEY (medico_usuario) REFERENCES usuarios(usuario)
+        )""",
+    ]),
+]
+
+SQL_CRIAR_SCHEMA_VERSION = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        versao INT PRIMARY KEY,
+        descricao VARCHAR(200) NOT NULL,
+        aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+# ---------- Execução ----------
+def versao_atual(backend=None):
+    backend = backend or banco.obter_backend()
+    with backend.cursor(commit=True) as cursor:
+        cursor.execute(SQL_CRIAR_SCHEMA_VERSION)
+        cursor.execute("SELECT MAX(versao) FROM schema_version")
+        return cursor.fetchone()[0] or 0
+
+
+# Reservas duplicadas retiradas pela migração 4 (ficam em agendamentos_conflitos para remarcação)
+def conflitos_movidos(backend=None):
+    backend = backend or banco.obter_backend()
+    with backend.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM agendamentos_conflitos")
+        return cursor.fetchone()[0]
+
+
+def aplicar_migracoes(backend=None, migracoes=None):
+    # Retorna a lista de versões aplicadas nesta execução
+    backend = backend or banco.obter_backend()
+    migracoes = sorted(migracoes or MIGRACOES, key=lambda m: m.versao)
+    aplicadas = []
+
+    with backend.conexao() as conexao:
+        cursor = conexao.cursor()
+        try:
+            cursor.execute(SQL_CRIAR_SCHEMA_VERSION)
+            conexao.commit()
+            # Impede que dois terminais iniciando juntos apliquem a mesma migração
+            if backend.dialeto == 'mysql':
+                cursor.execute("SELECT GET_LOCK('vidaplus_migracoes', 60)")
+                cursor.fetchone()
+            try:
+                cursor.execute("SELECT MAX(versao) FROM schema_version")
+                atual = cursor.fetchone()[0] or 0
+                for migracao in migracoes:
+                    if migracao.versao <= atual:
+                        continue
+                    # No MySQL comandos DDL confirmam a transação implicitamente,
+                    # por isso o registro em schema_version vem sempre por último
+                    for comando in migracao.comandos_para(backend.dialeto):
+                        cursor.execute(comando)
+                    cursor.execute("INSERT INTO schema_version (versao, descricao) VALUES (%s, %s)",
+                                   (migracao.versao, migracao.descricao))
+                    conexao.commit()
+                    aplicadas.append(migracao.versao)
+            finally:
+                if backend.dialeto == 'mysql':
+                    cursor.execute("SELECT RELEASE_LOCK('vidaplus_migracoes')")
+                    cursor.fetchone()
+        finally:
+            cursor.close()
+    return aplicadas
+
+
+# ---------- Verificação dos planos de execução ----------
+def _problemas_mysql(linhas, colunas):
+    problemas = []
+    for linha in linhas:
+        plano = dict(zip(colunas, linha))
+        extra = plano.get('Extra') or ''
+        if plano.get('type') == 'ALL':
+            problemas.append(f"varredura completa em {plano.get('table')}")
+        if 'Using filesort' in extra:
+            problemas.append(f"filesort em {plano.get('table')}")
+    return problemas
+
+
+def _problemas_sqlite(linhas):
+    problemas = []
+    for linha in linhas:
+        detalhe = linha[-1]
+        # "SCAN tabela" sem índice = varredura completa; "USE TEMP B-TREE" = ordenação em memória
+        if detalhe.startswith('SCAN ') and ' INDEX ' not in f'{detalhe} ':
+            problemas.append(f"varredura completa ({detalhe})")
+        if 'USE TEMP B-TREE' in detalhe:
+            problemas.append(f"ordenação sem índice ({detalhe})")
+    return problemas
+
+
+def verificar_planos(backend=None, consultas=None):
+    # Retorna {nome_da_consulta: [problemas]} apenas para as consultas com problema
+    backend = backend or banco.obter_backend()
+    consultas = consultas or repositorio.CONSULTAS
+    resultado = {}
+    with backend.cursor() as cursor:
+        for nome, (sql, parametros) in consultas.items():
+            if backend.dialeto == 'mysql':
+                cursor.execute("EXPLAIN " + sql, parametros)
+                colunas = [coluna[0] for coluna in cursor.description]
+                problemas = _problemas_mysql(cursor.fetchall(), colunas)
+            else:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, parametros)
+                problemas = _problemas_sqlite(cursor.fetchall())
+            if problemas:
+                resultado[nome] = problemas
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrações do banco VidaPlus")
+    parser.add_argument('--verificar', action='store_true',
+                        help="roda EXPLAIN nas consultas do sistema e falha se houver varredura completa")
+    args = parser.parse_args(argv)
+
+    aplicadas = aplicar_migracoes()
+    if aplicadas:
+        print(f"Migrações aplicadas: {', '.join(map(str, aplicadas))}")
+    movidas = conflitos_movidos() if 4 in aplicadas else 0
+    if movidas:
+        print(f"Reservas duplicadas movidas para agendamentos_conflitos: {movidas}")
+    print(f"Versão do esquema: {versao_atual()}")
+
+    if args.verificar:
+        problemas = verificar_planos()
+        for nome, lista in problemas.items():
+            for problema in lista:
+                print(f"[FALHA] {nome}: {problema}")
+        if problemas:
+            return 1
+        print(f"{len(repositorio.CONSULTAS)} consultas verificadas, todas usam índice.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
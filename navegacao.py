@@ -0,0 +1,70 @@
+"""
+Navegação entre telas do VidaPlus dentro de uma única janela raiz.
+
+Cada tela é construída uma única vez, dentro de um frame guardado pelo
+Roteador, e a troca de tela apenas esconde um frame e exibe outro. Assim o
+sistema roda com um só mainloop, sem destruir e recriar janelas a cada login
+ou logout.
+"""
+import customtkinter as ctk
+
+import rastreamento
+
+
+# ---------- Tela em cache ----------
+class Tela:
+    # `frame` recebe os widgets da tela; `ao_exibir`/`ao_ocultar` são chamados
+    # a cada troca para recarregar dados ou cancelar tarefas pendentes
+    def __init__(self, frame):
+        self.frame = frame
+        self.ao_exibir = None
+        self.ao_ocultar = None
+
+
+# ---------- Roteador ----------
+class Roteador:
+    # Mantém as telas de um container (a janela raiz ou a área de conteúdo de
+    # uma tela principal) e exibe uma de cada vez
+    def __init__(self, container, **opcoes_pack):
+        self.container = container
+        self.opcoes_pack = opcoes_pack or {'fill': 'both', 'expand': True}
+        self._telas = {}
+        self.atual = None
+
+    # `construir(tela)` monta os widgets em tela.frame e só roda na primeira exibição.
+    # titulo, geometria e redimensionavel (tupla largura, altura) ajustam a janela raiz.
+    def mostrar(self, nome, construir, titulo=None, geometria=None, redimensionavel=None):
+        tela = self._telas.get(nome)
+        if tela is None:
+            tela = Tela(ctk.CTkFrame(self.container, fg_color='transparent'))
+            with rastreamento.medir('ui', f'construir:{nome}'):
+                construir(tela)
+            self._telas[nome] = tela
+
+        if self.atual != nome:
+            self.ocultar()
+            tela.frame.pack(**self.opcoes_pack)
+            self.atual = nome
+
+        janela = self.container.winfo_toplevel()
+        if titulo is not None:
+            janela.title(titulo)
+        if geometria is not None:
+            janela.geometry(geometria)
+        if redimensionavel is not None:
+            janela.resizable(*redimensionavel)
+
+        if tela.ao_exibir:
+            with rastreamento.medir('ui', f'exibir:{nome}'):
+                tela.ao_exibir()
+        return tela
+
+    # Esconde a tela atual (os widgets continuam em cache para a próxima exibição)
+    def ocultar(self):
+        if self.atual is None:
+            return
+        tela = self._telas[self.atual]
+        self.atual = None
+        tela.frame.pack_forget()
+        if tela.ao_ocultar:
+            tela.ao_ocultar()
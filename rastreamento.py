@@ -0,0 +1,230 @@
+"""
+Medição de tempo dos caminhos críticos do VidaPlus.
+
+Cada operação medida (comando SQL, obtenção de conexão, bcrypt, ação de botão,
+montagem de tela) entra em um histograma em memória por (categoria, nome), com
+faixas fixas em milissegundos. O SQL é agrupado pelo texto normalizado
+(espaços colapsados e literais trocados por '?'). Operações acima do limite
+configurado vão para o registro de lentas: as últimas ficam em memória e cada
+uma é enviada ao logger 'vidaplus.lentas'.
+
+Outros módulos podem publicar contadores junto com as medições
+(registrar_contadores), como o limitador de tentativas de login.
+
+Os dados podem ser exportados a qualquer momento em JSON ou no formato texto do
+Prometheus (salvar(), instantaneo(), prometheus()). Na interface, Ctrl+Shift+D
+grava os dois arquivos.
+
+Configuração por variáveis de ambiente:
+- VIDAPLUS_RASTREAMENTO          ('0' desliga as medições, padrão: ligado)
+- VIDAPLUS_LIMITE_LENTO_MS       (a partir de quantos ms uma operação é lenta, padrão: 250)
+- VIDAPLUS_RASTREAMENTO_ARQUIVO  (se definido, grava JSON e .prom com esse nome ao sair do sistema)
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache, wraps
+
+ATIVO = os.environ.get('VIDAPLUS_RASTREAMENTO', '1') != '0'
+LIMITE_LENTO_MS = float(os.environ.get('VIDAPLUS_LIMITE_LENTO_MS', '250'))
+ARQUIVO_SAIDA = os.environ.get('VIDAPLUS_RASTREAMENTO_ARQUIVO')
+
+# Limites superiores das faixas do histograma, em milissegundos (a última faixa é +Inf)
+FAIXAS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+MAXIMO_LENTAS = 200
+
+logger = logging.getLogger('vidaplus.lentas')
+
+
+# ---------- Histograma ----------
+class Histograma:
+    __slots__ = ('contagem', 'soma', 'maximo', 'faixas')
+
+    def __init__(self):
+        self.contagem = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+        self.faixas = [0] * (len(FAIXAS_MS) + 1)
+
+    def adicionar(self, milissegundos):
+        self.contagem += 1
+        self.soma += milissegundos
+        self.maximo = max(self.maximo, milissegundos)
+        posicao = 0
+        while posicao < len(FAIXAS_MS) and milissegundos > FAIXAS_MS[posicao]:
+            posicao += 1
+        self.faixas[posicao] += 1
+
+    def percentil(self, fracao):
+        # Estimativa pelo limite superior da faixa onde o percentil cai (o máximo na última faixa)
+        alvo = fracao * self.contagem
+        acumulado = 0
+        for posicao, quantidade in enumerate(self.faixas):
+            acumulado += quantidade
+            if acumulado >= alvo and quantidade:
+                return min(FAIXAS_MS[posicao], self.maximo) if posicao < len(FAIXAS_MS) else self.maximo
+        return 0.0
+
+    def resumo(self):
+        return {
+            'contagem': self.contagem,
+            'total_ms': round(self.soma, 3),
+            'media_ms': round(self.soma / self.contagem, 3) if self.contagem else 0.0,
+            'maximo_ms': round(self.maximo, 3),
+            'p50_ms': self.percentil(0.50),
+            'p95_ms': self.percentil(0.95),
+            'p99_ms': self.percentil(0.99),
+            'faixas': {(f'<={limite}' if i < len(FAIXAS_MS) else '+Inf'): quantidade
+                       for i, (limite, quantidade) in enumerate(zip(FAIXAS_MS + (None,), self.faixas))},
+        }
+
+
+# ---------- Registro das medições ----------
+_histogramas = {}                      # (categoria, nome) -> Histograma
+_lentas = deque(maxlen=MAXIMO_LENTAS)  # Últimas operações acima do limite
+_contadores = {}                       # grupo -> função que retorna {nome: valor}
+_lock = threading.Lock()
+
+
+def registrar(categoria, nome, segundos):
+    milissegundos = segundos * 1000
+    with _lock:
+        histograma = _histogramas.get((categoria, nome))
+        if histograma is None:
+            histograma = _histogramas[(categoria, nome)] = Histograma()
+        histograma.adicionar(milissegundos)
+        lenta = milissegundos >= LIMITE_LENTO_MS
+        if lenta:
+            _lentas.append({'instante': datetime.now().isoformat(timespec='milliseconds'),
+                            'categoria': categoria, 'nome': nome, 'ms': round(milissegundos, 3),
+                            'thread': threading.current_thread().name})
+    if lenta:
+        logger.warning("Operação lenta: %s %s levou %.1f ms", categoria, nome, milissegundos)
+
+
+@contextmanager
+def medir(categoria, nome):
+    if not ATIVO:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(categoria, nome, time.perf_counter() - inicio)
+
+
+# Decorador: @rastrear('ui') usa o nome da função; @rastrear('ui', 'Salvar') usa o nome dado
+def rastrear(categoria, nome=None):
+    def decorar(funcao):
+        rotulo = nome or nome_funcao(funcao)
+
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            if not ATIVO:
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                registrar(categoria, rotulo, time.perf_counter() - inicio)
+        return medida
+    return decorar
+
+
+# `obter()` é chamada a cada exportação e retorna os contadores atuais do grupo
+def registrar_contadores(grupo, obter):
+    with _lock:
+        _contadores[grupo] = obter
+
+
+def _ler_contadores():
+    with _lock:
+        grupos = list(_contadores.items())
+    return {grupo: obter() for grupo, obter in sorted(grupos)}
+
+
+# Comando de botão medido na categoria 'ui' com o texto do botão
+def acao_ui(nome, funcao):
+    return rastrear('ui', nome)(funcao)
+
+
+def nome_funcao(funcao):
+    # 'tela.<locals>.salvar' -> 'tela.salvar' (só os dois últimos níveis, sem '<locals>')
+    partes = [parte for parte in getattr(funcao, '__qualname__', repr(funcao)).split('.') if parte != '<locals>']
+    return '.'.join(partes[-2:])
+
+
+@lru_cache(maxsize=512)
+def normalizar_sql(sql):
+    # Agrupa o mesmo comando com valores diferentes: literais viram '?' e os espaços são colapsados
+    texto = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    texto = re.sub(r'\b\d+(?:\.\d+)?\b', '?', texto)
+    texto = ' '.join(texto.replace('%s', '?').split())
+    return texto if len(texto) <= 200 else texto[:197] + '...'
+
+
+# ---------- Exportação ----------
+def instantaneo():
+    with _lock:
+        histogramas = {chave: histograma.resumo() for chave, histograma in _histogramas.items()}
+        lentas = list(_lentas)
+    categorias = {}
+    for (categoria, nome), resumo in sorted(histogramas.items()):
+        categorias.setdefault(categoria, {})[nome] = resumo
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'limite_lento_ms': LIMITE_LENTO_MS,
+        'operacoes': categorias,
+        'contadores': _ler_contadores(),
+        'lentas': lentas,
+    }
+
+
+def _rotulo_prometheus(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def prometheus():
+    with _lock:
+        itens = [(chave, histograma.contagem, histograma.soma, list(histograma.faixas))
+                 for chave, histograma in sorted(_histogramas.items())]
+    linhas = ['# HELP vidaplus_operacao_segundos Duração das operações medidas do VidaPlus.',
+              '# TYPE vidaplus_operacao_segundos histogram']
+    for (categoria, nome), contagem, soma, faixas in itens:
+        rotulos = f'categoria="{_rotulo_prometheus(categoria)}",nome="{_rotulo_prometheus(nome)}"'
+        acumulado = 0
+        for limite, quantidade in zip(FAIXAS_MS, faixas):
+            acumulado += quantidade
+            linhas.append(f'vidaplus_operacao_segundos_bucket{{{rotulos},le="{limite / 1000:g}"}} {acumulado}')
+        linhas.append(f'vidaplus_operacao_segundos_bucket{{{rotulos},le="+Inf"}} {contagem}')
+        linhas.append(f'vidaplus_operacao_segundos_sum{{{rotulos}}} {soma / 1000:.6f}')
+        linhas.append(f'vidaplus_operacao_segundos_count{{{rotulos}}} {contagem}')
+    for grupo, valores in _ler_contadores().items():
+        for nome, valor in sorted(valores.items()):
+            metrica = f'vidaplus_{grupo}_{nome}'
+            linhas.append(f'# TYPE {metrica} gauge')
+            linhas.append(f'{metrica} {valor}')
+    return '\n'.join(linhas) + '\n'
+
+
+def salvar(caminho_base='vidaplus-rastreamento'):
+    # Grava <caminho_base>.json e <caminho_base>.prom; retorna os dois caminhos
+    caminho_base = os.path.splitext(caminho_base)[0]
+    with open(caminho_base + '.json', 'w', encoding='utf-8') as arquivo:
+        json.dump(instantaneo(), arquivo, indent=2, ensure_ascii=False)
+    with open(caminho_base + '.prom', 'w', encoding='utf-8') as arquivo:
+        arquivo.write(prometheus())
+    return caminho_base + '.json', caminho_base + '.prom'
+
+
+def limpar():
+    with _lock:
+        _histogramas.clear()
+        _lentas.clear()
@@ -0,0 +1,416 @@
+"""
+Emissão de receitas médicas do VidaPlus em PDF ou HTML.
+
+O médico emite a receita de uma consulta da própria agenda e a tela segue
+livre: emitir() devolve na hora uma Emissao, que a tela consulta de tempos em
+tempos. Em segundo plano, os dados da consulta são lidos do banco (thread de
+I/O), o documento é gerado no pool de processos (tarefas.executar_cpu, o mesmo
+do bcrypt) e gravado na tabela receitas, uma por consulta e formato.
+
+Os modelos são analisados uma única vez por processo e guardados já prontos
+(uma lista de trechos fixos, campos e repetições): gerar uma receita é só
+percorrer essa lista. Marcações dos modelos:
+    {{campo}}                  valor do campo (com escape de HTML no modelo .html)
+    {{#itens}} ... {{/itens}}  repete o trecho para cada medicamento
+
+O PDF é escrito aqui mesmo (texto em Helvetica, páginas A4), sem bibliotecas
+externas.
+
+Configuração por variáveis de ambiente:
+- VIDAPLUS_RECEITAS_MODELOS    (pasta com receita.html e/ou receita.txt no lugar dos modelos padrão)
+- VIDAPLUS_RECEITAS_DIRETORIO  (onde as receitas abertas são gravadas, padrão: ~/.cache/vidaplus/receitas)
+
+Uso pela linha de comando (gera um exemplo, sem banco):
+    python receitas.py exemplo.pdf
+    python receitas.py exemplo.html
+"""
+import html
+import os
+import re
+import sys
+import textwrap
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import arquivos
+import rastreamento
+import repositorio
+import tarefas
+
+FORMATOS = ('pdf', 'html')
+CLINICA = 'VidaPlus'
+PASTA_MODELOS = os.environ.get('VIDAPLUS_RECEITAS_MODELOS')
+DIRETORIO_RECEITAS = os.environ.get('VIDAPLUS_RECEITAS_DIRETORIO') or arquivos.pasta_padrao('receitas')
+
+MODELO_HTML = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Receita - {{paciente_nome}}</title>
+<style>
+body { font-family: sans-serif; max-width: 720px; margin: 2em auto; }
+h1 { font-size: 1.4em; border-bottom: 1px solid #000; }
+li { margin: 0.6em 0; }
+.assinatura { margin-top: 4em; width: 50%; border-top: 1px solid #000; text-align: center; }
+</style>
+</head>
+<body>
+<h1>{{clinica}} - Receita Médica</h1>
+<p>Paciente: <strong>{{paciente_nome}}</strong> (CPF {{paciente_cpf}})<br>
+Consulta: {{data}} às {{hora}}</p>
+<ol>
+{{#itens}}<li><strong>{{medicamento}}</strong><br>{{posologia}}</li>
+{{/itens}}</ol>
+<p>{{observacoes}}</p>
+<p class="assinatura">{{medico_nome}}<br>Emitida em {{emitida_em}}</p>
+</body>
+</html>
+"""
+
+# Modelo do PDF: texto puro, uma linha do documento por linha do modelo
+MODELO_TEXTO = """{{clinica}} - RECEITA MÉDICA
+
+Paciente: {{paciente_nome}} (CPF {{paciente_cpf}})
+Consulta: {{data}} às {{hora}}
+
+{{#itens}}{{numero}}. {{medicamento}}
+    {{posologia}}
+
+{{/itens}}{{observacoes}}
+
+
+
+______________________________
+{{medico_nome}}
+Emitida em {{emitida_em}}
+"""
+
+MODELOS_PADRAO = {'html': ('receita.html', MODELO_HTML), 'pdf': ('receita.txt', MODELO_TEXTO)}
+
+
+# ---------- Modelos ----------
+_MARCACAO = re.compile(r'\{\{\s*([#/]?)\s*(\w+)\s*\}\}')
+
+
+class Modelo:
+    # Modelo analisado: lista de ('texto', trecho), ('campo', nome) e ('lista', nome, partes)
+    def __init__(self, texto, escapar=False):
+        self.escapar = escapar
+        self.partes = self._analisar(texto)
+
+    @staticmethod
+    def _analisar(texto):
+        raiz = []
+        pilha = [(None, raiz)]
+        posicao = 0
+        for marcacao in _MARCACAO.finditer(texto):
+            if marcacao.start() > posicao:
+                pilha[-1][1].append(('texto', texto[posicao:marcacao.start()]))
+            posicao = marcacao.end()
+            sinal, nome = marcacao.groups()
+            if sinal == '#':
+                partes = []
+                pilha[-1][1].append(('lista', nome, partes))
+                pilha.append((nome, partes))
+            elif sinal == '/':
+                if pilha[-1][0] != nome:
+                    raise ValueError(f"Modelo de receita: {{{{/{nome}}}}} sem o {{{{#{nome}}}}} correspondente")
+                pilha.pop()
+            else:
+                pilha[-1][1].append(('campo', nome))
+        if len(pilha) > 1:
+            raise ValueError(f"Modelo de receita: {{{{#{pilha[-1][0]}}}}} sem {{{{/{pilha[-1][0]}}}}}")
+        if posicao < len(texto):
+            raiz.append(('texto', texto[posicao:]))
+        return raiz
+
+    def renderizar(self, dados):
+        saida = []
+        self._renderizar(self.partes, (dados,), saida)
+        return ''.join(saida)
+
+    def _renderizar(self, partes, contextos, saida):
+        for parte in partes:
+            if parte[0] == 'texto':
+                saida.append(parte[1])
+            elif parte[0] == 'campo':
+                valor = self._buscar(parte[1], contextos)
+                valor = '' if valor is None else str(valor)
+                saida.append(html.escape(valor) if self.escapar else valor)
+            else:
+                for item in self._buscar(parte[1], contextos) or ():
+                    self._renderizar(parte[2], (item, *contextos), saida)
+
+    @staticmethod
+    def _buscar(nome, contextos):
+        # O item da repetição primeiro, depois os dados da receita
+        for contexto in contextos:
+            if nome in contexto:
+                return contexto[nome]
+        return None
+
+
+# Modelo do formato, analisado uma vez por processo (cada processo do pool guarda o seu).
+# Um modelo da pasta VIDAPLUS_RECEITAS_MODELOS é analisado de novo só quando o arquivo muda.
+def modelo(formato):
+    nome, padrao = MODELOS_PADRAO[formato]
+    if PASTA_MODELOS:
+        caminho = os.path.join(PASTA_MODELOS, nome)
+        try:
+            return _modelo_do_arquivo(caminho, os.stat(caminho).st_mtime_ns, formato == 'html')
+        except FileNotFoundError:
+            pass
+    return _modelo_analisado(padrao, formato == 'html')
+
+
+@lru_cache(maxsize=8)
+def _modelo_analisado(texto, escapar):
+    return Modelo(texto, escapar)
+
+
+@lru_cache(maxsize=8)
+def _modelo_do_arquivo(caminho, _modificado_em, escapar):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return Modelo(arquivo.read(), escapar)
+
+
+# ---------- PDF ----------
+LARGURA_PAGINA, ALTURA_PAGINA = 595, 842   # A4 em pontos
+MARGEM = 56
+TAMANHO_FONTE = 11
+ENTRELINHA = 15
+COLUNAS_PDF = 88                           # Caracteres por linha antes da quebra
+LINHAS_POR_PAGINA = (ALTURA_PAGINA - 2 * MARGEM) // ENTRELINHA
+
+
+def _texto_pdf(linha):
+    # Helvetica com WinAnsiEncoding: acentos do português em cp1252; (, ) e \ escapados
+    dados = linha.encode('cp1252', errors='replace')
+    return dados.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def escrever_pdf(texto, titulo='Receita'):
+    linhas = []
+    for linha in texto.splitlines():
+        recuo = len(linha) - len(linha.lstrip(' '))
+        linhas.extend(textwrap.wrap(linha, COLUNAS_PDF, subsequent_indent=' ' * recuo) or [''])
+    paginas = [linhas[inicio:inicio + LINHAS_POR_PAGINA] for inicio in range(0, len(linhas), LINHAS_POR_PAGINA)] or [[]]
+
+    # Objetos: 1 catálogo, 2 árvore de páginas, 3 fonte, 4 informações; depois página e conteúdo de cada página
+    objetos = [None, None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+               b'<< /Title (' + _texto_pdf(titulo) + b') /Producer (VidaPlus) >>']
+    referencias = []
+    for pagina in paginas:
+        fluxo = b''.join([f'BT /F1 {TAMANHO_FONTE} Tf {ENTRELINHA} TL {MARGEM} {ALTURA_PAGINA - MARGEM} Td\n'.encode()]
+                         + [b'(' + _texto_pdf(linha) + b') Tj T*\n' for linha in pagina] + [b'ET'])
+        objetos.append(b'<< /Length %d >>\nstream\n' % len(fluxo) + fluxo + b'\nendstream')
+        objetos.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> '
+                       b'/Contents %d 0 R >>' % (LARGURA_PAGINA, ALTURA_PAGINA, len(objetos)))
+        referencias.append(b'%d 0 R' % len(objetos))
+    objetos[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objetos[1] = b'<< /Type /Pages /Kids [' + b' '.join(referencias) + b'] /Count %d >>' % len(paginas)
+
+    saida = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    posicoes = []
+    for numero, objeto in enumerate(objetos, start=1):
+        posicoes.append(len(saida))
+        saida += b'%d 0 obj\n' % numero + objeto + b'\nendobj\n'
+    inicio_xref = len(saida)
+    saida += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1)
+    saida += b''.join(b'%010d 00000 n \n' % posicao for posicao in posicoes)
+    saida += b'trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, inicio_xref)
+    return bytes(saida)
+
+
+# ---------- Geração ----------
+# Executada no pool de processos: recebe só dados simples e devolve os bytes do documento
+def renderizar(formato, dados):
+    texto = modelo(formato).renderizar(dados)
+    if formato == 'html':
+        return texto.encode('utf-8')
+    return escrever_pdf(texto, f"Receita - {dados.get('paciente_nome') or ''}")
+
+
+# Texto digitado pelo médico, um medicamento por linha ("medicamento - posologia") -> itens da receita
+def interpretar_itens(texto):
+    itens = []
+    for linha in (texto or '').splitlines():
+        linha = ' '.join(linha.split())
+        if not linha:
+            continue
+        medicamento, _, posologia = linha.partition(' - ')
+        itens.append({'numero': len(itens) + 1, 'medicamento': medicamento.strip(), 'posologia': posologia.strip()})
+    if not itens:
+        raise ValueError("Informe ao menos um medicamento.")
+    return itens
+
+
+# Dados do modelo a partir da linha de RepositorioReceitas.dados_consulta
+def montar_dados(consulta, itens, observacoes=''):
+    _, data, hora, paciente, nome_paciente, cpf, medico, nome_medico = consulta
+    return {
+        'clinica': CLINICA,
+        'paciente_nome': nome_paciente or paciente,
+        'paciente_cpf': cpf or '-',
+        'medico_nome': nome_medico or medico,
+        'data': datetime.fromisoformat(str(data)[:10]).strftime('%d/%m/%Y'),
+        'hora': repositorio.formatar_hora(hora),
+        'itens': itens,
+        'observacoes': (observacoes or '').strip(),
+        'emitida_em': datetime.now().strftime('%d/%m/%Y %H:%M'),
+    }
+
+
+# ---------- Emissões em segundo plano ----------
+class Emissao:
+    # Receita em produção; situacao() é 'na_fila', 'gerando', 'pronta' ou 'falhou' (detalhe em `erro`)
+    def __init__(self, id_agendamento, formato, medico):
+        self.id_agendamento = id_agendamento
+        self.formato = formato
+        self.medico = medico
+        self.paciente = None          # Nome do paciente, preenchido ao ler a consulta
+        self.bytes = None
+        self.segundos = None
+        self.futuro = None
+        self._gerando = False
+        self._inicio = time.monotonic()
+
+    def situacao(self):
+        if self.futuro is not None and self.futuro.done():
+            return 'falhou' if self.erro is not None else 'pronta'
+        return 'gerando' if self._gerando else 'na_fila'
+
+    @property
+    def concluida(self):
+        return self.futuro is not None and self.futuro.done()
+
+    @property
+    def erro(self):
+        if self.futuro is None or not self.futuro.done() or self.futuro.cancelled():
+            return None
+        return self.futuro.exception()
+
+    # Aguarda a conclusão (para scripts e benchmarks; a interface usa situacao())
+    def aguardar(self, tempo=None):
+        self.futuro.result(tempo)
+        return self
+
+
+_emissoes = {}   # (id_agendamento, formato) -> Emissao mais recente
+_contadores = {'emitidas': 0, 'falhas': 0, 'bytes': 0, 'segundos': 0.0}
+_lock = threading.Lock()
+
+
+def _gerar(emissao, itens, observacoes, anterior):
+    # Uma nova emissão da mesma receita espera a anterior: a última emitida é a que fica gravada
+    if anterior is not None and not anterior.concluida:
+        try:
+            anterior.futuro.result()
+        except Exception:
+            pass
+    emissao._gerando = True
+    try:
+        receitas = repositorio.receitas()
+        consulta = receitas.dados_consulta(emissao.id_agendamento, emissao.medico)
+        if consulta is None:
+            raise LookupError("Consulta não encontrada na agenda deste médico.")
+        dados = montar_dados(consulta, itens, observacoes)
+        emissao.paciente = dados['paciente_nome']
+        conteudo = tarefas.executar_cpu(renderizar, emissao.formato, dados)
+        receitas.gravar(emissao.id_agendamento, emissao.formato, emissao.medico, conteudo)
+    except Exception:
+        with _lock:
+            _contadores['falhas'] += 1
+        raise
+    emissao.bytes = len(conteudo)
+    emissao.segundos = time.monotonic() - emissao._inicio
+    with _lock:
+        _contadores['emitidas'] += 1
+        _contadores['bytes'] += emissao.bytes
+        _contadores['segundos'] += emissao.segundos
+    return emissao
+
+
+# Começa a emissão e retorna na hora a Emissao que a tela acompanha.
+# `itens` como em interpretar_itens(); ValueError para formato ou itens inválidos.
+def emitir(id_agendamento, medico, itens, observacoes='', formato='pdf'):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de receita inválido: {formato!r}")
+    if not itens:
+        raise ValueError("Informe ao menos um medicamento.")
+    emissao = Emissao(id_agendamento, formato, medico)
+    with _lock:
+        anterior = _emissoes.get((id_agendamento, formato))
+        # Enviada sob o lock: quem encontrar esta emissão como `anterior` já vê o futuro dela
+        emissao.futuro = tarefas.executor_io().submit(rastreamento.rastrear('tarefa')(_gerar),
+                                                      emissao, itens, observacoes, anterior)
+        _emissoes[(id_agendamento, formato)] = emissao
+    return emissao
+
+
+# Emissões desta estação, da mais recente para a mais antiga (opcionalmente só as de um médico)
+def emissoes(medico=None):
+    with _lock:
+        lista = [emissao for emissao in _emissoes.values() if medico is None or emissao.medico == medico]
+    return sorted(lista, key=lambda emissao: emissao._inicio, reverse=True)
+
+
+def metricas():
+    with _lock:
+        metricas = dict(_contadores)
+        metricas['pendentes'] = sum(1 for emissao in _emissoes.values() if not emissao.concluida)
+    return metricas
+
+
+rastreamento.registrar_contadores('receitas', metricas)
+
+
+# ---------- Abertura ----------
+# Grava em disco a receita guardada no banco e retorna o caminho (para o visualizador do sistema)
+def abrir(id_agendamento, medico, formato='pdf', diretorio=None):
+    resultado = repositorio.receitas().obter(id_agendamento, formato, medico)
+    if resultado is None:
+        raise LookupError("Receita não encontrada para esta consulta.")
+    conteudo, _ = resultado
+    # Receitas são dados clínicos: só numa pasta do próprio usuário, inacessível aos demais, para que
+    # ninguém troque o arquivo entre a gravação e a abertura no visualizador
+    diretorio = arquivos.pasta_privada(diretorio or DIRETORIO_RECEITAS)
+    return arquivos.gravar(os.path.join(diretorio, f"receita-{id_agendamento}.{formato}"), conteudo)
+
+
+def formatar_emissao(emissao):
+    situacoes = {'na_fila': 'na fila', 'gerando': 'gerando...', 'pronta': 'pronta', 'falhou': 'falhou'}
+    situacao = emissao.situacao()
+    texto = f"Consulta {emissao.id_agendamento}"
+    if emissao.paciente:
+        texto += f" - {emissao.paciente}"
+    texto += f" ({emissao.formato.upper()}): {situacoes[situacao]}"
+    if situacao == 'pronta':
+        texto += f" em {emissao.segundos:.1f} s"
+    elif situacao == 'falhou':
+        texto += f" - {emissao.erro}"
+    return texto
+
+
+# ---------- Linha de comando ----------
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1 or not argv[0].lower().endswith(('.pdf', '.html')):
+        print("Uso: python receitas.py exemplo.pdf|exemplo.html", file=sys.stderr)
+        return 2
+    consulta = (1, datetime.now().date().isoformat(), '08:30:00', 'paciente', 'Maria da Silva', '123.456.789-00',
+                'medico', 'Dr. João Souza')
+    itens = interpretar_itens("Amoxicilina 500 mg - 1 cápsula de 8 em 8 horas por 7 dias\n"
+                              "Dipirona 500 mg - 1 comprimido se dor ou febre")
+    formato = 'html' if argv[0].lower().endswith('.html') else 'pdf'
+    with open(argv[0], 'wb') as arquivo:
+        arquivo.write(renderizar(formato, montar_dados(consulta, itens, "Retorno em 15 dias.")))
+    print(f"Receita de exemplo gravada em {argv[0]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Imagens da interface do VidaPlus, decodificadas uma única vez por processo.
+
+imagem(nome, tamanho) devolve um CTkImage já reduzido para o tamanho de
+exibição e guardado em memória, então voltar à tela inicial (ou abrir outra
+tela com o mesmo logo) não decodifica nem redimensiona o arquivo de novo. A
+versão reduzida também é gravada em uma pasta de cache, e os próximos inícios
+do sistema leem esse arquivo pequeno em vez do original (o logo tem 500x500).
+A PIL só é importada quando a primeira imagem é pedida.
+
+Configuração por variável de ambiente:
+- VIDAPLUS_CACHE_RECURSOS  (pasta das imagens reduzidas, padrão: ~/.cache/vidaplus; vazio desliga)
+"""
+import os
+import threading
+
+PASTA_RECURSOS = os.path.dirname(os.path.abspath(__file__))
+PASTA_CACHE = os.environ.get('VIDAPLUS_CACHE_RECURSOS', os.path.join(os.path.expanduser('~'), '.cache', 'vidaplus'))
+
+_imagens = {}  # (nome, tamanho, escala) -> CTkImage
+_lock = threading.Lock()
+
+
+def caminho(nome):
+    return os.path.join(PASTA_RECURSOS, nome)
+
+
+def _caminho_reduzida(origem, largura, altura):
+    # O nome inclui data e tamanho do original: trocar o arquivo invalida a cópia reduzida
+    estado = os.stat(origem)
+    base = os.path.splitext(os.path.basename(origem))[0]
+    return os.path.join(PASTA_CACHE, f"{base}_{largura}x{altura}_{estado.st_mtime_ns:x}_{estado.st_size:x}.png")
+
+
+# Imagem PIL do recurso em largura x altura pixels (lida da cópia reduzida quando ela existe)
+def imagem_reduzida(nome, largura, altura):
+    from PIL import Image
+
+    origem = caminho(nome)
+    destino = _caminho_reduzida(origem, largura, altura) if PASTA_CACHE else None
+    if destino and os.path.exists(destino):
+        with Image.open(destino) as arquivo:
+            arquivo.load()
+            return arquivo.copy()
+
+    with Image.open(origem) as arquivo:
+        reduzida = arquivo.resize((largura, altura), Image.LANCZOS)
+    if destino:
+        try:
+            os.makedirs(PASTA_CACHE, exist_ok=True)
+            # Grava em um arquivo temporário e renomeia: dois terminais iniciando juntos não se atrapalham
+            temporario = f"{destino}.{os.getpid()}.tmp"
+            reduzida.save(temporario, format='PNG')
+            os.replace(temporario, destino)
+        except OSError:
+            pass  # Sem permissão de escrita: segue só com o cache em memória
+    return reduzida
+
+
+# CTkImage do recurso exibido em `tamanho` (largura, altura) com a escala da tela (HiDPI)
+def imagem(nome, tamanho, escala=1.0):
+    chave = (nome, tuple(tamanho), escala)
+    with _lock:
+        if chave in _imagens:
+            return _imagens[chave]
+
+    import customtkinter as ctk
+
+    largura, altura = (max(1, round(lado * escala)) for lado in tamanho)
+    resultado = ctk.CTkImage(dark_image=imagem_reduzida(nome, largura, altura), size=tuple(tamanho))
+    with _lock:
+        return _imagens.setdefault(chave, resultado)
+
+
+def limpar():
+    with _lock:
+        _imagens.clear()
@@ -0,0 +1,125 @@
+"""
+Armazém em memória dos cadastros de médicos e pacientes para as telas do administrador.
+
+Em vez de uma consulta por troca de seleção no menu, todos os cadastros da
+hierarquia são carregados de uma vez (em páginas) para registros compactos com
+__slots__, indexados por usuario. Trocar de registro vira uma busca em dicionário,
+e a caixa de busca consulta o índice de prefixos (busca.py) montado na mesma carga;
+quando os dados ficam velhos, a tela recarrega o armazém em segundo plano.
+
+Configuração por variável de ambiente:
+- VIDAPLUS_REGISTROS_TTL  (segundos até o armazém ser considerado velho, padrão: 120)
+"""
+import os
+import threading
+import time
+
+import busca
+import repositorio
+
+TTL_REGISTROS = float(os.environ.get('VIDAPLUS_REGISTROS_TTL', '120'))
+TAMANHO_PAGINA = 1000
+
+
+class RegistroUsuario:
+    __slots__ = ('usuario', 'nome_completo', 'cpf', 'telefone', 'endereco', 'versao')
+
+    def __init__(self, usuario, nome_completo, cpf, telefone, endereco, versao=1):
+        self.usuario = usuario
+        self.nome_completo = nome_completo
+        self.cpf = cpf
+        self.telefone = telefone
+        self.endereco = endereco
+        self.versao = versao
+
+    # Valores por coluna para preencher os formulários (a senha nunca é carregada)
+    def campos_formulario(self):
+        return {
+            'nome_completo': self.nome_completo,
+            'cpf': self.cpf,
+            'telefone': self.telefone or '',
+            'endereco': self.endereco or '',
+            'usuario': self.usuario,
+        }
+
+    # Novo registro com as colunas alteradas aplicadas e a versão gravada no banco
+    def com_alteracoes(self, alteracoes, versao):
+        valores = self.campos_formulario()
+        valores.update((coluna, valor) for coluna, valor in alteracoes.items() if coluna in valores)
+        return RegistroUsuario(valores['usuario'], valores['nome_completo'], valores['cpf'],
+                               valores['telefone'], valores['endereco'], versao)
+
+
+class ArmazemRegistros:
+    def __init__(self, hierarquia, ttl=TTL_REGISTROS, tamanho_pagina=TAMANHO_PAGINA):
+        self.hierarquia = hierarquia
+        self.ttl = ttl
+        self.tamanho_pagina = tamanho_pagina
+        self._registros = {}
+        self._ordenados = []
+        self.indice = busca.IndicePrefixos()
+        self._carregado_em = None
+        self._invalidado = False
+        self._lock = threading.Lock()
+
+    @property
+    def carregado(self):
+        return self._carregado_em is not None
+
+    @property
+    def velho(self):
+        if self._carregado_em is None or self._invalidado:
+            return True
+        return time.monotonic() - self._carregado_em > self.ttl
+
+    # Executada em segundo plano: lê todos os cadastros e troca o índice de uma vez
+    def recarregar(self):
+        inicio = time.monotonic()
+        registros = {
+            linha[0]: RegistroUsuario(*linha)
+            for linha in repositorio.usuarios().listar_registros(self.hierarquia, self.tamanho_pagina)
+        }
+        indice = busca.IndicePrefixos((r.usuario, r.nome_completo, r.cpf) for r in registros.values())
+        with self._lock:
+            self._registros = registros
+            self._ordenados = sorted(registros)
+            self.indice = indice
+            self._carregado_em = inicio
+            self._invalidado = False
+        return self
+
+    def __len__(self):
+        return len(self._registros)
+
+    def obter(self, usuario):
+        return self._registros.get(usuario)
+
+    def usuarios(self):
+        return list(self._ordenados)
+
+    # Mantém o armazém coerente após uma gravação feita por esta estação
+    def substituir(self, usuario_original, registro):
+        with self._lock:
+            registros = dict(self._registros)
+            registros.pop(usuario_original, None)
+            registros[registro.usuario] = registro
+            self._registros = registros
+            self._ordenados = sorted(registros)
+            self.indice.remover(usuario_original)
+            self.indice.adicionar(registro.usuario, registro.nome_completo, registro.cpf)
+
+    # Força uma recarga na próxima abertura (ex.: usuário novo cadastrado)
+    def marcar_velho(self):
+        self._invalidado = True
+
+
+# ---------- Armazéns por hierarquia ----------
+_armazens = {}
+_armazens_lock = threading.Lock()
+
+
+def armazem(hierarquia):
+    with _armazens_lock:
+        if hierarquia not in _armazens:
+            _armazens[hierarquia] = ArmazemRegistros(hierarquia)
+        return _armazens[hierarquia]
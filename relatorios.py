@@ -0,0 +1,284 @@
+"""
+Relatórios das consultas para a administração do VidaPlus.
+
+A agregação pesada fica no banco: um GROUP BY por dia, médico, horário e
+situação, lido só do índice idx_agendamentos_resumo. O resultado (os resumos
+diários) fica em memória em arrays colunares, e as consolidações do relatório
+são feitas sobre eles com NumPy: carga e taxa de faltas por médico, mapa de
+calor dia da semana × hora, horários mais movimentados e média móvel diária.
+
+A cada relatório só os dias com consultas criadas ou alteradas desde a leitura
+anterior (coluna atualizado_em) voltam ao banco. Uma recarga completa de tempos
+em tempos cobre o que não passa por atualizado_em (consultas apagadas ou
+remarcadas para outro dia fora do sistema).
+
+O NumPy só é importado no primeiro relatório, fora da abertura da interface.
+
+Configuração por variáveis de ambiente:
+- VIDAPLUS_RELATORIOS_RECARGA      (segundos entre recargas completas dos resumos, padrão: 3600)
+- VIDAPLUS_RELATORIOS_MEDIA_MOVEL  (dias da média móvel, padrão: 7)
+"""
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import disponibilidade
+import rastreamento
+import repositorio
+
+RECARGA_COMPLETA = float(os.environ.get('VIDAPLUS_RELATORIOS_RECARGA', '3600'))
+JANELA_MEDIA_MOVEL = int(os.environ.get('VIDAPLUS_RELATORIOS_MEDIA_MOVEL', '7'))
+# Segundos relidos antes da última alteração vista (gravações confirmadas fora de ordem)
+FOLGA_ALTERACOES = 2
+DATA_INICIAL = '0001-01-01'
+DATA_FINAL = '9999-12-31'
+DIAS_SEMANA = ('Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom')
+REALIZADA = repositorio.STATUS_AGENDAMENTO.index('realizada')
+FALTOU = repositorio.STATUS_AGENDAMENTO.index('faltou')
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Os relatórios precisam do NumPy (pip install numpy).") from None
+    return numpy
+
+
+# ---------- Resumos diários ----------
+class ResumosDiarios:
+    def __init__(self, repositorio_agendamentos=None, recarga=RECARGA_COMPLETA):
+        self.repositorio = repositorio_agendamentos or repositorio.agendamentos()
+        self.recarga = recarga
+        # 'AAAA-MM-DD' -> (medicos, minutos, status, quantidades), um array NumPy por coluna
+        self._dias = {}
+        self._medicos = {}   # usuario -> índice usado nos arrays
+        self.nomes_medicos = []
+        self._desde = None   # Instante da última alteração já incorporada
+        self._carregado_em = None
+        self._lock = threading.Lock()
+        self._contadores = {'recargas_completas': 0, 'atualizacoes': 0, 'dias_recalculados': 0}
+
+    def _indice_medico(self, usuario):
+        indice = self._medicos.get(usuario)
+        if indice is None:
+            indice = self._medicos[usuario] = len(self.nomes_medicos)
+            self.nomes_medicos.append(usuario)
+        return indice
+
+    # Agrupa as linhas do SQL_RESUMO_DIARIO por dia, já em arrays
+    def _montar(self, linhas):
+        np = _numpy()
+        colunas = {}  # dia -> ([medicos], [minutos], [status], [quantidades])
+        for data, medico, hora, status, quantidade in linhas:
+            listas = colunas.setdefault(str(data)[:10], ([], [], [], []))
+            listas[0].append(self._indice_medico(medico or '-'))
+            listas[1].append(disponibilidade.minutos(hora))
+            listas[2].append(repositorio.STATUS_AGENDAMENTO.index(status)
+                             if status in repositorio.STATUS_AGENDAMENTO else 0)
+            listas[3].append(quantidade)
+        return {dia: (np.array(medicos, dtype=np.int32), np.array(minutos, dtype=np.int16),
+                      np.array(status, dtype=np.int8), np.array(quantidades, dtype=np.int64))
+                for dia, (medicos, minutos, status, quantidades) in colunas.items()}
+
+    # Deixa os resumos em dia com o banco; retorna quantos dias foram recalculados
+    def atualizar(self):
+        with self._lock:
+            if self._carregado_em is None or time.monotonic() - self._carregado_em > self.recarga:
+                # O marco é lido antes da carga: o que mudar entre as duas leituras vem na próxima
+                desde = self.repositorio.ultima_alteracao()
+                self._dias = self._montar(self.repositorio.resumo_diario(DATA_INICIAL, DATA_FINAL))
+                self._desde, self._carregado_em = desde, time.monotonic()
+                self._contadores['recargas_completas'] += 1
+                self._contadores['dias_recalculados'] += len(self._dias)
+                return len(self._dias)
+
+            desde = (repositorio.recuar_instante(self._desde, FOLGA_ALTERACOES)
+                     if self._desde else '1970-01-01 00:00:00.000')
+            alteradas = self.repositorio.dias_alterados(desde)
+            self._contadores['atualizacoes'] += 1
+            if not alteradas:
+                return 0
+            self._desde = max([self._desde or ''] + [repositorio.texto_instante(instante) for _, instante in alteradas])
+            recalculados = 0
+            for inicio, fim in faixas_de_dias({str(data)[:10] for data, _ in alteradas}):
+                novos = self._montar(self.repositorio.resumo_diario(inicio, fim))
+                # Um dia do intervalo sem linhas no GROUP BY ficou sem consultas
+                for dia in [dia for dia in self._dias if inicio <= dia <= fim]:
+                    del self._dias[dia]
+                self._dias.update(novos)
+                recalculados += (date.fromisoformat(fim) - date.fromisoformat(inicio)).days + 1
+            self._contadores['dias_recalculados'] += recalculados
+            return recalculados
+
+    # Arrays dos resumos entre `inicio` e `fim` ('AAAA-MM-DD', inclusive), com a data de cada linha
+    def colunas(self, inicio, fim):
+        np = _numpy()
+        with self._lock:
+            dias = sorted(dia for dia in self._dias if inicio <= dia <= fim)
+            partes = [self._dias[dia] for dia in dias]
+        if not partes:
+            vazio = np.zeros(0, dtype=np.int64)
+            return {'dias': np.zeros(0, dtype='datetime64[D]'), 'medicos': vazio, 'minutos': vazio,
+                    'status': vazio, 'quantidades': vazio}
+        tamanhos = [len(parte[0]) for parte in partes]
+        return {
+            'dias': np.repeat(np.array(dias, dtype='datetime64[D]'), tamanhos),
+            'medicos': np.concatenate([parte[0] for parte in partes]),
+            'minutos': np.concatenate([parte[1] for parte in partes]),
+            'status': np.concatenate([parte[2] for parte in partes]),
+            'quantidades': np.concatenate([parte[3] for parte in partes]),
+        }
+
+    def metricas(self):
+        with self._lock:
+            metricas = dict(self._contadores)
+            metricas['dias_em_memoria'] = len(self._dias)
+        return metricas
+
+
+# Agrupa datas 'AAAA-MM-DD' em intervalos de dias consecutivos: [(inicio, fim), ...]
+def faixas_de_dias(dias):
+    faixas = []
+    for dia in sorted(dias):
+        if faixas and date.fromisoformat(dia) - date.fromisoformat(faixas[-1][1]) == timedelta(days=1):
+            faixas[-1][1] = dia
+        else:
+            faixas.append([dia, dia])
+    return [tuple(faixa) for faixa in faixas]
+
+
+# ---------- Consolidações ----------
+# [{'medico', 'consultas', 'realizadas', 'faltas', 'taxa_faltas'}, ...] do médico mais ocupado ao menos.
+# A taxa de faltas considera só as consultas já marcadas pelo médico (realizadas + faltas).
+def carga_por_medico(colunas, nomes_medicos):
+    np = _numpy()
+    tamanho = len(nomes_medicos)
+    medicos, status, quantidades = colunas['medicos'], colunas['status'], colunas['quantidades']
+    consultas = np.bincount(medicos, weights=quantidades, minlength=tamanho)
+    realizadas = np.bincount(medicos[status == REALIZADA], weights=quantidades[status == REALIZADA], minlength=tamanho)
+    faltas = np.bincount(medicos[status == FALTOU], weights=quantidades[status == FALTOU], minlength=tamanho)
+    marcadas = realizadas + faltas
+    taxas = np.divide(faltas, marcadas, out=np.full(tamanho, np.nan), where=marcadas > 0)
+    return [{'medico': nomes_medicos[i], 'consultas': int(consultas[i]), 'realizadas': int(realizadas[i]),
+             'faltas': int(faltas[i]), 'taxa_faltas': None if np.isnan(taxas[i]) else float(taxas[i])}
+            for i in np.argsort(-consultas, kind='stable') if consultas[i]]
+
+
+# Matriz 7 × 24 (segunda a domingo × hora do dia) com a quantidade de consultas
+def mapa_calor(colunas):
+    np = _numpy()
+    # 1970-01-01 (dia 0 do datetime64) foi uma quinta-feira: +3 leva a segunda-feira = 0
+    dias_semana = (colunas['dias'].astype(np.int64) + 3) % 7
+    mapa = np.zeros((7, 24), dtype=np.int64)
+    np.add.at(mapa, (dias_semana, colunas['minutos'] // 60), colunas['quantidades'])
+    return mapa
+
+
+# [(dia_semana, hora, consultas), ...] das células mais cheias do mapa de calor
+def horarios_mais_movimentados(mapa, quantidade=5):
+    np = _numpy()
+    ordem = np.argsort(-mapa, axis=None, kind='stable')[:quantidade]
+    return [(int(i // 24), int(i % 24), int(mapa.flat[i])) for i in ordem if mapa.flat[i]]
+
+
+# Consultas por dia de `inicio` a `fim` (inclusive, com os dias vazios) e a média móvel de `janela` dias
+# (NaN nos primeiros dias, antes de a janela completar)
+def serie_diaria(colunas, inicio, fim, janela=JANELA_MEDIA_MOVEL):
+    np = _numpy()
+    primeiro = np.datetime64(inicio, 'D')
+    total_dias = int((np.datetime64(fim, 'D') - primeiro).astype(np.int64)) + 1
+    posicoes = (colunas['dias'] - primeiro).astype(np.int64)
+    totais = np.bincount(posicoes, weights=colunas['quantidades'], minlength=total_dias)
+    media = np.full(total_dias, np.nan)
+    if janela > 0 and total_dias >= janela:
+        media[janela - 1:] = np.convolve(totais, np.ones(janela) / janela, mode='valid')
+    return np.arange(primeiro, primeiro + total_dias), totais, media
+
+
+# ---------- Relatório ----------
+def gerar_relatorio(inicio, fim, janela=JANELA_MEDIA_MOVEL, resumos_diarios=None):
+    resumos_diarios = resumos_diarios or resumos()
+    with rastreamento.medir('relatorios', 'atualizar_resumos'):
+        recalculados = resumos_diarios.atualizar()
+    with rastreamento.medir('relatorios', 'consolidar'):
+        colunas = resumos_diarios.colunas(inicio, fim)
+        por_medico = carga_por_medico(colunas, resumos_diarios.nomes_medicos)
+        mapa = mapa_calor(colunas)
+        datas, totais, media = serie_diaria(colunas, inicio, fim, janela)
+    realizadas = sum(medico['realizadas'] for medico in por_medico)
+    faltas = sum(medico['faltas'] for medico in por_medico)
+    return {
+        'inicio': inicio,
+        'fim': fim,
+        'consultas': int(colunas['quantidades'].sum()),
+        'realizadas': realizadas,
+        'faltas': faltas,
+        'taxa_faltas': faltas / (realizadas + faltas) if realizadas + faltas else None,
+        'por_medico': por_medico,
+        'mapa_calor': mapa.tolist(),
+        'horarios_pico': horarios_mais_movimentados(mapa),
+        'serie': {'datas': [str(data) for data in datas], 'consultas': totais.astype(int).tolist(),
+                  'media_movel': [None if valor != valor else round(float(valor), 2) for valor in media]},
+        'janela_media_movel': janela,
+        'dias_recalculados': recalculados,
+    }
+
+
+def _percentual(taxa):
+    return '-' if taxa is None else f"{taxa:.1%}"
+
+
+# Texto do relatório para a tela (fonte monoespaçada)
+def formatar_relatorio(relatorio, medicos_listados=20, dias_listados=14):
+    linhas = [f"Consultas de {relatorio['inicio']} a {relatorio['fim']}: {relatorio['consultas']}",
+              f"Realizadas: {relatorio['realizadas']}   Faltas: {relatorio['faltas']}   "
+              f"Taxa de faltas: {_percentual(relatorio['taxa_faltas'])}", ""]
+
+    linhas.append("Carga por médico")
+    linhas.append(f"  {'médico':<24}{'consultas':>10}{'realizadas':>12}{'faltas':>8}{'taxa':>8}")
+    for medico in relatorio['por_medico'][:medicos_listados]:
+        linhas.append(f"  {medico['medico'][:23]:<24}{medico['consultas']:>10}{medico['realizadas']:>12}"
+                      f"{medico['faltas']:>8}{_percentual(medico['taxa_faltas']):>8}")
+    if len(relatorio['por_medico']) > medicos_listados:
+        linhas.append(f"  ... e mais {len(relatorio['por_medico']) - medicos_listados} médico(s)")
+
+    linhas += ["", "Horários mais movimentados"]
+    for dia_semana, hora, consultas in relatorio['horarios_pico']:
+        linhas.append(f"  {DIAS_SEMANA[dia_semana]} {hora:02d}h: {consultas} consultas")
+
+    # Mapa de calor só com as horas que têm alguma consulta
+    mapa = relatorio['mapa_calor']
+    horas = [hora for hora in range(24) if any(mapa[dia][hora] for dia in range(7))]
+    if horas:
+        linhas += ["", "Consultas por dia da semana e hora",
+                   "       " + "".join(f"{hora:>6}h" for hora in horas)]
+        for dia in range(7):
+            linhas.append(f"  {DIAS_SEMANA[dia]:<5}" + "".join(f"{mapa[dia][hora]:>7}" for hora in horas))
+
+    serie = relatorio['serie']
+    linhas += ["", f"Últimos dias (média móvel de {relatorio['janela_media_movel']} dias)"]
+    for data, consultas, media in list(zip(serie['datas'], serie['consultas'], serie['media_movel']))[-dias_listados:]:
+        linhas.append(f"  {data}  {consultas:>6}  {'-' if media is None else f'{media:.1f}':>8}")
+    return "\n".join(linhas)
+
+
+# ---------- Instância padrão (ligada ao backend global de `banco`) ----------
+_resumos = None
+_resumos_lock = threading.Lock()
+
+
+def resumos():
+    global _resumos
+    with _resumos_lock:
+        if _resumos is None or _resumos.repositorio is not repositorio.agendamentos():
+            _resumos = ResumosDiarios()
+        return _resumos
+
+
+def metricas():
+    return _resumos.metricas() if _resumos is not None else {}
+
+
+rastreamento.registrar_contadores('relatorios', metricas)
@@ -0,0 +1,819 @@
+"""
+Repositórios de dados do sistema VidaPlus.
+
+Todo o SQL usado pela interface fica aqui, separado das telas. Os repositórios
+recebem um backend de `banco` (MySQL com pool de conexões ou SQLite embutido),
+então a mesma consulta roda no servidor de produção, em benchmarks e em testes
+de carga sem alterações.
+
+As leituras ficam em constantes SQL_* e são listadas em CONSULTAS, que o
+`migracoes.py --verificar` usa para conferir com EXPLAIN que nenhuma delas cai
+em varredura completa de tabela.
+"""
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import banco
+import cache
+
+# ---------- SQL das consultas ----------
+SQL_BUSCAR_CREDENCIAIS = "SELECT senha, hierarquia FROM usuarios WHERE usuario = %s"
+
+SQL_LISTAR_POR_HIERARQUIA = "SELECT usuario FROM usuarios WHERE hierarquia = %s ORDER BY usuario"
+
+# Busca por prefixo de usuário, palavra do nome ou CPF, para quando o índice em memória
+# (busca.py) ainda não foi carregado. Percorre o índice (hierarquia, usuario) na ordem e
+# para ao atingir o LIMIT.
+SQL_BUSCAR_PREFIXO = """
+    SELECT usuario, nome_completo, cpf FROM usuarios
+    WHERE hierarquia = %s
+      AND (usuario LIKE %s ESCAPE '!'
+           OR nome_completo LIKE %s ESCAPE '!' OR nome_completo LIKE %s ESCAPE '!'
+           OR cpf LIKE %s ESCAPE '!' OR cpf LIKE %s ESCAPE '!')
+    ORDER BY usuario
+    LIMIT %s
+"""
+
+SQL_BUSCAR_DADOS = """
+    SELECT nome_completo, cpf, telefone, endereco, usuario, hierarquia, versao
+    FROM usuarios WHERE usuario = %s
+"""
+
+# Página de cadastros de uma hierarquia, paginada por usuario (keyset) sobre o índice (hierarquia, usuario)
+SQL_LISTAR_REGISTROS = """
+    SELECT usuario, nome_completo, cpf, telefone, endereco, versao
+    FROM usuarios
+    WHERE hierarquia = %s AND usuario > %s
+    ORDER BY usuario
+    LIMIT %s
+"""
+
+# Chaves únicas já cadastradas (validação em memória da importação em lote)
+SQL_LISTAR_CHAVES_UNICAS = "SELECT usuario, cpf FROM usuarios"
+
+SQL_INSERIR_USUARIO = """
+    INSERT INTO usuarios (
+        nome_completo, cpf, telefone, endereco, usuario, senha, hierarquia
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Colunas que os formulários de cadastro podem alterar, na ordem dos campos na tela
+COLUNAS_EDITAVEIS = ('nome_completo', 'cpf', 'telefone', 'endereco', 'usuario', 'senha')
+
+# Situações de uma consulta (coluna agendamentos.status); a posição é o código usado nos relatórios
+STATUS_AGENDAMENTO = ('agendada', 'realizada', 'faltou')
+
+
+# UPDATE apenas com as colunas alteradas. A condição sobre `versao` (controle de
+# concorrência otimista) faz a gravação falhar se outra estação alterou o
+# cadastro depois que ele foi carregado, em vez de sobrescrevê-lo em silêncio.
+@lru_cache(maxsize=64)
+def sql_atualizar_usuario(colunas):
+    atribuicoes = ', '.join(f"{coluna}=%s" for coluna in colunas)
+    return f"""
+    UPDATE usuarios SET {atribuicoes}, versao = versao + 1
+    WHERE usuario = %s AND hierarquia = %s AND versao = %s
+"""
+
+# Troca o hash da senha por outro com o custo atual do bcrypt, só se ele ainda for o lido no login
+# (uma troca de senha feita nesse meio-tempo prevalece). A versão do cadastro não muda:
+# a senha é a mesma e um formulário aberto em outra estação continua válido.
+SQL_REGRAVAR_HASH = "UPDATE usuarios SET senha = %s WHERE usuario = %s AND senha = %s"
+
+SQL_INSERIR_AGENDAMENTO = """
+    INSERT INTO agendamentos (paciente_usuario, medico_usuario, data_consulta, hora_consulta, observacoes)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+# Gravações da fila de escrita: a chave de cada uma entra na mesma transação (reenvio idempotente)
+SQL_MARCAR_ESCRITA = "INSERT INTO escritas_aplicadas (chave) VALUES (%s)"
+SQL_LIMPAR_ESCRITAS = {
+    'mysql': "DELETE FROM escritas_aplicadas WHERE aplicada_em < NOW() - INTERVAL %s DAY",
+    'sqlite': "DELETE FROM escritas_aplicadas WHERE aplicada_em < datetime('now', '-' || %s || ' days')",
+}
+
+# Horários já reservados de um médico em um período (chave única medico_usuario, data_consulta, hora_consulta)
+SQL_HORARIOS_MEDICO_PERIODO = """
+    SELECT data_consulta, hora_consulta
+    FROM agendamentos
+    WHERE medico_usuario = %s AND data_consulta BETWEEN %s AND %s
+"""
+
+# Blocos de atendimento do médico por dia da semana (0 = segunda-feira)
+SQL_LISTAR_EXPEDIENTES = """
+    SELECT dia_semana, hora_inicio, hora_fim, duracao_minutos
+    FROM expedientes
+    WHERE medico_usuario = %s
+    ORDER BY dia_semana, hora_inicio
+"""
+
+# Agenda do médico em um período (dia ou semana), com o nome do paciente
+SQL_AGENDA_MEDICO = """
+    SELECT a.id, a.paciente_usuario, u.nome_completo, a.data_consulta, a.hora_consulta,
+           a.observacoes, a.atualizado_em, a.status
+    FROM agendamentos a
+    LEFT JOIN usuarios u ON u.usuario = a.paciente_usuario
+    WHERE a.medico_usuario = %s AND a.data_consulta BETWEEN %s AND %s
+    ORDER BY a.data_consulta, a.hora_consulta
+"""
+
+# Somente o que foi criado ou alterado desde a última leitura (atualização incremental).
+# Sem filtro de data: uma consulta remarcada para fora do período também precisa sair da tela.
+SQL_AGENDA_MEDICO_ALTERADOS = """
+    SELECT a.id, a.paciente_usuario, u.nome_completo, a.data_consulta, a.hora_consulta,
+           a.observacoes, a.atualizado_em, a.status
+    FROM agendamentos a
+    LEFT JOIN usuarios u ON u.usuario = a.paciente_usuario
+    WHERE a.medico_usuario = %s AND a.atualizado_em >= %s
+"""
+
+# Marco inicial da atualização incremental (lido antes da carga completa do período)
+SQL_ULTIMA_ALTERACAO_MEDICO = """
+    SELECT MAX(atualizado_em) FROM agendamentos WHERE medico_usuario = %s
+"""
+
+# Consultas do paciente paginadas por chave (data_consulta, hora_consulta, id), sem OFFSET:
+# cada página continua exatamente de onde a anterior parou usando o índice do paciente.
+# Próximas consultas (a partir de hoje), em ordem crescente
+SQL_PROXIMAS_PACIENTE = """
+    SELECT id, medico_usuario, data_consulta, hora_consulta, observacoes
+    FROM agendamentos
+    WHERE paciente_usuario = %s AND data_consulta >= %s
+    ORDER BY data_consulta, hora_consulta, id
+    LIMIT %s
+"""
+
+SQL_PROXIMAS_PACIENTE_APOS = """
+    SELECT id, medico_usuario, data_consulta, hora_consulta, observacoes
+    FROM agendamentos
+    WHERE paciente_usuario = %s AND data_consulta >= %s
+      AND (data_consulta > %s OR hora_consulta > %s OR (hora_consulta = %s AND id > %s))
+    ORDER BY data_consulta, hora_consulta, id
+    LIMIT %s
+"""
+
+# Histórico (antes de hoje), da consulta mais recente para a mais antiga
+SQL_HISTORICO_PACIENTE = """
+    SELECT id, medico_usuario, data_consulta, hora_consulta, observacoes
+    FROM agendamentos
+    WHERE paciente_usuario = %s AND data_consulta < %s
+    ORDER BY data_consulta DESC, hora_consulta DESC, id DESC
+    LIMIT %s
+"""
+
+SQL_HISTORICO_PACIENTE_ANTES = """
+    SELECT id, medico_usuario, data_consulta, hora_consulta, observacoes
+    FROM agendamentos
+    WHERE paciente_usuario = %s AND data_consulta <= %s
+      AND (data_consulta < %s OR hora_consulta < %s OR (hora_consulta = %s AND id < %s))
+    ORDER BY data_consulta DESC, hora_consulta DESC, id DESC
+    LIMIT %s
+"""
+
+# Exportação (exportacao.py): todas as consultas de um período, lidas em fluxo e na ordem do índice,
+# com o nome do médico e do paciente
+SQL_EXPORTAR_AGENDAMENTOS = """
+    SELECT a.id, a.data_consulta, a.hora_consulta, a.medico_usuario, m.nome_completo,
+           a.paciente_usuario, p.nome_completo, a.observacoes
+    FROM agendamentos a
+    LEFT JOIN usuarios m ON m.usuario = a.medico_usuario
+    LEFT JOIN usuarios p ON p.usuario = a.paciente_usuario
+    WHERE a.data_consulta BETWEEN %s AND %s
+    ORDER BY a.data_consulta, a.hora_consulta, a.id
+"""
+
+SQL_EXPORTAR_AGENDAMENTOS_MEDICO = """
+    SELECT a.id, a.data_consulta, a.hora_consulta, a.medico_usuario, m.nome_completo,
+           a.paciente_usuario, p.nome_completo, a.observacoes
+    FROM agendamentos a
+    LEFT JOIN usuarios m ON m.usuario = a.medico_usuario
+    LEFT JOIN usuarios p ON p.usuario = a.paciente_usuario
+    WHERE a.medico_usuario = %s AND a.data_consulta BETWEEN %s AND %s
+    ORDER BY a.data_consulta, a.hora_consulta
+"""
+
+# Situação da consulta marcada pelo médico (só na própria agenda)
+SQL_MARCAR_STATUS = "UPDATE agendamentos SET status = %s WHERE id = %s AND medico_usuario = %s"
+
+# Relatórios (relatorios.py): quantidade de consultas por dia, médico, horário e situação.
+# Lido pelo índice idx_agendamentos_resumo, sem tocar na tabela.
+SQL_RESUMO_DIARIO = """
+    SELECT data_consulta, medico_usuario, hora_consulta, status, COUNT(*)
+    FROM agendamentos
+    WHERE data_consulta BETWEEN %s AND %s
+    GROUP BY data_consulta, medico_usuario, hora_consulta, status
+"""
+
+# Datas das consultas criadas ou alteradas a partir de um instante, com o instante de cada alteração
+SQL_DIAS_ALTERADOS = """
+    SELECT data_consulta, atualizado_em FROM agendamentos WHERE atualizado_em >= %s
+"""
+
+SQL_ULTIMA_ALTERACAO = "SELECT MAX(atualizado_em) FROM agendamentos"
+
+# ---------- Histórico clínico ----------
+# Caracteres do texto trazidos em cada linha da linha do tempo; o texto inteiro só ao abrir o registro
+PREVIA_HISTORICO = 200
+
+# Primeira tela do histórico: uma linha por paciente, pela chave primária
+SQL_RESUMO_HISTORICO = """
+    SELECT total_entradas, total_anexos, primeira_em, ultima_em, ultimo_tipo, ultimo_titulo, ultimo_autor
+    FROM historico_resumo WHERE paciente_usuario = %s
+"""
+
+# Linha do tempo do paciente, do registro mais recente para o mais antigo, paginada por chave
+# (criado_em, id) sobre o índice idx_historico_paciente_data: o custo de uma página não depende
+# de quantos registros o paciente tem
+SQL_HISTORICO_CLINICO = f"""
+    SELECT id, criado_em, tipo, titulo, autor_usuario, SUBSTR(texto, 1, {PREVIA_HISTORICO}), anexos
+    FROM historico_clinico
+    WHERE paciente_usuario = %s
+    ORDER BY criado_em DESC, id DESC
+    LIMIT %s
+"""
+
+SQL_HISTORICO_CLINICO_ANTES = f"""
+    SELECT id, criado_em, tipo, titulo, autor_usuario, SUBSTR(texto, 1, {PREVIA_HISTORICO}), anexos
+    FROM historico_clinico
+    WHERE paciente_usuario = %s AND criado_em <= %s AND (criado_em < %s OR id < %s)
+    ORDER BY criado_em DESC, id DESC
+    LIMIT %s
+"""
+
+# Texto completo de um registro (só se for do paciente informado)
+SQL_TEXTO_HISTORICO = "SELECT texto FROM historico_clinico WHERE id = %s AND paciente_usuario = %s"
+
+# Anexos de um registro, sem o conteúdo
+SQL_ANEXOS_HISTORICO = """
+    SELECT id, nome, tipo_mime, tamanho FROM historico_anexos WHERE entrada_id = %s ORDER BY id
+"""
+
+# Tamanho de um anexo do paciente (posse conferida antes de entregar a cópia guardada em disco)
+SQL_TAMANHO_ANEXO = """
+    SELECT a.tamanho
+    FROM historico_anexos a
+    JOIN historico_clinico h ON h.id = a.entrada_id
+    WHERE a.id = %s AND h.paciente_usuario = %s
+"""
+
+# Conteúdo de um anexo, lido só quando ele é aberto
+SQL_CONTEUDO_ANEXO = """
+    SELECT a.nome, a.conteudo
+    FROM historico_anexos a
+    JOIN historico_clinico h ON h.id = a.entrada_id
+    WHERE a.id = %s AND h.paciente_usuario = %s
+"""
+
+SQL_INSERIR_HISTORICO = """
+    INSERT INTO historico_clinico (paciente_usuario, autor_usuario, tipo, titulo, texto, anexos)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+SQL_INSERIR_ANEXO = """
+    INSERT INTO historico_anexos (entrada_id, nome, tipo_mime, tamanho, conteudo) VALUES (%s, %s, %s, %s, %s)
+"""
+
+SQL_CRIADO_EM_HISTORICO = "SELECT criado_em FROM historico_clinico WHERE id = %s"
+
+# Resumo do paciente atualizado na transação de cada registro (criado na primeira vez)
+SQL_ATUALIZAR_RESUMO_HISTORICO = {
+    'mysql': """
+        INSERT INTO historico_resumo (paciente_usuario, total_entradas, total_anexos, primeira_em, ultima_em,
+                                      ultimo_tipo, ultimo_titulo, ultimo_autor)
+        VALUES (%s, 1, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE total_entradas = total_entradas + 1,
+            total_anexos = total_anexos + VALUES(total_anexos), ultima_em = VALUES(ultima_em),
+            ultimo_tipo = VALUES(ultimo_tipo), ultimo_titulo = VALUES(ultimo_titulo),
+            ultimo_autor = VALUES(ultimo_autor)
+    """,
+    'sqlite': """
+        INSERT INTO historico_resumo (paciente_usuario, total_entradas, total_anexos, primeira_em, ultima_em,
+                                      ultimo_tipo, ultimo_titulo, ultimo_autor)
+        VALUES (%s, 1, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (paciente_usuario) DO UPDATE SET total_entradas = total_entradas + 1,
+            total_anexos = total_anexos + excluded.total_anexos, ultima_em = excluded.ultima_em,
+            ultimo_tipo = excluded.ultimo_tipo, ultimo_titulo = excluded.ultimo_titulo,
+            ultimo_autor = excluded.ultimo_autor
+    """,
+}
+
+# ---------- Receitas ----------
+# Dados da consulta impressos na receita (só se a consulta é do médico)
+SQL_DADOS_RECEITA = """
+    SELECT a.id, a.data_consulta, a.hora_consulta, a.paciente_usuario, p.nome_completo, p.cpf,
+           a.medico_usuario, m.nome_completo
+    FROM agendamentos a
+    LEFT JOIN usuarios p ON p.usuario = a.paciente_usuario
+    LEFT JOIN usuarios m ON m.usuario = a.medico_usuario
+    WHERE a.id = %s AND a.medico_usuario = %s
+"""
+
+# Emitir de novo a receita da mesma consulta e formato substitui o documento anterior
+SQL_GRAVAR_RECEITA = """
+    REPLACE INTO receitas (agendamento_id, formato, medico_usuario, conteudo) VALUES (%s, %s, %s, %s)
+"""
+
+SQL_CONTEUDO_RECEITA = """
+    SELECT conteudo, emitida_em FROM receitas
+    WHERE agendamento_id = %s AND formato = %s AND medico_usuario = %s
+"""
+
+# Consultas verificadas com EXPLAIN: nome -> (sql, parâmetros de exemplo)
+CONSULTAS = {
+    'buscar_credenciais': (SQL_BUSCAR_CREDENCIAIS, ('usuario',)),
+    'listar_por_hierarquia': (SQL_LISTAR_POR_HIERARQUIA, ('Medico',)),
+    'buscar_dados': (SQL_BUSCAR_DADOS, ('usuario',)),
+    'buscar_prefixo': (SQL_BUSCAR_PREFIXO, ('Paciente', 'ma%', 'ma%', '% ma%', 'ma%', 'ma%', 50)),
+    'listar_registros': (SQL_LISTAR_REGISTROS, ('Paciente', '', 1000)),
+    'atualizar_usuario': (sql_atualizar_usuario(('telefone',)), ('t', 'usuario', 'Paciente', 1)),
+    'horarios_medico_periodo': (SQL_HORARIOS_MEDICO_PERIODO, ('medico', '2025-01-01', '2025-01-14')),
+    'listar_expedientes': (SQL_LISTAR_EXPEDIENTES, ('medico',)),
+    'agenda_medico': (SQL_AGENDA_MEDICO, ('medico', '2025-01-06', '2025-01-12')),
+    'agenda_medico_alterados': (SQL_AGENDA_MEDICO_ALTERADOS, ('medico', '2025-01-06 08:00:00.000')),
+    'ultima_alteracao_medico': (SQL_ULTIMA_ALTERACAO_MEDICO, ('medico',)),
+    'proximas_paciente': (SQL_PROXIMAS_PACIENTE, ('paciente', '2025-01-01', 50)),
+    'proximas_paciente_apos': (SQL_PROXIMAS_PACIENTE_APOS,
+                               ('paciente', '2025-01-01', '2025-01-01', '08:00:00', '08:00:00', 1, 50)),
+    'historico_paciente': (SQL_HISTORICO_PACIENTE, ('paciente', '2025-01-01', 50)),
+    'historico_paciente_antes': (SQL_HISTORICO_PACIENTE_ANTES,
+                                 ('paciente', '2025-01-01', '2025-01-01', '08:00:00', '08:00:00', 1, 50)),
+    'exportar_agendamentos': (SQL_EXPORTAR_AGENDAMENTOS, ('2025-01-01', '2025-01-31')),
+    'exportar_agendamentos_medico': (SQL_EXPORTAR_AGENDAMENTOS_MEDICO, ('medico', '2025-01-01', '2025-01-31')),
+    'resumo_diario': (SQL_RESUMO_DIARIO, ('2025-01-01', '2025-12-31')),
+    'dias_alterados': (SQL_DIAS_ALTERADOS, ('2025-01-06 08:00:00.000',)),
+    'ultima_alteracao': (SQL_ULTIMA_ALTERACAO, ()),
+    'resumo_historico': (SQL_RESUMO_HISTORICO, ('paciente',)),
+    'historico_clinico': (SQL_HISTORICO_CLINICO, ('paciente', 30)),
+    'historico_clinico_antes': (SQL_HISTORICO_CLINICO_ANTES,
+                                ('paciente', '2025-01-01 08:00:00.000', '2025-01-01 08:00:00.000', 1, 30)),
+    'texto_historico': (SQL_TEXTO_HISTORICO, (1, 'paciente')),
+    'anexos_historico': (SQL_ANEXOS_HISTORICO, (1,)),
+    'tamanho_anexo': (SQL_TAMANHO_ANEXO, (1, 'paciente')),
+    'conteudo_anexo': (SQL_CONTEUDO_ANEXO, (1, 'paciente')),
+    'dados_receita': (SQL_DADOS_RECEITA, (1, 'medico')),
+    'conteudo_receita': (SQL_CONTEUDO_RECEITA, (1, 'pdf', 'medico')),
+}
+
+
+# ---------- Erros ----------
+class ConflitoVersao(Exception):
+    # O cadastro foi alterado (ou removido) por outra estação depois de carregado
+    def __init__(self, usuario):
+        super().__init__(f"O cadastro de '{usuario}' foi alterado por outro usuário.")
+        self.usuario = usuario
+
+
+# ---------- Usuários ----------
+class RepositorioUsuarios:
+    def __init__(self, backend=None, ttl_diretorio=cache.TTL_PADRAO):
+        self.backend = backend or banco.obter_backend()
+        # Diretório de usuários por hierarquia; as escritas deste repositório o invalidam
+        self.diretorio = cache.CacheTTL(self._listar_do_banco, ttl=ttl_diretorio)
+
+    # Retorna (senha, hierarquia) do usuário ou None se ele não existir
+    def buscar_credenciais(self, usuario):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_BUSCAR_CREDENCIAIS, (usuario,))
+            return cursor.fetchone()
+
+    # Lista os nomes de usuário de uma hierarquia (Administrador, Medico ou Paciente)
+    def listar_por_hierarquia(self, hierarquia, usar_cache=True):
+        if not usar_cache:
+            return list(self._listar_do_banco(hierarquia))
+        return list(self.diretorio.obter(hierarquia))
+
+    def _listar_do_banco(self, hierarquia):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_LISTAR_POR_HIERARQUIA, (hierarquia,))
+            return tuple(row[0] for row in cursor.fetchall())
+
+    # [(usuario, nome_completo, cpf), ...] da hierarquia cujo usuário, alguma palavra do nome
+    # ou o CPF (com ou sem pontuação) começa com `termo`; no máximo `limite` linhas
+    def buscar_prefixo(self, hierarquia, termo, limite):
+        termo = ' '.join(termo.split())
+        prefixo = re.sub(r'([!%_])', r'!\1', termo) + '%'
+        digitos = re.sub(r'\D', '', termo)
+        # "12345678" também casa com o CPF gravado com máscara ("123.456.78")
+        mascara = '.'.join(digitos[i:i + 3] for i in range(0, min(len(digitos), 9), 3))
+        if len(digitos) > 9:
+            mascara += '-' + digitos[9:11]
+        cpf_mascara = mascara + '%' if digitos else prefixo
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_BUSCAR_PREFIXO, (hierarquia, prefixo, prefixo, '% ' + prefixo, prefixo, cpf_mascara, limite))
+            return cursor.fetchall()
+
+    # Retorna (nome_completo, cpf, telefone, endereco, usuario, hierarquia, versao) ou None
+    def buscar_dados(self, usuario):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_BUSCAR_DADOS, (usuario,))
+            return cursor.fetchone()
+
+    # Gera todos os cadastros de uma hierarquia, página a página, como
+    # (usuario, nome_completo, cpf, telefone, endereco, versao)
+    def listar_registros(self, hierarquia, tamanho_pagina=1000):
+        ultimo = ''
+        while True:
+            with self.backend.cursor() as cursor:
+                cursor.execute(SQL_LISTAR_REGISTROS, (hierarquia, ultimo, tamanho_pagina))
+                pagina = cursor.fetchall()
+            yield from pagina
+            if len(pagina) < tamanho_pagina:
+                return
+            ultimo = pagina[-1][0]
+
+    # dados = [nome_completo, cpf, telefone, endereco, usuario, senha_hash]
+    def inserir(self, dados, hierarquia):
+        with self.backend.cursor(commit=True) as cursor:
+            cursor.execute(SQL_INSERIR_USUARIO, (*dados, hierarquia))
+        self.diretorio.invalidar(hierarquia)
+
+    # Insere vários cadastros em uma única transação; cada linha é
+    # (nome_completo, cpf, telefone, endereco, usuario, senha_hash, hierarquia)
+    def inserir_lote(self, linhas):
+        with self.backend.cursor(commit=True) as cursor:
+            cursor.executemany(SQL_INSERIR_USUARIO, linhas)
+        for hierarquia in {linha[6] for linha in linhas}:
+            self.diretorio.invalidar(hierarquia)
+
+    # Gera (usuario, cpf) de todos os cadastros, em blocos para não montar uma lista enorme
+    def listar_chaves_unicas(self, tamanho_bloco=5000):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_LISTAR_CHAVES_UNICAS)
+            while True:
+                bloco = cursor.fetchmany(tamanho_bloco)
+                if not bloco:
+                    return
+                yield from bloco
+
+    # Grava só as colunas de `alteracoes` ({coluna: valor}, senha já criptografada)
+    # se o cadastro ainda estiver na `versao` lida; retorna a nova versão.
+    # Levanta ConflitoVersao se outra estação gravou antes.
+    def atualizar(self, usuario_original, hierarquia, alteracoes, versao):
+        colunas = tuple(coluna for coluna in COLUNAS_EDITAVEIS if coluna in alteracoes)
+        if len(colunas) != len(alteracoes):
+            raise ValueError(f"Colunas não editáveis: {set(alteracoes) - set(colunas)}")
+        if not colunas:
+            return versao
+
+        with self.backend.cursor(commit=True) as cursor:
+            cursor.execute(sql_atualizar_usuario(colunas),
+                           (*(alteracoes[coluna] for coluna in colunas), usuario_original, hierarquia, versao))
+            alteradas = cursor.rowcount
+        if not alteradas:
+            raise ConflitoVersao(usuario_original)
+        # O nome de usuário pode ter mudado: a lista da hierarquia precisa ser recarregada
+        if 'usuario' in alteracoes:
+            self.diretorio.invalidar(hierarquia)
+        return versao + 1
+
+    # Retorna True se o hash foi trocado
+    def regravar_hash(self, usuario, hash_atual, hash_novo):
+        with self.backend.cursor(commit=True) as cursor:
+            cursor.execute(SQL_REGRAVAR_HASH, (hash_novo, usuario, hash_atual))
+            return cursor.rowcount > 0
+
+
+# ---------- Agendamentos ----------
+class RepositorioAgendamentos:
+    def __init__(self, backend=None):
+        self.backend = backend or banco.obter_backend()
+
+    def inserir(self, paciente_usuario, medico_usuario, data_consulta, hora_consulta, observacoes):
+        with self.backend.cursor(commit=True) as cursor:
+            cursor.execute(SQL_INSERIR_AGENDAMENTO,
+                           (paciente_usuario, medico_usuario, data_consulta, normalizar_hora(hora_consulta), observacoes))
+            return cursor.lastrowid
+
+    # Gera as linhas de SQL_EXPORTAR_AGENDAMENTOS(_MEDICO) entre `inicio` e `fim` (datas inclusive),
+    # lidas do cursor em fluxo de `tamanho_bloco` em `tamanho_bloco`, sem montar a lista inteira
+    def exportar(self, inicio, fim, medico_usuario=None, tamanho_bloco=1000):
+        with self.backend.cursor_fluxo() as cursor:
+            if medico_usuario:
+                cursor.execute(SQL_EXPORTAR_AGENDAMENTOS_MEDICO, (medico_usuario, inicio, fim))
+            else:
+                cursor.execute(SQL_EXPORTAR_AGENDAMENTOS, (inicio, fim))
+            while True:
+                bloco = cursor.fetchmany(tamanho_bloco)
+                if not bloco:
+                    return
+                yield from bloco
+
+    # [(data_consulta, hora_consulta), ...] reservados para o médico entre `inicio` e `fim` (inclusive)
+    def listar_horarios_medico(self, medico_usuario, inicio, fim):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_HORARIOS_MEDICO_PERIODO, (medico_usuario, inicio, fim))
+            return cursor.fetchall()
+
+    # Agenda do médico entre `inicio` e `fim` (datas inclusive), como
+    # [(id, paciente_usuario, nome_paciente, data_consulta, hora_consulta, observacoes, atualizado_em,
+    #  status), ...]
+    def listar_agenda_medico(self, medico_usuario, inicio, fim):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_AGENDA_MEDICO, (medico_usuario, inicio, fim))
+            return cursor.fetchall()
+
+    # Mesmas colunas, só das consultas do médico criadas ou alteradas a partir de `desde`
+    def listar_agenda_medico_alterados(self, medico_usuario, desde):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_AGENDA_MEDICO_ALTERADOS, (medico_usuario, desde))
+            return cursor.fetchall()
+
+    # Marca a consulta como 'agendada', 'realizada' ou 'faltou'; retorna False se ela não é do médico
+    def marcar_status(self, id_agendamento, medico_usuario, status):
+        if status not in STATUS_AGENDAMENTO:
+            raise ValueError(f"Situação inválida: {status!r}")
+        with self.backend.cursor(commit=True) as cursor:
+            cursor.execute(SQL_MARCAR_STATUS, (status, id_agendamento, medico_usuario))
+            return cursor.rowcount == 1
+
+    # Gera (data_consulta, medico_usuario, hora_consulta, status, quantidade) entre `inicio` e `fim`
+    # (datas inclusive), lidas em fluxo: o período inteiro pode ter anos de consultas
+    def resumo_diario(self, inicio, fim, tamanho_bloco=5000):
+        with self.backend.cursor_fluxo() as cursor:
+            cursor.execute(SQL_RESUMO_DIARIO, (inicio, fim))
+            while True:
+                bloco = cursor.fetchmany(tamanho_bloco)
+                if not bloco:
+                    return
+                yield from bloco
+
+    # [(data_consulta, atualizado_em), ...] das consultas criadas ou alteradas a partir de `desde`
+    def dias_alterados(self, desde):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_DIAS_ALTERADOS, (desde,))
+            return cursor.fetchall()
+
+    # Instante da alteração mais recente entre todas as consultas (texto) ou None
+    def ultima_alteracao(self):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_ULTIMA_ALTERACAO)
+            linha = cursor.fetchone()
+        return texto_instante(linha[0]) if linha and linha[0] is not None else None
+
+    # Instante da alteração mais recente entre as consultas do médico (texto) ou None
+    def ultima_alteracao_medico(self, medico_usuario):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_ULTIMA_ALTERACAO_MEDICO, (medico_usuario,))
+            linha = cursor.fetchone()
+        return texto_instante(linha[0]) if linha and linha[0] is not None else None
+
+    # [(dia_semana, hora_inicio, hora_fim, duracao_minutos), ...] do expediente do médico
+    def listar_expedientes(self, medico_usuario):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_LISTAR_EXPEDIENTES, (medico_usuario,))
+            return cursor.fetchall()
+
+    # As listagens abaixo retornam [(id, medico_usuario, data_consulta, hora_consulta, observacoes), ...].
+    # Para a próxima página, passe a última linha recebida em `apos`/`antes`.
+
+    # Próximas consultas do paciente a partir de `hoje` (ordem crescente)
+    def listar_proximas_paciente(self, paciente_usuario, hoje, apos=None, limite=50):
+        with self.backend.cursor() as cursor:
+            if apos is None:
+                cursor.execute(SQL_PROXIMAS_PACIENTE, (paciente_usuario, hoje, limite))
+            else:
+                id_, _, data, hora, _ = apos
+                cursor.execute(SQL_PROXIMAS_PACIENTE_APOS,
+                               (paciente_usuario, data, data, hora, hora, id_, limite))
+            return cursor.fetchall()
+
+    # Consultas anteriores a `hoje`, da mais recente para a mais antiga
+    def listar_historico_paciente(self, paciente_usuario, hoje, antes=None, limite=50):
+        with self.backend.cursor() as cursor:
+            if antes is None:
+                cursor.execute(SQL_HISTORICO_PACIENTE, (paciente_usuario, hoje, limite))
+            else:
+                id_, _, data, hora, _ = antes
+                cursor.execute(SQL_HISTORICO_PACIENTE_ANTES,
+                               (paciente_usuario, data, data, hora, hora, id_, limite))
+            return cursor.fetchall()
+
+
+# ---------- Histórico clínico ----------
+class RepositorioHistorico:
+    def __init__(self, backend=None):
+        self.backend = backend or banco.obter_backend()
+
+    # (total_entradas, total_anexos, primeira_em, ultima_em, ultimo_tipo, ultimo_titulo, ultimo_autor)
+    # ou None se o paciente ainda não tem registros
+    def resumo(self, paciente_usuario):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_RESUMO_HISTORICO, (paciente_usuario,))
+            return cursor.fetchone()
+
+    # [(id, criado_em, tipo, titulo, autor_usuario, previa_do_texto, anexos), ...] do mais recente
+    # para o mais antigo. Para a próxima página, passe a última linha recebida em `antes`.
+    def listar(self, paciente_usuario, antes=None, limite=30):
+        with self.backend.cursor() as cursor:
+            if antes is None:
+                cursor.execute(SQL_HISTORICO_CLINICO, (paciente_usuario, limite))
+            else:
+                id_, criado_em = antes[0], texto_instante(antes[1])
+                cursor.execute(SQL_HISTORICO_CLINICO_ANTES, (paciente_usuario, criado_em, criado_em, id_, limite))
+            return cursor.fetchall()
+
+    # (texto, [(id, nome, tipo_mime, tamanho), ...]) do registro, ou None se ele não é do paciente
+    def detalhar(self, id_entrada, paciente_usuario):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_TEXTO_HISTORICO, (id_entrada, paciente_usuario))
+            linha = cursor.fetchone()
+            if linha is None:
+                return None
+            cursor.execute(SQL_ANEXOS_HISTORICO, (id_entrada,))
+            return linha[0] or '', cursor.fetchall()
+
+    # Tamanho em bytes do anexo, ou None se ele não é de um registro do paciente
+    def tamanho_anexo(self, id_anexo, paciente_usuario):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_TAMANHO_ANEXO, (id_anexo, paciente_usuario))
+            linha = cursor.fetchone()
+        return linha[0] if linha else None
+
+    # (nome, conteudo) do anexo, ou None se ele não é de um registro do paciente
+    def conteudo_anexo(self, id_anexo, paciente_usuario):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_CONTEUDO_ANEXO, (id_anexo, paciente_usuario))
+            linha = cursor.fetchone()
+        return (linha[0], bytes(linha[1])) if linha else None
+
+    # Inclui o registro, seus anexos [(nome, tipo_mime, conteudo), ...] e a atualização do resumo
+    # do paciente em uma única transação; retorna o id do registro
+    def registrar(self, paciente_usuario, autor_usuario, tipo, titulo, texto, anexos=()):
+        with self.backend.cursor(commit=True) as cursor:
+            cursor.execute(SQL_INSERIR_HISTORICO, (paciente_usuario, autor_usuario, tipo, titulo, texto, len(anexos)))
+            id_entrada = cursor.lastrowid
+            if anexos:
+                cursor.executemany(SQL_INSERIR_ANEXO, [(id_entrada, nome, tipo_mime, len(conteudo), conteudo)
+                                                       for nome, tipo_mime, conteudo in anexos])
+            # Horário do banco, o mesmo gravado no registro (ordem da linha do tempo)
+            cursor.execute(SQL_CRIADO_EM_HISTORICO, (id_entrada,))
+            criado_em = texto_instante(cursor.fetchone()[0])
+            cursor.execute(SQL_ATUALIZAR_RESUMO_HISTORICO[self.backend.dialeto],
+                           (paciente_usuario, len(anexos), criado_em, criado_em, tipo, titulo, autor_usuario))
+        return id_entrada
+
+
+# ---------- Receitas ----------
+class RepositorioReceitas:
+    def __init__(self, backend=None):
+        self.backend = backend or banco.obter_backend()
+
+    # (id, data_consulta, hora_consulta, paciente_usuario, nome_paciente, cpf_paciente, medico_usuario,
+    #  nome_medico) da consulta, ou None se ela não existe ou não é do médico
+    def dados_consulta(self, id_agendamento, medico_usuario):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_DADOS_RECEITA, (id_agendamento, medico_usuario))
+            return cursor.fetchone()
+
+    def gravar(self, id_agendamento, formato, medico_usuario, conteudo):
+        with self.backend.cursor(commit=True) as cursor:
+            cursor.execute(SQL_GRAVAR_RECEITA, (id_agendamento, formato, medico_usuario, conteudo))
+
+    # (conteudo, emitida_em) da receita emitida pelo médico para a consulta, ou None
+    def obter(self, id_agendamento, formato, medico_usuario):
+        with self.backend.cursor() as cursor:
+            cursor.execute(SQL_CONTEUDO_RECEITA, (id_agendamento, formato, medico_usuario))
+            linha = cursor.fetchone()
+        return (bytes(linha[0]), linha[1]) if linha else None
+
+
+# ---------- Formatação ----------
+# O MySQL devolve TIME como timedelta e o SQLite como texto; a interface exibe sempre HH:MM
+def formatar_hora(valor):
+    if hasattr(valor, 'total_seconds'):
+        minutos = int(valor.total_seconds()) // 60
+        return f"{minutos // 60:02d}:{minutos % 60:02d}"
+    return str(valor)[:5]
+
+
+# Grava horários sempre como HH:MM:SS, para que "8:00", "08:00" e "08:00:00"
+# sejam o mesmo horário também no SQLite (onde TIME é texto)
+def normalizar_hora(valor):
+    if hasattr(valor, 'total_seconds'):
+        segundos = int(valor.total_seconds())
+    elif hasattr(valor, 'hour'):
+        segundos = valor.hour * 3600 + valor.minute * 60 + valor.second
+    else:
+        try:
+            horas, minutos, segundos = (int(parte) for parte in (str(valor).strip().split(':') + ['0'])[:3])
+        except ValueError:
+            raise ValueError(f"Hora inválida: {valor!r} (use HH:MM)") from None
+        if not (0 <= horas < 24 and 0 <= minutos < 60 and 0 <= segundos < 60):
+            raise ValueError(f"Hora inválida: {valor!r} (use HH:MM)")
+        segundos += horas * 3600 + minutos * 60
+    return f"{segundos // 3600:02d}:{segundos // 60 % 60:02d}:{segundos % 60:02d}"
+
+
+# Instantes de atualizado_em como texto 'AAAA-MM-DD HH:MM:SS.fff' (o MySQL devolve datetime,
+# o SQLite já grava assim): nesse formato a ordem do texto é a ordem cronológica
+def texto_instante(valor):
+    if hasattr(valor, 'strftime'):
+        return valor.strftime('%Y-%m-%d %H:%M:%S.%f')[:23]
+    return str(valor)
+
+
+def recuar_instante(valor, segundos):
+    instante = datetime.fromisoformat(texto_instante(valor)) - timedelta(seconds=segundos)
+    return texto_instante(instante)
+
+
+# ---------- Gravações da fila de escrita ----------
+# Uma função por tipo de gravação enfileirada (fila_escrita.py), executada no cursor da transação do lote
+def _gravar_usuario(cursor, dados):
+    cursor.execute(SQL_INSERIR_USUARIO, (*dados['cadastro'], dados['hierarquia']))
+
+
+def _gravar_agendamento(cursor, dados):
+    cursor.execute(SQL_INSERIR_AGENDAMENTO, (dados['paciente'], dados['medico'], dados['data'],
+                                             normalizar_hora(dados['hora']), dados['observacoes']))
+
+
+GRAVACOES = {'usuario': _gravar_usuario, 'agendamento': _gravar_agendamento}
+
+
+class RepositorioEscritas:
+    def __init__(self, backend=None):
+        self.backend = backend or banco.obter_backend()
+
+    # Aplica `itens` [(chave, tipo, dados), ...] em ordem, em uma única transação com um SAVEPOINT
+    # por item. Retorna [(situacao, erro), ...] na mesma ordem, com situacao 'aplicada',
+    # 'repetida' (a chave já estava no banco) ou 'recusada' (erro definitivo, ex.: chave única).
+    # Erros transitórios (conexão) desfazem o lote inteiro e sobem para quem chamou.
+    def aplicar_lote(self, itens):
+        resultados = []
+        with self.backend.cursor(commit=True) as cursor:
+            if self.backend.dialeto == 'sqlite':
+                cursor.execute("BEGIN")  # Sem isso o primeiro SAVEPOINT abriria (e o RELEASE confirmaria) a transação
+            for chave, tipo, dados in itens:
+                cursor.execute("SAVEPOINT gravacao")
+                try:
+                    cursor.execute(SQL_MARCAR_ESCRITA, (chave,))
+                except banco.ERROS_BANCO as err:
+                    if not self.backend.eh_duplicado(err):
+                        raise
+                    cursor.execute("ROLLBACK TO SAVEPOINT gravacao")
+                    cursor.execute("RELEASE SAVEPOINT gravacao")
+                    resultados.append(('repetida', None))
+                    continue
+                try:
+                    GRAVACOES[tipo](cursor, dados)
+                except Exception as err:
+                    if isinstance(err, banco.ERROS_BANCO) and self.backend.eh_transitorio(err):
+                        raise
+                    # Erro definitivo: desfaz só este item (inclusive a chave) e segue com o lote
+                    cursor.execute("ROLLBACK TO SAVEPOINT gravacao")
+                    resultados.append(('recusada', err))
+                else:
+                    resultados.append(('aplicada', None))
+                cursor.execute("RELEASE SAVEPOINT gravacao")
+        return resultados
+
+    # Apaga as chaves com mais de `dias` dias (a fila só reenvia o que ainda não deu baixa)
+    def limpar_aplicadas(self, dias=7):
+        with self.backend.cursor(commit=True) as cursor:
+            cursor.execute(SQL_LIMPAR_ESCRITAS[self.backend.dialeto], (dias,))
+            return cursor.rowcount
+
+
+# ---------- Instâncias padrão (ligadas ao backend global de `banco`) ----------
+_usuarios = None
+_agendamentos = None
+_escritas = None
+_historico = None
+_receitas = None
+
+
+def usuarios():
+    global _usuarios
+    if _usuarios is None or _usuarios.backend is not banco.obter_backend():
+        _usuarios = RepositorioUsuarios()
+    return _usuarios
+
+
+def agendamentos():
+    global _agendamentos
+    if _agendamentos is None or _agendamentos.backend is not banco.obter_backend():
+        _agendamentos = RepositorioAgendamentos()
+    return _agendamentos
+
+
+def escritas():
+    global _escritas
+    if _escritas is None or _escritas.backend is not banco.obter_backend():
+        _escritas = RepositorioEscritas()
+    return _escritas
+
+
+def historico():
+    global _historico
+    if _historico is None or _historico.backend is not banco.obter_backend():
+        _historico = RepositorioHistorico()
+    return _historico
+
+
+def receitas():
+    global _receitas
+    if _receitas is None or _receitas.backend is not banco.obter_backend():
+        _receitas = RepositorioReceitas()
+    return _receitas
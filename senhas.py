@@ -0,0 +1,111 @@
+"""
+Operações de senha (bcrypt) do sistema VidaPlus.
+
+As funções ficam no nível do módulo para poderem ser enviadas ao pool de
+processos de `tarefas`, já que o bcrypt é propositalmente pesado para a CPU.
+O bcrypt é importado no primeiro uso, fora da abertura da interface.
+
+O custo (work factor) dos hashes novos é configurável. Como o custo fica
+gravado em cada hash, os cadastros antigos são regravados com o custo atual
+no próximo login bem-sucedido (servicos.autenticar_usuario), em segundo plano.
+Para escolher o custo que cabe em um orçamento de tempo nesta máquina:
+
+    python -m senhas --calibrar --orcamento-ms 100
+
+Configuração por variável de ambiente:
+- VIDAPLUS_BCRYPT_CUSTO  (custo dos hashes novos, de 4 a 31, padrão: 12)
+"""
+import os
+import sys
+import time
+
+CUSTO_MINIMO = 4
+CUSTO_MAXIMO = 31
+CUSTO = int(os.environ.get('VIDAPLUS_BCRYPT_CUSTO', '12'))
+if not CUSTO_MINIMO <= CUSTO <= CUSTO_MAXIMO:
+    raise ValueError(f"VIDAPLUS_BCRYPT_CUSTO deve ficar entre {CUSTO_MINIMO} e {CUSTO_MAXIMO} (recebido: {CUSTO}).")
+
+
+# Gera o hash bcrypt de uma senha em texto puro (com o custo configurado, se `custo` não for dado)
+def gerar_hash_senha(senha, custo=None):
+    import bcrypt
+    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(rounds=custo or CUSTO)).decode('utf-8')
+
+
+# Verifica se a senha informada corresponde ao hash armazenado no banco
+def verificar_senha(senha, senha_hash):
+    import bcrypt
+    return bcrypt.checkpw(senha.encode('utf-8'), senha_hash.encode('utf-8'))
+
+
+# Custo gravado no hash ('$2b$12$...' -> 12); None se o texto não for um hash bcrypt
+def custo_do_hash(senha_hash):
+    partes = senha_hash.split('$')
+    if len(partes) < 4 or not partes[2].isdigit():
+        return None
+    return int(partes[2])
+
+
+# O hash foi gerado com um custo diferente do configurado (mais fraco ou mais lento que o desejado)
+def precisa_regravar(senha_hash, custo=None):
+    atual = custo_do_hash(senha_hash)
+    return atual is not None and atual != (custo or CUSTO)
+
+
+# ---------- Calibração ----------
+# Tempo mediano (ms) de um hash com `custo`
+def medir_custo(custo, repeticoes=3):
+    import statistics
+
+    import bcrypt
+    tempos = []
+    for _ in range(repeticoes):
+        sal = bcrypt.gensalt(rounds=custo)
+        inicio = time.perf_counter()
+        bcrypt.hashpw(b'calibracao-vidaplus', sal)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+# Maior custo cujo hash leva no máximo `orcamento_ms` nesta máquina; retorna (custo, medições {custo: ms})
+def calibrar(orcamento_ms, repeticoes=3):
+    medicoes = {}
+    escolhido = CUSTO_MINIMO
+    for custo in range(CUSTO_MINIMO, CUSTO_MAXIMO + 1):
+        medicoes[custo] = medir_custo(custo, repeticoes)
+        if medicoes[custo] > orcamento_ms:
+            break
+        escolhido = custo
+        # Cada ponto do custo dobra o tempo: não mede o próximo se ele estourar o orçamento com folga
+        if medicoes[custo] * 2 > orcamento_ms * 1.5:
+            break
+    return escolhido, medicoes
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Custo do bcrypt das senhas do VidaPlus")
+    parser.add_argument('--calibrar', action='store_true', help="mede o bcrypt e sugere VIDAPLUS_BCRYPT_CUSTO")
+    parser.add_argument('--orcamento-ms', type=float, default=100,
+                        help="tempo máximo aceitável de um login, em ms (padrão: 100)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="hashes medidos por custo (padrão: 3)")
+    args = parser.parse_args(argv)
+
+    if not args.calibrar:
+        print(f"Custo configurado: {CUSTO} (VIDAPLUS_BCRYPT_CUSTO)")
+        print(f"Tempo de um hash com esse custo: {medir_custo(CUSTO, args.repeticoes):.1f} ms")
+        return 0
+
+    custo, medicoes = calibrar(args.orcamento_ms, args.repeticoes)
+    for custo_medido, ms in medicoes.items():
+        marcador = '  <-' if custo_medido == custo else ''
+        print(f"  custo {custo_medido:2d}: {ms:9.1f} ms{marcador}")
+    if medicoes[custo] > args.orcamento_ms:
+        print(f"Nem o custo mínimo ({CUSTO_MINIMO}) cabe em {args.orcamento_ms:g} ms nesta máquina.")
+    print(f"\nVIDAPLUS_BCRYPT_CUSTO={custo}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
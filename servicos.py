@@ -0,0 +1,179 @@
+"""
+Operações das telas do VidaPlus sem dependência da interface gráfica.
+
+Login, cadastro, atualização cadastral, agendamento e listagem de consultas
+ficam aqui, e as telas de app.py apenas os chamam em segundo plano. Assim os
+mesmos caminhos podem ser exercitados sem janela (benchmarks, scripts de
+carga) contra qualquer backend de `banco`.
+
+Cadastros novos e agendamentos passam pela fila de escrita local
+(fila_escrita.py): retornam 'aplicada' quando o banco confirmou a gravação a
+tempo, ou 'pendente' quando ela ficou no diário local para ser reenviada.
+"""
+import logging
+import secrets
+
+import banco
+import disponibilidade
+import fila_escrita
+import limitador
+import registros
+import repositorio
+import senhas
+import tarefas
+
+logger = logging.getLogger('vidaplus.senhas')
+
+# Hierarquias do banco aceitas em cada opção da tela de login
+PERMISSOES = {
+    'Administrador': ('Administrador',),
+    'Medico': ('Administrador', 'Medico'),
+    'Paciente': ('Paciente',),
+}
+
+
+# ---------- Login ----------
+_hash_ficticio = None
+
+
+# Confere a senha contra um hash qualquer: o usuário inexistente demora o mesmo que uma senha errada
+def _verificar_ficticio(senha_digitada):
+    global _hash_ficticio
+    if _hash_ficticio is None:
+        _hash_ficticio = tarefas.executar_cpu(senhas.gerar_hash_senha, secrets.token_urlsafe(16))
+    tarefas.executar_cpu(senhas.verificar_senha, senha_digitada, _hash_ficticio)
+
+
+# Retorna a hierarquia do usuário, None se ele não existir ou False se a senha estiver errada.
+# Levanta limitador.TentativasExcedidas, sem ir ao banco nem ao bcrypt, quando há erros demais.
+def autenticar_usuario(usuario_digitado, senha_digitada):
+    limitador.tentativas().tentar(usuario_digitado)
+
+    # Usuário que o banco acabou de dizer não existir: dispensa a consulta
+    if limitador.inexistentes().contem(usuario_digitado):
+        _verificar_ficticio(senha_digitada)
+        return None
+
+    # Busca senha e hierarquia do usuário
+    resultado = repositorio.usuarios().buscar_credenciais(usuario_digitado)
+
+    if not resultado:
+        limitador.inexistentes().adicionar(usuario_digitado)
+        _verificar_ficticio(senha_digitada)
+        return None  # Usuário não encontrado
+
+    senha_banco, hierarquia_banco = resultado
+    # Verifica a senha no pool de processos, pois o bcrypt é pesado para a CPU
+    if not tarefas.executar_cpu(senhas.verificar_senha, senha_digitada, senha_banco):
+        return False  # Senha incorreta
+    limitador.tentativas().devolver(usuario_digitado)
+    # Hash com custo diferente do configurado: regrava em segundo plano, sem atrasar o login
+    if senhas.precisa_regravar(senha_banco):
+        tarefas.executor_io().submit(regravar_hash, usuario_digitado, senha_digitada, senha_banco)
+    return hierarquia_banco
+
+
+# Regrava o hash da senha com o custo atual do bcrypt (VIDAPLUS_BCRYPT_CUSTO); retorna True se trocou
+def regravar_hash(usuario, senha, hash_atual):
+    try:
+        hash_novo = tarefas.executar_cpu(senhas.gerar_hash_senha, senha)
+        return repositorio.usuarios().regravar_hash(usuario, hash_atual, hash_novo)
+    except banco.ERROS_BANCO as err:
+        # Sem problema para o usuário: o hash antigo continua válido e a troca é tentada no próximo login
+        logger.warning("Falha ao regravar o hash da senha de %s: %s", usuario, err)
+        return False
+
+
+def pode_acessar(hierarquia_banco, hierarquia_esperada):
+    return hierarquia_banco in PERMISSOES[hierarquia_esperada]
+
+
+# ---------- Cadastro ----------
+# `dados` na ordem do formulário: nome_completo, cpf, telefone, endereco, usuario, senha (em texto puro).
+# Retorna 'aplicada' ou 'pendente'; levanta fila_escrita.EscritaRecusada (ex.: usuário ou CPF já
+# cadastrado) se o banco recusar a gravação dentro da espera.
+def cadastrar_usuario(dados, hierarquia):
+    dados = list(dados)
+    # Substitui a senha original pela senha criptografada (o diário local nunca vê a senha em texto puro)
+    dados[5] = tarefas.executar_cpu(senhas.gerar_hash_senha, dados[5])
+    fila = fila_escrita.fila()
+    return fila.aguardar(fila.enfileirar('usuario', {'cadastro': dados, 'hierarquia': hierarquia}))
+
+
+# Executado pela fila quando o cadastro chega ao banco
+def _usuario_gravado(dados):
+    hierarquia = dados['hierarquia']
+    repositorio.usuarios().diretorio.invalidar(hierarquia)
+    limitador.inexistentes().descartar(dados['cadastro'][4])
+    # O armazém do administrador passa a precisar de recarga para incluir o novo usuário
+    registros.armazem(hierarquia).marcar_velho()
+
+
+# `alteracoes` traz só as colunas alteradas no formulário
+def atualizar_usuario(usuario_original, hierarquia, alteracoes, versao):
+    alteracoes = dict(alteracoes)
+    # O bcrypt só roda quando uma nova senha foi digitada
+    if 'senha' in alteracoes:
+        alteracoes['senha'] = tarefas.executar_cpu(senhas.gerar_hash_senha, alteracoes['senha'])
+    # Retorna a nova versão do cadastro; ConflitoVersao se outra estação gravou antes
+    versao = repositorio.usuarios().atualizar(usuario_original, hierarquia, alteracoes, versao)
+    if 'usuario' in alteracoes:
+        limitador.inexistentes().descartar(alteracoes['usuario'])
+    return versao
+
+
+# ---------- Agendamentos ----------
+# Confere o horário no índice de disponibilidade e enfileira o agendamento; retorna 'aplicada' ou 'pendente'.
+# Levanta disponibilidade.HorarioIndisponivel (com alternativas) se o horário já foi reservado ou já passou.
+def agendar_consulta(paciente, medico, data, hora, observacoes):
+    agenda = disponibilidade.agenda()
+    hora = repositorio.normalizar_hora(hora)
+    try:
+        livre = agenda.esta_livre(medico, data, hora)
+    except banco.ERROS_BANCO:
+        # Banco fora do ar e dia fora do índice: a chave única do banco decide no reenvio
+        # (horários passados já foram recusados antes de qualquer consulta ao banco)
+        livre = None
+    if livre is False:
+        raise agenda.indisponivel(medico, data, hora)
+
+    fila = fila_escrita.fila()
+    chave = fila.enfileirar('agendamento', {'paciente': paciente, 'medico': medico,
+                                            'data': disponibilidade.como_data(data).isoformat(),
+                                            'hora': hora, 'observacoes': observacoes})
+    if livre:
+        # O horário já conta como ocupado nesta estação enquanto a gravação está na fila
+        agenda.registrar(medico, data, hora)
+    try:
+        return fila.aguardar(chave)
+    except fila_escrita.EscritaRecusada as err:
+        if not err.duplicada:
+            raise
+        # Outra estação reservou o horário primeiro
+        raise agenda.indisponivel(medico, data, hora) from None
+
+
+# Executado pela fila quando o banco recusa um agendamento já confirmado localmente
+def _agendamento_recusado(dados, duplicada):
+    # Recusado por chave única o horário está mesmo ocupado; por outro motivo, volta a ficar livre
+    if not duplicada:
+        disponibilidade.agenda().liberar(dados['medico'], dados['data'], dados['hora'])
+
+
+# Texto curto de uma gravação da fila, para os avisos da interface
+def descrever_escrita(tipo, dados):
+    if tipo == 'usuario':
+        return f"cadastro de {dados['cadastro'][4]} ({dados['hierarquia']})"
+    return f"consulta de {dados['paciente']} com {dados['medico']} em {dados['data']} às {dados['hora'][:5]}"
+
+
+fila_escrita.ao_aplicar('usuario', _usuario_gravado)
+fila_escrita.ao_recusar('agendamento', _agendamento_recusado)
+
+
+# Próxima página das consultas do paciente: primeiro as próximas (fase 'proximas'),
+# depois o histórico (fase 'historico'); `ultima` é a última linha da página anterior
+def pagina_consultas_paciente(paciente, hoje, fase, ultima, tamanho):
+    if fase == 'proximas':
+        return repositorio.agendamentos().listar_proximas_paciente(paciente, hoje, ultima, tamanho)
+    return repositorio.agendamentos().listar_historico_paciente(paciente, hoje, ultima, tamanho)
@@ -0,0 +1,243 @@
+"""
+Sessões de login do VidaPlus.
+
+A senha só passa pelo bcrypt (e pelo banco) no login de verdade. Depois dele,
+a sessão fica em uma tabela em memória e é identificada por um token assinado
+com HMAC-SHA256, que carrega o usuário, a hierarquia e o instante de expiração;
+as telas perguntam à sessão quem está logado e com qual hierarquia, sem voltar
+ao banco para conferir permissões.
+
+No logout (ou após alguns minutos sem uso da interface) a sessão é bloqueada,
+não encerrada: o mesmo usuário volta digitando a senha, conferida contra um
+HMAC guardado na própria sessão, sem bcrypt nem consulta ao banco. Sessões
+ociosas por mais tempo que VIDAPLUS_SESSAO_OCIOSA são removidas e exigem um
+login completo, assim como erros seguidos de senha no desbloqueio.
+
+Configuração por variáveis de ambiente:
+- VIDAPLUS_SESSAO_SEGREDO   (chave das assinaturas em hexadecimal, padrão: aleatória a cada execução)
+- VIDAPLUS_SESSAO_DURACAO   (duração máxima de uma sessão em minutos, padrão: 480)
+- VIDAPLUS_SESSAO_OCIOSA    (minutos sem uso até a sessão ser removida, padrão: 30)
+- VIDAPLUS_SESSAO_BLOQUEIO  (minutos sem uso até a interface bloquear a sessão, padrão: 5)
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+_segredo_configurado = os.environ.get('VIDAPLUS_SESSAO_SEGREDO')
+SEGREDO = bytes.fromhex(_segredo_configurado) if _segredo_configurado else secrets.token_bytes(32)
+DURACAO = float(os.environ.get('VIDAPLUS_SESSAO_DURACAO', '480')) * 60
+TEMPO_OCIOSO = float(os.environ.get('VIDAPLUS_SESSAO_OCIOSA', '30')) * 60
+TEMPO_BLOQUEIO = float(os.environ.get('VIDAPLUS_SESSAO_BLOQUEIO', '5')) * 60
+# Erros de senha aceitos no desbloqueio antes de a sessão ser encerrada
+TENTATIVAS_DESBLOQUEIO = 5
+
+
+class SessaoInvalida(Exception):
+    # `motivo`: 'assinatura', 'expirada', 'encerrada' ou 'bloqueada'
+    def __init__(self, motivo):
+        super().__init__(f"Sessão inválida ({motivo}).")
+        self.motivo = motivo
+
+
+# ---------- Tokens ----------
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b'=').decode('ascii')
+
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+
+
+def assinar(dados, segredo=SEGREDO):
+    corpo = _b64(json.dumps(dados, separators=(',', ':')).encode('utf-8'))
+    assinatura = hmac.new(segredo, corpo.encode('ascii'), hashlib.sha256).digest()
+    return f"{corpo}.{_b64(assinatura)}"
+
+
+# Confere a assinatura e a expiração do token e retorna os dados que ele carrega
+def ler_token(token, segredo=SEGREDO, agora=None):
+    try:
+        corpo, assinatura = token.split('.')
+        esperada = hmac.new(segredo, corpo.encode('ascii'), hashlib.sha256).digest()
+        if not hmac.compare_digest(esperada, _de_b64(assinatura)):
+            raise SessaoInvalida('assinatura')
+        dados = json.loads(_de_b64(corpo))
+    except (ValueError, AttributeError, UnicodeError):
+        raise SessaoInvalida('assinatura') from None
+    if dados['exp'] <= (time.time() if agora is None else agora):
+        raise SessaoInvalida('expirada')
+    return dados
+
+
+# ---------- Sessões ----------
+class Sessao:
+    __slots__ = ('id', 'usuario', 'hierarquia', 'token', 'expira_em', 'ultimo_uso', 'bloqueada',
+                 'falhas', '_chave', '_verificador')
+
+    def __init__(self, id_sessao, usuario, hierarquia, token, expira_em, senha):
+        self.id = id_sessao
+        self.usuario = usuario
+        self.hierarquia = hierarquia
+        self.token = token
+        self.expira_em = expira_em
+        self.ultimo_uso = time.monotonic()
+        self.bloqueada = False
+        self.falhas = 0
+        # A senha não fica guardada: só um HMAC dela com uma chave aleatória desta sessão
+        self._chave = secrets.token_bytes(32)
+        self._verificador = self._calcular(senha)
+
+    def _calcular(self, senha):
+        return hmac.new(self._chave, senha.encode('utf-8'), hashlib.sha256).digest()
+
+    def confere(self, senha):
+        return hmac.compare_digest(self._verificador, self._calcular(senha))
+
+    def trocar_senha(self, senha):
+        self._verificador = self._calcular(senha)
+
+    def ociosa_ha(self):
+        return time.monotonic() - self.ultimo_uso
+
+
+class TabelaSessoes:
+    def __init__(self, duracao=DURACAO, tempo_ocioso=TEMPO_OCIOSO, segredo=SEGREDO):
+        self.duracao = duracao
+        self.tempo_ocioso = tempo_ocioso
+        self.segredo = segredo
+        self._sessoes = {}   # id -> Sessao
+        self._por_usuario = {}  # usuario -> id (uma sessão por usuário neste terminal)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessoes)
+
+    # Chamado depois de um login completo (bcrypt) bem-sucedido; substitui a sessão anterior do usuário
+    def abrir(self, usuario, hierarquia, senha):
+        id_sessao = secrets.token_urlsafe(16)
+        expira_em = time.time() + self.duracao
+        token = assinar({'sid': id_sessao, 'usr': usuario, 'hier': hierarquia, 'exp': expira_em}, self.segredo)
+        sessao = Sessao(id_sessao, usuario, hierarquia, token, expira_em, senha)
+        with self._lock:
+            self._remover(self._por_usuario.get(usuario))
+            self._sessoes[id_sessao] = sessao
+            self._por_usuario[usuario] = id_sessao
+        return sessao
+
+    def _remover(self, id_sessao):
+        sessao = self._sessoes.pop(id_sessao, None)
+        if sessao is not None and self._por_usuario.get(sessao.usuario) == id_sessao:
+            del self._por_usuario[sessao.usuario]
+        return sessao
+
+    def _viva(self, sessao, agora, monotonico):
+        return sessao.expira_em > agora and monotonico - sessao.ultimo_uso < self.tempo_ocioso
+
+    # Retorna a sessão ativa (não bloqueada) do token; `tocar` conta a chamada como uso
+    def validar(self, token, tocar=True):
+        dados = ler_token(token, self.segredo)
+        with self._lock:
+            sessao = self._sessoes.get(dados['sid'])
+            if sessao is None or sessao.token != token:
+                raise SessaoInvalida('encerrada')
+            if not self._viva(sessao, time.time(), time.monotonic()):
+                self._remover(sessao.id)
+                raise SessaoInvalida('expirada')
+            if sessao.bloqueada:
+                raise SessaoInvalida('bloqueada')
+            if tocar:
+                sessao.ultimo_uso = time.monotonic()
+            return sessao
+
+    def tocar(self, token):
+        try:
+            self.validar(token)
+        except SessaoInvalida:
+            pass
+
+    def bloquear(self, token):
+        with self._lock:
+            try:
+                sessao = self._sessoes.get(ler_token(token, self.segredo)['sid'])
+            except SessaoInvalida:
+                return
+            if sessao is not None:
+                sessao.bloqueada = True
+
+    # Desbloqueio rápido: confere a senha contra a sessão guardada do usuário, sem bcrypt nem banco.
+    # Retorna a sessão reativada, ou None quando é preciso um login completo (sem sessão,
+    # sessão expirada ou senha diferente; a senha pode ter sido trocada em outro terminal).
+    def retomar(self, usuario, senha):
+        with self._lock:
+            sessao = self._sessoes.get(self._por_usuario.get(usuario))
+            if sessao is None:
+                return None
+            if not self._viva(sessao, time.time(), time.monotonic()):
+                self._remover(sessao.id)
+                return None
+            if not sessao.confere(senha):
+                sessao.falhas += 1
+                if sessao.falhas >= TENTATIVAS_DESBLOQUEIO:
+                    self._remover(sessao.id)
+                return None
+            sessao.falhas = 0
+            sessao.bloqueada = False
+            sessao.ultimo_uso = time.monotonic()
+            return sessao
+
+    # O usuário logado alterou o próprio cadastro: acompanha o novo nome e a nova senha
+    def atualizar(self, token, usuario=None, senha=None):
+        sessao = self.validar(token)
+        with self._lock:
+            if senha is not None:
+                sessao.trocar_senha(senha)
+            if usuario is not None and usuario != sessao.usuario:
+                # O token carrega o usuário: um novo é assinado para a mesma sessão
+                self._remover(self._por_usuario.get(usuario))
+                del self._por_usuario[sessao.usuario]
+                sessao.usuario = usuario
+                sessao.token = assinar({'sid': sessao.id, 'usr': usuario, 'hier': sessao.hierarquia,
+                                        'exp': sessao.expira_em}, self.segredo)
+                self._por_usuario[usuario] = sessao.id
+        return sessao
+
+    def encerrar(self, token):
+        try:
+            id_sessao = ler_token(token, self.segredo, agora=0)['sid']
+        except SessaoInvalida:
+            return
+        with self._lock:
+            self._remover(id_sessao)
+
+    # Cadastro alterado por outra pessoa (senha, usuário ou hierarquia): a sessão guardada deixa de valer
+    def encerrar_usuario(self, usuario):
+        with self._lock:
+            self._remover(self._por_usuario.get(usuario))
+
+    # Remove as sessões expiradas ou ociosas demais; retorna quantas saíram
+    def expirar(self):
+        agora, monotonico = time.time(), time.monotonic()
+        with self._lock:
+            vencidas = [sessao.id for sessao in self._sessoes.values() if not self._viva(sessao, agora, monotonico)]
+            for id_sessao in vencidas:
+                self._remover(id_sessao)
+        return len(vencidas)
+
+
+# ---------- Instância padrão ----------
+_tabela = None
+_tabela_lock = threading.Lock()
+
+
+def tabela():
+    global _tabela
+    if _tabela is None:
+        with _tabela_lock:
+            if _tabela is None:
+                _tabela = TabelaSessoes()
+    return _tabela
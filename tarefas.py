@@ -0,0 +1,160 @@
+"""
+Execução de tarefas em segundo plano para a interface do VidaPlus.
+
+Consultas ao banco rodam em um pool de threads (I/O) e o bcrypt, pesado para a
+CPU, roda em um pool de processos. Os resultados voltam para a thread da
+interface por meio de `after()`, de modo que o mainloop do Tk nunca fica
+bloqueado esperando o banco.
+
+Configuração por variáveis de ambiente:
+- VIDAPLUS_THREADS_IO     (padrão: 8 threads)
+- VIDAPLUS_PROCESSOS_CPU  (padrão: número de CPUs, no máximo 4)
+"""
+import os
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+import rastreamento
+
+THREADS_IO = int(os.environ.get('VIDAPLUS_THREADS_IO', '8'))
+PROCESSOS_CPU = int(os.environ.get('VIDAPLUS_PROCESSOS_CPU', str(min(4, os.cpu_count() or 1))))
+
+# Intervalo em que a interface verifica se uma tarefa terminou
+INTERVALO_VERIFICACAO_MS = 25
+
+_executor_io = None
+_executor_cpu = None
+_lock = threading.Lock()
+
+
+# ---------- Executores globais (criados sob demanda) ----------
+def executor_io():
+    global _executor_io
+    if _executor_io is None:
+        with _lock:
+            if _executor_io is None:
+                _executor_io = ThreadPoolExecutor(max_workers=THREADS_IO, thread_name_prefix='vidaplus-io')
+    return _executor_io
+
+
+def executor_cpu():
+    global _executor_cpu
+    if _executor_cpu is None:
+        with _lock:
+            if _executor_cpu is None:
+                # Importado aqui: o multiprocessing só é carregado no primeiro trabalho de CPU
+                from concurrent.futures import ProcessPoolExecutor
+                _executor_cpu = ProcessPoolExecutor(max_workers=PROCESSOS_CPU)
+    return _executor_cpu
+
+
+# Envia um trabalho pesado ao pool de processos e aguarda o resultado.
+# Deve ser chamada de dentro de uma tarefa de I/O, nunca da thread da interface.
+def executar_cpu(funcao, *args):
+    # Medido aqui, no processo da interface: o tempo inclui a fila do pool (ex.: 'senhas.verificar_senha')
+    with rastreamento.medir('cpu', f"{funcao.__module__}.{funcao.__name__}"):
+        return executor_cpu().submit(funcao, *args).result()
+
+
+def encerrar():
+    global _executor_io, _executor_cpu
+    with _lock:
+        if _executor_io is not None:
+            _executor_io.shutdown(wait=False, cancel_futures=True)
+            _executor_io = None
+        if _executor_cpu is not None:
+            _executor_cpu.shutdown(wait=False, cancel_futures=True)
+            _executor_cpu = None
+
+
+# ---------- Indicador de ocupado ----------
+class IndicadorOcupado:
+    def __init__(self, janela, rotulo=None, texto='Carregando...'):
+        self.janela = janela
+        self.rotulo = rotulo
+        self.texto = texto
+
+    def definir(self, ocupado):
+        # O widget pode já ter sido destruído quando a tarefa termina
+        try:
+            self.janela.configure(cursor='watch' if ocupado else '')
+            if self.rotulo is not None:
+                self.rotulo.configure(text=self.texto if ocupado else '')
+        except tk.TclError:
+            pass
+
+
+# ---------- Tarefas ligadas a uma tela ----------
+class Tarefa:
+    def __init__(self, futuro):
+        self.futuro = futuro
+        self.cancelada = False
+
+    def cancelar(self):
+        self.cancelada = True
+        self.futuro.cancel()
+
+
+class GrupoTarefas:
+    # Agrupa as tarefas de uma tela: ao sair dela, cancelar() descarta tudo o que
+    # ainda está pendente e nenhum callback é chamado sobre widgets destruídos.
+    def __init__(self, widget, indicador=None):
+        self.widget = widget
+        self.indicador = indicador
+        self._pendentes = set()
+
+    @property
+    def ocupado(self):
+        return bool(self._pendentes)
+
+    def executar(self, funcao, *args, ao_concluir=None, ao_falhar=None, cpu=False):
+        executor = executor_cpu() if cpu else executor_io()
+        if not cpu:
+            # Mede o tempo da tarefa na thread de I/O (o pool de processos exige a função original)
+            funcao = rastreamento.rastrear('tarefa')(funcao)
+        tarefa = Tarefa(executor.submit(funcao, *args))
+        self._pendentes.add(tarefa)
+        self._atualizar_indicador()
+        self._agendar_verificacao(tarefa, ao_concluir, ao_falhar)
+        return tarefa
+
+    def cancelar(self):
+        for tarefa in list(self._pendentes):
+            tarefa.cancelar()
+        self._pendentes.clear()
+        self._atualizar_indicador()
+
+    def _agendar_verificacao(self, tarefa, ao_concluir, ao_falhar):
+        try:
+            self.widget.after(INTERVALO_VERIFICACAO_MS, self._verificar, tarefa, ao_concluir, ao_falhar)
+        except tk.TclError:
+            # A janela foi fechada: não há mais a quem entregar o resultado
+            tarefa.cancelar()
+            self._pendentes.discard(tarefa)
+
+    def _verificar(self, tarefa, ao_concluir, ao_falhar):
+        if tarefa.cancelada:
+            return
+        if not tarefa.futuro.done():
+            self._agendar_verificacao(tarefa, ao_concluir, ao_falhar)
+            return
+
+        self._pendentes.discard(tarefa)
+        self._atualizar_indicador()
+        try:
+            resultado = tarefa.futuro.result()
+        except Exception as erro:
+            if ao_falhar is None:
+                raise
+            with rastreamento.medir('ui', rastreamento.nome_funcao(ao_falhar)):
+                ao_falhar(erro)
+            return
+        if ao_concluir is not None:
+            # Atualização dos widgets com o resultado, na thread da interface
+            with rastreamento.medir('ui', rastreamento.nome_funcao(ao_concluir)):
+                ao_concluir(resultado)
+
+    def _atualizar_indicador(self):
+        if self.indicador is not None:
+            self.indicador.definir(self.ocupado)